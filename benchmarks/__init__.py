@@ -0,0 +1,3 @@
+"""
+筛选流程的性能基准测试
+"""
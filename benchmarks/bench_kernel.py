@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+筛选内核与旧版逐到期日筛选的性能对比
+
+用法:
+    python -m benchmarks.bench_kernel
+    python -m benchmarks.bench_kernel --expirations 40 --strikes 500 1000 2500
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from screener_core.greeks import add_greeks
+from screener_core.iv_solver import fill_missing_iv
+from screener_core.filtering import STRATEGIES, concat_chains, otm_strike_bounds, screen_chain
+from benchmarks.synthetic import make_chains
+
+
+def legacy_screen(chains, current_price, min_otm, max_otm, strategy, rate=0.0, dividend=0.0):
+    """旧版实现：逐个到期日筛选（逐行 apply 计算权利金），最后拼接排序"""
+    spec = STRATEGIES[strategy]
+    min_strike, max_strike = otm_strike_bounds(current_price, min_otm, max_otm, spec)
+    all_opportunities = []
+    for exp, dte, options_df in chains:
+        filtered = options_df[
+            (options_df['strike'] >= min_strike) &
+            (options_df['strike'] <= max_strike)
+        ].copy()
+        filtered['premium'] = filtered.apply(
+            lambda row: row['bid'] if row['bid'] > 0 else row['lastPrice'], axis=1
+        )
+        filtered = filtered[filtered['premium'] > 0]
+        if spec.collateral == 'strike':
+            filtered['collateral'] = filtered['strike'] * 100
+        else:
+            filtered['collateral'] = current_price * 100
+        filtered = filtered[filtered['collateral'] > 0]
+        if filtered.empty:
+            continue
+        filtered['annualizedReturn'] = (
+            (filtered['premium'] * 100) / filtered['collateral']
+        ) * (365 / dte)
+        filtered['dte'] = dte
+        fill_missing_iv(filtered, current_price, spec.option_type, rate, dividend)
+        add_greeks(filtered, current_price, spec.option_type, rate, dividend)
+        filtered['real_delta'] = abs(filtered['delta'])
+        all_opportunities.append(filtered)
+    if not all_opportunities:
+        return pd.DataFrame()
+    return pd.concat(all_opportunities).sort_values('annualizedReturn', ascending=False)
+
+
+def kernel_screen(chains, current_price, min_otm, max_otm, strategy, rate=0.0, dividend=0.0):
+    """新版实现：拼接后单次向量化筛选"""
+    chain_df, dtes = concat_chains(chains)
+    result, _ = screen_chain(chain_df, dtes, current_price, min_otm, max_otm, strategy, rate, dividend)
+    if result.empty:
+        return result
+    return result.sort_values('annualizedReturn', ascending=False)
+
+
+def _best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="筛选内核性能对比")
+    parser.add_argument('--expirations', type=int, default=30)
+    parser.add_argument('--strikes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    spot, min_otm, max_otm = 100.0, 0.01, 0.30
+    print(f"{'策略':<10}{'合约数':>10}{'旧版(ms)':>12}{'内核(ms)':>12}{'加速比':>10}")
+    for strategy in STRATEGIES:
+        spec = STRATEGIES[strategy]
+        for n_strikes in args.strikes:
+            chains = make_chains(spot, args.expirations, n_strikes, spec.option_type, seed=n_strikes)
+            total = sum(len(df) for _, _, df in chains)
+            legacy_time, legacy = _best_of(
+                lambda: legacy_screen(chains, spot, min_otm, max_otm, strategy, 0.04), args.repeat)
+            kernel_time, kernel = _best_of(
+                lambda: kernel_screen(chains, spot, min_otm, max_otm, strategy, 0.04), args.repeat)
+            pd.testing.assert_frame_equal(legacy, kernel)
+            print(f"{strategy:<10}{total:>10}{legacy_time * 1000:>12.1f}"
+                  f"{kernel_time * 1000:>12.1f}{legacy_time / kernel_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+筛选流程基准测试套件
+
+在合成期权链上分阶段计时（查找到期日、逐到期日筛选看跌/看涨期权、筛选内核、
+构建隐含波动率曲面、合并排序、前 K 名部分选择、帕累托前沿、组合配置、显示格式化），结果写入 JSON（含各阶段峰值内存，
+以及期权链和筛选结果转换为紧凑列类型前后每个合约占用的字节数），并可与保存的基线对比。
+
+用法:
+    python -m benchmarks.suite run -o current.json
+    python -m benchmarks.suite run --sizes 1000 10000 --tickers 2 --expirations 10
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.15
+
+compare 在出现性能回退时返回非零退出码，可直接用于 CI。
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from screener_core.allocator import AllocationLimits, allocate
+from screener_core.config import DEFAULT_TARGET_DELTA
+from screener_core.data import find_potential_expirations
+from screener_core.delta_index import DeltaIndex
+from screener_core.filtering import CASH_SECURED_PUT, concat_chains, screen_chain
+from screener_core.formatting import format_display_df
+from screener_core.iv_surface import build_iv_surface
+from screener_core.probability import add_probabilities
+from screener_core.pipeline import ScreenResult, analyze_and_filter_puts, analyze_and_filter_calls
+from screener_core.ranking import pareto_frontier, rank_opportunities, rank_watchlist_results, top_k
+from screener_core.schema import bytes_per_row, compact_frame
+from benchmarks.synthetic import SyntheticProvider, make_universe
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+MIN_OTM, MAX_OTM, RATE = 0.0, 0.5, 0.04
+STAGES = [
+    'find_potential_expirations',
+    'analyze_and_filter_puts',
+    'analyze_and_filter_calls',
+    'screen_chain',
+    'iv_surface',
+    'rank',
+    'top_k',
+    'pareto_frontier',
+    'target_delta',
+    'probability',
+    'allocation',
+    'format',
+]
+TOP_K = 100
+
+
+class Workload:
+    """一个规模下的合成数据及各阶段的输入"""
+
+    def __init__(self, contracts, tickers, expirations, seed=0):
+        self.strikes = max(1, contracts // (tickers * expirations))
+        self.tickers = tickers
+        self.expirations = expirations
+        self.contracts = self.strikes * tickers * expirations
+        self.universe = make_universe(tickers, expirations, self.strikes, seed=seed)
+        self.provider = SyntheticProvider(self.universe)
+        self.stocks = {symbol: self.provider.ticker(symbol) for symbol in self.universe}
+        self._per_expiration = None
+        self._ranked = None
+        self._delta_index = None
+
+    def find_expirations(self):
+        return [find_potential_expirations(stock, 0, 10_000) for stock in self.stocks.values()]
+
+    def _analyze(self, analyze, option_type):
+        results = {}
+        for symbol, (spot, sides) in self.universe.items():
+            results[symbol] = [
+                analyze(self.stocks[symbol], exp, dte, spot, MIN_OTM, MAX_OTM, options_df=df, rate=RATE)
+                for exp, dte, df in sides[option_type]
+            ]
+        return results
+
+    def analyze_puts(self):
+        return self._analyze(analyze_and_filter_puts, 'puts')
+
+    def analyze_calls(self):
+        return self._analyze(analyze_and_filter_calls, 'calls')
+
+    def screen_kernel(self):
+        results = {}
+        for symbol, (spot, sides) in self.universe.items():
+            chain_df, dtes = concat_chains(sides['puts'])
+            results[symbol], _ = screen_chain(chain_df, dtes, spot, MIN_OTM, MAX_OTM,
+                                              CASH_SECURED_PUT, RATE)
+        return results
+
+    def iv_surface(self):
+        return {
+            symbol: build_iv_surface(sides['puts'], spot, 'puts', RATE)
+            for symbol, (spot, sides) in self.universe.items()
+        }
+
+    def rank(self):
+        # 旧版 main() 中的 pd.concat(...).sort_values(...)，再跨股票合并排序
+        if self._per_expiration is None:
+            self._per_expiration = self.analyze_puts()
+        results = []
+        for symbol, frames in self._per_expiration.items():
+            frames = [frame for frame in frames if not frame.empty]
+            ranked = rank_opportunities(pd.concat(frames)) if frames else pd.DataFrame()
+            results.append(ScreenResult(symbol, ranked, self.universe[symbol][0], None, []))
+        return rank_watchlist_results(results)
+
+    def top_k(self):
+        return top_k(self._ranked, TOP_K)
+
+    def pareto_frontier(self):
+        return pareto_frontier(self._ranked)
+
+    def target_delta(self):
+        # 索引在 prepare 中建好，只测量调整目标 Delta 后的查找
+        return self._delta_index.nearest(DEFAULT_TARGET_DELTA)
+
+    def probability(self):
+        # 结果中没有曲面，每个到期日按最接近平值合约的隐含波动率模拟
+        return add_probabilities(self._ranked, CASH_SECURED_PUT, rate=RATE)
+
+    def allocation(self):
+        # 预算足够大，集中度和 Delta 约束都会起作用
+        return allocate(self._ranked, AllocationLimits(budget=10_000_000, max_delta=20_000)).book
+
+    def format(self):
+        if self._ranked is None:
+            self._ranked = self.rank()
+        return format_display_df(self._ranked)
+
+    def footprint(self):
+        """原始期权链、紧凑期权链和筛选结果平均每个合约占用的字节数"""
+        raw, compact, result = [], [], []
+        for symbol, (spot, sides) in self.universe.items():
+            chain_df, dtes = concat_chains(sides['puts'])
+            raw.append(bytes_per_row(chain_df))
+            compact_df = compact_frame(chain_df)
+            compact.append(bytes_per_row(compact_df))
+            screened, _ = screen_chain(compact_df, dtes, spot, MIN_OTM, MAX_OTM, CASH_SECURED_PUT, RATE)
+            result.append(bytes_per_row(screened))
+        return {
+            'contracts': self.contracts,
+            'chain_raw': statistics.mean(raw),
+            'chain_compact': statistics.mean(compact),
+            'result': statistics.mean(result),
+        }
+
+    def prepare(self, stage):
+        """提前计算阶段依赖的输入，使其不计入该阶段的耗时和内存"""
+        if stage == 'rank' and self._per_expiration is None:
+            self._per_expiration = self.analyze_puts()
+        if stage in ('top_k', 'pareto_frontier', 'target_delta', 'probability', 'allocation',
+                     'format') and self._ranked is None:
+            self._ranked = self.rank()
+        if stage == 'target_delta' and self._delta_index is None:
+            self._delta_index = DeltaIndex(self._ranked)
+
+    def stage(self, name):
+        return {
+            'find_potential_expirations': self.find_expirations,
+            'analyze_and_filter_puts': self.analyze_puts,
+            'analyze_and_filter_calls': self.analyze_calls,
+            'screen_chain': self.screen_kernel,
+            'iv_surface': self.iv_surface,
+            'rank': self.rank,
+            'top_k': self.top_k,
+            'pareto_frontier': self.pareto_frontier,
+            'target_delta': self.target_delta,
+            'probability': self.probability,
+            'allocation': self.allocation,
+            'format': self.format,
+        }[name]
+
+
+def _result_rows(result):
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, dict):
+        return sum(_result_rows(value) for value in result.values())
+    if isinstance(result, list):
+        return sum(_result_rows(value) for value in result)
+    return 1
+
+
+def measure(func, repeat):
+    """返回 (各次耗时列表, 峰值内存字节数, 结果)；峰值内存在单独一次运行中测量"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    result = None
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak - baseline, result
+
+
+def run_suite(sizes=DEFAULT_SIZES, tickers=5, expirations=20, repeat=3, stages=STAGES,
+              seed=0, log=None):
+    """运行基准测试，返回可写入 JSON 的结果字典"""
+    records = []
+    footprints = []
+    for size in sizes:
+        workload = Workload(size, tickers, expirations, seed)
+        footprints.append(workload.footprint())
+        if log is not None:
+            log(footprints[-1])
+        # 超大规模时减少重复次数，控制总耗时
+        runs = repeat if workload.contracts < 500_000 else max(1, min(repeat, 2))
+        for stage in stages:
+            workload.prepare(stage)
+            times, peak, result = measure(workload.stage(stage), runs)
+            record = {
+                'stage': stage,
+                'contracts': workload.contracts,
+                'tickers': workload.tickers,
+                'expirations': workload.expirations,
+                'strikes': workload.strikes,
+                'repeat': runs,
+                'best_seconds': min(times),
+                'median_seconds': statistics.median(times),
+                'peak_bytes': int(peak),
+                'rows': _result_rows(result),
+            }
+            records.append(record)
+            if log is not None:
+                log(record)
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+        },
+        'config': {
+            'sizes': list(sizes), 'tickers': tickers, 'expirations': expirations,
+            'repeat': repeat, 'seed': seed,
+        },
+        'results': records,
+        'bytes_per_contract': footprints,
+    }
+
+
+def compare_results(baseline, current, threshold=0.15, memory_threshold=0.25, min_seconds=0.001):
+    """对比两次运行结果，返回 [(stage, contracts, 指标, 基线值, 当前值, 是否回退), ...]
+
+    耗时按 best_seconds 比较，只有相对变化超过 threshold 且绝对差超过 min_seconds
+    才算回退，避免毫秒以下的计时噪声；峰值内存按 memory_threshold 比较。
+    """
+    base_index = {(r['stage'], r['contracts']): r for r in baseline['results']}
+    rows = []
+    for record in current['results']:
+        base = base_index.get((record['stage'], record['contracts']))
+        if base is None:
+            continue
+        old, new = base['best_seconds'], record['best_seconds']
+        regressed = new > old * (1 + threshold) and new - old > min_seconds
+        rows.append((record['stage'], record['contracts'], 'seconds', old, new, regressed))
+        old, new = base['peak_bytes'], record['peak_bytes']
+        regressed = new > old * (1 + memory_threshold) and new - old > 64 * 1024
+        rows.append((record['stage'], record['contracts'], 'peak_bytes', old, new, regressed))
+    return rows
+
+
+def _format_value(metric, value):
+    if metric == 'seconds':
+        return f"{value * 1000:.2f}ms"
+    return f"{value / 1024 ** 2:.2f}MB"
+
+
+def _log_record(record):
+    if 'stage' not in record:
+        print(f"每个合约字节数（{record['contracts']} 个合约）: 原始期权链 {record['chain_raw']:.1f} / "
+              f"紧凑期权链 {record['chain_compact']:.1f} / 筛选结果 {record['result']:.1f}", file=sys.stderr)
+        return
+    print(f"{record['stage']:<28}{record['contracts']:>10}{record['best_seconds'] * 1000:>12.2f}"
+          f"{record['peak_bytes'] / 1024 ** 2:>12.2f}{record['rows']:>10}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="筛选流程基准测试")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="运行基准测试并输出 JSON")
+    run.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="每个规模的合约总数")
+    run.add_argument('--tickers', type=int, default=5, help="股票数量")
+    run.add_argument('--expirations', type=int, default=20, help="每个股票的到期日数量")
+    run.add_argument('--repeat', type=int, default=3, help="每个阶段的计时次数（取最好成绩）")
+    run.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('-o', '--output', help="JSON 输出文件（默认输出到标准输出）")
+    run.add_argument('--baseline', help="运行后与该基线文件对比")
+    run.add_argument('--threshold', type=float, default=0.15, help="耗时回退阈值（相对变化）")
+
+    compare = commands.add_parser('compare', help="与基线对比，出现回退时返回 1")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.15, help="耗时回退阈值（相对变化）")
+    compare.add_argument('--memory-threshold', type=float, default=0.25, help="峰值内存回退阈值")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        print(f"{'阶段':<26}{'合约数':>9}{'耗时(ms)':>10}{'峰值内存(MB)':>10}{'行数':>8}", file=sys.stderr)
+        current = run_suite(args.sizes, args.tickers, args.expirations, args.repeat,
+                            args.stages, args.seed, log=_log_record)
+        text = json.dumps(current, indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+        else:
+            print(text)
+        if not args.baseline:
+            return 0
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, current, args.threshold)
+    else:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.current, encoding='utf-8') as f:
+            current = json.load(f)
+        rows = compare_results(baseline, current, args.threshold, args.memory_threshold)
+
+    regressions = 0
+    for stage, contracts, metric, old, new, regressed in rows:
+        change = (new - old) / old if old else 0.0
+        flag = '回退' if regressed else ''
+        regressions += regressed
+        print(f"{stage:<28}{contracts:>10}{metric:>12}{_format_value(metric, old):>12}"
+              f"{_format_value(metric, new):>12}{change:>+9.1%}  {flag}", file=sys.stderr)
+    print(f"共 {regressions} 项回退", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
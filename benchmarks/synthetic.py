@@ -0,0 +1,107 @@
+"""
+合成期权链生成器
+
+生成与 yfinance option_chain() 列结构一致的期权链，价格由带波动率微笑的
+Black-Scholes 模型给出，并混入零买价、失效隐含波动率等真实数据中常见的问题。
+"""
+
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from screener_core.greeks import black_scholes_price
+from screener_core.providers import MarketDataProvider, OptionChain
+
+
+def make_option_chain(spot, dte, n_strikes, option_type='puts', rng=None, symbol='SYN',
+                      expiration=None, rate=0.04):
+    """生成单个到期日的期权链"""
+    rng = np.random.default_rng(0) if rng is None else rng
+    expiration = expiration or (date.today() + timedelta(days=int(dte))).isoformat()
+    strikes = np.round(np.linspace(spot * 0.5, spot * 1.5, n_strikes), 2)
+    moneyness = np.log(strikes / spot)
+    iv = 0.25 + 0.4 * moneyness ** 2 - 0.1 * moneyness + rng.normal(0, 0.01, n_strikes)
+    iv = np.clip(iv, 0.05, None)
+    fair = black_scholes_price(spot, strikes, dte, iv, option_type, rate)
+    spread = np.maximum(0.01, fair * 0.05)
+    bid = np.round(np.maximum(fair - spread / 2, 0.0), 2)
+    ask = np.round(fair + spread / 2, 2)
+    bid[rng.random(n_strikes) < 0.1] = 0.0
+    bad_iv = rng.random(n_strikes) < 0.05
+    iv[bad_iv] = 1e-5
+
+    code = 'P' if option_type == 'puts' else 'C'
+    exp_code = expiration.replace('-', '')[2:]
+    return pd.DataFrame({
+        'contractSymbol': [f"{symbol}{exp_code}{code}{int(k * 1000):08d}" for k in strikes],
+        'lastTradeDate': pd.Timestamp('2024-01-02 15:59:00', tz='UTC'),
+        'strike': strikes,
+        'lastPrice': np.round(fair * rng.uniform(0.9, 1.1, n_strikes), 2),
+        'bid': bid,
+        'ask': ask,
+        'change': np.round(rng.normal(0, 0.1, n_strikes), 2),
+        'percentChange': np.round(rng.normal(0, 5, n_strikes), 2),
+        'volume': rng.integers(0, 5000, n_strikes).astype(float),
+        'openInterest': rng.integers(0, 20000, n_strikes),
+        'impliedVolatility': iv,
+        'inTheMoney': strikes > spot if option_type == 'puts' else strikes < spot,
+        'contractSize': 'REGULAR',
+        'currency': 'USD',
+    })
+
+
+def make_chains(spot=100.0, n_expirations=12, strikes_per_expiration=100, option_type='puts',
+                seed=0, symbol='SYN', first_dte=1, dte_step=7):
+    """生成多个到期日的期权链，返回 [(exp, dte, options_df), ...]"""
+    rng = np.random.default_rng(seed)
+    chains = []
+    for i in range(n_expirations):
+        dte = first_dte + i * dte_step
+        exp = (date.today() + timedelta(days=dte)).isoformat()
+        chains.append((exp, dte, make_option_chain(
+            spot, dte, strikes_per_expiration, option_type, rng, symbol, exp
+        )))
+    return chains
+
+
+def make_universe(n_tickers=5, n_expirations=12, strikes_per_expiration=100, seed=0,
+                  first_dte=1, dte_step=7):
+    """生成多个股票的合成期权链
+
+    返回 {股票代码: (现价, {'puts': chains, 'calls': chains})}，chains 格式同 make_chains。
+    """
+    rng = np.random.default_rng(seed)
+    universe = {}
+    for i in range(n_tickers):
+        symbol = f"SYN{i:03d}"
+        spot = float(np.round(rng.uniform(20, 500), 2))
+        universe[symbol] = (spot, {
+            option_type: make_chains(spot, n_expirations, strikes_per_expiration, option_type,
+                                     seed + i * 2 + offset, symbol, first_dte, dte_step)
+            for offset, option_type in enumerate(('puts', 'calls'))
+        })
+    return universe
+
+
+class SyntheticProvider(MarketDataProvider):
+    """以 make_universe 生成的数据作为行情数据源"""
+
+    name = 'synthetic'
+    cacheable = False
+
+    def __init__(self, universe):
+        self.universe = universe
+
+    def get_price(self, symbol):
+        entry = self.universe.get(symbol.upper())
+        return entry[0] if entry else None
+
+    def get_expirations(self, symbol):
+        return [exp for exp, _, _ in self.universe[symbol.upper()][1]['puts']]
+
+    def get_option_chain(self, symbol, expiration):
+        sides = self.universe[symbol.upper()][1]
+        frames = {
+            option_type: next(df for exp, _, df in chains if exp == expiration)
+            for option_type, chains in sides.items()
+        }
+        return OptionChain(calls=frames['calls'], puts=frames['puts'])
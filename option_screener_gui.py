@@ -1,9 +1,47 @@
+import time
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-from datetime import date
 import plotly.express as px
 import plotly.graph_objects as go
+from screener_core import data as core_data
+from screener_core.chain_cache import shared_cache
+from screener_core.singleflight import shared_flight
+from screener_core.config import (
+    DEFAULT_DAYS_TO_EXPIRATION_MIN,
+    DEFAULT_DAYS_TO_EXPIRATION_MAX,
+    DEFAULT_OTM_PERCENTAGE_MIN,
+    DEFAULT_OTM_PERCENTAGE_MAX,
+    DEFAULT_FETCH_WORKERS,
+    DEFAULT_FETCH_TIMEOUT,
+    DEFAULT_RISK_FREE_RATE,
+    DEFAULT_DIVIDEND_YIELD,
+    DEFAULT_WATCHLIST_WORKERS,
+    DEFAULT_SPREAD_MAX_WIDTH,
+    DEFAULT_SPREAD_MIN_CREDIT,
+    DTE_SLIDER_RANGE,
+    OTM_SLIDER_RANGE,
+    DELTA_FETCH_OTM_RANGE,
+    DEFAULT_DELTA_BAND,
+    DEFAULT_TARGET_DELTA,
+    DEFAULT_SIMULATION_PATHS,
+    DEFAULT_ALLOCATION_BUDGET,
+    DEFAULT_MAX_TICKER_FRACTION,
+    DEFAULT_MAX_EXPIRY_FRACTION,
+    DEFAULT_MAX_CONTRACTS,
+)
+from screener_core.filtering import STRATEGIES, SPREAD_STRATEGIES, CASH_SECURED_PUT, get_strategy, is_spread, refilter_results
+from screener_core.allocator import AllocationLimits, allocate
+from screener_core.delta_index import DeltaFilter, DeltaIndex
+from screener_core.formatting import format_allocation_df, format_display_df
+from screener_core.iv_surface import filter_richness
+from screener_core.prewarm import start_from_env as start_prewarm
+from screener_core.probability import add_probabilities
+from screener_core.pipeline import ScreenResult, apply_surface, parse_watchlist, screen_watchlist, stream_ticker
+from screener_core.service_client import ServiceError, client_from_env
+from screener_core.spreads import SpreadLimits
+from screener_core.ranking import RankingStream, combine_watchlist_results, pareto_frontier, rank_watchlist_results, top_k
+from screener_core.status import StatusLog
+from screener_core.tracing import export_metrics, shared_metrics, span, trace
 
 # Page configuration
 st.set_page_config(
@@ -14,264 +52,472 @@ st.set_page_config(
 
 # Default values
 DEFAULT_TICKER = 'DPST'
-DEFAULT_DAYS_TO_EXPIRATION_MIN = 30
-DEFAULT_DAYS_TO_EXPIRATION_MAX = 45
-DEFAULT_OTM_PERCENTAGE_MIN = 0.05
-DEFAULT_OTM_PERCENTAGE_MAX = 0.15
+DEFAULT_WATCHLIST = 'AAPL, MSFT, NVDA, SPY, QQQ'
+STREAM_TOP_N = 20  # 逐个到期日获取时实时显示的机会数
+RANK_METRICS = {
+    "年化收益率": 'annualizedReturn',
+    "期望年化收益率": 'expectedReturn',
+    "盈利概率": 'probProfit',
+}
+ALLOCATION_OBJECTIVES = {
+    "权利金合计": 'premium',
+    "期望盈亏合计": 'expectedPnl',
+}
 
-@st.cache_data(ttl=300)  # 缓存5分钟
 def get_stock_price(ticker_symbol):
-    """获取股票当前价格（可缓存）"""
-    try:
-        stock = yf.Ticker(ticker_symbol)
-        
-        # 尝试多种方式获取当前价格
-        current_price = None
-        
-        # 方法1: 从info获取
-        try:
-            current_price = stock.info.get('regularMarketPrice')
-        except:
-            pass
-            
-        # 方法2: 从历史数据获取
-        if current_price is None or pd.isna(current_price):
-            try:
-                hist = stock.history(period='1d')
-                if not hist.empty:
-                    current_price = hist['Close'].iloc[-1]
-            except:
-                pass
-        
-        # 方法3: 从快速信息获取
-        if current_price is None or pd.isna(current_price):
-            try:
-                fast_info = stock.fast_info
-                current_price = fast_info.last_price
-            except:
-                pass
-
-        if current_price is None or pd.isna(current_price):
-            raise ValueError(f"无法获取 {ticker_symbol} 的有效价格")
-            
-        return float(current_price)
-    except Exception as e:
-        # 不在这里显示错误，让调用函数处理
-        return None
+    """获取股票当前价格（由核心库的报价服务缓存5分钟，获取失败的不缓存）"""
+    return core_data.get_stock_price(ticker_symbol)
 
-def get_stock_data(ticker_symbol):
-    """获取股票数据和当前价格"""
-    try:
-        # 获取缓存的价格
-        current_price = get_stock_price(ticker_symbol)
-        if current_price is None:
-            st.error(f"获取股票数据时出错")
-            st.info("💡 提示：请检查股票代码是否正确，或稍后重试")
-            return None, None
-            
-        # 创建新的股票对象（不缓存）
-        stock = yf.Ticker(ticker_symbol)
-        return stock, current_price
-    except Exception as e:
-        st.error(f"获取股票数据时出错: {e}")
-        st.info("💡 提示：请检查股票代码是否正确，或稍后重试")
-        return None, None
-
-def find_potential_expirations(stock, min_dte, max_dte):
-    """查找指定DTE范围内的到期日"""
-    today = date.today()
-    potential_expirations = []
-    try:
-        for exp_str in stock.options:
-            exp_date = date.fromisoformat(exp_str)
-            dte = (exp_date - today).days
-            if min_dte <= dte <= max_dte:
-                potential_expirations.append((exp_str, dte))
-    except Exception as e:
-        st.error(f"获取期权到期日时出错: {e}")
-    return potential_expirations
+def show_messages(messages):
+    """在界面上显示核心库返回的状态信息"""
+    for kind, message in messages:
+        getattr(st, kind)(message)
 
-def get_real_greeks(stock, exp, option_type='puts'):
-    """获取真实的希腊字母数据"""
-    try:
-        option_chain = stock.option_chain(exp)
-        if option_type == 'puts':
-            options_df = option_chain.puts
-        else:
-            options_df = option_chain.calls
-        
-        # 检查是否有真实的希腊字母数据
-        greek_columns = ['delta', 'gamma', 'theta', 'vega', 'rho']
-        available_greeks = [col for col in greek_columns if col in options_df.columns]
-        
-        if available_greeks:
-            st.info(f"✅ 获取到真实希腊字母数据: {', '.join(available_greeks)}")
-            return options_df, True
-        else:
-            st.info("⚠️ 未获取到希腊字母数据，将使用计算值")
-            return options_df, False
-            
-    except Exception as e:
-        st.warning(f"获取希腊字母数据时出错: {e}")
-        return None, False
+def visible_results(result_df, filters, strategy_type, current_price=None, frontier_only=False,
+                    min_richness=None, delta_filter=None, delta_index=None):
+    """按当前滑块重新筛选，设置了 IV 溢价下限时只保留相对曲面偏贵的合约，
+    勾选「仅显示帕累托前沿」时只保留前沿上的合约
 
-def analyze_and_filter_puts(stock, exp, dte, current_price, min_otm, max_otm):
-    """分析和筛选看跌期权"""
-    try:
-        # 获取期权数据和希腊字母
-        puts, has_greeks = get_real_greeks(stock, exp, 'puts')
-        if puts is None:
-            return pd.DataFrame()
-
-        # 按OTM范围筛选
-        min_strike = current_price * (1 - max_otm)
-        max_strike = current_price * (1 - min_otm)
-        
-        filtered_puts = puts[
-            (puts['strike'] >= min_strike) &
-            (puts['strike'] <= max_strike)
-        ].copy()
-
-        # 使用bid价格，如果为0则使用lastPrice
-        filtered_puts['premium'] = filtered_puts.apply(
-            lambda row: row['bid'] if row['bid'] > 0 else row['lastPrice'], axis=1
-        )
-        
-        # 筛选有价格数据的期权
-        filtered_puts = filtered_puts[filtered_puts['premium'] > 0]
-        
-        # 计算抵押品
-        filtered_puts['collateral'] = filtered_puts['strike'] * 100
-        filtered_puts = filtered_puts[filtered_puts['collateral'] > 0]
+    设置了 delta_filter 时按 Delta 代替价外百分比筛选；delta_index 为在 result_df 上建好的
+    DeltaIndex，调整 Delta 滑块时复用，不再重新排序。
+    """
+    if delta_filter is not None and result_df is not None and not result_df.empty:
+        if delta_index is None:
+            delta_index = DeltaIndex(result_df)
+        visible_df = delta_index.select(delta_filter, filters[0], filters[1])
+    else:
+        visible_df = refilter_results(result_df, *filters, strategy_type, current_price)
+    visible_df = filter_richness(visible_df, min_richness)
+    if frontier_only:
+        visible_df = pareto_frontier(visible_df)
+    return visible_df
 
-        if filtered_puts.empty:
-            return pd.DataFrame()
+def top_return_chart(result_df):
+    """前10个机会的年化收益率柱状图"""
+    fig = px.bar(
+        top_k(result_df, 10), 
+        x='strike', 
+        y='annualizedReturn',
+        title='前10个机会的年化收益率',
+        labels={'strike': '行权价', 'annualizedReturn': '年化收益率'}
+    )
+    fig.update_layout(yaxis_tickformat='.2%')
+    return fig
 
-        # 计算年化收益率
-        filtered_puts['annualizedReturn'] = (
-            (filtered_puts['premium'] * 100) / filtered_puts['collateral']
-        ) * (365 / dte)
-        
-        filtered_puts['dte'] = dte
-        
-        # 获取真实Delta数据
-        if has_greeks and 'delta' in filtered_puts.columns:
-            # 使用真实Delta数据
-            filtered_puts['real_delta'] = abs(filtered_puts['delta'])
-            st.success(f"✅ 使用真实Delta数据 (范围: {filtered_puts['real_delta'].min():.3f} - {filtered_puts['real_delta'].max():.3f})")
-        else:
-            # 使用改进的近似计算
-            # 对于看跌期权，Delta通常为负值，我们取绝对值
-            filtered_puts['real_delta'] = abs(filtered_puts['strike'] - current_price) / current_price
-            st.info("ℹ️ 使用计算的Delta近似值")
-        
-        return filtered_puts
-    except Exception as e:
-        st.error(f"分析看跌期权数据时出错: {e}")
-        return pd.DataFrame()
+def waterfall_chart(spans_df):
+    """按开始时间排列各阶段耗时的瀑布图，同一阶段使用相同颜色"""
+    fig = go.Figure()
+    for stage, group in spans_df.groupby('stage', sort=False):
+        fig.add_trace(go.Bar(
+            y=group['label'],
+            x=group['duration'] * 1000,
+            base=group['start'] * 1000,
+            orientation='h',
+            name=stage,
+            customdata=group['thread'],
+            hovertemplate='%{y}<br>开始 %{base:.0f}ms · 耗时 %{x:.1f}ms<br>%{customdata}<extra></extra>'
+        ))
+    fig.update_yaxes(autorange='reversed', categoryorder='array', categoryarray=list(spans_df['label']))
+    fig.update_layout(
+        title='耗时瀑布图',
+        xaxis_title='毫秒',
+        barmode='overlay',
+        height=max(300, 22 * len(spans_df) + 120)
+    )
+    return fig
 
-def analyze_and_filter_calls(stock, exp, dte, current_price, min_otm, max_otm):
-    """分析和筛选看涨期权"""
-    try:
-        # 获取期权数据和希腊字母
-        calls, has_greeks = get_real_greeks(stock, exp, 'calls')
-        if calls is None:
-            return pd.DataFrame()
-
-        # 按OTM范围筛选 (对于看涨期权，OTM意味着行权价高于当前价格)
-        min_strike = current_price * (1 + min_otm)
-        max_strike = current_price * (1 + max_otm)
-        
-        filtered_calls = calls[
-            (calls['strike'] >= min_strike) &
-            (calls['strike'] <= max_strike)
-        ].copy()
-
-        # 使用bid价格，如果为0则使用lastPrice
-        filtered_calls['premium'] = filtered_calls.apply(
-            lambda row: row['bid'] if row['bid'] > 0 else row['lastPrice'], axis=1
-        )
-        
-        # 筛选有价格数据的期权
-        filtered_calls = filtered_calls[filtered_calls['premium'] > 0]
+def render_performance_panel(traces):
+    """显示本次数据获取与页面渲染的耗时瀑布图，以及进程内各阶段的耗时分位数"""
+    with st.expander("⏱️ 性能"):
+        for title, item in traces:
+            if item is None:
+                continue
+            spans_df = item.frame()
+            if spans_df.empty:
+                continue
+            st.markdown(f"**{title}**（共 {spans_df['end'].max() * 1000:.0f}ms）")
+            st.plotly_chart(waterfall_chart(spans_df), use_container_width=True)
         
-        # 对于备兑看涨期权，抵押品是股票本身（100股）
-        filtered_calls['collateral'] = current_price * 100
-        filtered_calls = filtered_calls[filtered_calls['collateral'] > 0]
+        stages = shared_metrics().snapshot()
+        if stages:
+            st.markdown("**各阶段累计耗时（进程内）**")
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        '阶段': name,
+                        '次数': stage['count'],
+                        '总耗时(ms)': stage['sum'] * 1000,
+                        'p50(ms)': stage['quantiles'][0.5] * 1000,
+                        'p95(ms)': stage['quantiles'][0.95] * 1000,
+                        'p99(ms)': stage['quantiles'][0.99] * 1000,
+                    }
+                    for name, stage in stages.items()
+                ]).round(1),
+                use_container_width=True,
+                hide_index=True
+            )
 
-        if filtered_calls.empty:
-            return pd.DataFrame()
+def screen_options_gui(ticker, min_dte, max_dte, min_otm, max_otm, strategy_type,
+                       max_workers=DEFAULT_FETCH_WORKERS, fetch_timeout=DEFAULT_FETCH_TIMEOUT,
+                       rate=DEFAULT_RISK_FREE_RATE, dividend=DEFAULT_DIVIDEND_YIELD,
+                       display_filters=None, frontier_only=False, spread_limits=None, min_richness=None,
+                       delta_filter=None, service=None):
+    """GUI版本的期权筛选主函数，返回 ScreenResult
 
-        # 计算年化收益率
-        filtered_calls['annualizedReturn'] = (
-            (filtered_calls['premium'] * 100) / filtered_calls['collateral']
-        ) * (365 / dte)
-        
-        filtered_calls['dte'] = dte
-        
-        # 获取真实Delta数据
-        if has_greeks and 'delta' in filtered_calls.columns:
-            # 使用真实Delta数据
-            filtered_calls['real_delta'] = abs(filtered_calls['delta'])
-            st.success(f"✅ 使用真实Delta数据 (范围: {filtered_calls['real_delta'].min():.3f} - {filtered_calls['real_delta'].max():.3f})")
-        else:
-            # 使用改进的近似计算
-            # 对于看涨期权，Delta通常为正值
-            filtered_calls['real_delta'] = abs(filtered_calls['strike'] - current_price) / current_price
-            st.info("ℹ️ 使用计算的Delta近似值")
-        
-        return filtered_calls
-    except Exception as e:
-        st.error(f"分析看涨期权数据时出错: {e}")
-        return pd.DataFrame()
-
-def screen_options_gui(ticker, min_dte, max_dte, min_otm, max_otm, strategy_type):
-    """GUI版本的期权筛选主函数"""
+    每获取完一个到期日就刷新排名靠前的机会表格和收益率图表；display_filters 为实时显示时
+    使用的 (min_dte, max_dte, min_otm, max_otm)，默认与筛选条件相同。实时显示只对已到达的
+    结果做部分选择，全部到达后才完整排序一次。
+    service 为筛选服务客户端时由服务完成筛选，只显示等待提示，不逐个到期日刷新。
+    """
+    if service is not None:
+        with st.spinner(f'正在通过筛选服务获取 {ticker.upper()} 的数据...'):
+            return service.screen_ticker(
+                ticker, min_dte, max_dte, min_otm, max_otm, strategy_type,
+                max_workers=max_workers, rate=rate, dividend=dividend, spread_limits=spread_limits
+            )
+    display_filters = display_filters or (min_dte, max_dte, min_otm, max_otm)
     
     # 获取股票数据
     with st.spinner(f'正在获取 {ticker.upper()} 的数据...'):
-        stock, current_price = get_stock_data(ticker)
+        current_price = get_stock_price(ticker)
+    
+    status = StatusLog()
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    table_placeholder = st.empty()
+    chart_placeholder = st.empty()
+    stream = None
+    surface = None
+    for update in stream_ticker(
+        ticker, min_dte, max_dte, min_otm, max_otm, strategy_type,
+        max_workers=max_workers, fetch_timeout=fetch_timeout,
+        current_price=current_price, rate=rate, dividend=dividend, status=status,
+        spread_limits=spread_limits
+    ):
+        if stream is None:
+            stream = RankingStream(update.total)
+        stream.add(update.index, update.result)
+        current_price = update.current_price
+        surface = update.surface or surface
+        progress_bar.progress(update.completed / update.total)
+        status_text.text(f"已完成 {update.completed}/{update.total} 个到期日: {update.expiration}")
+        if update.result.empty:
+            continue
         
-    if stock is None or current_price is None:
-        return None, None
+        # 合并已到达的到期日，显示当前条件下排名靠前的机会
+        visible_df = visible_results(stream.combined(), display_filters, strategy_type, current_price,
+                                     frontier_only, min_richness, delta_filter)
+        if visible_df.empty:
+            continue
+        with span('render.table'):
+            table_placeholder.dataframe(
+                format_display_df(top_k(visible_df, STREAM_TOP_N)),
+                use_container_width=True,
+                hide_index=True
+            )
+        with span('render.charts'):
+            # 多腿组合的前10名常在多个到期日到达后保持不变，相同的图表需要不同的 key
+            chart_placeholder.plotly_chart(top_return_chart(visible_df), use_container_width=True,
+                                           key=f"stream_chart_{update.completed}")
     
-    # 查找到期日
-    expirations = find_potential_expirations(stock, min_dte, max_dte)
-    if not expirations:
-        st.warning(f"在 {min_dte}-{max_dte} 天到期窗口内未找到期权")
-        return None, current_price
+    progress_bar.empty()
+    status_text.empty()
+    table_placeholder.empty()
+    chart_placeholder.empty()
+    
+    if current_price is None:
+        errors = status.errors()
+        return ScreenResult(ticker, None, None, errors[0] if errors else "获取股票数据失败", status.messages)
+    result_df = stream.result() if stream is not None else pd.DataFrame()
+    # 全部到期日到达后才有完整的隐含波动率曲面
+    result_df = apply_surface(result_df, surface, current_price, strategy_type, rate, dividend, status)
+    return ScreenResult(ticker, result_df, current_price, None, status.messages, surface)
+
+def fetch_watchlist_screen(tickers, strategy_type, filters,
+                           max_workers=DEFAULT_WATCHLIST_WORKERS, fetch_workers=DEFAULT_FETCH_WORKERS,
+                           rate=DEFAULT_RISK_FREE_RATE, dividend=DEFAULT_DIVIDEND_YIELD,
+                           frontier_only=False, spread_limits=None, min_richness=None,
+                           otm_range=OTM_SLIDER_RANGE, delta_filter=None, service=None):
+    """按滑块完整范围（价外百分比取 otm_range）批量筛选自选股，每个股票完成时刷新按当前条件筛选的排名表
 
-    # 分析所有到期日的期权
-    all_opportunities = []
+    返回 (合并排序后的完整结果, 失败的 ScreenResult 列表, {股票代码: 隐含波动率曲面})。
+    service 为筛选服务客户端时由服务筛选，服务按完成先后逐个返回股票结果。
+    """
     progress_bar = st.progress(0)
+    status_text = st.empty()
+    table_placeholder = st.empty()
     
-    for i, (exp, dte) in enumerate(expirations):
+    finished = []
+    failures = []
+    screen = service.screen_watchlist if service is not None else screen_watchlist
+    for item in screen(
+        tickers, *DTE_SLIDER_RANGE, *otm_range, strategy_type,
+        max_workers=max_workers, fetch_workers=fetch_workers, rate=rate, dividend=dividend,
+        spread_limits=spread_limits
+    ):
+        finished.append(item)
+        if item.error is not None:
+            failures.append(item)
+        progress_bar.progress(len(finished) / len(tickers))
+        status_text.text(f"已完成 {len(finished)}/{len(tickers)}: {item.ticker}")
+        
+        if item.result is not None and not item.result.empty:
+            visible_df = visible_results(combine_watchlist_results(finished), filters, strategy_type,
+                                         frontier_only=frontier_only, min_richness=min_richness,
+                                         delta_filter=delta_filter)
+            if not visible_df.empty:
+                with span('render.table'):
+                    table_placeholder.dataframe(
+                        format_display_df(top_k(visible_df, 100)),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+    
+    progress_bar.empty()
+    status_text.empty()
+    table_placeholder.empty()
+    with span('rank'):
+        ranked_df = rank_watchlist_results(finished)
+    surfaces = {item.ticker: item.surface for item in finished if item.surface is not None}
+    return ranked_df, failures, surfaces
+
+def render_watchlist_result(ranked_df, failures, total, strategy_type):
+    """显示自选股批量筛选结果"""
+    st.subheader(f"🎯 自选股{strategy_type}批量筛选")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("筛选股票", f"{total - len(failures)}/{total} 个")
+    with col2:
+        st.metric("策略类型", strategy_type)
+    with col3:
+        st.metric("找到机会", f"{len(ranked_df)} 个")
+    
+    if failures:
+        with st.expander(f"⚠️ {len(failures)} 个股票筛选失败"):
+            for item in failures:
+                st.write(f"**{item.ticker}**: {item.error}")
+    
+    if ranked_df.empty:
+        st.warning("未找到符合条件的期权机会，请尝试调整筛选条件")
+        return
+    
+    with span('render.table'):
+        st.dataframe(
+            format_display_df(ranked_df),
+            use_container_width=True,
+            hide_index=True
+        )
+    st.download_button(
+        "📥 下载CSV",
+        ranked_df.to_csv(index=False).encode('utf-8'),
+        file_name="watchlist_screen.csv",
+        mime="text/csv"
+    )
+
+def render_allocation(result_df, limits, objective):
+    """在当前显示的筛选结果中按资金预算配置张数，显示组合合计和选中的合约"""
+    st.subheader("💼 组合配置")
+    if result_df is None or result_df.empty:
+        st.info("没有可配置的合约")
+        return
+    with span('allocation'):
+        allocation = allocate(result_df, limits, objective)
+    book_df = allocation.book
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("合约张数", f"{int(book_df['quantity'].sum()) if not book_df.empty else 0} 张")
+    with col2:
+        st.metric("占用资金", f"${allocation.collateral:,.0f}",
+                  help=f"预算 ${limits.budget:,.0f}，剩余 ${limits.budget - allocation.collateral:,.0f}")
+    with col3:
+        st.metric("权利金合计" if objective == 'premium' else "期望盈亏合计", f"${allocation.value:,.0f}")
+    with col4:
+        st.metric("Delta 敞口", f"{allocation.delta:,.0f} 股",
+                  help="Σ |Delta| × 100 × 张数，相当于多少股正股的方向风险")
+    if book_df.empty:
+        st.warning("预算不足以买入任何一张合约，请提高资金预算或集中度上限")
+        return
+    st.dataframe(format_allocation_df(book_df, objective), use_container_width=True, hide_index=True)
+    st.download_button(
+        "📥 下载组合CSV",
+        book_df.to_csv(index=False).encode('utf-8'),
+        file_name="allocation.csv",
+        mime="text/csv"
+    )
+
+def surface_chart(surface):
+    """隐含波动率曲面热力图（行权价相对现价 70%-130%）"""
+    grid = surface.grid_frame()
+    grid = grid.loc[:, (grid.columns >= 0.7) & (grid.columns <= 1.3)]
+    fig = go.Figure(go.Heatmap(
+        z=grid.to_numpy(),
+        x=grid.columns,
+        y=grid.index,
+        colorscale='Viridis',
+        colorbar={'tickformat': '.0%'},
+        hovertemplate='行权价/现价 %{x:.2f}<br>到期天数 %{y}<br>隐含波动率 %{z:.2%}<extra></extra>'
+    ))
+    fig.update_layout(title='隐含波动率曲面', xaxis_title='行权价 / 现价', yaxis_title='到期天数')
+    return fig
+
+def render_iv_surface(surface):
+    """显示隐含波动率曲面的期限结构、偏斜和热力图"""
+    with st.expander("🌋 隐含波动率曲面"):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("30天平值IV", f"{float(surface.atm_iv(30)):.2%}")
+        with col2:
+            st.metric("90天平值IV", f"{float(surface.atm_iv(90)):.2%}")
+        with col3:
+            st.metric("期限结构斜率", f"{surface.term_slope():+.2%}",
+                      help="90天与30天平值波动率之差，负值表示近月波动率更高（倒挂）")
+        with col4:
+            st.metric("30天偏斜", f"{float(surface.skew(30)):+.2%}",
+                      help="90% 与 110% 行权价的隐含波动率之差")
+        st.plotly_chart(surface_chart(surface), use_container_width=True)
+        metrics = surface.metrics()
+        metrics.columns = ['到期天数', '平值IV', '偏斜']
+        st.dataframe(metrics.style.format({'平值IV': '{:.2%}', '偏斜': '{:+.2%}'}), hide_index=True)
+        st.caption(f"由 {surface.points} 个报价构建；筛选结果的「IV溢价」为合约隐含波动率减去曲面值")
+
+def render_single_result(ticker, current_price, strategy_type, result_df, surface=None):
+    """显示单个股票的筛选结果、希腊字母统计、隐含波动率曲面和图表"""
+    # 显示当前价格和策略信息
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("股票代码", ticker)
+    with col2:
+        st.metric("当前价格", f"${current_price:.2f}")
+    with col3:
+        st.metric("策略类型", strategy_type)
+    with col4:
+        if result_df is not None and not result_df.empty:
+            st.metric("找到机会", f"{len(result_df)} 个")
+        else:
+            st.metric("找到机会", "0 个")
+
+    st.markdown("---")
+
+    # 显示结果
+    if result_df is None or result_df.empty:
+        st.warning("未找到符合条件的期权机会，请尝试调整筛选条件")
+        return
+
+    st.subheader(f"🎯 {strategy_type}筛选结果")
+
+    # 检查是否有其他希腊字母数据
+    greek_columns = ['gamma', 'theta', 'vega', 'rho', 'impliedVolatility']
+    available_greeks = [col for col in greek_columns if col in result_df.columns]
+
+    if available_greeks:
+        st.info(f"📊 可用的希腊字母数据: {', '.join(available_greeks)}")
+
+        # 显示希腊字母统计
+        with st.expander("📈 希腊字母统计信息"):
+            greek_stats = {}
+            for greek in available_greeks:
+                if greek in result_df.columns:
+                    greek_data = pd.to_numeric(result_df[greek], errors='coerce').dropna()
+                    if not greek_data.empty:
+                        greek_stats[greek] = {
+                            '平均值': greek_data.mean(),
+                            '最小值': greek_data.min(),
+                            '最大值': greek_data.max(),
+                            '标准差': greek_data.std()
+                        }
+
+            if greek_stats:
+                stats_df = pd.DataFrame(greek_stats).T
+                st.dataframe(stats_df.round(4))
+
+    if surface is not None:
+        render_iv_surface(surface)
+
+    # 准备显示数据
+    display_df = format_display_df(result_df)
+
+    # 显示表格
+    with span('render.table'):
+        st.dataframe(
+            display_df,
+            use_container_width=True,
+            hide_index=True
+        )
+
+    # 创建图表
+    with span('render.charts'):
+        render_charts(result_df)
+
+def render_charts(result_df):
+    """年化收益率、到期天数分布和收益率 vs Delta 图表"""
+    st.subheader("📊 数据可视化")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # 年化收益率图表
         try:
-            if strategy_type == "现金担保看跌期权":
-                opportunities = analyze_and_filter_puts(
-                    stock, exp, dte, current_price, min_otm, max_otm
-                )
-            else:  # 备兑看涨期权
-                opportunities = analyze_and_filter_calls(
-                    stock, exp, dte, current_price, min_otm, max_otm
-                )
-                
-            if not opportunities.empty:
-                all_opportunities.append(opportunities)
+            st.plotly_chart(top_return_chart(result_df), use_container_width=True)
         except Exception as e:
-            st.warning(f"处理到期日 {exp} 时出错: {e}")
-            
-        progress_bar.progress((i + 1) / len(expirations))
+            st.info(f"年化收益率图表生成失败: {e}")
 
-    if not all_opportunities:
-        return pd.DataFrame(), current_price
-    else:
-        result_df = pd.concat(all_opportunities)
-        result_df = result_df.sort_values('annualizedReturn', ascending=False)
-        return result_df, current_price
+    with col2:
+        # 到期天数分布
+        try:
+            fig2 = px.histogram(
+                result_df, 
+                x='dte',
+                title='到期天数分布',
+                labels={'dte': '到期天数', 'count': '数量'}
+            )
+            st.plotly_chart(fig2, use_container_width=True)
+        except Exception as e:
+            st.info(f"到期天数分布图表生成失败: {e}")
+
+    # 散点图：收益率 vs 风险
+    try:
+        # 处理数据中的 NaN 值和无效数据
+        plot_df = result_df.copy()
+
+        # 清理数据
+        plot_df['volume'] = pd.to_numeric(plot_df['volume'], errors='coerce').fillna(1)
+        plot_df['real_delta'] = pd.to_numeric(plot_df['real_delta'], errors='coerce')
+        plot_df['annualizedReturn'] = pd.to_numeric(plot_df['annualizedReturn'], errors='coerce')
+        plot_df['strike'] = pd.to_numeric(plot_df['strike'], errors='coerce')
+        plot_df['dte'] = pd.to_numeric(plot_df['dte'], errors='coerce')
+        plot_df['premium'] = pd.to_numeric(plot_df['premium'], errors='coerce')
+
+        # 移除包含 NaN 的行
+        plot_df = plot_df.dropna(subset=['real_delta', 'annualizedReturn', 'volume'])
+        plot_df = plot_df[plot_df['volume'] > 0]  # 只保留volume > 0的数据
+
+        if not plot_df.empty and len(plot_df) > 1:
+            fig3 = px.scatter(
+                plot_df,
+                x='real_delta',
+                y='annualizedReturn',
+                size='volume',
+                hover_data=['strike', 'dte', 'premium'],
+                title='收益率 vs Delta 分析',
+                labels={
+                    'real_delta': 'Delta (敏感度指标)',
+                    'annualizedReturn': '年化收益率',
+                    'volume': '成交量'
+                }
+            )
+            fig3.update_layout(yaxis_tickformat='.2%')
+            st.plotly_chart(fig3, use_container_width=True)
+        else:
+            st.info("数据不足，无法生成散点图")
+    except Exception as e:
+        st.info(f"散点图生成遇到问题: {str(e)}")
 
 # Streamlit 界面
 def main():
+    # 配置了 OPTION_SCREENER_SERVICE_URL 时通过筛选服务获取数据，缓存和预热都在服务进程中
+    service = client_from_env()
+    # 配置了 OPTION_SCREENER_PREWARM 时在后台预热自选股缓存（每个进程只启动一次）
+    prewarmer = start_prewarm() if service is None else None
     st.title("📈 期权策略筛选器")
     st.markdown("---")
     
@@ -281,238 +527,445 @@ def main():
     # 策略选择
     strategy_type = st.sidebar.selectbox(
         "选择期权策略",
-        ["现金担保看跌期权", "备兑看涨期权"],
-        help="选择要筛选的期权策略类型"
+        list(STRATEGIES) + list(SPREAD_STRATEGIES),
+        help="选择要筛选的期权策略类型；价差、铁鹰式和宽跨式在同一到期日内配对多个行权价"
+    )
+    
+    screen_mode = st.sidebar.radio(
+        "筛选模式",
+        ["单个股票", "自选股批量"],
+        horizontal=True,
+        help="自选股批量模式会并发筛选列表中的所有股票，并合并排序结果"
     )
     
-    ticker = st.sidebar.text_input(
-        "股票代码", 
-        value=DEFAULT_TICKER,
-        help="输入要分析的股票代码，如 AAPL, TSLA, DPST"
-    ).upper()
+    ticker = ""
+    watchlist = []
+    if screen_mode == "单个股票":
+        ticker = st.sidebar.text_input(
+            "股票代码", 
+            value=DEFAULT_TICKER,
+            help="输入要分析的股票代码，如 AAPL, TSLA, DPST"
+        ).upper()
+    else:
+        watchlist = parse_watchlist(st.sidebar.text_area(
+            "自选股列表",
+            value=DEFAULT_WATCHLIST,
+            help="输入多个股票代码，用逗号、空格或换行分隔"
+        ))
     
     st.sidebar.subheader("到期时间范围")
     min_dte = st.sidebar.slider(
         "最小到期天数", 
-        min_value=1, 
-        max_value=90, 
+        min_value=DTE_SLIDER_RANGE[0], 
+        max_value=DTE_SLIDER_RANGE[1], 
         value=DEFAULT_DAYS_TO_EXPIRATION_MIN,
         help="期权的最小到期天数"
     )
     
     max_dte = st.sidebar.slider(
         "最大到期天数", 
-        min_value=1, 
-        max_value=90, 
+        min_value=DTE_SLIDER_RANGE[0], 
+        max_value=DTE_SLIDER_RANGE[1], 
         value=DEFAULT_DAYS_TO_EXPIRATION_MAX,
         help="期权的最大到期天数"
     )
     
-    st.sidebar.subheader("价外程度范围")
+    strike_mode = "价外百分比"
+    if not is_spread(strategy_type):
+        strike_mode = st.sidebar.radio(
+            "行权价选择方式",
+            ["价外百分比", "Delta 区间", "目标 Delta"],
+            horizontal=True,
+            help="按价外百分比、|Delta| 区间，或每个到期日最接近目标 Delta 的一个合约选择行权价"
+        )
     
     # 根据策略类型调整说明文字
-    if strategy_type == "现金担保看跌期权":
+    if is_spread(strategy_type):
+        otm_help_min = "卖出腿行权价相对当前价格的最小价外百分比（看跌腿低于、看涨腿高于当前价格）"
+        otm_help_max = "卖出腿行权价相对当前价格的最大价外百分比（看跌腿低于、看涨腿高于当前价格）"
+    elif strategy_type == CASH_SECURED_PUT:
         otm_help_min = "看跌期权行权价相对当前价格的最小价外百分比（行权价低于当前价格）"
         otm_help_max = "看跌期权行权价相对当前价格的最大价外百分比（行权价低于当前价格）"
     else:
         otm_help_min = "看涨期权行权价相对当前价格的最小价外百分比（行权价高于当前价格）"
         otm_help_max = "看涨期权行权价相对当前价格的最大价外百分比（行权价高于当前价格）"
     
-    min_otm = st.sidebar.slider(
-        "最小价外百分比", 
-        min_value=0.01, 
-        max_value=0.30, 
-        value=DEFAULT_OTM_PERCENTAGE_MIN,
-        format="%.2f",
-        help=otm_help_min
+    min_otm, max_otm = DEFAULT_OTM_PERCENTAGE_MIN, DEFAULT_OTM_PERCENTAGE_MAX
+    delta_filter = None
+    if strike_mode == "价外百分比":
+        st.sidebar.subheader("价外程度范围")
+        min_otm = st.sidebar.slider(
+            "最小价外百分比", 
+            min_value=OTM_SLIDER_RANGE[0], 
+            max_value=OTM_SLIDER_RANGE[1], 
+            value=DEFAULT_OTM_PERCENTAGE_MIN,
+            format="%.2f",
+            help=otm_help_min
+        )
+        
+        max_otm = st.sidebar.slider(
+            "最大价外百分比", 
+            min_value=OTM_SLIDER_RANGE[0], 
+            max_value=OTM_SLIDER_RANGE[1], 
+            value=DEFAULT_OTM_PERCENTAGE_MAX,
+            format="%.2f",
+            help=otm_help_max
+        )
+    elif strike_mode == "Delta 区间":
+        st.sidebar.subheader("Delta 范围")
+        low, high = st.sidebar.slider(
+            "|Delta| 区间",
+            min_value=0.0,
+            max_value=1.0,
+            value=DEFAULT_DELTA_BAND,
+            step=0.01,
+            format="%.2f",
+            help="只显示 |Delta| 在该区间内的价外合约"
+        )
+        delta_filter = DeltaFilter(low, high)
+    else:
+        st.sidebar.subheader("Delta 范围")
+        target = st.sidebar.slider(
+            "目标 |Delta|",
+            min_value=0.01,
+            max_value=0.5,
+            value=DEFAULT_TARGET_DELTA,
+            step=0.01,
+            format="%.2f",
+            help="每个到期日只显示 |Delta| 最接近该值的一个价外合约"
+        )
+        delta_filter = DeltaFilter(target=target)
+    # 按 Delta 选择时获取全部价外合约，之后在内存中按 Delta 重新筛选
+    otm_range = OTM_SLIDER_RANGE if delta_filter is None else DELTA_FETCH_OTM_RANGE
+    
+    spread_limits = None
+    if is_spread(strategy_type):
+        st.sidebar.subheader("组合条件")
+        max_width = DEFAULT_SPREAD_MAX_WIDTH
+        if get_strategy(strategy_type).wings:
+            max_width = st.sidebar.number_input(
+                "最大行权价间距",
+                min_value=0.5,
+                max_value=100.0,
+                value=DEFAULT_SPREAD_MAX_WIDTH,
+                step=0.5,
+                help="买入腿与卖出腿行权价的最大间距（美元）"
+            )
+        min_credit = st.sidebar.number_input(
+            "最低净权利金",
+            min_value=0.0,
+            max_value=50.0,
+            value=DEFAULT_SPREAD_MIN_CREDIT,
+            step=0.05,
+            help="每股最低净权利金（卖出腿收入减去买入腿成本）"
+        )
+        max_loss = st.sidebar.number_input(
+            "最大亏损上限",
+            min_value=0.0,
+            value=0.0,
+            step=100.0,
+            help="每张组合的最大亏损（宽跨式为保证金）上限，单位美元；0 表示不限制"
+        )
+        spread_limits = SpreadLimits(max_width, min_credit, max_loss or None)
+    
+    frontier_only = st.sidebar.checkbox(
+        "仅显示帕累托前沿",
+        value=False,
+        help="只显示没有其他合约在年化收益率、Delta、持仓量三方面同时不差于它（且至少一项更好）的合约"
     )
+    min_richness = None
+    if not is_spread(strategy_type) and st.sidebar.checkbox(
+        "按 IV 曲面溢价筛选",
+        value=False,
+        help="由全部到期日构建隐含波动率曲面，只显示隐含波动率高于曲面的合约（相对偏贵，对卖方有利）"
+    ):
+        min_richness = st.sidebar.slider(
+            "最低 IV 溢价",
+            min_value=-0.05,
+            max_value=0.10,
+            value=0.0,
+            step=0.005,
+            format="%.3f",
+            help="合约隐含波动率减去曲面在同一行权价和到期日的值（0.01 即 1 个波动率点）"
+        )
     
-    max_otm = st.sidebar.slider(
-        "最大价外百分比", 
-        min_value=0.01, 
-        max_value=0.30, 
-        value=DEFAULT_OTM_PERCENTAGE_MAX,
-        format="%.2f",
-        help=otm_help_max
+    probability_paths = None
+    rank_metric = 'annualizedReturn'
+    historical_vol = 0.0
+    if not is_spread(strategy_type) and st.sidebar.checkbox(
+        "计算盈利概率（蒙特卡洛）",
+        value=False,
+        help="按隐含波动率曲面（保留偏斜）或历史波动率模拟到期价格，估计盈利概率、被行权概率、期望盈亏和最差 5% 的平均亏损"
+    ):
+        rank_label = st.sidebar.selectbox(
+            "排序依据",
+            list(RANK_METRICS),
+            help="年化收益率假设期权到期作废；期望年化收益率计入了被行权的亏损"
+        )
+        rank_metric = RANK_METRICS[rank_label]
+        probability_paths = st.sidebar.number_input(
+            "模拟路径数",
+            min_value=10_000,
+            max_value=1_000_000,
+            value=DEFAULT_SIMULATION_PATHS,
+            step=10_000,
+            help="每个到期日模拟的到期价格数，同一到期日的所有行权价共用"
+        )
+        historical_vol = st.sidebar.number_input(
+            "历史波动率",
+            min_value=0.0,
+            max_value=3.0,
+            value=0.0,
+            step=0.01,
+            format="%.2f",
+            help="按该年化波动率的对数正态分布模拟；0 表示使用隐含波动率曲面"
+        )
+    
+    allocation_limits = None
+    allocation_objective = 'premium'
+    if st.sidebar.checkbox(
+        "按资金预算配置组合",
+        value=False,
+        help="在当前显示的合约中选择每个合约的张数，使权利金（或期望盈亏）合计最大，同时满足预算和集中度限制"
+    ):
+        budget = st.sidebar.number_input(
+            "资金预算",
+            min_value=1_000.0,
+            max_value=100_000_000.0,
+            value=DEFAULT_ALLOCATION_BUDGET,
+            step=10_000.0,
+            format="%.0f",
+            help="全部合约占用的担保资金（多腿组合为最大亏损）上限，单位美元"
+        )
+        max_ticker_fraction = st.sidebar.slider(
+            "单个股票资金上限",
+            min_value=0.05,
+            max_value=1.0,
+            value=DEFAULT_MAX_TICKER_FRACTION,
+            step=0.05,
+            format="%.2f",
+            help="单个股票占用资金占预算的最大比例"
+        )
+        max_expiry_fraction = st.sidebar.slider(
+            "单个到期日资金上限",
+            min_value=0.05,
+            max_value=1.0,
+            value=DEFAULT_MAX_EXPIRY_FRACTION,
+            step=0.05,
+            format="%.2f",
+            help="单个到期日占用资金占预算的最大比例"
+        )
+        max_delta = st.sidebar.number_input(
+            "Delta 预算",
+            min_value=0.0,
+            value=0.0,
+            step=100.0,
+            format="%.0f",
+            help="Σ |Delta| × 100 × 张数 的上限（相当于多少股正股）；0 表示不限制"
+        )
+        max_contracts = st.sidebar.number_input(
+            "每个合约最多张数",
+            min_value=0,
+            value=DEFAULT_MAX_CONTRACTS,
+            step=1,
+            help="0 表示不限制"
+        )
+        if probability_paths is not None:
+            objective_label = st.sidebar.selectbox(
+                "配置目标",
+                list(ALLOCATION_OBJECTIVES),
+                help="期望盈亏计入了被行权的亏损"
+            )
+            allocation_objective = ALLOCATION_OBJECTIVES[objective_label]
+        allocation_limits = AllocationLimits(budget, max_ticker_fraction, max_expiry_fraction,
+                                             max_delta or None, max_contracts or None)
+    
+    st.sidebar.subheader("希腊字母参数")
+    rate = st.sidebar.number_input(
+        "无风险利率",
+        min_value=0.0,
+        max_value=0.20,
+        value=DEFAULT_RISK_FREE_RATE,
+        step=0.005,
+        format="%.3f",
+        help="Black-Scholes 模型使用的年化无风险利率（连续复利）"
+    )
+    dividend = st.sidebar.number_input(
+        "股息率",
+        min_value=0.0,
+        max_value=0.20,
+        value=DEFAULT_DIVIDEND_YIELD,
+        step=0.005,
+        format="%.3f",
+        help="标的股票的年化连续股息率"
     )
     
+    st.sidebar.subheader("高级设置")
+    max_workers = st.sidebar.slider(
+        "并发请求数",
+        min_value=1,
+        max_value=16,
+        value=DEFAULT_FETCH_WORKERS,
+        help="同时获取期权链的到期日数量，设为1时逐个获取"
+    )
+    cache_stats, flight_stats = shared_cache().stats(), shared_flight().stats()
+    if service is not None:
+        try:
+            service_stats = service.stats()
+            cache_stats, flight_stats = service_stats['cache'], service_stats['flight']
+            st.sidebar.caption(
+                f"筛选服务: {service.base_url} · 执行中 {service_stats['service']['active']} / "
+                f"排队 {service_stats['service']['waiting']}"
+            )
+        except ServiceError as e:
+            cache_stats = flight_stats = None
+            st.sidebar.caption(f"筛选服务不可用: {e}")
+    if cache_stats is not None:
+        st.sidebar.caption(
+            f"期权链缓存: 命中 {cache_stats['hits'] + cache_stats['disk_hits']} / "
+            f"未命中 {cache_stats['misses']} / 淘汰 {cache_stats['evictions']} · "
+            f"{cache_stats['bytes'] / 2**20:.1f} MB"
+        )
+        st.sidebar.caption(
+            f"请求合并: 上游请求 {flight_stats['upstream']} / "
+            f"合并节省 {flight_stats['coalesced']}"
+        )
+    if prewarmer is not None and prewarmer.last_stats is not None:
+        prewarm_stats = prewarmer.last_stats
+        st.sidebar.caption(
+            f"缓存预热: {len(prewarmer.tickers)} 个股票 · 上轮请求 {prewarm_stats['requests']} 次"
+            + (f"，{len(prewarm_stats['deferred'])} 个顺延" if prewarm_stats['deferred'] else "")
+        )
+    show_performance = st.sidebar.checkbox(
+        "显示性能面板",
+        value=False,
+        help="显示数据获取和页面渲染各阶段的耗时瀑布图"
+    )
+    watchlist_workers = DEFAULT_WATCHLIST_WORKERS
+    if screen_mode == "自选股批量":
+        watchlist_workers = st.sidebar.slider(
+            "并发股票数",
+            min_value=1,
+            max_value=16,
+            value=DEFAULT_WATCHLIST_WORKERS,
+            help="批量筛选时同时处理的股票数量"
+        )
+    
     # 主要内容区域
+    filters = (min_dte, max_dte, min_otm, max_otm)
+    symbols = [ticker] if screen_mode == "单个股票" else watchlist
+    # 影响筛选结果计算的参数；滑块只在内存中重新筛选，不影响该键
+    screen_key = (screen_mode, tuple(symbols), strategy_type, rate, dividend, spread_limits, otm_range)
+    
     if st.sidebar.button("🔍 开始筛选", type="primary"):
-        if not ticker:
+        if screen_mode == "单个股票" and not ticker:
             st.error("请输入股票代码")
             return
             
+        if screen_mode == "自选股批量" and not watchlist:
+            st.error("请输入至少一个股票代码")
+            return
+        
+        # 按滑块完整范围获取一次数据，保存在会话中
+        try:
+            if screen_mode == "自选股批量":
+                with trace('fetch') as fetch_trace:
+                    ranked_df, failures, surfaces = fetch_watchlist_screen(
+                        watchlist, strategy_type, filters,
+                        max_workers=watchlist_workers, fetch_workers=max_workers,
+                        rate=rate, dividend=dividend, frontier_only=frontier_only,
+                        spread_limits=spread_limits, min_richness=min_richness,
+                        otm_range=otm_range, delta_filter=delta_filter, service=service
+                    )
+                st.session_state['screen'] = {
+                    'key': screen_key, 'result': ranked_df, 'failures': failures,
+                    'current_price': None, 'messages': [], 'fetched_at': time.time(),
+                    'trace': fetch_trace, 'surface': None, 'surfaces': surfaces,
+                }
+            else:
+                with trace('fetch') as fetch_trace:
+                    screen = screen_options_gui(
+                        ticker, *DTE_SLIDER_RANGE, *otm_range, strategy_type,
+                        max_workers=max_workers, rate=rate, dividend=dividend,
+                        display_filters=filters, frontier_only=frontier_only,
+                        spread_limits=spread_limits, min_richness=min_richness,
+                        delta_filter=delta_filter, service=service
+                    )
+                if screen.current_price is None:
+                    show_messages(screen.messages)
+                    st.session_state.pop('screen', None)
+                    return
+                st.session_state['screen'] = {
+                    'key': screen_key, 'result': screen.result, 'failures': [],
+                    'current_price': screen.current_price, 'messages': screen.messages,
+                    'fetched_at': time.time(), 'trace': fetch_trace, 'surface': screen.surface,
+                    'surfaces': None,
+                }
+        except Exception as e:
+            st.error(f"筛选过程中出现错误: {e}")
+            st.info("请检查网络连接或稍后重试")
+            return
+        finally:
+            export_metrics()
+    
+    # 每次重新运行时在内存中按当前滑块重新筛选，不再访问网络
+    stored = st.session_state.get('screen')
+    if stored is not None and stored['key'] != screen_key:
+        st.info("股票、策略、组合条件、希腊字母参数或行权价选择方式已变更，请点击「🔍 开始筛选」重新获取数据")
+    elif stored is not None:
         if min_dte >= max_dte:
             st.error("最小到期天数必须小于最大到期天数")
             return
             
-        if min_otm >= max_otm:
+        if delta_filter is None and min_otm >= max_otm:
             st.error("最小价外百分比必须小于最大价外百分比")
             return
         
-        # 执行筛选
-        try:
-            result_df, current_price = screen_options_gui(ticker, min_dte, max_dte, min_otm, max_otm, strategy_type)
-            
-            if current_price is None:
-                return
-                
-            # 显示当前价格和策略信息
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("股票代码", ticker)
-            with col2:
-                st.metric("当前价格", f"${current_price:.2f}")
-            with col3:
-                st.metric("策略类型", strategy_type)
-            with col4:
-                if result_df is not None and not result_df.empty:
-                    st.metric("找到机会", f"{len(result_df)} 个")
-                else:
-                    st.metric("找到机会", "0 个")
-            
-            st.markdown("---")
-            
-            # 显示结果
-            if result_df is not None and not result_df.empty:
-                st.subheader(f"🎯 {strategy_type}筛选结果")
-                
-                # 检查是否有其他希腊字母数据
-                greek_columns = ['gamma', 'theta', 'vega', 'rho', 'impliedVolatility']
-                available_greeks = [col for col in greek_columns if col in result_df.columns]
-                
-                if available_greeks:
-                    st.info(f"📊 可用的希腊字母数据: {', '.join(available_greeks)}")
-                    
-                    # 显示希腊字母统计
-                    with st.expander("📈 希腊字母统计信息"):
-                        greek_stats = {}
-                        for greek in available_greeks:
-                            if greek in result_df.columns:
-                                greek_data = pd.to_numeric(result_df[greek], errors='coerce').dropna()
-                                if not greek_data.empty:
-                                    greek_stats[greek] = {
-                                        '平均值': greek_data.mean(),
-                                        '最小值': greek_data.min(),
-                                        '最大值': greek_data.max(),
-                                        '标准差': greek_data.std()
-                                    }
-                        
-                        if greek_stats:
-                            stats_df = pd.DataFrame(greek_stats).T
-                            st.dataframe(stats_df.round(4))
-                
-                # 准备显示数据
-                base_columns = ['contractSymbol', 'dte', 'strike', 'premium', 'real_delta', 'volume', 'openInterest', 'annualizedReturn']
-                
-                # 如果有隐含波动率，也显示出来
-                if 'impliedVolatility' in result_df.columns:
-                    base_columns.insert(-1, 'impliedVolatility')
-                
-                display_df = result_df[base_columns].copy()
-                
-                # 格式化数据
-                display_df['strike'] = display_df['strike'].map('${:.2f}'.format)
-                display_df['premium'] = display_df['premium'].map('${:.2f}'.format)
-                display_df['real_delta'] = display_df['real_delta'].map('{:.3f}'.format)
-                display_df['annualizedReturn'] = display_df['annualizedReturn'].map('{:.2%}'.format)
-                
-                # 如果有隐含波动率，也格式化
-                if 'impliedVolatility' in display_df.columns:
-                    display_df['impliedVolatility'] = display_df['impliedVolatility'].map('{:.2%}'.format)
-                
-                # 重命名列
-                column_names = ['合约代码', '到期天数', '行权价', '权利金', 'Delta', '成交量', '持仓量']
-                if 'impliedVolatility' in display_df.columns:
-                    column_names.append('隐含波动率')
-                column_names.append('年化收益率')
-                
-                display_df.columns = column_names
-                
-                # 显示表格
-                st.dataframe(
-                    display_df,
-                    use_container_width=True,
-                    hide_index=True
-                )
-                
-                # 创建图表
-                st.subheader("📊 数据可视化")
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    # 年化收益率图表
-                    try:
-                        fig1 = px.bar(
-                            result_df.head(10), 
-                            x='strike', 
-                            y='annualizedReturn',
-                            title='前10个机会的年化收益率',
-                            labels={'strike': '行权价', 'annualizedReturn': '年化收益率'}
-                        )
-                        fig1.update_layout(yaxis_tickformat='.2%')
-                        st.plotly_chart(fig1, use_container_width=True)
-                    except Exception as e:
-                        st.info(f"年化收益率图表生成失败: {e}")
-                
-                with col2:
-                    # 到期天数分布
-                    try:
-                        fig2 = px.histogram(
-                            result_df, 
-                            x='dte',
-                            title='到期天数分布',
-                            labels={'dte': '到期天数', 'count': '数量'}
+        with trace('render') as render_trace:
+            base_df = stored['result']
+            probability_key = None
+            if probability_paths is not None and base_df is not None and not base_df.empty:
+                # 概率只取决于合约所在到期日，在完整结果上计算一次并按模拟参数缓存，之后只在内存中重新筛选
+                probability_key = (probability_paths, historical_vol)
+                cached = stored.setdefault('probabilities', {})
+                if probability_key not in cached:
+                    with span('probability'):
+                        cached[probability_key] = add_probabilities(
+                            base_df, strategy_type, stored['current_price'],
+                            surface=stored.get('surfaces') or stored.get('surface'),
+                            volatility=historical_vol or None, rate=rate, dividend=dividend,
+                            paths=probability_paths
                         )
-                        st.plotly_chart(fig2, use_container_width=True)
-                    except Exception as e:
-                        st.info(f"到期天数分布图表生成失败: {e}")
-                
-                # 散点图：收益率 vs 风险
-                try:
-                    # 处理数据中的 NaN 值和无效数据
-                    plot_df = result_df.copy()
-                    
-                    # 清理数据
-                    plot_df['volume'] = pd.to_numeric(plot_df['volume'], errors='coerce').fillna(1)
-                    plot_df['real_delta'] = pd.to_numeric(plot_df['real_delta'], errors='coerce')
-                    plot_df['annualizedReturn'] = pd.to_numeric(plot_df['annualizedReturn'], errors='coerce')
-                    plot_df['strike'] = pd.to_numeric(plot_df['strike'], errors='coerce')
-                    plot_df['dte'] = pd.to_numeric(plot_df['dte'], errors='coerce')
-                    plot_df['premium'] = pd.to_numeric(plot_df['premium'], errors='coerce')
-                    
-                    # 移除包含 NaN 的行
-                    plot_df = plot_df.dropna(subset=['real_delta', 'annualizedReturn', 'volume'])
-                    plot_df = plot_df[plot_df['volume'] > 0]  # 只保留volume > 0的数据
-                    
-                    if not plot_df.empty and len(plot_df) > 1:
-                        fig3 = px.scatter(
-                            plot_df,
-                            x='real_delta',
-                            y='annualizedReturn',
-                            size='volume',
-                            hover_data=['strike', 'dte', 'premium'],
-                            title='收益率 vs Delta 分析',
-                            labels={
-                                'real_delta': 'Delta (敏感度指标)',
-                                'annualizedReturn': '年化收益率',
-                                'volume': '成交量'
-                            }
-                        )
-                        fig3.update_layout(yaxis_tickformat='.2%')
-                        st.plotly_chart(fig3, use_container_width=True)
-                    else:
-                        st.info("数据不足，无法生成散点图")
-                except Exception as e:
-                    st.info(f"散点图生成遇到问题: {str(e)}")
-                
+                base_df = cached[probability_key]
+            with span('refilter'):
+                delta_index = None
+                if delta_filter is not None and base_df is not None and not base_df.empty:
+                    # Delta 索引在同一份结果上只建一次，之后调整 Delta 只做二分查找
+                    indexes = stored.setdefault('delta_indexes', {})
+                    if probability_key not in indexes:
+                        indexes[probability_key] = DeltaIndex(base_df)
+                    delta_index = indexes[probability_key]
+                result_df = visible_results(base_df, filters, strategy_type, stored['current_price'],
+                                            frontier_only, min_richness, delta_filter, delta_index)
+                if rank_metric != 'annualizedReturn' and result_df is not None and not result_df.empty:
+                    result_df = result_df.sort_values(rank_metric, ascending=False, kind='stable')
+            fetched = time.strftime('%H:%M:%S', time.localtime(stored['fetched_at']))
+            st.caption(f"数据获取于 {fetched}，调整到期天数、价外百分比或 Delta 会立即在已获取的数据中重新筛选")
+            if stored['messages']:
+                with st.expander("📋 筛选日志"):
+                    show_messages(stored['messages'])
+            if screen_mode == "自选股批量":
+                render_watchlist_result(result_df, stored['failures'], len(watchlist), strategy_type)
             else:
-                st.warning("未找到符合条件的期权机会，请尝试调整筛选条件")
-                
-        except Exception as e:
-            st.error(f"筛选过程中出现错误: {e}")
-            st.info("请检查网络连接或稍后重试")
+                render_single_result(ticker, stored['current_price'], strategy_type, result_df,
+                                     stored.get('surface'))
+            if allocation_limits is not None:
+                render_allocation(result_df, allocation_limits, allocation_objective)
+        if show_performance:
+            render_performance_panel([
+                ("数据获取", stored.get('trace')),
+                ("本次页面渲染", render_trace),
+            ])
     
     # 说明信息
     st.markdown("---")
@@ -525,11 +978,16 @@ def main():
         **策略说明：**
         - **现金担保看跌期权**: 卖出看跌期权，收取权利金，需要现金担保
         - **备兑看涨期权**: 持有股票的同时卖出看涨期权，收取权利金
+        - **牛市看跌价差 / 熊市看涨价差**: 卖出一个价外期权，同时买入更价外的同类期权限定最大亏损
+        - **铁鹰式**: 同一到期日的看跌价差加看涨价差，每对卖出腿显示收益风险比最高的买入腿组合
+        - **卖出宽跨式**: 同时卖出价外看跌和看涨期权，风险按保证金计算
         
         **参数说明：**
         - **股票代码**: 要分析的股票代码
         - **到期天数**: 期权到期的天数范围
         - **价外百分比**: 期权行权价相对当前价格的价外程度
+        - **Delta 区间 / 目标 Delta**: 按 |Delta| 选择行权价，目标 Delta 在每个到期日只取最接近的一个合约
+        - **组合配置**: 在显示的合约中按资金预算、单个股票 / 到期日上限和 Delta 预算分配张数
         """)
     
     with col2:
@@ -539,6 +997,9 @@ def main():
         - **权利金**: 期权的卖出价格（每股）
         - **Delta**: 期权价格对标的价格变化的敏感度
         - **年化收益率**: 如果期权到期无价值的预估收益率
+        - **IV溢价**: 隐含波动率减去曲面值，正值表示相对偏贵
+        - **盈利概率 / 行权概率**: 蒙特卡洛模拟到期价格得到的概率
+        - **期望盈亏 / CVaR**: 每张合约的期望到期盈亏，以及最差 5% 情形的平均亏损
         
         **风险提示：**
         - 现金担保看跌：可能被迫以行权价买入股票
@@ -556,6 +1017,7 @@ def main():
     **策略风险：**
     - **现金担保看跌期权**: 如果股价跌破行权价，您需要以行权价购买股票
     - **备兑看涨期权**: 如果股价超过行权价，您的股票可能被以行权价卖出
+    - **多腿组合**: 价差和铁鹰式的亏损以最大亏损为限；卖出宽跨式没有保护腿，亏损没有上限
     """)
 
 if __name__ == "__main__":
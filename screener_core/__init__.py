@@ -0,0 +1,71 @@
+"""
+期权筛选核心库
+
+不依赖 Streamlit / Plotly，可在脚本、定时任务和命令行中直接使用。
+为了让命令行和 `import screener_core` 启动足够快，下列名称在首次访问时才导入对应子模块
+（以及 pandas、yfinance 等较重的依赖）。
+"""
+
+import importlib
+
+_EXPORTS = {
+    'StatusLog': 'screener_core.status',
+    'get_stock_price': 'screener_core.data',
+    'get_stock_prices': 'screener_core.data',
+    'get_stock_data': 'screener_core.data',
+    'find_potential_expirations': 'screener_core.data',
+    'fetch_option_chain': 'screener_core.data',
+    'fetch_option_chains': 'screener_core.data',
+    'get_real_greeks': 'screener_core.data',
+    'STRATEGIES': 'screener_core.filtering',
+    'CASH_SECURED_PUT': 'screener_core.filtering',
+    'COVERED_CALL': 'screener_core.filtering',
+    'screen_chain': 'screener_core.filtering',
+    'concat_chains': 'screener_core.filtering',
+    'SPREAD_STRATEGIES': 'screener_core.filtering',
+    'SpreadLimits': 'screener_core.spreads',
+    'screen_spreads': 'screener_core.spreads',
+    'ScreenResult': 'screener_core.pipeline',
+    'analyze_and_filter_puts': 'screener_core.pipeline',
+    'analyze_and_filter_calls': 'screener_core.pipeline',
+    'ScreenUpdate': 'screener_core.pipeline',
+    'screen_ticker': 'screener_core.pipeline',
+    'stream_ticker': 'screener_core.pipeline',
+    'screen_watchlist': 'screener_core.pipeline',
+    'parse_watchlist': 'screener_core.pipeline',
+    'rank_opportunities': 'screener_core.ranking',
+    'rank_watchlist_results': 'screener_core.ranking',
+    'RankingStream': 'screener_core.ranking',
+    'top_k': 'screener_core.ranking',
+    'pareto_frontier': 'screener_core.ranking',
+    'DeltaFilter': 'screener_core.delta_index',
+    'DeltaIndex': 'screener_core.delta_index',
+    'format_display_df': 'screener_core.formatting',
+    'compact_frame': 'screener_core.schema',
+    'IVSurface': 'screener_core.iv_surface',
+    'build_iv_surface': 'screener_core.iv_surface',
+    'add_probabilities': 'screener_core.probability',
+    'historical_volatility': 'screener_core.probability',
+    'AllocationLimits': 'screener_core.allocator',
+    'Allocation': 'screener_core.allocator',
+    'allocate': 'screener_core.allocator',
+    'ScreeningService': 'screener_core.service',
+    'ServiceClient': 'screener_core.service_client',
+    'SnapshotWriter': 'screener_core.snapshots',
+    'SnapshotReader': 'screener_core.snapshots',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'screener_core' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
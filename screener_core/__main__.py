@@ -0,0 +1,4 @@
+import sys
+from screener_core.cli import main
+
+sys.exit(main())
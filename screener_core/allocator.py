@@ -0,0 +1,171 @@
+"""
+资金约束下的组合配置
+
+在筛选结果中为每个合约选择张数，使组合的预期权利金（或计算了概率时的期望盈亏）最大，约束：
+- 全部合约占用的担保资金不超过资金预算
+- 每个股票、每个到期日占用的资金不超过预算的一定比例（集中度限制）
+- 可选的 Delta 预算：Σ |Delta| × 100 × 张数（相当于多少股正股的方向风险）不超过上限
+- 可选的每个合约最多张数
+
+这是带分组约束的多维背包问题，用「贪心 + 修复」求近似解，几千个候选也能在界面上即时完成：
+1. 贪心：按单位资源收益（收益 ÷ 占用预算和 Delta 预算的比例）从高到低，每个合约买满剩余容量
+2. 修复：贪心容易让小合约占满容量，放不下收益更高的大合约。对没买满的候选按收益从高到低尝试
+   加入一张，从已持有的合约中按单位资源收益从低到高腾出它缺少的资金、股票额度、到期日额度或
+   Delta；腾出部分的收益低于新合约时才替换
+3. 填充：替换后剩余的容量再按第 1 步的顺序补满
+"""
+
+from collections import namedtuple
+import math
+import numpy as np
+import pandas as pd
+from screener_core.config import (
+    DEFAULT_ALLOCATION_BUDGET, DEFAULT_MAX_CONTRACTS, DEFAULT_MAX_EXPIRY_FRACTION, DEFAULT_MAX_TICKER_FRACTION
+)
+
+AllocationLimits = namedtuple('AllocationLimits',
+                              ['budget', 'max_ticker_fraction', 'max_expiry_fraction', 'max_delta', 'max_contracts'],
+                              defaults=(DEFAULT_ALLOCATION_BUDGET, DEFAULT_MAX_TICKER_FRACTION,
+                                        DEFAULT_MAX_EXPIRY_FRACTION, None, DEFAULT_MAX_CONTRACTS))
+AllocationLimits.__doc__ = """组合约束：budget 为资金预算（美元），max_ticker_fraction / max_expiry_fraction 为
+每个股票 / 每个到期日占用资金占预算的最大比例，max_delta 为 Σ|Delta|×100×张数 的上限，
+max_contracts 为每个合约最多张数（None 表示不限制）"""
+
+Allocation = namedtuple('Allocation', ['book', 'collateral', 'value', 'delta'])
+Allocation.__doc__ = """配置结果：book 为选中的合约（原结果的行加上 quantity、allocatedCollateral、
+allocatedValue 列，保持原有顺序），collateral / value / delta 为组合合计"""
+
+# 每张合约的收益：权利金按每股报价，期望盈亏已是每张合约的金额
+OBJECTIVES = {'premium': 100, 'expectedPnl': 1}
+REPAIR_CANDIDATES = 200  # 修复阶段最多尝试加入的候选数
+
+
+class _Book:
+    """配置过程中的持仓和各约束的剩余容量"""
+
+    def __init__(self, cost, value, delta, ticker, expiry, cap, limits):
+        self.cost, self.value, self.delta = cost, value, delta
+        self.ticker, self.expiry, self.cap = ticker, expiry, cap
+        self.quantity = np.zeros(len(cost), dtype=np.int64)
+        self.cash = float(limits.budget)
+        self.ticker_left = np.full(ticker.max() + 1, limits.budget * limits.max_ticker_fraction)
+        self.expiry_left = np.full(expiry.max() + 1, limits.budget * limits.max_expiry_fraction)
+        self.delta_left = math.inf if limits.max_delta is None else float(limits.max_delta)
+
+    def room(self, i):
+        """合约 i 还能增加的张数"""
+        cash = min(self.cash, self.ticker_left[self.ticker[i]], self.expiry_left[self.expiry[i]])
+        units = min(self.cap[i] - self.quantity[i], math.floor(cash / self.cost[i] + 1e-9))
+        if self.delta[i] > 0 and self.delta_left < math.inf:
+            units = min(units, math.floor(self.delta_left / self.delta[i] + 1e-9))
+        return max(units, 0)
+
+    def change(self, i, units):
+        cost = self.cost[i] * units
+        self.quantity[i] += units
+        self.cash -= cost
+        self.ticker_left[self.ticker[i]] -= cost
+        self.expiry_left[self.expiry[i]] -= cost
+        self.delta_left -= self.delta[i] * units
+
+    def fill(self, order):
+        for i in order:
+            units = self.room(i)
+            if units:
+                self.change(i, units)
+
+    def shortfall(self, i):
+        """加入一张合约 i 时 (资金, 股票额度, 到期日额度, Delta) 各缺多少"""
+        cost = self.cost[i]
+        return [cost - self.cash, cost - self.ticker_left[self.ticker[i]],
+                cost - self.expiry_left[self.expiry[i]], self.delta[i] - self.delta_left]
+
+    def try_swap(self, i, held):
+        """从 held（按单位资源收益升序）中腾出容量加入一张合约 i，收益提高时执行并返回 True"""
+        short = self.shortfall(i)
+        removals = []
+        removed_value = 0.0
+        for j in held:
+            if max(short) <= 1e-9:
+                break
+            if j == i:
+                continue
+            # 合约 j 的一张能缓解的缺口：资金总是可以，同一股票、同一到期日时缓解对应额度
+            helps = [self.cost[j], self.cost[j] if self.ticker[j] == self.ticker[i] else 0.0,
+                     self.cost[j] if self.expiry[j] == self.expiry[i] else 0.0, self.delta[j]]
+            needed = [math.ceil(s / h - 1e-9) for s, h in zip(short, helps) if s > 1e-9 and h > 0]
+            if not needed:
+                continue
+            units = min(max(needed), self.quantity[j])
+            removed_value += self.value[j] * units
+            if removed_value >= self.value[i]:
+                return False
+            removals.append((j, units))
+            short = [s - h * units for s, h in zip(short, helps)]
+        if max(short) > 1e-9:
+            return False
+        for j, units in removals:
+            self.change(j, -units)
+        self.change(i, 1)
+        return True
+
+
+def allocate(result_df, limits=AllocationLimits(), objective='premium'):
+    """在筛选结果中按约束选择每个合约的张数，返回 Allocation
+
+    objective 为 'premium'（每张权利金，默认）或 'expectedPnl'（需先计算概率列）。collateral 列为
+    每张合约占用的担保资金；没有 ticker 列时全部合约视为同一股票，到期日按 dte 区分。
+    """
+    if result_df is None or result_df.empty:
+        return Allocation(result_df, 0.0, 0.0, 0.0)
+    cost = result_df['collateral'].to_numpy(dtype=float)
+    value = result_df[objective].to_numpy(dtype=float) * OBJECTIVES[objective]
+    delta = result_df['real_delta'].to_numpy(dtype=float) * 100
+    valid = np.isfinite(cost) & (cost > 0) & np.isfinite(value) & (value > 0)
+    if limits.max_delta is not None:
+        valid &= np.isfinite(delta)
+    delta = np.where(np.isfinite(delta), delta, 0.0)
+    if 'ticker' in result_df.columns:
+        ticker, _ = pd.factorize(result_df['ticker'])
+    else:
+        ticker = np.zeros(len(result_df), dtype=np.int64)
+    expiry, _ = pd.factorize(result_df['dte'])
+    cap = np.full(len(result_df), np.iinfo(np.int64).max if limits.max_contracts is None else limits.max_contracts)
+
+    # 单位资源收益：收益 ÷ (占预算的比例 + 占 Delta 预算的比例)
+    usage = cost / limits.budget
+    if limits.max_delta:
+        usage = usage + delta / limits.max_delta
+    density = np.where(valid, value / usage, -np.inf)
+    candidates = np.flatnonzero(valid)
+    order = candidates[np.lexsort((-value[candidates], -density[candidates]))]
+
+    book = _Book(cost, value, delta, ticker, expiry, cap, limits)
+    book.fill(order)
+
+    # 修复：收益高但没能买满的候选，尝试替换掉单位资源收益低的持仓
+    rank = np.empty(len(cost), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    pending = candidates[np.argsort(-value[candidates], kind='stable')]
+    pending = pending[book.quantity[pending] < cap[pending]][:REPAIR_CANDIDATES]
+    swapped = False
+    for i in pending:
+        held = np.flatnonzero(book.quantity)
+        if not len(held) or value[i] <= value[held].min():
+            continue
+        if book.room(i):
+            book.change(i, 1)
+            continue
+        held = held[np.argsort(-rank[held])]
+        swapped |= book.try_swap(i, held)
+    if swapped:
+        book.fill(order)
+
+    chosen = np.flatnonzero(book.quantity)
+    quantity = book.quantity[chosen]
+    selected = result_df.iloc[chosen].copy(deep=False)
+    selected['quantity'] = quantity
+    selected['allocatedCollateral'] = cost[chosen] * quantity
+    selected['allocatedValue'] = value[chosen] * quantity
+    return Allocation(selected, float(selected['allocatedCollateral'].sum()),
+                      float(selected['allocatedValue'].sum()), float((delta[chosen] * quantity).sum()))
@@ -0,0 +1,345 @@
+"""
+现金担保看跌期权 / 备兑看涨期权回测
+
+在历史期权链快照（见 screener_core.snapshots）和历史收盘价上重放筛选规则
+（到期天数窗口、价外区间、权利金规则），模拟开仓、到期作废或被行权、提前移仓。
+
+计算全部基于数组：
+1. 一次性筛选所有快照日期的所有合约，每个 (股票, 日期) 选出年化收益率最高的合约作为候选
+2. 一次性计算每个候选持有到期（或在 roll_dte 时移仓）的结果
+3. 用 searchsorted 为每个候选找到平仓后的下一笔候选，再沿该指针链同时推进所有股票，
+   循环次数等于单个股票的交易笔数，而不是交易日数
+
+参数扫描可通过进程池并行，快照和价格数据在每个工作进程中只传递一次。
+"""
+
+import itertools
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from screener_core.config import (
+    DEFAULT_DAYS_TO_EXPIRATION_MIN,
+    DEFAULT_DAYS_TO_EXPIRATION_MAX,
+    DEFAULT_OTM_PERCENTAGE_MIN,
+    DEFAULT_OTM_PERCENTAGE_MAX,
+)
+from screener_core.filtering import CASH_SECURED_PUT, get_strategy, option_premium, otm_strike_bounds
+
+BacktestParams = namedtuple('BacktestParams', [
+    'strategy', 'min_dte', 'max_dte', 'min_otm', 'max_otm', 'roll_dte'
+])
+BacktestParams.__new__.__defaults__ = (
+    CASH_SECURED_PUT,
+    DEFAULT_DAYS_TO_EXPIRATION_MIN,
+    DEFAULT_DAYS_TO_EXPIRATION_MAX,
+    DEFAULT_OTM_PERCENTAGE_MIN,
+    DEFAULT_OTM_PERCENTAGE_MAX,
+    None,
+)
+BacktestParams.__doc__ = """回测参数：策略名称、到期天数窗口、价外区间，以及剩余到期天数
+不超过 roll_dte 时按快照中的卖价买回并移仓（None 表示持有到期）"""
+
+BacktestResult = namedtuple('BacktestResult', ['params', 'trades', 'summary'])
+
+SNAPSHOT_COLUMNS = ['ticker', 'date', 'snapshot_time', 'spot', 'option_type', 'expiration', 'dte',
+                    'contractSymbol', 'strike', 'bid', 'ask', 'lastPrice']
+
+# 交易结果
+EXPIRED = 'expired'
+ASSIGNED = 'assigned'
+ROLLED = 'rolled'
+OPEN = 'open'
+
+_DAY_KEY = 1_000_000  # 组合键 = 股票编号 * _DAY_KEY + 日期序号
+
+
+def _to_days(values):
+    """日期（字符串 / date / Timestamp）转换为 1970-01-01 起的天数"""
+    return pd.to_datetime(pd.Series(values)).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+class PriceHistory:
+    """按 (股票, 日期) 查询收盘价的二维数组
+
+    prices 可以是宽表（索引为日期、列为股票代码，例如 yf.download 的 'Close'），
+    也可以是包含 ticker、date、close 列的长表。
+    """
+
+    def __init__(self, prices):
+        if {'ticker', 'date', 'close'}.issubset(prices.columns):
+            prices = prices.pivot_table(index='date', columns='ticker', values='close')
+        prices = prices.sort_index()
+        self.days = _to_days(prices.index)
+        self.tickers = pd.Index([str(c).upper() for c in prices.columns])
+        self.values = prices.to_numpy(dtype=float)
+
+    def close(self, tickers, days):
+        """返回每个 (股票, 日期) 当天或之前最近一个交易日的收盘价；超出数据范围时为 NaN"""
+        days = np.asarray(days, dtype=np.int64)
+        rows = np.searchsorted(self.days, days, side='right') - 1
+        cols = self.tickers.get_indexer(pd.Index(tickers))
+        result = np.full(len(days), np.nan)
+        if len(self.days) == 0:
+            return result
+        valid = (rows >= 0) & (cols >= 0) & (days <= self.days[-1])
+        result[valid] = self.values[rows[valid], cols[valid]]
+        return result
+
+
+def prepare_snapshots(snapshots):
+    """整理快照数据：每个 (股票, 日期, 期权类型) 只保留当天第一次获取的数据，日期转换为天数"""
+    df = snapshots[[c for c in SNAPSHOT_COLUMNS if c in snapshots.columns]].copy()
+    df['ticker'] = df['ticker'].astype(str).str.upper()
+    df['day'] = _to_days(df['date'])
+    df['exp_day'] = _to_days(df['expiration'])
+    if 'snapshot_time' in df.columns:
+        first = df.groupby(['ticker', 'day', 'option_type'])['snapshot_time'].transform('min')
+        df = df[df['snapshot_time'] == first]
+    if 'ask' not in df.columns:
+        df['ask'] = np.nan
+    return df.reset_index(drop=True)
+
+
+def load_snapshots(reader, tickers=None, start=None, end=None, strategy=None, max_dte=None):
+    """从 SnapshotReader 读取回测需要的列（按股票、日期、期权类型和到期天数下推过滤）"""
+    option_type = get_strategy(strategy).option_type if strategy is not None else None
+    df = reader.query(tickers, start, end, option_type=option_type, max_dte=max_dte,
+                      columns=SNAPSHOT_COLUMNS)
+    return prepare_snapshots(df) if not df.empty else df
+
+
+def select_entries(snapshots, params):
+    """按筛选规则为每个 (股票, 快照日期) 选出年化收益率最高的合约，返回候选 DataFrame"""
+    spec = get_strategy(params.strategy)
+    df = snapshots[snapshots['option_type'] == spec.option_type]
+    dte = df['dte'].to_numpy(dtype=np.int64)
+    strike = df['strike'].to_numpy(dtype=float)
+    spot = df['spot'].to_numpy(dtype=float)
+    premium = option_premium(df['bid'].to_numpy(dtype=float), df['lastPrice'].to_numpy(dtype=float))
+    collateral = strike * 100 if spec.collateral == 'strike' else spot * 100
+
+    min_strike, max_strike = otm_strike_bounds(spot, params.min_otm, params.max_otm, spec)
+    mask = (
+        (dte >= params.min_dte) & (dte <= params.max_dte)
+        & (strike >= min_strike) & (strike <= max_strike)
+        & (premium > 0) & (collateral > 0)
+    )
+    df = df[mask]
+    premium, collateral, dte = premium[mask], collateral[mask], dte[mask]
+    annualized = (premium * 100) / collateral * (365 / dte)
+
+    # 按 (股票, 日期, 年化收益率降序) 排序后取每组第一行
+    ticker_codes, ticker_names = pd.factorize(df['ticker'])
+    day = df['day'].to_numpy()
+    order = np.lexsort((-annualized, day, ticker_codes))
+    ticker_codes, day = ticker_codes[order], day[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (ticker_codes[1:] != ticker_codes[:-1]) | (day[1:] != day[:-1])
+    order = order[first]
+
+    entries = df.iloc[order][['ticker', 'day', 'exp_day', 'contractSymbol', 'strike', 'spot']]
+    return entries.assign(
+        premium=premium[order],
+        collateral=collateral[order],
+        dte=dte[order],
+        annualizedReturn=annualized[order],
+        ticker_code=ticker_codes[first],
+    ).reset_index(drop=True)
+
+
+def _roll_exits(entries, snapshots, params, option_type):
+    """查找剩余到期天数不超过 roll_dte 时持仓合约的第一个报价，返回 (是否移仓, 日期, 买回价, 现价)"""
+    n = len(entries)
+    rolled = np.zeros(n, dtype=bool)
+    exit_day = np.zeros(n, dtype=np.int64)
+    cost = np.full(n, np.nan)
+    spot = np.full(n, np.nan)
+    if params.roll_dte is None or n == 0:
+        return rolled, exit_day, cost, spot
+
+    quotes = snapshots[snapshots['option_type'] == option_type][
+        ['ticker', 'contractSymbol', 'day', 'ask', 'lastPrice', 'spot']
+    ]
+    held = pd.DataFrame({
+        'entry': np.arange(n),
+        'ticker': entries['ticker'].to_numpy(),
+        'contractSymbol': entries['contractSymbol'].to_numpy(),
+        'entry_day': entries['day'].to_numpy(),
+        'roll_day': entries['exp_day'].to_numpy() - params.roll_dte,
+        'exp_day': entries['exp_day'].to_numpy(),
+    })
+    merged = held.merge(quotes, on=['ticker', 'contractSymbol'])
+    merged = merged[
+        (merged['day'] > merged['entry_day'])
+        & (merged['day'] >= merged['roll_day'])
+        & (merged['day'] < merged['exp_day'])
+    ]
+    merged = merged.sort_values(['entry', 'day']).drop_duplicates('entry')
+    buyback = option_premium(merged['ask'].to_numpy(dtype=float), merged['lastPrice'].to_numpy(dtype=float))
+    found = buyback > 0
+    index = merged['entry'].to_numpy()[found]
+    rolled[index] = True
+    exit_day[index] = merged['day'].to_numpy()[found]
+    cost[index] = buyback[found]
+    spot[index] = merged['spot'].to_numpy(dtype=float)[found]
+    return rolled, exit_day, cost, spot
+
+
+def evaluate_entries(entries, snapshots, prices, params):
+    """计算每个候选单独持有的结果（全部向量化），在 entries 上添加结果列"""
+    spec = get_strategy(params.strategy)
+    strike = entries['strike'].to_numpy(dtype=float)
+    premium = entries['premium'].to_numpy(dtype=float)
+    entry_spot = entries['spot'].to_numpy(dtype=float)
+    exp_day = entries['exp_day'].to_numpy(dtype=np.int64)
+    settle = prices.close(entries['ticker'], exp_day)
+
+    if spec.strike_side < 0:
+        # 卖出看跌：到期价低于行权价时被行权，按内在价值计算亏损
+        pnl = premium - np.maximum(strike - settle, 0.0)
+        assigned = settle < strike
+    else:
+        # 备兑看涨：持有股票，到期价高于行权价时股票被按行权价买走
+        pnl = premium + np.minimum(settle, strike) - entry_spot
+        assigned = settle > strike
+    outcome = np.where(assigned, ASSIGNED, EXPIRED).astype(object)
+    exit_day = exp_day.copy()
+    exit_spot = settle
+
+    rolled, roll_day, cost, roll_spot = _roll_exits(entries, snapshots, params, spec.option_type)
+    if rolled.any():
+        if spec.strike_side < 0:
+            roll_pnl = premium - cost
+        else:
+            roll_pnl = premium - cost + roll_spot - entry_spot
+        pnl = np.where(rolled, roll_pnl, pnl)
+        exit_day = np.where(rolled, roll_day, exit_day)
+        exit_spot = np.where(rolled, roll_spot, exit_spot)
+        outcome[rolled] = ROLLED
+
+    resolved = rolled | ~np.isnan(settle)
+    outcome[~resolved] = OPEN
+    collateral = entries['collateral'].to_numpy(dtype=float)
+    held_days = np.maximum(exit_day - entries['day'].to_numpy(), 1)
+    return entries.assign(
+        exit_day=exit_day,
+        exit_spot=exit_spot,
+        outcome=outcome,
+        pnl=pnl * 100,
+        returnOnCollateral=pnl * 100 / collateral,
+        held_days=held_days,
+    )
+
+
+def chain_trades(evaluated):
+    """从每个股票的第一个候选开始，平仓后接上下一个候选，返回按顺序的交易行号
+
+    到期平仓的下一笔从到期日之后的快照开始，移仓的下一笔在同一天开仓。
+    """
+    n = len(evaluated)
+    if n == 0:
+        return np.array([], dtype=np.int64)
+    codes = evaluated['ticker_code'].to_numpy(dtype=np.int64)
+    keys = codes * _DAY_KEY + evaluated['day'].to_numpy(dtype=np.int64)  # select_entries 已按此排序
+    outcome = evaluated['outcome'].to_numpy()
+    next_day = evaluated['exit_day'].to_numpy(dtype=np.int64) + (outcome != ROLLED)
+    nxt = np.searchsorted(keys, codes * _DAY_KEY + next_day, side='left')
+    valid = (nxt < n) & (outcome != OPEN)
+    valid[valid] = codes[nxt[valid]] == codes[valid]
+    nxt = np.where(valid, nxt, -1)
+
+    first = np.ones(n, dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    current = np.flatnonzero(first)
+    taken = []
+    # 所有股票同时沿指针链推进一步
+    while len(current):
+        taken.append(current)
+        current = nxt[current]
+        current = current[current >= 0]
+    return np.sort(np.concatenate(taken))
+
+
+def summarize(trades):
+    """汇总交易结果"""
+    closed = trades[trades['outcome'] != OPEN]
+    capital_days = (closed['collateral'] * closed['held_days']).sum()
+    return {
+        'trades': int(len(closed)),
+        'open': int(len(trades) - len(closed)),
+        'win_rate': float((closed['pnl'] > 0).mean()) if len(closed) else np.nan,
+        'assignment_rate': float((closed['outcome'] == ASSIGNED).mean()) if len(closed) else np.nan,
+        'roll_rate': float((closed['outcome'] == ROLLED).mean()) if len(closed) else np.nan,
+        'total_pnl': float(closed['pnl'].sum()),
+        'mean_return': float(closed['returnOnCollateral'].mean()) if len(closed) else np.nan,
+        # 按占用资金和持有天数加权的年化收益率
+        'annualized_return': float(closed['pnl'].sum() / capital_days * 365) if capital_days else np.nan,
+        'worst_trade': float(closed['pnl'].min()) if len(closed) else np.nan,
+    }
+
+
+def _run(snapshots, prices, params):
+    entries = select_entries(snapshots, params)
+    evaluated = evaluate_entries(entries, snapshots, prices, params)
+    trades = evaluated.iloc[chain_trades(evaluated)].reset_index(drop=True)
+    trades = trades.assign(
+        entry_date=trades['day'].to_numpy().astype('datetime64[D]'),
+        expiration=trades['exp_day'].to_numpy().astype('datetime64[D]'),
+        exit_date=trades['exit_day'].to_numpy().astype('datetime64[D]'),
+    ).drop(columns=['day', 'exp_day', 'exit_day', 'ticker_code'])
+    return BacktestResult(params, trades, summarize(trades))
+
+
+def run_backtest(snapshots, prices, params=None):
+    """回测一组参数
+
+    snapshots 为 SnapshotReader.query 返回的快照（或 prepare_snapshots 的结果），
+    prices 为收盘价（宽表 / 长表 / PriceHistory）。返回 BacktestResult。
+    """
+    params = params or BacktestParams()
+    if 'day' not in snapshots.columns:
+        snapshots = prepare_snapshots(snapshots)
+    if not isinstance(prices, PriceHistory):
+        prices = PriceHistory(prices)
+    return _run(snapshots, prices, params)
+
+
+def param_grid(**values):
+    """按参数取值列表生成 BacktestParams 的笛卡尔积，例如 param_grid(min_dte=[20, 30], max_otm=[0.1, 0.2])"""
+    names = list(values)
+    return [BacktestParams()._replace(**dict(zip(names, combo)))
+            for combo in itertools.product(*(values[name] for name in names))]
+
+
+_worker_data = None
+
+
+def _init_worker(snapshots, prices):
+    global _worker_data
+    _worker_data = (snapshots, prices)
+
+
+def _run_worker(params):
+    snapshots, prices = _worker_data
+    return _run(snapshots, prices, params).summary
+
+
+def run_sweep(snapshots, prices, grid, processes=None):
+    """对多组参数回测，返回每组参数一行的汇总 DataFrame
+
+    processes 为进程数（None 为 CPU 核数，1 为在当前进程中顺序执行）。
+    """
+    if 'day' not in snapshots.columns:
+        snapshots = prepare_snapshots(snapshots)
+    if not isinstance(prices, PriceHistory):
+        prices = PriceHistory(prices)
+    grid = list(grid)
+    if processes == 1 or len(grid) <= 1:
+        summaries = [_run(snapshots, prices, params).summary for params in grid]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(snapshots, prices)) as executor:
+            summaries = list(executor.map(_run_worker, grid))
+    rows = [{**params._asdict(), **summary} for params, summary in zip(grid, summaries)]
+    return pd.DataFrame(rows)
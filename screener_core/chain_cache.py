@@ -0,0 +1,295 @@
+"""
+期权链缓存
+
+按 (股票代码, 到期日, 期权类型) 缓存原始期权链，另外缓存每个股票的到期日列表和由期权链构建的
+隐含波动率曲面，进程内所有会话共享：
+- 内存层：按字节预算的 LRU 淘汰
+- 磁盘层（可选）：Parquet 列式文件，应用重启后仍可命中
+- 过期策略：交易时段内按 TTL 过期；休市期间数据不会变化，保留到下一个开盘时刻
+- 曲面只在内存中缓存，该股票任一期权链写入、过期或被淘汰时一并失效
+
+通过环境变量配置共享缓存：
+    OPTION_CHAIN_CACHE_TTL   交易时段内的有效期（秒），默认 300
+    OPTION_CHAIN_CACHE_MB    内存层字节预算（MB），默认 128
+    OPTION_CHAIN_CACHE_DIR   磁盘层目录，不设置则只使用内存层
+"""
+
+import importlib.util
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TZ = ZoneInfo("America/New_York")
+except Exception:  # 缺少时区数据时退化为纯 TTL
+    MARKET_TZ = None
+
+# 磁盘层需要 pyarrow；只检查是否安装，真正读写时才导入
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (16, 0)
+
+
+def is_market_open(timestamp):
+    """判断时间戳是否处于美股常规交易时段（不考虑节假日）"""
+    if MARKET_TZ is None:
+        return True
+    now = datetime.fromtimestamp(timestamp, MARKET_TZ)
+    if now.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= (now.hour, now.minute) < MARKET_CLOSE
+
+
+def next_market_open(timestamp):
+    """返回时间戳之后的下一个开盘时刻（不考虑节假日）"""
+    if MARKET_TZ is None:
+        return timestamp
+    now = datetime.fromtimestamp(timestamp, MARKET_TZ)
+    candidate = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    # 跨越夏令时切换时重新按本地时间对齐
+    candidate = datetime(candidate.year, candidate.month, candidate.day,
+                         MARKET_OPEN[0], MARKET_OPEN[1], tzinfo=MARKET_TZ)
+    return candidate.astimezone(timezone.utc).timestamp()
+
+
+def compute_expiry(fetched_at, ttl, market_hours_aware=True):
+    """计算缓存条目的过期时间戳"""
+    expires_at = fetched_at + ttl
+    if market_hours_aware and not is_market_open(fetched_at):
+        expires_at = max(expires_at, next_market_open(fetched_at))
+    return expires_at
+
+
+def frame_nbytes(df):
+    """估算 DataFrame 占用的内存字节数"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ChainCache:
+    """线程安全的两级期权链缓存
+
+    get() 返回的 DataFrame 为缓存中的同一个对象，调用方不要原地修改。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, disk_dir=None,
+                 market_hours_aware=True, clock=time.time):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.market_hours_aware = market_hours_aware
+        self.disk_dir = disk_dir if (disk_dir and HAS_PYARROW) else None
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (df, nbytes, expires_at)
+        self._expiration_lists = {}    # ticker -> (到期日元组, expires_at)，只在内存中
+        self._surfaces = {}            # ticker -> {key: (曲面, expires_at)}，只在内存中
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(ticker, expiration, side):
+        return (ticker.upper(), expiration, side)
+
+    def get(self, ticker, expiration, side):
+        """读取缓存，未命中或已过期时返回 None"""
+        key = self.make_key(ticker, expiration, side)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                df, nbytes, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return df
+                self._remove(key)
+                self.expirations += 1
+
+        df = self._read_disk(key, now)
+        with self._lock:
+            if df is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        return df
+
+    def put(self, ticker, expiration, side, df, fetched_at=None):
+        """写入缓存；fetched_at 默认为当前时间"""
+        key = self.make_key(ticker, expiration, side)
+        fetched_at = self.clock() if fetched_at is None else fetched_at
+        expires_at = compute_expiry(fetched_at, self.ttl, self.market_hours_aware)
+        self._put_memory(key, df, expires_at)
+        self._write_disk(key, df, fetched_at)
+
+    def expires_in(self, ticker, expiration, side):
+        """内存层中该期权链距离过期的秒数，不在内存层时返回 None；不计入命中统计"""
+        key = self.make_key(ticker, expiration, side)
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else entry[2] - self.clock()
+
+    def get_expirations(self, ticker):
+        """读取缓存的到期日列表，未命中或已过期时返回 None"""
+        with self._lock:
+            entry = self._expiration_lists.get(ticker.upper())
+        if entry is None or self.clock() >= entry[1]:
+            return None
+        return entry[0]
+
+    def put_expirations(self, ticker, expirations, fetched_at=None):
+        """缓存到期日列表，过期规则与期权链相同"""
+        fetched_at = self.clock() if fetched_at is None else fetched_at
+        expires_at = compute_expiry(fetched_at, self.ttl, self.market_hours_aware)
+        with self._lock:
+            self._expiration_lists[ticker.upper()] = (tuple(expirations), expires_at)
+
+    def expirations_expire_in(self, ticker):
+        """到期日列表距离过期的秒数，未缓存时返回 None"""
+        with self._lock:
+            entry = self._expiration_lists.get(ticker.upper())
+        return None if entry is None else entry[1] - self.clock()
+
+    def get_surface(self, ticker, key):
+        """读取缓存的隐含波动率曲面，未命中或已过期时返回 None"""
+        with self._lock:
+            entry = self._surfaces.get(ticker.upper(), {}).get(key)
+        if entry is None or self.clock() >= entry[1]:
+            return None
+        return entry[0]
+
+    def put_surface(self, ticker, key, surface, sources):
+        """缓存由 sources（[(到期日, 期权类型), ...]）对应期权链构建的曲面
+
+        过期时间取来源期权链中最早的一个；任一来源不在内存层时不缓存，返回是否已缓存。
+        """
+        ticker = ticker.upper()
+        with self._lock:
+            entries = [self._entries.get(self.make_key(ticker, exp, side)) for exp, side in sources]
+            if not entries or any(entry is None for entry in entries):
+                return False
+            expires_at = min(entry[2] for entry in entries)
+            self._surfaces.setdefault(ticker, {})[key] = (surface, expires_at)
+        return True
+
+    def clear(self):
+        """清空内存层（磁盘层文件保留，按过期时间失效）"""
+        with self._lock:
+            self._entries.clear()
+            self._expiration_lists.clear()
+            self._surfaces.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """返回命中、未命中、淘汰等计数"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+                'surfaces': sum(len(surfaces) for surfaces in self._surfaces.values()),
+                'bytes': self._bytes,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def _put_memory(self, key, df, expires_at):
+        nbytes = frame_nbytes(df)
+        with self._lock:
+            # 期权链更新后，由旧数据构建的曲面失效
+            self._surfaces.pop(key[0], None)
+            if key in self._entries:
+                self._remove(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (df, nbytes, expires_at)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+        self._surfaces.pop(key[0], None)
+
+    def _disk_path(self, key):
+        """磁盘缓存文件路径；解析后不是 disk_dir 下 <股票代码>/<文件> 的键（如含 '..'）返回 None"""
+        ticker, expiration, side = key
+        root = os.path.realpath(self.disk_dir)
+        path = os.path.realpath(os.path.join(root, ticker, f"{expiration}_{side}.parquet"))
+        parts = os.path.relpath(path, root).split(os.sep)
+        if len(parts) != 2 or parts[0] in ('.', '..'):
+            return None
+        return path
+
+    def _read_disk(self, key, now):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        if path is None:
+            return None
+        try:
+            fetched_at = os.path.getmtime(path)
+        except OSError:
+            return None
+        expires_at = compute_expiry(fetched_at, self.ttl, self.market_hours_aware)
+        if now >= expires_at:
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception:
+            return None
+        self._put_memory(key, df, expires_at)
+        return df
+
+    def _write_disk(self, key, df, fetched_at):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        if path is None:
+            return
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            df.to_parquet(tmp_path, index=False)
+            # 用文件修改时间记录获取时间，重启后据此判断是否过期
+            os.utime(tmp_path, (fetched_at, fetched_at))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """返回进程内共享的期权链缓存（按环境变量配置）"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ChainCache(
+                max_bytes=int(float(os.environ.get('OPTION_CHAIN_CACHE_MB', DEFAULT_MAX_BYTES / 2**20)) * 2**20),
+                ttl=float(os.environ.get('OPTION_CHAIN_CACHE_TTL', DEFAULT_TTL)),
+                disk_dir=os.environ.get('OPTION_CHAIN_CACHE_DIR') or None,
+            )
+        return _shared_cache
@@ -0,0 +1,443 @@
+"""
+期权筛选命令行
+
+用法示例:
+    python -m screener_core screen AAPL MSFT SPY --strategy put -o results.csv
+    python -m screener_core screen --file watchlist.txt --format json -o results.json
+    python -m screener_core screen QQQ --format parquet -o qqq.parquet --timings
+    python -m screener_core screen AAPL MSFT SPY --frontier --top 20    # 帕累托前沿中收益率前 20
+    python -m screener_core screen SPY --strategy condor --max-width 5 --min-credit 0.5 --top 20
+    python -m screener_core screen AAPL MSFT --min-richness 0.02    # IV 比曲面高 2 个波动率点以上
+    python -m screener_core screen SPY QQQ --delta-band 0.2 0.3      # 按 Delta 区间代替价外百分比
+    python -m screener_core screen SPY --target-delta 0.25           # 每个到期日最接近 0.25 Delta 的合约
+    python -m screener_core screen AAPL MSFT --rank-by expectedReturn --top 20   # 按蒙特卡洛期望收益排序
+    python -m screener_core screen AAPL --probabilities --hv-prices closes.csv   # 按历史波动率模拟
+    python -m screener_core screen AAPL MSFT SPY --budget 50000 --max-ticker-fraction 0.4   # 按资金预算配置张数
+    python -m screener_core screen SPY QQQ --record fixtures/          # 录制实时数据
+    python -m screener_core screen SPY QQQ --replay fixtures/ --latency 0.2  # 离线回放
+    python -m screener_core screen SPY --snapshot-dir snapshots/       # 保存历史快照
+    python -m screener_core snapshots SPY --dir snapshots/ --start 2026-10-13 --min-dte 30 --max-dte 45
+    python -m screener_core backtest --dir snapshots/ --prices closes.csv --min-dte 20 30 --max-otm 0.1 0.2
+    python -m screener_core serve --port 8765                          # 启动筛选服务
+    python -m screener_core serve --replay fixtures/ --latency 0.2     # 用回放数据启动筛选服务
+
+模块顶层只导入标准库，pandas、yfinance 等在真正执行筛选时才导入，
+`--help` 和参数错误可以立即返回。
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+from screener_core.config import (
+    DEFAULT_DAYS_TO_EXPIRATION_MIN,
+    DEFAULT_DAYS_TO_EXPIRATION_MAX,
+    DEFAULT_OTM_PERCENTAGE_MIN,
+    DEFAULT_OTM_PERCENTAGE_MAX,
+    DEFAULT_FETCH_WORKERS,
+    DEFAULT_WATCHLIST_WORKERS,
+    DEFAULT_RISK_FREE_RATE,
+    DEFAULT_DIVIDEND_YIELD,
+    DEFAULT_SPREAD_MAX_WIDTH,
+    DEFAULT_SPREAD_MIN_CREDIT,
+    DELTA_FETCH_OTM_RANGE,
+    DEFAULT_SIMULATION_PATHS,
+    DEFAULT_MAX_TICKER_FRACTION,
+    DEFAULT_MAX_EXPIRY_FRACTION,
+    DEFAULT_MAX_CONTRACTS,
+    DEFAULT_SERVICE_PORT,
+    DEFAULT_SERVICE_CONCURRENCY,
+    DEFAULT_SERVICE_QUEUE,
+    DEFAULT_UPSTREAM_CONNECTIONS,
+)
+from screener_core.wire import SCREEN_STRATEGY_NAMES, SPREAD_NAMES, STRATEGY_NAMES
+
+OUTPUT_FORMATS = ('csv', 'json', 'parquet')
+RANK_METRICS = ('annualizedReturn', 'expectedReturn', 'probProfit')
+ALLOCATION_OBJECTIVES = ('premium', 'expectedPnl')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m screener_core', description="期权策略筛选命令行")
+    parser.add_argument('-v', '--verbose', action='count', default=0, help="输出筛选过程日志（-vv 输出调试日志）")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    screen = subparsers.add_parser('screen', help="筛选一个或多个股票，输出按年化收益率排序的结果")
+    screen.add_argument('tickers', nargs='*', help="股票代码列表")
+    screen.add_argument('--file', help="自选股文件，逗号、空格或换行分隔")
+    screen.add_argument('--strategy', choices=sorted(SCREEN_STRATEGY_NAMES), default='put',
+                        help="put: 现金担保看跌期权, call: 备兑看涨期权, put-spread: 牛市看跌价差, "
+                             "call-spread: 熊市看涨价差, condor: 铁鹰式, strangle: 卖出宽跨式")
+    screen.add_argument('--min-dte', type=int, default=DEFAULT_DAYS_TO_EXPIRATION_MIN)
+    screen.add_argument('--max-dte', type=int, default=DEFAULT_DAYS_TO_EXPIRATION_MAX)
+    screen.add_argument('--min-otm', type=float, default=DEFAULT_OTM_PERCENTAGE_MIN)
+    screen.add_argument('--max-otm', type=float, default=DEFAULT_OTM_PERCENTAGE_MAX)
+    screen.add_argument('--max-width', type=float, default=DEFAULT_SPREAD_MAX_WIDTH,
+                        help="多腿组合买入腿与卖出腿的最大行权价间距（美元）")
+    screen.add_argument('--min-credit', type=float, default=DEFAULT_SPREAD_MIN_CREDIT,
+                        help="多腿组合每股最低净权利金")
+    screen.add_argument('--max-loss', type=float, help="多腿组合每张的最大亏损上限（美元，宽跨式为保证金）")
+    screen.add_argument('--rate', type=float, default=DEFAULT_RISK_FREE_RATE,
+                        help="计算希腊字母使用的无风险利率")
+    screen.add_argument('--dividend', type=float, default=DEFAULT_DIVIDEND_YIELD,
+                        help="标的股息率")
+    screen.add_argument('--workers', type=int, default=DEFAULT_WATCHLIST_WORKERS,
+                        help="同时处理的股票数")
+    screen.add_argument('--fetch-workers', type=int, default=DEFAULT_FETCH_WORKERS,
+                        help="每个股票同时获取的到期日数")
+    screen.add_argument('--format', choices=OUTPUT_FORMATS,
+                        help="输出格式，默认根据输出文件扩展名判断，否则为 csv")
+    screen.add_argument('-o', '--output', help="输出文件路径，默认输出到标准输出（parquet 必须指定文件）")
+    screen.add_argument('--top', type=int, metavar='K', help="只输出年化收益率最高的 K 个机会")
+    screen.add_argument('--frontier', action='store_true',
+                        help="只输出收益率、Delta、持仓量三者的帕累托前沿上的合约")
+    screen.add_argument('--min-richness', type=float, metavar='VOL',
+                        help="只输出隐含波动率比该股票隐含波动率曲面至少高 VOL 的单腿合约（0.01 即 1 个波动率点）")
+    delta = screen.add_mutually_exclusive_group()
+    delta.add_argument('--delta-band', type=float, nargs=2, metavar=('LOW', 'HIGH'),
+                       help="只输出 |Delta| 在 [LOW, HIGH] 内的单腿合约，代替 --min-otm/--max-otm")
+    delta.add_argument('--target-delta', type=float, metavar='D',
+                       help="每个股票的每个到期日只输出 |Delta| 最接近 D 的一个单腿合约，代替 --min-otm/--max-otm")
+    screen.add_argument('--probabilities', action='store_true',
+                        help="为单腿合约添加蒙特卡洛盈利概率、行权概率、期望盈亏和 CVaR 列")
+    screen.add_argument('--rank-by', choices=RANK_METRICS, default='annualizedReturn',
+                        help="排序指标；expectedReturn 和 probProfit 会自动计算概率列")
+    screen.add_argument('--paths', type=int, default=DEFAULT_SIMULATION_PATHS,
+                        help="每个到期日模拟的到期价格数")
+    screen.add_argument('--seed', type=int, default=0, help="模拟的随机数种子，相同种子结果相同")
+    screen.add_argument('--processes', type=int, default=1,
+                        help="模拟使用的进程数（0 为 CPU 核数），默认在当前进程中计算")
+    screen.add_argument('--hv-prices', metavar='CSV',
+                        help="按收盘价 CSV（格式同 backtest --prices）计算的历史波动率模拟，默认使用隐含波动率曲面")
+    screen.add_argument('--budget', type=float, metavar='USD',
+                        help="在筛选结果中按资金预算配置每个合约的张数，只输出选中的合约（quantity 列为张数）")
+    screen.add_argument('--max-ticker-fraction', type=float, default=DEFAULT_MAX_TICKER_FRACTION,
+                        help="配置时单个股票占用资金占预算的最大比例")
+    screen.add_argument('--max-expiry-fraction', type=float, default=DEFAULT_MAX_EXPIRY_FRACTION,
+                        help="配置时单个到期日占用资金占预算的最大比例")
+    screen.add_argument('--max-delta', type=float, metavar='SHARES',
+                        help="配置时 Σ|Delta|×100×张数 的上限（相当于多少股正股），默认不限制")
+    screen.add_argument('--max-contracts', type=int, default=DEFAULT_MAX_CONTRACTS,
+                        help="配置时每个合约最多张数（0 为不限制）")
+    screen.add_argument('--objective', choices=ALLOCATION_OBJECTIVES, default='premium',
+                        help="配置的目标：权利金合计，或期望盈亏合计（会自动计算概率列）")
+    screen.add_argument('--timings', action='store_true', help="在标准错误输出中打印各阶段耗时")
+    screen.add_argument('--metrics-file', metavar='PATH', default=os.environ.get('OPTION_SCREENER_METRICS_FILE'),
+                        help="把各阶段耗时分位数和缓存命中率以 Prometheus 文本格式写入该文件"
+                             "（默认读取 OPTION_SCREENER_METRICS_FILE）")
+    source = screen.add_mutually_exclusive_group()
+    source.add_argument('--record', metavar='DIR', help="使用 yfinance 并把返回的数据录制到 fixture 目录")
+    source.add_argument('--replay', metavar='DIR', help="从 fixture 目录回放数据，不访问网络")
+    screen.add_argument('--latency', type=float, default=0.0,
+                        help="回放时每次请求模拟的网络延迟（秒）")
+    screen.add_argument('--snapshot-dir', metavar='DIR',
+                        help="把获取到的期权链保存为历史快照（默认读取 OPTION_SCREENER_SNAPSHOT_DIR）")
+
+    snapshots = subparsers.add_parser('snapshots', help="查询保存的期权链历史快照")
+    snapshots.add_argument('tickers', nargs='*', help="股票代码列表，默认全部")
+    snapshots.add_argument('--dir', default=os.environ.get('OPTION_SCREENER_SNAPSHOT_DIR'),
+                           help="快照目录，默认读取 OPTION_SCREENER_SNAPSHOT_DIR")
+    snapshots.add_argument('--start', help="开始日期 YYYY-MM-DD（含）")
+    snapshots.add_argument('--end', help="结束日期 YYYY-MM-DD（含）")
+    snapshots.add_argument('--strategy', choices=sorted(STRATEGY_NAMES), help="只查询看跌(put)或看涨(call)")
+    snapshots.add_argument('--expiration', action='append', help="到期日，可重复指定")
+    snapshots.add_argument('--min-dte', type=int)
+    snapshots.add_argument('--max-dte', type=int)
+    snapshots.add_argument('--min-strike', type=float)
+    snapshots.add_argument('--max-strike', type=float)
+    snapshots.add_argument('--format', choices=OUTPUT_FORMATS,
+                           help="输出格式，默认根据输出文件扩展名判断，否则为 csv")
+    snapshots.add_argument('-o', '--output', help="输出文件路径，默认输出到标准输出")
+
+    backtest = subparsers.add_parser('backtest', help="在历史快照上回测筛选规则，参数给多个值时做参数扫描")
+    backtest.add_argument('tickers', nargs='*', help="股票代码列表，默认快照中的全部股票")
+    backtest.add_argument('--dir', default=os.environ.get('OPTION_SCREENER_SNAPSHOT_DIR'),
+                          help="快照目录，默认读取 OPTION_SCREENER_SNAPSHOT_DIR")
+    backtest.add_argument('--prices', required=True,
+                          help="收盘价 CSV：第一列为日期、其余列为股票代码，或包含 ticker,date,close 列")
+    backtest.add_argument('--start', help="开始日期 YYYY-MM-DD（含）")
+    backtest.add_argument('--end', help="结束日期 YYYY-MM-DD（含）")
+    backtest.add_argument('--strategy', choices=sorted(STRATEGY_NAMES), default='put')
+    backtest.add_argument('--min-dte', type=int, nargs='+', default=[DEFAULT_DAYS_TO_EXPIRATION_MIN])
+    backtest.add_argument('--max-dte', type=int, nargs='+', default=[DEFAULT_DAYS_TO_EXPIRATION_MAX])
+    backtest.add_argument('--min-otm', type=float, nargs='+', default=[DEFAULT_OTM_PERCENTAGE_MIN])
+    backtest.add_argument('--max-otm', type=float, nargs='+', default=[DEFAULT_OTM_PERCENTAGE_MAX])
+    backtest.add_argument('--roll-dte', type=int, nargs='+', default=[None],
+                          help="剩余到期天数不超过该值时买回并移仓，默认持有到期")
+    backtest.add_argument('--processes', type=int, help="参数扫描的进程数，默认 CPU 核数")
+    backtest.add_argument('--format', choices=OUTPUT_FORMATS,
+                          help="输出格式，默认根据输出文件扩展名判断，否则为 csv")
+    backtest.add_argument('-o', '--output', help="输出文件路径，默认输出到标准输出")
+
+    serve = subparsers.add_parser('serve', help="启动筛选服务（HTTP/JSON 接口，多个客户端共用缓存和上游连接）")
+    serve.add_argument('--host', default='127.0.0.1', help="监听地址，默认只接受本机连接")
+    serve.add_argument('--port', type=int, default=DEFAULT_SERVICE_PORT)
+    serve.add_argument('--max-concurrent', type=int, default=DEFAULT_SERVICE_CONCURRENCY,
+                       help="同时执行的筛选请求数")
+    serve.add_argument('--max-pending', type=int, default=DEFAULT_SERVICE_QUEUE,
+                       help="排队等待的请求超过该数时返回 503")
+    serve.add_argument('--upstream-connections', type=int, default=DEFAULT_UPSTREAM_CONNECTIONS,
+                       help="访问上游数据源的长期线程（连接）数")
+    source = serve.add_mutually_exclusive_group()
+    source.add_argument('--record', metavar='DIR', help="使用 yfinance 并把返回的数据录制到 fixture 目录")
+    source.add_argument('--replay', metavar='DIR', help="从 fixture 目录回放数据，不访问网络")
+    serve.add_argument('--latency', type=float, default=0.0,
+                       help="回放时每次请求模拟的网络延迟（秒）")
+    serve.add_argument('--snapshot-dir', metavar='DIR',
+                       help="把获取到的期权链保存为历史快照（默认读取 OPTION_SCREENER_SNAPSHOT_DIR）")
+    return parser
+
+
+def _output_format(args):
+    if args.format:
+        return args.format
+    if args.output:
+        ext = os.path.splitext(args.output)[1].lstrip('.').lower()
+        if ext in OUTPUT_FORMATS:
+            return ext
+    return 'csv'
+
+
+def write_results(df, fmt, output=None):
+    """按格式写出结果；output 为空时写到标准输出"""
+    if fmt == 'parquet':
+        if not output:
+            raise ValueError("parquet 格式必须通过 -o 指定输出文件")
+        df.to_parquet(output, index=False)
+    elif fmt == 'json':
+        text = df.to_json(orient='records', date_format='iso', force_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(text)
+        else:
+            sys.stdout.write(text + '\n')
+    else:
+        df.to_csv(output if output else sys.stdout, index=False)
+
+
+def run_screen(args):
+    timings = {}
+    start = time.perf_counter()
+    from screener_core.allocator import AllocationLimits, allocate
+    from screener_core.delta_index import DeltaFilter, DeltaIndex
+    from screener_core.iv_surface import filter_richness
+    from screener_core.pipeline import parse_watchlist, screen_watchlist
+    from screener_core.probability import add_probabilities, historical_volatility
+    from screener_core.spreads import SpreadLimits
+    from screener_core.ranking import combine_watchlist_results, pareto_frontier, rank_watchlist_results, top_k
+    from screener_core import providers
+    from screener_core.tracing import span, trace, write_prometheus
+    timings['导入'] = time.perf_counter() - start
+
+    if args.snapshot_dir:
+        os.environ['OPTION_SCREENER_SNAPSHOT_DIR'] = args.snapshot_dir
+    if args.replay:
+        providers.set_provider(providers.ReplayProvider(args.replay, latency=args.latency))
+    elif args.record:
+        providers.set_provider(providers.RecordingProvider(providers.YFinanceProvider(), args.record))
+
+    tickers = list(args.tickers)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            tickers.append(f.read())
+    tickers = parse_watchlist(' '.join(tickers))
+    if not tickers:
+        print("❌ 请提供至少一个股票代码", file=sys.stderr)
+        return 2
+    fmt = _output_format(args)
+    if fmt == 'parquet' and not args.output:
+        print("❌ parquet 格式必须通过 -o 指定输出文件", file=sys.stderr)
+        return 2
+    delta_filter = None
+    min_otm, max_otm = args.min_otm, args.max_otm
+    if args.delta_band or args.target_delta is not None:
+        if args.strategy in SPREAD_NAMES:
+            print("❌ --delta-band 和 --target-delta 只支持单腿策略（put、call）", file=sys.stderr)
+            return 2
+        # 按 Delta 选合约时不按价外百分比限制，取全部价外合约后再按 Delta 筛选
+        delta_filter = DeltaFilter(*(args.delta_band or (None, None)), args.target_delta)
+        min_otm, max_otm = DELTA_FETCH_OTM_RANGE
+    probabilities = (args.probabilities or args.rank_by != 'annualizedReturn' or args.hv_prices
+                     or (args.budget is not None and args.objective == 'expectedPnl'))
+    if probabilities and args.strategy in SPREAD_NAMES:
+        print("❌ 概率列只支持单腿策略（put、call）", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    results = []
+    failures = 0
+    with trace('screen') as screen_trace:
+        for item in screen_watchlist(
+            tickers, args.min_dte, args.max_dte, min_otm, max_otm,
+            SCREEN_STRATEGY_NAMES[args.strategy], max_workers=args.workers, fetch_workers=args.fetch_workers,
+            rate=args.rate, dividend=args.dividend,
+            spread_limits=SpreadLimits(args.max_width, args.min_credit, args.max_loss)
+        ):
+            results.append(item)
+            if item.error is not None:
+                failures += 1
+                print(f"❌ {item.ticker}: {item.error}", file=sys.stderr)
+            else:
+                print(f"✅ {item.ticker}: {len(item.result)} 个机会 ({len(results)}/{len(tickers)})", file=sys.stderr)
+    timings['筛选'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # 只取前 K 名时不对全部候选排序
+    ranked_df = combine_watchlist_results(results) if args.top is not None else rank_watchlist_results(results)
+    if delta_filter is not None:
+        ranked_df = DeltaIndex(ranked_df).select(delta_filter)
+    ranked_df = filter_richness(ranked_df, args.min_richness)
+    if args.frontier:
+        ranked_df = pareto_frontier(ranked_df)
+    if probabilities:
+        # 每个合约的概率只取决于所在到期日，在筛选后的少量合约上计算
+        volatility = None
+        if args.hv_prices:
+            import pandas as pd
+            volatility = historical_volatility(pd.read_csv(args.hv_prices))
+        with span('probability'):
+            ranked_df = add_probabilities(
+                ranked_df, SCREEN_STRATEGY_NAMES[args.strategy],
+                surface={item.ticker: item.surface for item in results if item.surface is not None},
+                volatility=volatility, rate=args.rate, dividend=args.dividend, paths=args.paths,
+                seed=args.seed, processes=args.processes or None
+            )
+        if args.top is None and args.rank_by != 'annualizedReturn':
+            ranked_df = ranked_df.sort_values(args.rank_by, ascending=False, kind='stable')
+    if args.top is not None:
+        ranked_df = top_k(ranked_df, args.top, by=args.rank_by)
+    if args.budget is not None:
+        limits = AllocationLimits(args.budget, args.max_ticker_fraction, args.max_expiry_fraction,
+                                  args.max_delta, args.max_contracts or None)
+        with span('allocation'):
+            allocation = allocate(ranked_df, limits, args.objective)
+        ranked_df = allocation.book
+        print(f"💼 配置 {int(ranked_df['quantity'].sum()) if len(ranked_df) else 0} 张合约，"
+              f"占用资金 ${allocation.collateral:,.0f} / ${args.budget:,.0f}，"
+              f"{'权利金' if args.objective == 'premium' else '期望盈亏'} ${allocation.value:,.0f}，"
+              f"Delta {allocation.delta:,.0f} 股", file=sys.stderr)
+    write_results(ranked_df, fmt, args.output)
+    timings['输出'] = time.perf_counter() - start
+    if args.output:
+        print(f"📄 结果已写入 {args.output}（{len(ranked_df)} 行）", file=sys.stderr)
+    if args.timings:
+        print("⏱️ " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()),
+              file=sys.stderr)
+        # 各线程中同一阶段的耗时累加，总和可能超过筛选的实际用时
+        stages = screen_trace.totals()
+        if stages:
+            print("⏱️ 筛选各阶段累计: " + ", ".join(
+                f"{name} {seconds * 1000:.0f}ms×{count}" for name, (count, seconds) in stages.items()
+            ), file=sys.stderr)
+    if args.metrics_file:
+        write_prometheus(args.metrics_file)
+    return 1 if failures == len(tickers) else 0
+
+
+def run_snapshots(args):
+    if not args.dir:
+        print("❌ 请通过 --dir 或 OPTION_SCREENER_SNAPSHOT_DIR 指定快照目录", file=sys.stderr)
+        return 2
+    fmt = _output_format(args)
+    if fmt == 'parquet' and not args.output:
+        print("❌ parquet 格式必须通过 -o 指定输出文件", file=sys.stderr)
+        return 2
+    from screener_core.snapshots import SnapshotReader
+    option_type = {'put': 'puts', 'call': 'calls'}.get(args.strategy)
+    df = SnapshotReader(args.dir).query(
+        [t.upper() for t in args.tickers] or None, args.start, args.end, option_type,
+        args.expiration, args.min_dte, args.max_dte, args.min_strike, args.max_strike
+    )
+    write_results(df, fmt, args.output)
+    print(f"📄 共 {len(df)} 行快照数据", file=sys.stderr)
+    return 0
+
+
+def run_backtest(args):
+    if not args.dir:
+        print("❌ 请通过 --dir 或 OPTION_SCREENER_SNAPSHOT_DIR 指定快照目录", file=sys.stderr)
+        return 2
+    fmt = _output_format(args)
+    if fmt == 'parquet' and not args.output:
+        print("❌ parquet 格式必须通过 -o 指定输出文件", file=sys.stderr)
+        return 2
+    import pandas as pd
+    from screener_core import backtest
+    from screener_core.snapshots import SnapshotReader
+
+    strategy = STRATEGY_NAMES[args.strategy]
+    grid = backtest.param_grid(strategy=[strategy], min_dte=args.min_dte, max_dte=args.max_dte,
+                               min_otm=args.min_otm, max_otm=args.max_otm, roll_dte=args.roll_dte)
+    prices = pd.read_csv(args.prices)
+    if 'ticker' not in prices.columns:
+        prices = prices.set_index(prices.columns[0])
+    snapshots = backtest.load_snapshots(SnapshotReader(args.dir), [t.upper() for t in args.tickers] or None,
+                                        args.start, args.end, strategy, max(args.max_dte))
+    if snapshots.empty:
+        print("❌ 没有找到符合条件的快照", file=sys.stderr)
+        return 1
+
+    if len(grid) == 1:
+        result = backtest.run_backtest(snapshots, prices, grid[0])
+        write_results(result.trades, fmt, args.output)
+        print("📊 " + ", ".join(f"{k}={v:.4g}" for k, v in result.summary.items()), file=sys.stderr)
+    else:
+        summary = backtest.run_sweep(snapshots, prices, grid, args.processes)
+        write_results(summary, fmt, args.output)
+        print(f"📊 完成 {len(grid)} 组参数回测", file=sys.stderr)
+    return 0
+
+
+def run_serve(args):
+    import asyncio
+    from screener_core import providers
+    from screener_core.prewarm import start_from_env as start_prewarm
+    from screener_core.service import ScreeningService
+
+    if args.snapshot_dir:
+        os.environ['OPTION_SCREENER_SNAPSHOT_DIR'] = args.snapshot_dir
+    if args.replay:
+        # 服务进程中只有这一个数据源，回放数据也进入共享缓存
+        inner = providers.ReplayProvider(args.replay, latency=args.latency, cacheable=True)
+    elif args.record:
+        inner = providers.RecordingProvider(providers.YFinanceProvider(), args.record)
+    else:
+        inner = providers.get_provider()
+    providers.set_provider(providers.PooledProvider(inner, args.upstream_connections))
+    # 配置了 OPTION_SCREENER_PREWARM 时由服务进程预热缓存
+    start_prewarm()
+
+    service = ScreeningService(max_concurrent=args.max_concurrent, max_pending=args.max_pending)
+
+    async def serve():
+        await service.start(args.host, args.port)
+        host, port = service.address
+        print(f"🚀 筛选服务已启动: http://{host}:{port}", file=sys.stderr)
+        await service.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    level = logging.WARNING if args.verbose == 0 else (logging.INFO if args.verbose == 1 else logging.DEBUG)
+    logging.basicConfig(level=level, format="%(levelname)s %(name)s: %(message)s")
+    if args.command == 'screen':
+        return run_screen(args)
+    if args.command == 'snapshots':
+        return run_snapshots(args)
+    if args.command == 'backtest':
+        return run_backtest(args)
+    if args.command == 'serve':
+        return run_serve(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+筛选参数默认值
+"""
+
+DEFAULT_DAYS_TO_EXPIRATION_MIN = 30
+DEFAULT_DAYS_TO_EXPIRATION_MAX = 45
+DEFAULT_OTM_PERCENTAGE_MIN = 0.05
+DEFAULT_OTM_PERCENTAGE_MAX = 0.15
+DEFAULT_FETCH_WORKERS = 8  # 并发获取期权链的线程数
+DEFAULT_FETCH_TIMEOUT = 20  # 单个到期日期权链的超时时间（秒）
+DEFAULT_RISK_FREE_RATE = 0.04  # 计算希腊字母使用的无风险利率
+DEFAULT_DIVIDEND_YIELD = 0.0
+DEFAULT_WATCHLIST_WORKERS = 4  # 批量筛选时同时处理的股票数
+DEFAULT_SPREAD_MAX_WIDTH = 10.0  # 价差组合买入腿与卖出腿的最大行权价间距（美元）
+DEFAULT_SPREAD_MIN_CREDIT = 0.10  # 价差组合每股最低净权利金
+DEFAULT_SPREAD_MAX_LOSS = None  # 每张组合的最大亏损（美元），None 表示不限制
+DEFAULT_SIMULATION_PATHS = 100_000  # 蒙特卡洛估计盈利概率时每个到期日模拟的到期价格数
+DEFAULT_ALLOCATION_BUDGET = 100_000.0  # 组合配置的资金预算（美元）
+DEFAULT_MAX_TICKER_FRACTION = 0.25  # 单个股票占用资金占预算的最大比例
+DEFAULT_MAX_EXPIRY_FRACTION = 0.50  # 单个到期日占用资金占预算的最大比例
+DEFAULT_MAX_CONTRACTS = 10  # 组合中每个合约最多张数
+
+# 筛选服务（python -m screener_core serve）
+DEFAULT_SERVICE_PORT = 8765
+DEFAULT_SERVICE_CONCURRENCY = 4  # 同时执行的筛选请求数
+DEFAULT_SERVICE_QUEUE = 16  # 等待执行的请求超过该数时直接返回 503
+DEFAULT_SERVICE_TIMEOUT = 300  # 客户端等待一次筛选的最长时间（秒）
+DEFAULT_UPSTREAM_CONNECTIONS = 16  # 服务访问上游数据源的长期线程（连接）数
+
+# 界面滑块的完整范围；界面按此范围一次获取数据，滑块变化时在内存中重新筛选
+DTE_SLIDER_RANGE = (1, 90)
+OTM_SLIDER_RANGE = (0.01, 0.30)
+
+# 按 Delta 选合约时不按价外百分比限制（只取价外合约），按此范围获取数据
+DELTA_FETCH_OTM_RANGE = (0.0, 1.0)
+DEFAULT_DELTA_BAND = (0.20, 0.30)
+DEFAULT_TARGET_DELTA = 0.25
@@ -0,0 +1,291 @@
+"""
+行情与期权链数据获取
+
+数据通过 screener_core.providers 中的数据源获取，不包含任何界面代码；
+状态信息通过 StatusLog 返回。
+"""
+
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date
+import pandas as pd
+from screener_core.chain_cache import shared_cache
+from screener_core.config import DEFAULT_FETCH_WORKERS, DEFAULT_FETCH_TIMEOUT
+from screener_core.filtering import BOTH_SIDES
+from screener_core.iv_surface import build_iv_surface
+from screener_core.providers import OptionChain, get_provider
+from screener_core.quotes import shared_quotes
+from screener_core.schema import compact_frame
+from screener_core.singleflight import shared_flight
+from screener_core.status import StatusLog
+from screener_core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+def get_ticker(ticker_symbol, provider=None):
+    """返回与 yf.Ticker 接口一致的股票对象，数据来自 provider（默认为进程内默认数据源）"""
+    return (provider or get_provider()).ticker(ticker_symbol)
+
+
+def _coalesce_key(stock):
+    """请求合并使用的股票键；不可缓存的数据源（如回放）不参与合并"""
+    return getattr(stock, 'cache_key', getattr(stock, 'ticker', None))
+
+
+def get_stock_price(ticker_symbol, provider=None):
+    """获取股票当前价格，失败时返回 None；价格由共享的报价服务缓存"""
+    try:
+        return shared_quotes().get(ticker_symbol, provider)
+    except Exception as e:
+        # 不在这里显示错误，让调用函数处理
+        logger.debug("获取 %s 价格失败: %s", ticker_symbol, e)
+        return None
+
+
+def get_stock_prices(ticker_symbols, provider=None):
+    """批量获取多个股票的当前价格，返回 {大写代码: 价格或 None}
+
+    缓存中没有的股票合并为一次批量请求（数据源支持时），适合自选股批量筛选前预取。
+    """
+    return shared_quotes().get_many(ticker_symbols, provider)
+
+
+def get_stock_data(ticker_symbol, current_price=None, status=None, price_lookup=None, provider=None):
+    """获取股票数据和当前价格
+
+    已查询过价格时可传入 current_price，避免重复查询；price_lookup 可替换价格查询函数
+    （例如界面中带缓存的版本）。
+    """
+    status = status or StatusLog()
+    try:
+        # 获取缓存的价格
+        if current_price is None:
+            if price_lookup is not None:
+                current_price = price_lookup(ticker_symbol)
+            else:
+                current_price = get_stock_price(ticker_symbol, provider)
+        if current_price is None:
+            status.error(f"获取股票数据时出错")
+            status.info("💡 提示：请检查股票代码是否正确，或稍后重试")
+            return None, None
+            
+        # 创建新的股票对象（不缓存）
+        stock = get_ticker(ticker_symbol, provider)
+        return stock, current_price
+    except Exception as e:
+        status.error(f"获取股票数据时出错: {e}")
+        status.info("💡 提示：请检查股票代码是否正确，或稍后重试")
+        return None, None
+
+
+def get_expirations(stock, cache=None, refresh=False):
+    """获取股票的全部到期日
+
+    可缓存的数据源优先读取共享缓存中的到期日列表（过期规则与期权链相同），
+    并发的相同请求只访问一次数据源；refresh 为 True 时忽略缓存重新获取。
+    """
+    symbol = _coalesce_key(stock)
+
+    def _fetch():
+        with span('expirations', symbol=getattr(stock, 'ticker', '')):
+            expirations = tuple(stock.options)
+        if symbol:
+            cache.put_expirations(symbol, expirations)
+        return expirations
+
+    if not symbol:
+        return _fetch()
+    cache = shared_cache() if cache is None else cache
+    if not refresh:
+        cached = cache.get_expirations(symbol)
+        if cached is not None:
+            return cached
+    return shared_flight().do(('expirations', symbol), _fetch)
+
+
+def find_potential_expirations(stock, min_dte, max_dte, status=None, cache=None):
+    """查找指定DTE范围内的到期日"""
+    status = status or StatusLog()
+    today = date.today()
+    potential_expirations = []
+    try:
+        for exp_str in get_expirations(stock, cache):
+            exp_date = date.fromisoformat(exp_str)
+            dte = (exp_date - today).days
+            if min_dte <= dte <= max_dte:
+                potential_expirations.append((exp_str, dte))
+    except Exception as e:
+        status.error(f"获取期权到期日时出错: {e}")
+    return potential_expirations
+
+
+def fetch_option_chain(stock, exp, option_type='puts', cache=None, refresh=False):
+    """获取单个到期日的期权链（不做任何界面输出）
+
+    优先读取共享的期权链缓存；未命中时请求数据源，并同时缓存看涨和看跌两侧。
+    多个会话同时请求同一个到期日时只访问一次数据源，共享同一份结果。
+    refresh 为 True 时忽略缓存重新获取（用于后台预热）。
+    option_type 为 'both' 时返回含两侧的 OptionChain（多腿组合使用）。
+    """
+    cache = shared_cache() if cache is None else cache
+    symbol = _coalesce_key(stock)
+    if symbol and not refresh:
+        if option_type == BOTH_SIDES:
+            calls, puts = cache.get(symbol, exp, 'calls'), cache.get(symbol, exp, 'puts')
+            if calls is not None and puts is not None:
+                return OptionChain(calls=calls, puts=puts)
+        else:
+            cached = cache.get(symbol, exp, option_type)
+            if cached is not None:
+                return cached
+
+    def _fetch():
+        with span('option_chain', symbol=getattr(stock, 'ticker', ''), expiration=exp):
+            option_chain = stock.option_chain(exp)
+        # 缓存和后续筛选都使用紧凑列类型
+        option_chain = option_chain._replace(calls=compact_frame(option_chain.calls),
+                                             puts=compact_frame(option_chain.puts))
+        # 记录获取时间，快照按它识别同一份数据
+        fetched_at = time.time()
+        option_chain.calls.attrs['fetched_at'] = fetched_at
+        option_chain.puts.attrs['fetched_at'] = fetched_at
+        if symbol:
+            cache.put(symbol, exp, 'calls', option_chain.calls, fetched_at)
+            cache.put(symbol, exp, 'puts', option_chain.puts, fetched_at)
+        return option_chain
+
+    if symbol:
+        option_chain = shared_flight().do(('chain', symbol, exp), _fetch)
+    else:
+        option_chain = _fetch()
+    if option_type == BOTH_SIDES:
+        return option_chain
+    if option_type == 'puts':
+        return option_chain.puts
+    return option_chain.calls
+
+
+def iter_option_chains(stock, expirations, option_type='puts',
+                       max_workers=DEFAULT_FETCH_WORKERS, timeout=DEFAULT_FETCH_TIMEOUT):
+    """并发获取多个到期日的期权链，按完成先后逐个产出
+
+    每项为 (index, exp, dte, options_df, error)，index 为该到期日在 expirations 中的位置；
+    获取失败或超时的到期日 options_df 为 None，error 为对应异常。
+    timeout 从该到期日的请求真正开始执行时计时，排队等待的时间不计入。
+    生成器提前关闭时会取消尚未开始的请求。
+    """
+    total = len(expirations)
+    if total == 0:
+        return
+
+    started = {}
+
+    def _fetch(index, exp):
+        started[index] = time.monotonic()
+        return fetch_option_chain(stock, exp, option_type)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, total)))
+    try:
+        pending = {
+            # 在调用方的上下文中执行，继承当前的 Trace
+            executor.submit(contextvars.copy_context().run, _fetch, i, exp): i
+            for i, (exp, _) in enumerate(expirations)
+        }
+        while pending:
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            finished = []
+            for future in done:
+                i = pending[future]
+                exp, dte = expirations[i]
+                try:
+                    finished.append((future, (i, exp, dte, future.result(), None)))
+                except Exception as e:
+                    finished.append((future, (i, exp, dte, None, e)))
+
+            # 已开始执行但超过时限的请求直接放弃，不再等待其返回
+            if timeout is not None:
+                now = time.monotonic()
+                for future, i in pending.items():
+                    if future in done or i not in started:
+                        continue
+                    if now - started[i] > timeout:
+                        exp, dte = expirations[i]
+                        finished.append((future, (i, exp, dte, None, TimeoutError(f"获取超时（>{timeout}秒）"))))
+
+            for future, item in finished:
+                del pending[future]
+                yield item
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_option_chains(stock, expirations, option_type='puts',
+                        max_workers=DEFAULT_FETCH_WORKERS, timeout=DEFAULT_FETCH_TIMEOUT,
+                        progress_callback=None):
+    """并发获取多个到期日的期权链
+
+    返回与 expirations 顺序一致的列表 [(exp, dte, options_df, error), ...]，
+    获取失败或超时的到期日 options_df 为 None，error 为对应异常。
+    progress_callback(completed, total) 在主线程中每完成一个到期日调用一次。
+    """
+    total = len(expirations)
+    results = [(exp, dte, None, None) for exp, dte in expirations]
+    completed = 0
+    for i, exp, dte, options_df, error in iter_option_chains(
+        stock, expirations, option_type, max_workers, timeout
+    ):
+        results[i] = (exp, dte, options_df, error)
+        completed += 1
+        if progress_callback is not None:
+            progress_callback(completed, total)
+    return results
+
+
+def get_iv_surface(stock, chains, current_price, option_type='puts', rate=0.0, dividend=0.0, cache=None):
+    """由已获取的 [(exp, dte, 期权链), ...] 构建隐含波动率曲面，没有足够的有效报价时返回 None
+
+    可缓存的数据源把曲面与期权链一起缓存，来源期权链更新、过期或被淘汰时失效；
+    option_type 为 'both' 时两侧期权链都是来源。
+    """
+    cache = shared_cache() if cache is None else cache
+    symbol = _coalesce_key(stock)
+    key = (option_type, tuple((exp, dte) for exp, dte, _ in chains), rate, dividend)
+    if symbol:
+        cached = cache.get_surface(symbol, key)
+        if cached is not None:
+            return cached
+    with span('iv_surface', symbol=getattr(stock, 'ticker', '')):
+        surface = build_iv_surface(chains, current_price, option_type, rate, dividend)
+    if symbol and surface is not None:
+        sides = ('puts', 'calls') if option_type == BOTH_SIDES else (option_type,)
+        cache.put_surface(symbol, key, surface, [(exp, side) for exp, _, _ in chains for side in sides])
+    return surface
+
+
+def get_real_greeks(stock, exp, option_type='puts', options_df=None, status=None):
+    """获取真实的希腊字母数据
+
+    如果传入已获取的 options_df，则直接使用，不再发起网络请求。
+    """
+    status = status or StatusLog()
+    try:
+        if options_df is None:
+            options_df = fetch_option_chain(stock, exp, option_type)
+        
+        # 检查是否有真实的希腊字母数据
+        greek_columns = ['delta', 'gamma', 'theta', 'vega', 'rho']
+        available_greeks = [col for col in greek_columns if col in options_df.columns]
+        
+        if available_greeks:
+            status.info(f"✅ 获取到真实希腊字母数据: {', '.join(available_greeks)}")
+            return options_df, True
+        else:
+            status.info("⚠️ 未获取到希腊字母数据，将使用计算值")
+            return options_df, False
+            
+    except Exception as e:
+        status.warning(f"获取希腊字母数据时出错: {e}")
+        return None, False
@@ -0,0 +1,109 @@
+"""
+按 Delta 筛选的有序索引
+
+交易台常按 Delta 而不是价外百分比选合约，例如「每个到期日 0.20-0.30 Delta 的看跌期权」或
+「每个到期日最接近 0.25 Delta 的一个合约」。DeltaIndex 在筛选结果上只建一次索引：
+- 按 (股票, 到期日) 分组，组内按 |Delta|（real_delta 列）排序
+- 组号和 Delta 合成一个单调递增的键 组号×2 + Delta（Delta 在 [0, 1] 内），
+  所有组的区间端点或目标值可以用一次 searchsorted 同时二分查找
+之后每次调整区间或目标值，每个到期日只做 O(log n) 的二分查找，不再扫描全部结果。
+选出的行保持原结果中的顺序（即排序后的年化收益率顺序）。缺少 Delta 的合约不参与 Delta 筛选。
+"""
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+DeltaFilter = namedtuple('DeltaFilter', ['low', 'high', 'target'], defaults=(None, None, None))
+DeltaFilter.__doc__ = """Delta 筛选条件：target 为 None 时保留 |Delta| 在 [low, high] 内的合约，
+否则每个股票的每个到期日只保留 |Delta| 最接近 target 的一个合约（距离相同时取 Delta 较小的）"""
+
+
+class DeltaIndex:
+    """筛选结果按 (股票, 到期日) 分组、组内按 |Delta| 排序的索引，创建后不再修改"""
+
+    def __init__(self, result_df):
+        self.result_df = result_df
+        if result_df is None or result_df.empty:
+            self._keys = np.array([], dtype=float)
+            self._rows = np.array([], dtype=np.int64)
+            self._delta = np.array([], dtype=float)
+            self._group_dte = np.array([], dtype=np.int64)
+            self._bounds = np.zeros(1, dtype=np.int64)
+            self._dtype = np.dtype(float)
+            return
+
+        # 区间端点按 Delta 列本身的精度比较（紧凑类型为 float32），与直接比较该列一致
+        self._dtype = result_df['real_delta'].dtype
+        delta = result_df['real_delta'].to_numpy(dtype=float)
+        dte = result_df['dte'].to_numpy(dtype=np.int64)
+        if 'ticker' in result_df.columns:
+            tickers, _ = pd.factorize(result_df['ticker'], sort=True)
+            group_key = tickers.astype(np.int64) * (int(dte.max()) + 1) + dte
+        else:
+            group_key = dte
+        group_values, groups = np.unique(group_key, return_inverse=True)
+
+        rows = np.flatnonzero(~np.isnan(delta))
+        rows = rows[np.lexsort((delta[rows], groups[rows]))]
+        self._rows = rows
+        self._delta = delta[rows]
+        self._keys = groups[rows] * 2.0 + self._delta
+        # 每组在排序后数组中的 [起点, 终点)
+        self._bounds = np.searchsorted(groups[rows], np.arange(len(group_values) + 1))
+        self._group_dte = group_values % (int(dte.max()) + 1) if 'ticker' in result_df.columns else group_values
+
+    @property
+    def groups(self):
+        """（股票, 到期日）分组数"""
+        return len(self._group_dte)
+
+    def _groups_in(self, min_dte, max_dte):
+        mask = np.ones(len(self._group_dte), dtype=bool)
+        if min_dte is not None:
+            mask &= self._group_dte >= min_dte
+        if max_dte is not None:
+            mask &= self._group_dte <= max_dte
+        return np.flatnonzero(mask)
+
+    def _take(self, positions):
+        """按原结果中的顺序取出行"""
+        return self.result_df.iloc[np.sort(self._rows[positions])]
+
+    def band(self, low, high, min_dte=None, max_dte=None):
+        """|Delta| 在 [low, high] 内、到期天数在 [min_dte, max_dte] 内的合约"""
+        if self.result_df is None or self.result_df.empty:
+            return self.result_df
+        groups = self._groups_in(min_dte, max_dte)
+        low, high = (float(np.asarray(value, dtype=self._dtype)) for value in (low, high))
+        starts = np.searchsorted(self._keys, groups * 2.0 + low, side='left')
+        ends = np.searchsorted(self._keys, groups * 2.0 + high, side='right')
+        lengths = np.maximum(ends - starts, 0)
+        # 把各组的 [起点, 终点) 展开成连续的位置
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        # 合成键在组号较大时有舍入，按原始 Delta 再精确判断一次（只检查选中的行）
+        delta = self._delta[positions]
+        return self._take(positions[(delta >= low) & (delta <= high)])
+
+    def nearest(self, target, min_dte=None, max_dte=None):
+        """每个股票的每个到期日中 |Delta| 最接近 target 的一个合约"""
+        if self.result_df is None or self.result_df.empty:
+            return self.result_df
+        groups = self._groups_in(min_dte, max_dte)
+        lo, hi = self._bounds[groups], self._bounds[groups + 1]
+        groups, lo, hi = groups[hi > lo], lo[hi > lo], hi[hi > lo]
+        pos = np.clip(np.searchsorted(self._keys, groups * 2.0 + target), lo, hi)
+        below = np.maximum(pos - 1, lo)
+        above = np.minimum(pos, hi - 1)
+        d_below = np.abs(self._delta[below] - target)
+        d_above = np.abs(self._delta[above] - target)
+        chosen = np.where(d_above < d_below, above, below)
+        # Delta 相同的多个合约取原结果中排在最前的（组内相同 Delta 按原顺序排列）
+        chosen = np.maximum(np.searchsorted(self._keys, self._keys[chosen], side='left'), lo)
+        return self._take(chosen)
+
+    def select(self, delta_filter, min_dte=None, max_dte=None):
+        """按 DeltaFilter 筛选"""
+        if delta_filter.target is not None:
+            return self.nearest(delta_filter.target, min_dte, max_dte)
+        return self.band(delta_filter.low, delta_filter.high, min_dte, max_dte)
@@ -0,0 +1,180 @@
+"""
+单次遍历的向量化筛选内核
+
+把多个到期日的期权链拼接后一次完成价外区间筛选、权利金选择、抵押品和年化收益率计算，
+两种策略只在参数上不同：
+- strike_side: -1 表示行权价低于现价（看跌），1 表示高于现价（看涨）
+- collateral: 'strike' 按行权价×100 计算现金担保，'spot' 按现价×100 计算持股成本
+"""
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from screener_core.greeks import add_greeks
+from screener_core.iv_solver import IVResult, fill_missing_iv
+from screener_core.schema import compact_frame
+
+StrategySpec = namedtuple('StrategySpec', ['option_type', 'strike_side', 'collateral'])
+SpreadSpec = namedtuple('SpreadSpec', ['option_type', 'sides', 'wings'])
+SpreadSpec.__doc__ = """多腿组合策略：sides 为卖出腿所在的一侧或两侧，wings 表示每个卖出腿是否配一个更价外的买入腿
+
+多腿策略需要同一到期日的看涨和看跌两侧期权链，option_type 固定为 BOTH_SIDES。
+"""
+
+BOTH_SIDES = 'both'
+
+CASH_SECURED_PUT = "现金担保看跌期权"
+COVERED_CALL = "备兑看涨期权"
+BULL_PUT_SPREAD = "牛市看跌价差"
+BEAR_CALL_SPREAD = "熊市看涨价差"
+IRON_CONDOR = "铁鹰式"
+SHORT_STRANGLE = "卖出宽跨式"
+
+STRATEGIES = {
+    CASH_SECURED_PUT: StrategySpec('puts', -1, 'strike'),
+    COVERED_CALL: StrategySpec('calls', 1, 'spot'),
+}
+
+SPREAD_STRATEGIES = {
+    BULL_PUT_SPREAD: SpreadSpec(BOTH_SIDES, ('puts',), True),
+    BEAR_CALL_SPREAD: SpreadSpec(BOTH_SIDES, ('calls',), True),
+    IRON_CONDOR: SpreadSpec(BOTH_SIDES, ('puts', 'calls'), True),
+    SHORT_STRANGLE: SpreadSpec(BOTH_SIDES, ('puts', 'calls'), False),
+}
+
+# 卖出腿价外区间按所在一侧的单腿策略计算
+SIDE_SPECS = {spec.option_type: spec for spec in STRATEGIES.values()}
+
+ScreenStats = namedtuple('ScreenStats', ['has_greeks', 'iv_result', 'missing_delta'])
+ScreenStats.__doc__ = """筛选过程信息：是否使用数据源的希腊字母、反推隐含波动率的结果、缺少Delta的合约数"""
+
+
+def merge_screen_stats(stats_list):
+    """合并逐个到期日筛选得到的 ScreenStats，与对拼接后的期权链筛选一次的结果一致"""
+    stats_list = [stats for stats in stats_list if stats is not None]
+    iv_results = [stats.iv_result for stats in stats_list if stats.iv_result is not None]
+    iv_result = None
+    if iv_results:
+        iv_result = IVResult(*(np.concatenate(parts) for parts in zip(*iv_results)))
+    return ScreenStats(
+        any(stats.has_greeks for stats in stats_list),
+        iv_result,
+        sum(stats.missing_delta for stats in stats_list),
+    )
+
+
+def get_strategy(strategy):
+    """按策略名称、StrategySpec 或 SpreadSpec 返回对应的策略定义"""
+    if isinstance(strategy, (StrategySpec, SpreadSpec)):
+        return strategy
+    if strategy in SPREAD_STRATEGIES:
+        return SPREAD_STRATEGIES[strategy]
+    return STRATEGIES[strategy]
+
+
+def is_spread(strategy):
+    """是否为多腿组合策略"""
+    return isinstance(get_strategy(strategy), SpreadSpec)
+
+
+def otm_strike_bounds(current_price, min_otm, max_otm, spec):
+    """价外百分比区间对应的行权价范围 (min_strike, max_strike)"""
+    if spec.strike_side < 0:
+        return current_price * (1 - max_otm), current_price * (1 - min_otm)
+    return current_price * (1 + min_otm), current_price * (1 + max_otm)
+
+
+def refilter_results(result_df, min_dte, max_dte, min_otm, max_otm, strategy, current_price=None):
+    """在按更宽条件筛选出的结果上，按更窄的到期天数和价外区间重新筛选，保持原有顺序
+
+    筛选内核中权利金、年化收益率和希腊字母都只取决于合约本身，因此结果与直接按窄条件
+    筛选一致。current_price 为 None 时使用结果中的 currentPrice 列（自选股合并结果）。
+    """
+    if result_df is None or result_df.empty:
+        return result_df
+    spec = get_strategy(strategy)
+    if current_price is None:
+        current_price = result_df['currentPrice'].to_numpy(dtype=float)
+    dte = result_df['dte'].to_numpy()
+    mask = (dte >= min_dte) & (dte <= max_dte)
+    if isinstance(spec, SpreadSpec):
+        # 多腿组合按每个卖出腿的行权价判断价外区间
+        legs = [(SIDE_SPECS[side], 'shortPut' if side == 'puts' else 'shortCall') for side in spec.sides]
+    else:
+        legs = [(spec, 'strike')]
+    for leg_spec, column in legs:
+        strike = result_df[column].to_numpy(dtype=float)
+        min_strike, max_strike = otm_strike_bounds(current_price, min_otm, max_otm, leg_spec)
+        mask &= (strike >= min_strike) & (strike <= max_strike)
+    return result_df[mask]
+
+
+def option_premium(bid, last_price):
+    """卖出期权可获得的权利金：使用bid价格，如果为0则使用lastPrice"""
+    return np.where(bid > 0, bid, last_price)
+
+
+def concat_chains(chains):
+    """拼接 [(exp, dte, options_df), ...]，返回 (拼接后的期权链, 每行的 dte 数组)
+
+    保留各期权链原有的索引，与逐个到期日筛选后再拼接的结果一致。
+    """
+    frames = [df for _, _, df in chains if df is not None and not df.empty]
+    if not frames:
+        return pd.DataFrame(), np.array([], dtype=np.int64)
+    dte = np.repeat(
+        np.array([d for _, d, df in chains if df is not None and not df.empty], dtype=np.int64),
+        [len(df) for df in frames]
+    )
+    return pd.concat(frames), dte
+
+
+def screen_chain(chain_df, dte, current_price, min_otm, max_otm, strategy,
+                 rate=0.0, dividend=0.0):
+    """对（可包含多个到期日的）期权链做一次向量化筛选
+
+    dte 为标量或与 chain_df 行对齐的数组。返回 (筛选结果, ScreenStats)，结果未排序，
+    列类型为 schema.compact_frame 的紧凑类型。
+    """
+    spec = get_strategy(strategy)
+    if chain_df is None or chain_df.empty:
+        return pd.DataFrame(), ScreenStats(False, None, 0)
+
+    dte = np.broadcast_to(np.asarray(dte, dtype=np.int64), (len(chain_df),))
+    strike = chain_df['strike'].to_numpy(dtype=float)
+    bid = chain_df['bid'].to_numpy(dtype=float)
+    last_price = chain_df['lastPrice'].to_numpy(dtype=float)
+
+    premium = option_premium(bid, last_price)
+    if spec.collateral == 'strike':
+        collateral = strike * 100
+    else:
+        collateral = np.full(len(strike), current_price * 100)
+
+    min_strike, max_strike = otm_strike_bounds(current_price, min_otm, max_otm, spec)
+    mask = (
+        (strike >= min_strike) & (strike <= max_strike)
+        & (premium > 0) & (collateral > 0)
+    )
+    if not mask.any():
+        return pd.DataFrame(), ScreenStats(False, None, 0)
+
+    # 只在筛选后的行上物化一次新的 DataFrame，之后的列都直接写入这张表；
+    # 浅拷贝不复制数据，只让 pandas 2.x 把它当作独立的表，写入时不再警告
+    result = chain_df[mask].copy(deep=False)
+    premium, collateral, dte = premium[mask], collateral[mask], dte[mask]
+    result['premium'] = premium
+    result['collateral'] = collateral
+    result['annualizedReturn'] = ((premium * 100) / collateral) * (365 / dte)
+    result['dte'] = dte
+
+    # 隐含波动率缺失或失效时由市场价格反推
+    iv_result = fill_missing_iv(result, current_price, spec.option_type, rate, dividend)
+
+    has_greeks = 'delta' in result.columns
+    if not has_greeks:
+        # 根据隐含波动率用 Black-Scholes 模型计算希腊字母
+        add_greeks(result, current_price, spec.option_type, rate, dividend)
+    result['real_delta'] = result['delta'].abs()
+    missing_delta = int(result['real_delta'].isna().sum())
+    return compact_frame(result), ScreenStats(has_greeks, iv_result, missing_delta)
@@ -0,0 +1,99 @@
+"""
+筛选结果的显示格式化
+"""
+
+
+def format_display_df(result_df):
+    """把筛选结果转换为用于表格显示的格式化副本"""
+    if 'returnOnRisk' in result_df.columns:
+        return format_spread_display_df(result_df)
+    base_columns = ['contractSymbol', 'dte', 'strike', 'premium', 'real_delta', 'volume', 'openInterest', 'annualizedReturn']
+    column_names = ['合约代码', '到期天数', '行权价', '权利金', 'Delta', '成交量', '持仓量']
+    
+    # 批量筛选结果带有股票代码列
+    if 'ticker' in result_df.columns:
+        base_columns.insert(0, 'ticker')
+        column_names.insert(0, '股票代码')
+    
+    # 如果有隐含波动率，也显示出来
+    if 'impliedVolatility' in result_df.columns:
+        base_columns.insert(-1, 'impliedVolatility')
+    # 有隐含波动率曲面时显示相对曲面的溢价
+    if 'ivRichness' in result_df.columns:
+        base_columns.insert(-1, 'ivRichness')
+    
+    has_probabilities = 'probProfit' in result_df.columns
+    if has_probabilities:
+        base_columns += ['probProfit', 'probAssign', 'expectedPnl', 'cvar', 'expectedReturn']
+    
+    # 选取列已经得到新表，格式化时逐列替换；浅拷贝不复制数据，只避免 pandas 2.x 的链式赋值警告
+    display_df = result_df[base_columns].copy(deep=False)
+    
+    # 格式化数据
+    display_df['strike'] = display_df['strike'].map('${:.2f}'.format)
+    display_df['premium'] = display_df['premium'].map('${:.2f}'.format)
+    display_df['real_delta'] = display_df['real_delta'].map('{:.3f}'.format)
+    display_df['annualizedReturn'] = display_df['annualizedReturn'].map('{:.2%}'.format)
+    
+    # 如果有隐含波动率，也格式化
+    if 'impliedVolatility' in display_df.columns:
+        display_df['impliedVolatility'] = display_df['impliedVolatility'].map('{:.2%}'.format)
+        column_names.append('隐含波动率')
+    if 'ivRichness' in display_df.columns:
+        display_df['ivRichness'] = display_df['ivRichness'].map('{:+.2%}'.format)
+        column_names.append('IV溢价')
+    column_names.append('年化收益率')
+    
+    # 计算了蒙特卡洛概率时追加在最后
+    if has_probabilities:
+        display_df['probProfit'] = display_df['probProfit'].map('{:.1%}'.format)
+        display_df['probAssign'] = display_df['probAssign'].map('{:.1%}'.format)
+        display_df['expectedPnl'] = display_df['expectedPnl'].map('${:,.2f}'.format)
+        display_df['cvar'] = display_df['cvar'].map('${:,.0f}'.format)
+        display_df['expectedReturn'] = display_df['expectedReturn'].map('{:.2%}'.format)
+        column_names += ['盈利概率', '行权概率', '期望盈亏', 'CVaR(5%)', '期望年化收益率']
+    
+    display_df.columns = column_names
+    return display_df
+
+
+def format_allocation_df(book_df, objective='premium'):
+    """组合配置结果的显示格式，在筛选结果的列前加上张数、占用资金和该合约的合计收益"""
+    display_df = format_display_df(book_df)
+    value_name = '权利金合计' if objective == 'premium' else '期望盈亏合计'
+    # 按位置插入，结果可能有重复的索引
+    display_df.insert(0, value_name, [f'${value:,.0f}' for value in book_df['allocatedValue']])
+    display_df.insert(0, '占用资金', [f'${value:,.0f}' for value in book_df['allocatedCollateral']])
+    display_df.insert(0, '张数', book_df['quantity'].to_numpy())
+    return display_df
+
+
+SPREAD_LEG_NAMES = {
+    'shortPut': '卖出看跌',
+    'longPut': '买入看跌',
+    'shortCall': '卖出看涨',
+    'longCall': '买入看涨',
+}
+
+
+def format_spread_display_df(result_df):
+    """把多腿组合筛选结果转换为用于表格显示的格式化副本，只显示该策略用到的腿"""
+    legs = [column for column in SPREAD_LEG_NAMES if result_df[column].notna().any()]
+    base_columns = ['contractSymbol', 'dte', *legs, 'premium', 'collateral', 'returnOnRisk',
+                    'real_delta', 'volume', 'openInterest', 'annualizedReturn']
+    column_names = ['合约代码', '到期天数', *(SPREAD_LEG_NAMES[leg] for leg in legs), '净权利金',
+                    '最大亏损', '收益风险比', 'Delta', '成交量', '持仓量', '年化收益率']
+    if 'ticker' in result_df.columns:
+        base_columns.insert(0, 'ticker')
+        column_names.insert(0, '股票代码')
+
+    display_df = result_df[base_columns].copy(deep=False)
+    for leg in legs:
+        display_df[leg] = display_df[leg].map('${:.2f}'.format)
+    display_df['premium'] = display_df['premium'].map('${:.2f}'.format)
+    display_df['collateral'] = display_df['collateral'].map('${:,.0f}'.format)
+    display_df['returnOnRisk'] = display_df['returnOnRisk'].map('{:.2%}'.format)
+    display_df['real_delta'] = display_df['real_delta'].map('{:.3f}'.format)
+    display_df['annualizedReturn'] = display_df['annualizedReturn'].map('{:.2%}'.format)
+    display_df.columns = column_names
+    return display_df
@@ -0,0 +1,119 @@
+"""
+向量化 Black-Scholes 希腊字母计算
+
+所有函数都接受标量或 NumPy 数组（可广播），一次计算整条期权链，没有逐行循环。
+约定：
+- dte 为到期天数，按 365 天/年换算
+- rate、dividend 为连续复利的无风险利率和股息率
+- theta 为每日变化，vega 和 rho 为波动率/利率每变化 1 个百分点的价格变化
+- 波动率或到期时间无效（<=0 或 NaN）的合约返回 NaN
+"""
+
+import numpy as np
+
+DAYS_PER_YEAR = 365.0
+_SQRT2 = np.sqrt(2.0)
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+def _erfc(x):
+    """互补误差函数（Chebyshev 近似，相对误差 < 1.2e-7）"""
+    z = np.abs(x)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = -z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+            -0.82215223 + t * 0.17087277))))))))
+    ans = t * np.exp(poly)
+    return np.where(x >= 0, ans, 2.0 - ans)
+
+
+def norm_cdf(x):
+    """标准正态分布累积分布函数"""
+    return 0.5 * _erfc(-np.asarray(x, dtype=float) / _SQRT2)
+
+
+def norm_pdf(x):
+    """标准正态分布概率密度函数"""
+    x = np.asarray(x, dtype=float)
+    return _INV_SQRT_2PI * np.exp(-0.5 * x * x)
+
+
+def _is_call(option_type):
+    """把 'calls'/'puts' 或布尔数组统一为布尔数组（True 表示看涨）"""
+    if isinstance(option_type, str):
+        return option_type == 'calls'
+    return np.asarray(option_type, dtype=bool)
+
+
+def _prepare(spot, strike, dte, iv):
+    spot = np.asarray(spot, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+    iv = np.asarray(iv, dtype=float)
+    t = np.asarray(dte, dtype=float) / DAYS_PER_YEAR
+    valid = (iv > 0) & (t > 0) & (strike > 0) & (spot > 0)
+    # 无效输入先替换成安全值参与计算，最后统一置为 NaN
+    safe_iv = np.where(valid, iv, 1.0)
+    safe_t = np.where(valid, t, 1.0)
+    safe_strike = np.where(valid, strike, 1.0)
+    safe_spot = np.where(valid, spot, 1.0)
+    return safe_spot, safe_strike, safe_t, safe_iv, valid
+
+
+def black_scholes_price(spot, strike, dte, iv, option_type='puts', rate=0.0, dividend=0.0):
+    """Black-Scholes 理论价格"""
+    s, k, t, sigma, valid = _prepare(spot, strike, dte, iv)
+    is_call = _is_call(option_type)
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(s / k) + (rate - dividend + 0.5 * sigma * sigma) * t) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    disc_s = s * np.exp(-dividend * t)
+    disc_k = k * np.exp(-rate * t)
+    call = disc_s * norm_cdf(d1) - disc_k * norm_cdf(d2)
+    put = disc_k * norm_cdf(-d2) - disc_s * norm_cdf(-d1)
+    return np.where(valid, np.where(is_call, call, put), np.nan)
+
+
+def black_scholes_greeks(spot, strike, dte, iv, option_type='puts', rate=0.0, dividend=0.0):
+    """一次计算 delta、gamma、theta、vega、rho，返回 {名称: 数组}"""
+    s, k, t, sigma, valid = _prepare(spot, strike, dte, iv)
+    is_call = _is_call(option_type)
+    sqrt_t = np.sqrt(t)
+    sigma_sqrt_t = sigma * sqrt_t
+    d1 = (np.log(s / k) + (rate - dividend + 0.5 * sigma * sigma) * t) / sigma_sqrt_t
+    d2 = d1 - sigma_sqrt_t
+
+    div_disc = np.exp(-dividend * t)
+    rate_disc = np.exp(-rate * t)
+    pdf_d1 = norm_pdf(d1)
+    cdf_d1 = norm_cdf(d1)
+    cdf_d2 = norm_cdf(d2)
+    # N(-x) = 1 - N(x)
+    cdf_neg_d1 = 1.0 - cdf_d1
+    cdf_neg_d2 = 1.0 - cdf_d2
+
+    delta = np.where(is_call, div_disc * cdf_d1, -div_disc * cdf_neg_d1)
+    gamma = div_disc * pdf_d1 / (s * sigma_sqrt_t)
+    vega = s * div_disc * pdf_d1 * sqrt_t / 100.0
+
+    decay = -s * div_disc * pdf_d1 * sigma / (2.0 * sqrt_t)
+    theta_call = decay - rate * k * rate_disc * cdf_d2 + dividend * s * div_disc * cdf_d1
+    theta_put = decay + rate * k * rate_disc * cdf_neg_d2 - dividend * s * div_disc * cdf_neg_d1
+    theta = np.where(is_call, theta_call, theta_put) / DAYS_PER_YEAR
+
+    rho = np.where(is_call, k * t * rate_disc * cdf_d2, -k * t * rate_disc * cdf_neg_d2) / 100.0
+
+    greeks = {'delta': delta, 'gamma': gamma, 'theta': theta, 'vega': vega, 'rho': rho}
+    return {name: np.where(valid, values, np.nan) for name, values in greeks.items()}
+
+
+def add_greeks(options_df, spot, option_type='puts', rate=0.0, dividend=0.0,
+               iv_column='impliedVolatility', dte_column='dte'):
+    """根据隐含波动率为期权链添加希腊字母列（原地修改并返回）"""
+    iv = options_df[iv_column] if iv_column in options_df.columns else np.nan
+    greeks = black_scholes_greeks(
+        spot, options_df['strike'].to_numpy(dtype=float), options_df[dte_column].to_numpy(dtype=float),
+        np.asarray(iv, dtype=float), option_type, rate, dividend
+    )
+    for name, values in greeks.items():
+        options_df[name] = np.broadcast_to(values, len(options_df))
+    return options_df
@@ -0,0 +1,139 @@
+"""
+批量隐含波动率求解
+
+对整条（或多条）期权链的价格同时反推隐含波动率：
+- 每个合约维护自己的 [下界, 上界] 区间，牛顿步落在区间外或 vega 过小时改用二分，保证收敛
+- 每次迭代只计算尚未收敛的合约，迭代之间没有逐个合约的 Python 循环
+- 返回每个合约的迭代次数和收敛标记，价格超出无套利区间的合约直接标记为未收敛
+"""
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from screener_core.greeks import DAYS_PER_YEAR, norm_cdf, norm_pdf, _is_call
+
+DEFAULT_TOLERANCE = 1e-6
+DEFAULT_MAX_ITERATIONS = 100
+IV_LOWER_BOUND = 1e-4
+IV_UPPER_BOUND = 5.0
+MIN_VALID_IV = 0.01  # 低于该值的隐含波动率视为缺失或失效
+
+IVResult = namedtuple('IVResult', ['iv', 'converged', 'iterations'])
+IVResult.__doc__ = """隐含波动率求解结果：iv（未收敛为 NaN）、converged、iterations"""
+
+
+def _price_and_vega(s, k, t, sigma, is_call, rate, dividend):
+    """Black-Scholes 价格及 vega（按波动率变化 1.0 计）"""
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(s / k) + (rate - dividend + 0.5 * sigma * sigma) * t) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    disc_s = s * np.exp(-dividend * t)
+    disc_k = k * np.exp(-rate * t)
+    call = disc_s * norm_cdf(d1) - disc_k * norm_cdf(d2)
+    price = np.where(is_call, call, call - disc_s + disc_k)  # 看跌价格由平价关系得到
+    vega = disc_s * norm_pdf(d1) * sqrt_t
+    return price, vega
+
+
+def implied_volatility(price, spot, strike, dte, option_type='puts', rate=0.0, dividend=0.0,
+                       tol=DEFAULT_TOLERANCE, max_iter=DEFAULT_MAX_ITERATIONS,
+                       lower=IV_LOWER_BOUND, upper=IV_UPPER_BOUND):
+    """由期权价格反推隐含波动率，返回 IVResult"""
+    price = np.asarray(price, dtype=float)
+    n = np.broadcast(price, np.asarray(spot), np.asarray(strike), np.asarray(dte)).size
+    price, s, k, t = (np.broadcast_to(np.asarray(x, dtype=float), (n,)).copy()
+                      for x in (price, spot, strike, dte))
+    t /= DAYS_PER_YEAR
+    is_call = np.broadcast_to(_is_call(option_type), (n,))
+
+    iv = np.full(n, np.nan)
+    converged = np.zeros(n, dtype=bool)
+    iterations = np.zeros(n, dtype=np.int32)
+
+    # 价格必须严格位于无套利区间内，否则不存在隐含波动率
+    valid = (price > 0) & (s > 0) & (k > 0) & (t > 0)
+    disc_s = s * np.exp(-dividend * t)
+    disc_k = k * np.exp(-rate * t)
+    intrinsic = np.where(is_call, np.maximum(disc_s - disc_k, 0.0), np.maximum(disc_k - disc_s, 0.0))
+    ceiling = np.where(is_call, disc_s, disc_k)
+    valid &= (price > intrinsic) & (price < ceiling)
+
+    idx = np.flatnonzero(valid)
+    if idx.size == 0:
+        return IVResult(iv, converged, iterations)
+
+    p, s, k, t, c = price[idx], s[idx], k[idx], t[idx], is_call[idx]
+    lo = np.full(idx.size, lower)
+    hi = np.full(idx.size, upper)
+    # 价格高于波动率上界对应的理论价时无解
+    hi_price, _ = _price_and_vega(s, k, t, hi, c, rate, dividend)
+    solvable = hi_price >= p
+    # Brenner-Subrahmanyam 近似作为初始值
+    sigma = np.clip(np.sqrt(2.0 * np.pi / t) * p / s, lower * 2, upper / 2)
+
+    active = np.flatnonzero(solvable)
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        sa, ka, ta, ca, pa = s[active], k[active], t[active], c[active], p[active]
+        sig = sigma[active]
+        model, vega = _price_and_vega(sa, ka, ta, sig, ca, rate, dividend)
+        diff = model - pa
+        iterations[idx[active]] += 1
+
+        done = (np.abs(diff) < tol) | (hi[active] - lo[active] < tol * 1e-2)
+        # 价格随波动率单调递增，据此收紧区间
+        too_high = diff > 0
+        hi[active] = np.where(too_high, sig, hi[active])
+        lo[active] = np.where(too_high, lo[active], sig)
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = sig - diff / vega
+        bisect = 0.5 * (lo[active] + hi[active])
+        use_newton = np.isfinite(newton) & (newton > lo[active]) & (newton < hi[active])
+        sigma[active] = np.where(done, sig, np.where(use_newton, newton, bisect))
+
+        converged[idx[active[done]]] = True
+        active = active[~done]
+
+    iv[idx[converged[idx]]] = sigma[converged[idx]]
+    return IVResult(iv, converged, iterations)
+
+
+def market_price(options_df):
+    """取买卖价中间价；缺少有效报价时使用 premium 列（或 lastPrice）"""
+    bid = options_df['bid'].to_numpy(dtype=float) if 'bid' in options_df.columns else None
+    ask = options_df['ask'].to_numpy(dtype=float) if 'ask' in options_df.columns else None
+    fallback_column = 'premium' if 'premium' in options_df.columns else 'lastPrice'
+    fallback = options_df[fallback_column].to_numpy(dtype=float)
+    if bid is None or ask is None:
+        return fallback
+    has_quote = (bid > 0) & (ask >= bid)
+    return np.where(has_quote, 0.5 * (bid + ask), fallback)
+
+
+def fill_missing_iv(options_df, spot, option_type='puts', rate=0.0, dividend=0.0,
+                    dte_column='dte', min_iv=MIN_VALID_IV):
+    """为隐含波动率缺失或失效的合约反推隐含波动率（原地修改）
+
+    新增 iv_solved 列标记被重新求解的合约。返回被求解合约的 IVResult，
+    没有需要求解的合约时返回 None。
+    """
+    if 'impliedVolatility' in options_df.columns:
+        current = pd.to_numeric(options_df['impliedVolatility'], errors='coerce').to_numpy(dtype=float, copy=True)
+    else:
+        current = np.full(len(options_df), np.nan)
+    stale = ~(current >= min_iv)
+    options_df['iv_solved'] = stale
+    if not stale.any():
+        return None
+
+    result = implied_volatility(
+        market_price(options_df)[stale], spot,
+        options_df['strike'].to_numpy(dtype=float)[stale],
+        options_df[dte_column].to_numpy(dtype=float)[stale],
+        option_type, rate, dividend
+    )
+    current[stale] = result.iv
+    options_df['impliedVolatility'] = current
+    return result
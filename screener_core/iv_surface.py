@@ -0,0 +1,279 @@
+"""
+隐含波动率曲面
+
+把一个股票全部已获取到期日的隐含波动率合并成 (对数价值度 ln(K/S) × 到期天数) 曲面：
+- 每个到期日在固定的价值度网格上做高斯核平滑（Nadaraya-Watson），带宽随 √T 放大；
+  报价先线性分箱到网格上再做核卷积，没有逐个合约或逐个到期日的 Python 循环
+- 平滑后再剔除偏离曲线过远的报价重新平滑一次，个别错误报价不会拉偏整条曲线
+- 平滑在总方差 w = σ²T 上进行；到期日之间按总方差线性插值，价值度方向线性插值，
+  超出网格或到期日范围时取边界值（波动率保持不变）
+- 同时获取两侧时只使用价外一侧（低于现价取看跌、高于现价取看涨），价外期权报价更可靠
+- 隐含波动率缺失或失效的价外合约先按市场价格反推，价内合约和仍然无解的不参与构建
+
+每个合约按自己到期日的曲线取值，结果只取决于同一到期日的期权链，因此按更宽条件获取后
+在内存中重新筛选，与直接按窄条件筛选得到的曲面值一致。曲面由 data.get_iv_surface 与期权链
+一起缓存，任一来源期权链更新或被淘汰时失效。
+"""
+
+import numpy as np
+import pandas as pd
+from screener_core.greeks import DAYS_PER_YEAR, black_scholes_greeks
+from screener_core.iv_solver import MIN_VALID_IV, implied_volatility, market_price
+from screener_core.providers import OptionChain
+from screener_core.schema import compact_frame
+
+MONEYNESS_GRID = np.round(np.linspace(-0.7, 0.7, 71), 6)
+DEFAULT_BANDWIDTH = 0.15  # 一年期的核带宽（对数价值度），按 √T 缩放
+MIN_BANDWIDTH = 0.02  # 不小于网格间距
+MAX_BANDWIDTH = 0.2
+MIN_WEIGHT = 0.5  # 网格点附近的核权重之和低于该值时由相邻网格点插值
+MIN_POINTS = 3  # 有效报价少于该数的到期日不参与构建
+MAX_VALID_IV = 3.0
+OUTLIER_RATIO = 0.5  # 与平滑曲线的相对偏差超过该比例的报价视为异常
+SKEW_MONEYNESS = 0.10  # 偏斜按 90% 与 110% 行权价的波动率差计算
+
+
+class IVSurface:
+    """按到期天数排序的隐含波动率曲面，创建后不再修改，可在会话和线程间共享"""
+
+    def __init__(self, spot, dtes, grid, total_variance, points):
+        self.spot = float(spot)
+        self.dtes = np.asarray(dtes, dtype=float)
+        self.grid = np.asarray(grid, dtype=float)
+        self.total_variance = total_variance
+        self.points = int(points)
+
+    @property
+    def nbytes(self):
+        return self.dtes.nbytes + self.grid.nbytes + self.total_variance.nbytes
+
+    def iv(self, strike, dte):
+        """曲面在 (行权价, 到期天数) 处的隐含波动率，参数可为标量或数组"""
+        strike = np.asarray(strike, dtype=float)
+        dte = np.asarray(dte, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k = np.log(strike / self.spot)
+        k, dte = np.broadcast_arrays(k, dte)
+
+        # 价值度方向：网格上线性插值，超出范围取边界值
+        grid = self.grid
+        col = np.clip(np.searchsorted(grid, k, side='right'), 1, len(grid) - 1)
+        frac = np.clip((k - grid[col - 1]) / (grid[col] - grid[col - 1]), 0.0, 1.0)
+
+        # 到期日方向：side='right' 使恰好落在某个到期日上的查询只取该行，不受相邻到期日影响
+        row = np.searchsorted(self.dtes, dte, side='right')
+        lower = np.clip(row - 1, 0, len(self.dtes) - 1)
+        upper = np.clip(row, 0, len(self.dtes) - 1)
+        w_lower = self._row_values(lower, col, frac)
+        w_upper = self._row_values(upper, col, frac)
+        t = dte / DAYS_PER_YEAR
+        t_lower = self.dtes[lower] / DAYS_PER_YEAR
+        t_upper = self.dtes[upper] / DAYS_PER_YEAR
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(upper > lower, (t - t_lower) / (t_upper - t_lower), 0.0)
+            between = np.sqrt((w_lower + (w_upper - w_lower) * weight) / t)
+            # 早于第一个或晚于最后一个到期日时保持该到期日的波动率
+            outside = np.sqrt(np.where(dte < self.dtes[0], w_lower / t_lower, w_upper / t_upper))
+        iv = np.where((dte < self.dtes[0]) | (dte > self.dtes[-1]), outside, between)
+        valid = np.isfinite(k) & (dte > 0)
+        return np.where(valid, iv, np.nan)
+
+    def _row_values(self, row, col, frac):
+        left = self.total_variance[row, col - 1]
+        right = self.total_variance[row, col]
+        return left + (right - left) * frac
+
+    def atm_iv(self, dte):
+        """平值隐含波动率"""
+        return self.iv(self.spot, dte)
+
+    def skew(self, dte, moneyness=SKEW_MONEYNESS):
+        """偏斜：低于现价 moneyness 的行权价与高于现价 moneyness 的行权价的波动率差"""
+        return (self.iv(self.spot * (1 - moneyness), dte)
+                - self.iv(self.spot * (1 + moneyness), dte))
+
+    def term_slope(self, short_dte=30, long_dte=90):
+        """期限结构斜率：长期与短期平值波动率之差，负值表示近月波动率更高（倒挂）"""
+        return float(self.atm_iv(long_dte) - self.atm_iv(short_dte))
+
+    def metrics(self):
+        """每个到期日的平值波动率和偏斜"""
+        return pd.DataFrame({
+            'dte': self.dtes.astype(int),
+            'atmIV': self.atm_iv(self.dtes),
+            'skew': self.skew(self.dtes),
+        })
+
+    def grid_frame(self):
+        """曲面网格上的隐含波动率，行为到期天数、列为行权价相对现价的比例"""
+        t = self.dtes[:, None] / DAYS_PER_YEAR
+        return pd.DataFrame(np.sqrt(self.total_variance / t), index=self.dtes.astype(int),
+                            columns=np.round(np.exp(self.grid), 4))
+
+
+def _side_frames(chain, spot, option_type):
+    """构建曲面使用的 (期权链, 是否看涨, 行权价下限, 行权价上限)"""
+    if isinstance(chain, OptionChain):
+        return [(chain.puts, False, -np.inf, spot), (chain.calls, True, spot, np.inf)]
+    return [(chain, option_type == 'calls', -np.inf, np.inf)]
+
+
+def _collect_points(chains, spot, option_type):
+    """按到期日顺序拼接所有报价的 (行权价, 到期天数, 隐含波动率, 市场价, 是否看涨)"""
+    parts = []
+    for _, dte, chain in sorted(chains, key=lambda item: item[1]):
+        if chain is None or dte <= 0:
+            continue
+        for df, is_call, low, high in _side_frames(chain, spot, option_type):
+            if df is None or df.empty:
+                continue
+            strike = df['strike'].to_numpy(dtype=float)
+            keep = (strike >= low) & (strike < high)
+            if 'impliedVolatility' in df.columns:
+                iv = pd.to_numeric(df['impliedVolatility'], errors='coerce').to_numpy(dtype=float)
+            else:
+                iv = np.full(len(df), np.nan)
+            parts.append((strike[keep], np.full(keep.sum(), float(dte)), iv[keep],
+                          market_price(df)[keep], np.full(keep.sum(), is_call)))
+    if not parts:
+        return None
+    return [np.concatenate(column) for column in zip(*parts)]
+
+
+def _segment_starts(dte):
+    """按到期天数排好序的数组中每个到期日的起始位置"""
+    return np.flatnonzero(np.r_[True, dte[1:] != dte[:-1]])
+
+
+def _kernel_smooth(k, dte, total_variance, grid, bandwidth):
+    """按到期日分段的核平滑，返回 (到期天数, 网格总方差, 网格权重和)
+
+    先把报价线性分箱到相邻的两个网格点（bincount），再对每个到期日的分箱结果做核卷积，
+    耗时和内存只取决于 到期日数 × 网格点数²，与报价数无关。grid 必须等间距。
+    """
+    starts = _segment_starts(dte)
+    n_exp, n_grid = len(starts), len(grid)
+    row = np.repeat(np.arange(n_exp), np.diff(np.r_[starts, len(dte)]))
+    pos = (k - grid[0]) / (grid[1] - grid[0])
+    left = np.clip(np.floor(pos).astype(np.int64), 0, n_grid - 2)
+    frac = np.clip(pos - left, 0.0, 1.0)
+    cells = np.r_[row * n_grid + left, row * n_grid + left + 1]
+    shares = np.r_[1.0 - frac, frac]
+    size = n_exp * n_grid
+    counts = np.bincount(cells, shares, minlength=size).reshape(n_exp, n_grid)
+    sums = np.bincount(cells, shares * np.r_[total_variance, total_variance], minlength=size).reshape(n_exp, n_grid)
+
+    dtes = dte[starts]
+    h = np.clip(bandwidth * np.sqrt(dtes / DAYS_PER_YEAR), MIN_BANDWIDTH, MAX_BANDWIDTH)
+    u = (grid[None, :, None] - grid[None, None, :]) / h[:, None, None]
+    kernel = np.exp(-0.5 * u * u)  # (到期日, 分箱网格点, 输出网格点)
+    mass = np.einsum('eg,egj->ej', counts, kernel)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        smoothed = np.einsum('eg,egj->ej', sums, kernel) / mass
+    return dtes, smoothed, mass
+
+
+def _fill_sparse(values, valid):
+    """权重不足的网格点按同一到期日左右最近的有效网格点线性插值，两端取边界值"""
+    n = values.shape[1]
+    idx = np.arange(n)
+    left = np.maximum.accumulate(np.where(valid, idx, -1), axis=1)
+    right = np.minimum.accumulate(np.where(valid, idx, n)[:, ::-1], axis=1)[:, ::-1]
+    has_left, has_right = left >= 0, right < n
+    left_c, right_c = np.clip(left, 0, n - 1), np.clip(right, 0, n - 1)
+    rows = np.arange(values.shape[0])[:, None]
+    v_left, v_right = values[rows, left_c], values[rows, right_c]
+    span = np.where(right_c > left_c, right_c - left_c, 1)
+    interp = v_left + (v_right - v_left) * (idx - left_c) / span
+    filled = np.where(has_left & has_right, interp, np.where(has_left, v_left, v_right))
+    return np.where(valid, values, filled)
+
+
+def build_iv_surface(chains, spot, option_type='puts', rate=0.0, dividend=0.0,
+                     grid=MONEYNESS_GRID, bandwidth=DEFAULT_BANDWIDTH):
+    """由 [(exp, dte, 期权链), ...] 构建 IVSurface，没有足够的有效报价时返回 None
+
+    期权链为 DataFrame（option_type 一侧）或含两侧的 OptionChain。
+    """
+    points = _collect_points(chains, spot, option_type)
+    if points is None:
+        return None
+    strike, dte, iv, price, is_call = points
+
+    # 隐含波动率缺失或失效的价外报价按市场价格反推；价内期权价格几乎全是内在价值，
+    # 买卖价差就足以让反推的波动率偏差很大，这类报价直接舍弃
+    stale = ~((iv >= MIN_VALID_IV) & (iv <= MAX_VALID_IV))
+    solve = stale & np.where(is_call, strike >= spot, strike <= spot)
+    if solve.any():
+        iv = iv.copy()
+        iv[solve] = implied_volatility(price[solve], spot, strike[solve], dte[solve], is_call[solve],
+                                       rate, dividend).iv
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.log(strike / spot)
+    keep = (iv >= MIN_VALID_IV) & (iv <= MAX_VALID_IV) & (k >= grid[0]) & (k <= grid[-1])
+    k, dte, iv = k[keep], dte[keep], iv[keep]
+    if len(k) == 0:
+        return None
+    total_variance = iv * iv * dte / DAYS_PER_YEAR
+
+    # 第一次平滑后剔除偏离过远的报价，再平滑一次
+    dtes, smoothed, mass = _kernel_smooth(k, dte, total_variance, grid, bandwidth)
+    smoothed = _fill_sparse(smoothed, mass >= MIN_WEIGHT)
+    row = np.searchsorted(dtes, dte)
+    col = np.clip(np.searchsorted(grid, k, side='right'), 1, len(grid) - 1)
+    frac = (k - grid[col - 1]) / (grid[col] - grid[col - 1])
+    fitted = smoothed[row, col - 1] + (smoothed[row, col] - smoothed[row, col - 1]) * frac
+    fitted_iv = np.sqrt(fitted / (dte / DAYS_PER_YEAR))
+    inliers = np.abs(iv - fitted_iv) <= OUTLIER_RATIO * fitted_iv
+    k, dte, total_variance = k[inliers], dte[inliers], total_variance[inliers]
+
+    # 有效报价太少的到期日不参与构建
+    starts = _segment_starts(dte) if len(dte) else np.array([], dtype=int)
+    counts = np.diff(np.r_[starts, len(dte)])
+    enough = np.repeat(counts >= MIN_POINTS, counts)
+    k, dte, total_variance = k[enough], dte[enough], total_variance[enough]
+    if len(k) == 0:
+        return None
+    dtes, smoothed, mass = _kernel_smooth(k, dte, total_variance, grid, bandwidth)
+    return IVSurface(spot, dtes, grid, _fill_sparse(smoothed, mass >= MIN_WEIGHT), len(k))
+
+
+def apply_iv_surface(result_df, surface, current_price, option_type='puts', rate=0.0, dividend=0.0):
+    """为单腿筛选结果添加曲面列，返回 (新的 DataFrame, 用曲面补全隐含波动率的合约数)
+
+    - surfaceIV: 曲面在该合约行权价和到期天数处的隐含波动率
+    - ivRichness: 合约隐含波动率减去 surfaceIV，正值表示相对曲面偏贵（对卖方有利）
+    隐含波动率仍然缺失的合约改用 surfaceIV 并重新计算希腊字母，它们的 ivRichness 为 NaN。
+    多腿组合结果（没有 impliedVolatility 列）和 surface 为 None 时原样返回。
+    """
+    if (surface is None or result_df is None or result_df.empty
+            or 'impliedVolatility' not in result_df.columns):
+        return result_df, 0
+    strike = result_df['strike'].to_numpy(dtype=float)
+    dte = result_df['dte'].to_numpy(dtype=float)
+    surface_iv = surface.iv(strike, dte)
+    iv = result_df['impliedVolatility'].to_numpy(dtype=float)
+    missing = ~(iv >= MIN_VALID_IV) & np.isfinite(surface_iv)
+
+    result = result_df.copy(deep=False)
+    result['surfaceIV'] = surface_iv
+    result['ivRichness'] = np.where(missing, np.nan, iv - surface_iv)
+    filled = int(missing.sum())
+    if filled:
+        result['impliedVolatility'] = np.where(missing, surface_iv, iv)
+        greeks = black_scholes_greeks(current_price, strike[missing], dte[missing], surface_iv[missing],
+                                      option_type, rate, dividend)
+        for name, values in greeks.items():
+            if name in result.columns:
+                column = result[name].to_numpy(dtype=float, copy=True)
+                column[missing] = np.where(np.isnan(column[missing]), values, column[missing])
+                result[name] = column
+        result['real_delta'] = result['delta'].abs()
+    return compact_frame(result), filled
+
+
+def filter_richness(result_df, min_richness=None):
+    """只保留隐含波动率比曲面至少高 min_richness（波动率点）的合约；没有 ivRichness 列时原样返回"""
+    if min_richness is None or result_df is None or result_df.empty or 'ivRichness' not in result_df.columns:
+        return result_df
+    return result_df[result_df['ivRichness'].to_numpy(dtype=float) >= min_richness]
@@ -0,0 +1,355 @@
+"""
+筛选流程：获取价格和期权链，调用筛选内核，返回结果和状态信息
+"""
+
+import contextvars
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from screener_core.config import (
+    DEFAULT_FETCH_WORKERS,
+    DEFAULT_FETCH_TIMEOUT,
+    DEFAULT_RISK_FREE_RATE,
+    DEFAULT_DIVIDEND_YIELD,
+    DEFAULT_WATCHLIST_WORKERS,
+)
+from screener_core.data import (
+    get_stock_price,
+    get_stock_prices,
+    get_stock_data,
+    find_potential_expirations,
+    fetch_option_chains,
+    iter_option_chains,
+    get_iv_surface,
+    get_real_greeks,
+)
+from screener_core.filtering import (
+    BOTH_SIDES, STRATEGIES, CASH_SECURED_PUT, COVERED_CALL, concat_chains, get_strategy, is_spread,
+    merge_screen_stats, screen_chain
+)
+from screener_core.iv_surface import apply_iv_surface
+from screener_core.prewarm import record_request
+from screener_core.ranking import rank_opportunities
+from screener_core.snapshots import snapshot_writer
+from screener_core.spreads import screen_spread_chains, screen_spreads
+from screener_core.status import StatusLog
+from screener_core.tracing import span
+from screener_core.wire import ScreenResult
+
+logger = logging.getLogger(__name__)
+
+ScreenUpdate = namedtuple('ScreenUpdate', ['ticker', 'index', 'expiration', 'dte', 'result', 'error',
+                                           'completed', 'total', 'current_price', 'surface'],
+                          defaults=(None,))
+ScreenUpdate.__doc__ = """逐个到期日筛选时单个到期日的结果
+
+index 为该到期日在到期日列表中的位置，result 为该到期日未排序的筛选结果（没有机会或获取失败时
+为空 DataFrame），error 为获取失败的原因，completed / total 为已完成和总的到期日数。
+surface 只在最后一个结果中给出，为由全部已获取到期日构建的隐含波动率曲面。
+"""
+
+
+def report_screen_stats(stats, rate, status):
+    """根据筛选内核返回的信息记录数据来源"""
+    if stats.iv_result is not None:
+        unconverged = int((~stats.iv_result.converged).sum())
+        status.info(f"🔧 为 {len(stats.iv_result.iv)} 个合约反推隐含波动率（最多迭代 {stats.iv_result.iterations.max()} 次，{unconverged} 个未收敛）")
+    if stats.has_greeks:
+        status.success("✅ 使用真实Delta数据")
+    else:
+        message = f"ℹ️ 使用 Black-Scholes 模型计算的Delta（无风险利率 {rate:.2%}）"
+        if stats.missing_delta:
+            message += f"，{stats.missing_delta} 个合约缺少有效的隐含波动率"
+        status.info(message)
+
+
+def _ticker_surface(stock, fetched, current_price, option_type, rate, dividend, status):
+    """构建（或从缓存读取）隐含波动率曲面，失败时记录警告并返回 None"""
+    if not fetched:
+        return None
+    try:
+        return get_iv_surface(stock, fetched, current_price, option_type, rate, dividend)
+    except Exception as e:
+        status.warning(f"构建隐含波动率曲面时出错: {e}")
+        return None
+
+
+def apply_surface(result_df, surface, current_price, strategy_type, rate=DEFAULT_RISK_FREE_RATE,
+                  dividend=DEFAULT_DIVIDEND_YIELD, status=None):
+    """为排序后的单腿筛选结果添加曲面列，并用曲面补全仍然缺失的隐含波动率
+
+    不改变行的顺序；stream_ticker 的调用方在全部到期日到达后用最后一个 ScreenUpdate 的
+    surface 调用，得到与 screen_ticker 一致的结果。
+    """
+    if surface is None or is_spread(strategy_type):
+        return result_df
+    with span('surface.apply'):
+        result_df, filled = apply_iv_surface(result_df, surface, current_price,
+                                             get_strategy(strategy_type).option_type, rate, dividend)
+    if filled and status is not None:
+        status.info(f"🧭 用隐含波动率曲面补全 {filled} 个合约的隐含波动率")
+    return result_df
+
+
+def _analyze_and_filter(stock, exp, dte, current_price, min_otm, max_otm, options_df,
+                        rate, dividend, strategy_type, status):
+    """分析和筛选单个到期日的期权"""
+    option_type = STRATEGIES[strategy_type].option_type
+    # 获取期权数据和希腊字母
+    options_df, _ = get_real_greeks(stock, exp, option_type, options_df, status)
+    if options_df is None:
+        return pd.DataFrame()
+
+    filtered, stats = screen_chain(
+        options_df, dte, current_price, min_otm, max_otm, strategy_type, rate, dividend
+    )
+    if not filtered.empty:
+        report_screen_stats(stats, rate, status)
+    return filtered
+
+
+def analyze_and_filter_puts(stock, exp, dte, current_price, min_otm, max_otm, options_df=None,
+                            rate=DEFAULT_RISK_FREE_RATE, dividend=DEFAULT_DIVIDEND_YIELD, status=None):
+    """分析和筛选看跌期权"""
+    status = status or StatusLog()
+    try:
+        return _analyze_and_filter(stock, exp, dte, current_price, min_otm, max_otm, options_df,
+                                   rate, dividend, CASH_SECURED_PUT, status)
+    except Exception as e:
+        status.error(f"分析看跌期权数据时出错: {e}")
+        return pd.DataFrame()
+
+
+def analyze_and_filter_calls(stock, exp, dte, current_price, min_otm, max_otm, options_df=None,
+                             rate=DEFAULT_RISK_FREE_RATE, dividend=DEFAULT_DIVIDEND_YIELD, status=None):
+    """分析和筛选看涨期权"""
+    status = status or StatusLog()
+    try:
+        return _analyze_and_filter(stock, exp, dte, current_price, min_otm, max_otm, options_df,
+                                   rate, dividend, COVERED_CALL, status)
+    except Exception as e:
+        status.error(f"分析看涨期权数据时出错: {e}")
+        return pd.DataFrame()
+
+
+def _write_snapshot(writer, ticker, current_price, option_type, fetched):
+    """保存历史快照；多腿组合获取的两侧期权链分别保存"""
+    if option_type != BOTH_SIDES:
+        writer.write(ticker, current_price, option_type, fetched)
+        return
+    for side in ('puts', 'calls'):
+        writer.write(ticker, current_price, side, [(exp, dte, getattr(chain, side)) for exp, dte, chain in fetched])
+
+
+def screen_ticker(ticker, min_dte, max_dte, min_otm, max_otm, strategy_type,
+                  max_workers=DEFAULT_FETCH_WORKERS, fetch_timeout=DEFAULT_FETCH_TIMEOUT,
+                  current_price=None, rate=DEFAULT_RISK_FREE_RATE, dividend=DEFAULT_DIVIDEND_YIELD,
+                  progress_callback=None, price_lookup=None, provider=None, spread_limits=None):
+    """筛选单个股票，返回 ScreenResult
+
+    provider 为数据源（默认为进程内默认数据源），price_lookup 可替换价格查询函数。
+    多腿组合策略按 spread_limits（spreads.SpreadLimits）剪枝。
+    """
+    status = StatusLog()
+
+    surface = None
+
+    def _result(result, current_price, error=None):
+        return ScreenResult(ticker, result, current_price, error, status.messages, surface)
+
+    # 获取股票数据
+    record_request(ticker)
+    stock, current_price = get_stock_data(ticker, current_price, status, price_lookup, provider)
+    if stock is None or current_price is None:
+        errors = status.errors()
+        return _result(None, None, errors[0] if errors else "获取股票数据失败")
+
+    # 查找到期日
+    expirations = find_potential_expirations(stock, min_dte, max_dte, status)
+    if not expirations:
+        status.warning(f"在 {min_dte}-{max_dte} 天到期窗口内未找到期权")
+        return _result(pd.DataFrame(), current_price)
+
+    option_type = get_strategy(strategy_type).option_type
+
+    # 并发获取所有到期日的期权链
+    chains = fetch_option_chains(
+        stock, expirations, option_type,
+        max_workers=max_workers,
+        timeout=fetch_timeout,
+        progress_callback=progress_callback
+    )
+    for exp, _, _, error in chains:
+        if error is not None:
+            status.warning(f"获取到期日 {exp} 的期权链时出错: {error}")
+    fetched = [(exp, dte, df) for exp, dte, df, error in chains if error is None]
+
+    # 保存历史快照（需设置 OPTION_SCREENER_SNAPSHOT_DIR）
+    writer = snapshot_writer()
+    if writer is not None:
+        try:
+            with span('snapshot', symbol=ticker):
+                _write_snapshot(writer, ticker, current_price, option_type, fetched)
+        except Exception as e:
+            status.warning(f"保存期权链快照时出错: {e}")
+
+    # 由全部到期日构建隐含波动率曲面（与期权链一起缓存）
+    surface = _ticker_surface(stock, fetched, current_price, option_type, rate, dividend, status)
+
+    # 按到期日顺序拼接后一次完成筛选，结果与逐个到期日筛选一致
+    try:
+        with span('filter', symbol=ticker):
+            if is_spread(strategy_type):
+                # 多腿组合只在同一到期日内配对
+                result_df, stats = screen_spread_chains(
+                    fetched, current_price, min_otm, max_otm, strategy_type, rate, dividend, spread_limits
+                )
+            else:
+                chain_df, dtes = concat_chains(fetched)
+                result_df, stats = screen_chain(
+                    chain_df, dtes, current_price, min_otm, max_otm, strategy_type, rate, dividend
+                )
+    except Exception as e:
+        status.error(f"分析期权数据时出错: {e}")
+        return _result(pd.DataFrame(), current_price)
+
+    if result_df.empty:
+        return _result(pd.DataFrame(), current_price)
+    report_screen_stats(stats, rate, status)
+    with span('rank', symbol=ticker):
+        ranked = rank_opportunities(result_df)
+    ranked = apply_surface(ranked, surface, current_price, strategy_type, rate, dividend, status)
+    return _result(ranked, current_price)
+
+
+def stream_ticker(ticker, min_dte, max_dte, min_otm, max_otm, strategy_type,
+                  max_workers=DEFAULT_FETCH_WORKERS, fetch_timeout=DEFAULT_FETCH_TIMEOUT,
+                  current_price=None, rate=DEFAULT_RISK_FREE_RATE, dividend=DEFAULT_DIVIDEND_YIELD,
+                  price_lookup=None, provider=None, status=None, spread_limits=None):
+    """逐个到期日筛选单个股票，每获取完一个到期日就产出一个 ScreenUpdate
+
+    第一个结果在最快的期权链返回后即可得到。用 ranking.RankingStream 按 index 合并
+    全部结果，再用最后一个 ScreenUpdate 的 surface 调用 apply_surface 后，与 screen_ticker
+    的结果完全一致。获取价格或到期日失败时不产出任何结果，原因记录在 status（StatusLog）中。
+    """
+    status = status if status is not None else StatusLog()
+    record_request(ticker)
+    stock, current_price = get_stock_data(ticker, current_price, status, price_lookup, provider)
+    if stock is None or current_price is None:
+        return
+
+    expirations = find_potential_expirations(stock, min_dte, max_dte, status)
+    if not expirations:
+        status.warning(f"在 {min_dte}-{max_dte} 天到期窗口内未找到期权")
+        return
+
+    option_type = get_strategy(strategy_type).option_type
+    spread = is_spread(strategy_type)
+    fetched = [None] * len(expirations)
+    stats = []
+    completed = 0
+    for index, exp, dte, options_df, error in iter_option_chains(
+        stock, expirations, option_type, max_workers=max_workers, timeout=fetch_timeout
+    ):
+        completed += 1
+        result = pd.DataFrame()
+        if error is not None:
+            status.warning(f"获取到期日 {exp} 的期权链时出错: {error}")
+        else:
+            fetched[index] = (exp, dte, options_df)
+            try:
+                with span('filter', expiration=exp):
+                    if spread:
+                        result, chain_stats = screen_spreads(
+                            options_df, dte, current_price, min_otm, max_otm, strategy_type, rate, dividend,
+                            spread_limits
+                        )
+                    else:
+                        result, chain_stats = screen_chain(
+                            options_df, dte, current_price, min_otm, max_otm, strategy_type, rate, dividend
+                        )
+                if not result.empty:
+                    stats.append(chain_stats)
+            except Exception as e:
+                status.error(f"分析到期日 {exp} 的期权数据时出错: {e}")
+        surface = None
+        if completed == len(expirations):
+            surface = _ticker_surface(stock, [item for item in fetched if item is not None], current_price,
+                                      option_type, rate, dividend, status)
+        yield ScreenUpdate(ticker, index, exp, dte, result, error, completed, len(expirations), current_price,
+                           surface)
+
+    writer = snapshot_writer()
+    if writer is not None:
+        try:
+            with span('snapshot', symbol=ticker):
+                _write_snapshot(writer, ticker, current_price, option_type,
+                                [item for item in fetched if item is not None])
+        except Exception as e:
+            status.warning(f"保存期权链快照时出错: {e}")
+    if stats:
+        report_screen_stats(merge_screen_stats(stats), rate, status)
+
+
+def parse_watchlist(text):
+    """解析自选股列表，支持逗号、空格或换行分隔，去重并保持顺序"""
+    tickers = []
+    for token in text.replace(',', ' ').replace('，', ' ').split():
+        symbol = token.strip().upper()
+        if symbol and symbol not in tickers:
+            tickers.append(symbol)
+    return tickers
+
+
+def _screen_watchlist_ticker(ticker, min_dte, max_dte, min_otm, max_otm, strategy_type,
+                             fetch_workers, fetch_timeout, rate, dividend, price_lookup, provider,
+                             spread_limits):
+    """筛选自选股中的单个股票，每个股票只查询一次价格"""
+    if price_lookup is not None:
+        current_price = price_lookup(ticker)
+    else:
+        current_price = get_stock_price(ticker, provider)
+    if current_price is None:
+        return ScreenResult(ticker, None, None, f"无法获取 {ticker} 的有效价格", [])
+    return screen_ticker(
+        ticker, min_dte, max_dte, min_otm, max_otm, strategy_type,
+        max_workers=fetch_workers, fetch_timeout=fetch_timeout,
+        current_price=current_price, rate=rate, dividend=dividend, provider=provider,
+        spread_limits=spread_limits
+    )
+
+
+def screen_watchlist(tickers, min_dte, max_dte, min_otm, max_otm, strategy_type,
+                     max_workers=DEFAULT_WATCHLIST_WORKERS, fetch_workers=DEFAULT_FETCH_WORKERS,
+                     fetch_timeout=DEFAULT_FETCH_TIMEOUT, rate=DEFAULT_RISK_FREE_RATE,
+                     dividend=DEFAULT_DIVIDEND_YIELD, price_lookup=None, provider=None, spread_limits=None):
+    """批量筛选自选股列表
+
+    按完成先后逐个产出 ScreenResult，单个股票出错不会中断整个批次。
+    未提供 price_lookup 时先用一次批量请求获取全部股票的价格。
+    """
+    if price_lookup is None and tickers:
+        prices = get_stock_prices(tickers, provider)
+
+        def price_lookup(ticker):
+            return prices.get(ticker.upper())
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers) or 1)))
+    try:
+        futures = {
+            executor.submit(
+                contextvars.copy_context().run, _screen_watchlist_ticker, ticker, min_dte, max_dte, min_otm, max_otm,
+                strategy_type, fetch_workers, fetch_timeout, rate, dividend, price_lookup, provider,
+                spread_limits
+            ): ticker
+            for ticker in tickers
+        }
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                logger.exception("筛选 %s 时出错", ticker)
+                yield ScreenResult(ticker, None, None, str(e), [])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
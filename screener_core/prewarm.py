@@ -0,0 +1,252 @@
+"""
+后台缓存预热
+
+在请求路径之外按固定节奏刷新自选股的价格、到期日列表和期权链，写入进程内共享的报价缓存和
+期权链缓存，使交互式筛选几乎总能命中缓存：
+- 默认每 interval 秒一轮，开盘前后（open_window）每 open_interval 秒一轮
+- 每轮只刷新缺失或会在下一轮之前过期的数据，休市期间缓存保留到开盘，不会发起请求
+- 按交互式筛选的请求次数从多到少处理股票
+- 所有上游请求（包括交互式筛选发起的）共用每分钟 budget_per_minute 个请求的预算，
+  预算用完时结束本轮，剩余股票留到下一轮
+
+图形界面启动时按环境变量启用：
+    OPTION_SCREENER_PREWARM          逗号或空格分隔的股票列表
+    OPTION_SCREENER_PREWARM_BUDGET   每分钟上游请求预算，默认 120
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from screener_core.chain_cache import MARKET_OPEN, MARKET_TZ, shared_cache
+from screener_core.config import DTE_SLIDER_RANGE
+from screener_core.data import fetch_option_chain, find_potential_expirations, get_expirations
+from screener_core.providers import get_provider
+from screener_core.quotes import shared_quotes
+from screener_core.singleflight import shared_flight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 300
+DEFAULT_OPEN_INTERVAL = 60
+DEFAULT_OPEN_WINDOW = (-30 * 60, 60 * 60)   # 开盘前 30 分钟到开盘后 1 小时
+DEFAULT_BUDGET_PER_MINUTE = 120
+
+_request_counts = Counter()
+_request_lock = threading.Lock()
+
+
+def record_request(symbol):
+    """记录一次交互式筛选请求，预热时请求次数多的股票优先刷新"""
+    with _request_lock:
+        _request_counts[symbol.upper()] += 1
+
+
+def request_counts():
+    with _request_lock:
+        return Counter(_request_counts)
+
+
+class RequestBudget:
+    """令牌桶：平均每分钟 per_minute 个上游请求，最多积攒 burst 个"""
+
+    def __init__(self, per_minute=DEFAULT_BUDGET_PER_MINUTE, burst=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.burst = per_minute if burst is None else burst
+        self.clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """有剩余预算时占用一个请求并返回 True，否则返回 False（不等待）"""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def charge(self, n):
+        """记入预热之外发起的 n 个上游请求，余额可以为负"""
+        with self._lock:
+            self._refill()
+            self._tokens -= n
+
+    @property
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+def seconds_from_open(timestamp):
+    """时间戳相对于当天开盘时刻的秒数；周末或缺少时区数据时返回 None"""
+    if MARKET_TZ is None:
+        return None
+    now = datetime.fromtimestamp(timestamp, MARKET_TZ)
+    if now.weekday() >= 5:
+        return None
+    market_open = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    return timestamp - market_open.timestamp()
+
+
+class Prewarmer:
+    """按节奏预热一组股票的报价、到期日列表和期权链"""
+
+    def __init__(self, tickers, provider=None, min_dte=DTE_SLIDER_RANGE[0], max_dte=DTE_SLIDER_RANGE[1],
+                 interval=DEFAULT_INTERVAL, open_interval=DEFAULT_OPEN_INTERVAL,
+                 open_window=DEFAULT_OPEN_WINDOW, budget=None, cache=None, quotes=None,
+                 slack=30, clock=time.time):
+        self.tickers = list(dict.fromkeys(symbol.upper() for symbol in tickers))
+        self.provider = provider
+        self.min_dte = min_dte
+        self.max_dte = max_dte
+        self.interval = interval
+        self.open_interval = open_interval
+        self.open_window = open_window
+        self.budget = budget or RequestBudget()
+        self.cache = cache or shared_cache()
+        self.quotes = quotes or shared_quotes()
+        self.slack = slack
+        self.clock = clock
+        self.last_run = None
+        self.last_stats = None
+        self._seen_upstream = shared_flight().stats()['upstream']
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_delay(self, now=None):
+        """距离下一轮的秒数：开盘前后使用 open_interval，并在进入该时段时提前醒来"""
+        now = self.clock() if now is None else now
+        offset = seconds_from_open(now)
+        if offset is None:
+            return self.interval
+        start, end = self.open_window
+        if start <= offset <= end:
+            return self.open_interval
+        if offset < start:
+            return max(1.0, min(self.interval, start - offset))
+        return self.interval
+
+    def order(self):
+        """按交互式请求次数从多到少排列股票，次数相同时保持配置顺序"""
+        counts = request_counts()
+        return sorted(self.tickers, key=lambda symbol: -counts[symbol])
+
+    def _due(self, expires_in, margin):
+        return expires_in is None or expires_in < margin
+
+    def _charge_interactive(self, own_requests):
+        # 共享请求合并器统计了所有上游请求，扣除预热自身发起的部分即为交互式请求
+        upstream = shared_flight().stats()['upstream']
+        interactive = upstream - self._seen_upstream - own_requests
+        self._seen_upstream = upstream
+        if interactive > 0:
+            self.budget.charge(interactive)
+
+    def run_once(self):
+        """执行一轮预热，返回 {'requests', 'prices', 'expirations', 'chains', 'deferred'}"""
+        stats = {'requests': 0, 'prices': 0, 'expirations': 0, 'chains': 0, 'deferred': []}
+        provider = self.provider or get_provider()
+        if not provider.cacheable:
+            return stats
+        self._charge_interactive(0)
+        # 刷新会在下一轮开始前过期的数据
+        margin = self.next_delay() + self.slack
+        tickers = self.order()
+
+        def acquire():
+            if not self.budget.try_acquire():
+                return False
+            stats['requests'] += 1
+            return True
+
+        due_prices = [symbol for symbol in tickers if self._due(self.quotes.expires_in(symbol), margin)]
+        if due_prices and acquire():
+            self.quotes.get_many(due_prices, provider, refresh=True)
+            stats['prices'] = len(due_prices)
+
+        for position, symbol in enumerate(tickers):
+            try:
+                if not self._warm_ticker(provider, symbol, margin, acquire, stats):
+                    stats['deferred'] = tickers[position:]
+                    break
+            except Exception as e:
+                logger.warning("预热 %s 时出错: %s", symbol, e)
+
+        self._charge_interactive(stats['requests'])
+        self.last_run = self.clock()
+        self.last_stats = stats
+        return stats
+
+    def _warm_ticker(self, provider, symbol, margin, acquire, stats):
+        """预热单个股票，预算用完时返回 False"""
+        stock = provider.ticker(symbol)
+        if self._due(self.cache.expirations_expire_in(symbol), margin):
+            if not acquire():
+                return False
+            get_expirations(stock, self.cache, refresh=True)
+            stats['expirations'] += 1
+
+        for exp, _ in find_potential_expirations(stock, self.min_dte, self.max_dte, cache=self.cache):
+            remaining = [self.cache.expires_in(symbol, exp, side) for side in ('puts', 'calls')]
+            if not any(self._due(value, margin) for value in remaining):
+                continue
+            if not acquire():
+                return False
+            # 一次请求同时缓存看涨和看跌两侧
+            fetch_option_chain(stock, exp, 'puts', self.cache, refresh=True)
+            stats['chains'] += 1
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                stats = self.run_once()
+                logger.info("缓存预热完成: %s", {k: v for k, v in stats.items() if k != 'deferred'})
+            except Exception:
+                logger.exception("缓存预热出错")
+            self._stop.wait(self.next_delay())
+
+    def start(self):
+        """在后台守护线程中开始按节奏预热"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='cache-prewarm', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+_shared_prewarmer = None
+_prewarmer_lock = threading.Lock()
+
+
+def start_from_env():
+    """按环境变量启动进程内唯一的预热线程（重复调用只启动一次），未配置时返回 None"""
+    global _shared_prewarmer
+    tickers = os.environ.get('OPTION_SCREENER_PREWARM', '').replace(',', ' ').split()
+    if not tickers:
+        return None
+    with _prewarmer_lock:
+        if _shared_prewarmer is None:
+            budget = RequestBudget(float(os.environ.get('OPTION_SCREENER_PREWARM_BUDGET',
+                                                        DEFAULT_BUDGET_PER_MINUTE)))
+            _shared_prewarmer = Prewarmer(tickers, budget=budget).start()
+        return _shared_prewarmer
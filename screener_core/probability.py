@@ -0,0 +1,204 @@
+"""
+蒙特卡洛盈利概率与期望收益
+
+annualizedReturn 假设期权到期作废，不考虑被行权的风险。本模块对每个单腿合约模拟到期价格，估计：
+- probProfit: 到期盈利（含权利金）的概率
+- probAssign: 到期被行权的概率（看跌到期价格低于行权价，看涨高于行权价）
+- expectedPnl: 每张合约到期盈亏的期望（美元；备兑看涨包含 100 股正股的盈亏）
+- cvar: 最差 5% 路径的平均亏损（美元，正值为亏损）
+- expectedReturn: 期望盈亏占担保资金的比例按到期天数年化，可与 annualizedReturn 一样排序
+
+同一股票同一到期日的所有行权价共用一组随机数：
+- 按 (种子, 股票, 到期天数) 生成分层均匀随机数 (i + U_i) / N，天然升序，结果与进程数和顺序无关
+- 到期价格分布默认由隐含波动率曲面按 Breeden-Litzenberger 得到（用曲面上每个行权价的波动率计算
+  看涨期权价格，对行权价求导得到分布函数），保留波动率偏斜；给出历史波动率时按对数正态分布
+- 均匀随机数经分布函数的反函数得到升序的到期价格，再做一次前缀和。每个合约的概率、期望和 CVaR
+  只需在升序价格上二分查找行权价和盈亏平衡点，不需要逐条路径计算
+
+模拟在风险中性测度下进行（漂移为无风险利率减股息率），与希腊字母使用的 Black-Scholes 假设一致。
+多腿组合的最大亏损已经确定，不在这里计算。
+"""
+
+import math
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from screener_core.backtest import PriceHistory
+from screener_core.config import DEFAULT_SIMULATION_PATHS
+from screener_core.filtering import get_strategy, is_spread
+from screener_core.greeks import DAYS_PER_YEAR, black_scholes_price, norm_cdf
+from screener_core.schema import compact_frame
+
+DEFAULT_PATHS = DEFAULT_SIMULATION_PATHS
+DEFAULT_SEED = 0
+DEFAULT_CVAR_LEVEL = 0.05
+GRID_WIDTH = 8.0  # 到期价格网格覆盖平值波动率下 ±8 个标准差
+GRID_POINTS = 4001
+HISTORICAL_WINDOW = 63  # 历史波动率使用最近约一个季度的交易日
+TRADING_DAYS_PER_YEAR = 252
+PROBABILITY_COLUMNS = ('probProfit', 'probAssign', 'expectedPnl', 'cvar', 'expectedReturn')
+
+
+def terminal_cdf(spot, dte, rate=0.0, dividend=0.0, volatility=None, surface=None):
+    """到期价格的分布函数，返回对数网格上的 (价格, 累积概率)
+
+    给出 volatility 时为对数正态分布，否则由隐含波动率曲面求得。
+    """
+    t = dte / DAYS_PER_YEAR
+    atm = volatility if volatility is not None else float(surface.atm_iv(dte))
+    sd = atm * math.sqrt(t)
+    log_forward = (rate - dividend) * t
+    log_prices = log_forward + np.linspace(-GRID_WIDTH * sd, GRID_WIDTH * sd, GRID_POINTS)
+    prices = spot * np.exp(log_prices)
+    if volatility is not None:
+        return prices, norm_cdf((log_prices - log_forward + 0.5 * sd * sd) / sd)
+    calls = black_scholes_price(spot, prices, dte, surface.iv(prices, dte), 'calls', rate, dividend)
+    cdf = 1.0 + math.exp(rate * t) * np.gradient(calls, prices)
+    # 曲面平滑后仍可能有轻微的蝶式套利，分布函数截断到 [0, 1] 并保持单调
+    return prices, np.maximum.accumulate(np.clip(cdf, 0.0, 1.0))
+
+
+def simulate_terminal_prices(spot, dte, paths=DEFAULT_PATHS, seed=DEFAULT_SEED, rate=0.0, dividend=0.0,
+                             volatility=None, surface=None):
+    """分层抽样得到的 paths 个到期价格（升序）"""
+    uniforms = np.random.default_rng(seed).random(paths)
+    uniforms += np.arange(paths)
+    uniforms /= paths
+    prices, cdf = terminal_cdf(spot, dte, rate, dividend, volatility, surface)
+    return np.interp(uniforms, cdf, prices)
+
+
+def contract_metrics(prices, strike, premium, spot, covered_call=False, cvar_level=DEFAULT_CVAR_LEVEL):
+    """在升序的到期价格上计算每个合约的 (盈利概率, 行权概率, 每股期望盈亏, 每股 CVaR)
+
+    卖出看跌每股盈亏为 premium - max(K - S, 0)；备兑看涨为 premium + min(S, K) - spot。
+    两者都随到期价格单调不减，最差的路径就是价格最低的路径。
+    """
+    strike = np.asarray(strike, dtype=float)
+    premium = np.asarray(premium, dtype=float)
+    n = len(prices)
+    prefix = np.empty(n + 1)
+    prefix[0] = 0.0
+    np.cumsum(prices, out=prefix[1:])
+    tail = max(1, math.ceil(cvar_level * n))
+    below = np.searchsorted(prices, strike, side='left')  # 到期价格低于行权价的路径数
+    worst = np.minimum(below, tail)
+    if covered_call:
+        breakeven = spot - premium
+        assigned = n - np.searchsorted(prices, strike, side='right')
+        profitable = np.where(strike > breakeven, n - np.searchsorted(prices, breakeven, side='right'), 0)
+        pnl = premium - spot + (prefix[below] + strike * (n - below)) / n
+        tail_pnl = premium - spot + (prefix[worst] + strike * (tail - worst)) / tail
+    else:
+        breakeven = strike - premium
+        assigned = below
+        profitable = n - np.searchsorted(prices, breakeven, side='right')
+        pnl = premium - (strike * below - prefix[below]) / n
+        tail_pnl = premium - (strike * worst - prefix[worst]) / tail
+    return profitable / n, assigned / n, pnl, -tail_pnl
+
+
+def _group_metrics(task):
+    """一个 (股票, 到期日) 的全部合约；在进程池中执行时只传递该组的数据"""
+    spot, dte, seed, rate, dividend, volatility, surface, strike, premium, covered_call, paths, cvar_level = task
+    if volatility is None and surface is None:
+        nan = np.full(len(strike), np.nan)
+        return nan, nan, nan, nan
+    prices = simulate_terminal_prices(spot, dte, paths, seed, rate, dividend, volatility, surface)
+    return contract_metrics(prices, strike, premium, spot, covered_call, cvar_level)
+
+
+def _per_ticker(value, ticker):
+    """参数可以是单个值，也可以是 {股票代码: 值} 字典"""
+    if isinstance(value, dict):
+        return value.get(ticker)
+    return value
+
+
+def _fallback_volatility(result_df, positions, spot):
+    """没有曲面和历史波动率时，用该到期日最接近平值的合约的隐含波动率"""
+    if 'impliedVolatility' not in result_df.columns:
+        return None
+    iv = result_df['impliedVolatility'].to_numpy(dtype=float)[positions]
+    strike = result_df['strike'].to_numpy(dtype=float)[positions]
+    valid = np.isfinite(iv) & (iv > 0)
+    if not valid.any():
+        return None
+    return float(iv[valid][np.argmin(np.abs(strike[valid] - spot))])
+
+
+def add_probabilities(result_df, strategy, current_price=None, surface=None, volatility=None,
+                      rate=0.0, dividend=0.0, paths=DEFAULT_PATHS, seed=DEFAULT_SEED,
+                      cvar_level=DEFAULT_CVAR_LEVEL, processes=1):
+    """为单腿筛选结果添加盈利概率、行权概率、期望盈亏、CVaR 和期望年化收益率列
+
+    surface 和 volatility（年化历史波动率）可以是单个值，也可以是 {股票代码: 值} 字典（自选股合并结果）；
+    某个股票给出了 volatility 时优先按对数正态分布模拟。current_price 为 None 时使用结果中的
+    currentPrice 列。processes 为进程数（None 为 CPU 核数，1 为在当前进程中顺序执行）。
+    返回添加了列的浅拷贝，多腿组合结果原样返回。
+    """
+    if result_df is None or result_df.empty or is_spread(strategy):
+        return result_df
+    covered_call = get_strategy(strategy).option_type == 'calls'
+    keys = ['ticker', 'dte'] if 'ticker' in result_df.columns else ['dte']
+    groups = result_df.groupby(keys, observed=True, sort=False).indices
+    strike = result_df['strike'].to_numpy(dtype=float)
+    premium = result_df['premium'].to_numpy(dtype=float)
+    spots = (np.full(len(result_df), float(current_price)) if current_price is not None
+             else result_df['currentPrice'].to_numpy(dtype=float))
+
+    tasks = []
+    for key, positions in groups.items():
+        if len(keys) == 2:
+            ticker, dte = key
+        else:
+            ticker, dte = None, key[0] if isinstance(key, tuple) else key
+        spot = float(spots[positions[0]])
+        vol = _per_ticker(volatility, ticker)
+        ticker_surface = None if vol is not None else _per_ticker(surface, ticker)
+        if vol is None and ticker_surface is None:
+            vol = _fallback_volatility(result_df, positions, spot)
+        group_seed = [seed, zlib.crc32(str(ticker or '').encode()), int(dte)]
+        tasks.append((spot, int(dte), group_seed, rate, dividend, vol, ticker_surface,
+                      strike[positions], premium[positions], covered_call, paths, cvar_level))
+
+    if processes == 1 or len(tasks) <= 1:
+        outputs = list(map(_group_metrics, tasks))
+    else:
+        workers = processes or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outputs = list(executor.map(_group_metrics, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    columns = {name: np.full(len(result_df), np.nan) for name in PROBABILITY_COLUMNS[:4]}
+    for positions, values in zip(groups.values(), outputs):
+        for name, value in zip(PROBABILITY_COLUMNS[:4], values):
+            columns[name][positions] = value
+    # 每张合约 100 股
+    columns['expectedPnl'] *= 100
+    columns['cvar'] *= 100
+    dte = result_df['dte'].to_numpy(dtype=float)
+    columns['expectedReturn'] = columns['expectedPnl'] / result_df['collateral'].to_numpy(dtype=float) * (365 / dte)
+
+    result = result_df.copy(deep=False)
+    for name, value in columns.items():
+        result[name] = value
+    return compact_frame(result)
+
+
+def historical_volatility(prices, window=HISTORICAL_WINDOW):
+    """由收盘价计算每个股票的年化历史波动率，返回 {股票代码: 波动率}
+
+    prices 的格式与回测的收盘价相同（宽表或包含 ticker、date、close 列的长表），也可以是 PriceHistory。
+    每个股票取最近 window 个日收益率；数据不足两个收益率的股票不返回。
+    """
+    if not isinstance(prices, PriceHistory):
+        prices = PriceHistory(prices)
+    result = {}
+    for column, ticker in enumerate(prices.tickers):
+        closes = prices.values[:, column]
+        closes = closes[np.isfinite(closes) & (closes > 0)][-(window + 1):]
+        if len(closes) < 3:
+            continue
+        result[ticker] = float(np.std(np.diff(np.log(closes)), ddof=1) * math.sqrt(TRADING_DAYS_PER_YEAR))
+    return result
@@ -0,0 +1,453 @@
+"""
+行情数据源
+
+筛选流程只通过 MarketDataProvider 获取价格、到期日和期权链，提供三种实现：
+- YFinanceProvider: 通过 yfinance 获取实时数据（默认）
+- RecordingProvider: 包装另一个数据源，把每次返回的数据写入压缩的 fixture 文件
+- ReplayProvider: 从 fixture 文件回放数据，可模拟网络延迟，用于离线测试和性能分析
+- PooledProvider: 包装另一个数据源，全部请求在固定的一组长期线程中执行（筛选服务使用）
+
+fixture 目录结构（每个文件都是 gzip 压缩的 JSON）:
+    <目录>/meta.json.gz                      录制日期
+    <目录>/<股票代码>/price.json.gz
+    <目录>/<股票代码>/expirations.json.gz
+    <目录>/<股票代码>/chain_<到期日>.json.gz   calls/puts 两侧期权链
+
+通过环境变量 OPTION_SCREENER_PROVIDER 选择默认数据源：
+    yfinance（默认） / record:<目录> / replay:<目录>
+"""
+
+import gzip
+import json
+import os
+import contextvars
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from screener_core.config import DEFAULT_UPSTREAM_CONNECTIONS
+from screener_core.tracing import span
+
+OptionChain = namedtuple('OptionChain', ['calls', 'puts'])
+
+
+class FixtureNotFoundError(KeyError):
+    """回放数据源中缺少请求对应的 fixture"""
+
+
+class ProviderTicker:
+    """按 yf.Ticker 的接口（ticker / options / option_chain）包装数据源"""
+
+    def __init__(self, provider, symbol):
+        self.provider = provider
+        self.ticker = symbol.upper()
+        # 不可缓存的数据源（如回放）不进入共享的期权链缓存，避免与实时数据混用
+        self.cache_key = self.ticker if provider.cacheable else None
+
+    @property
+    def options(self):
+        return tuple(self.provider.get_expirations(self.ticker))
+
+    def option_chain(self, expiration):
+        return self.provider.get_option_chain(self.ticker, expiration)
+
+
+class MarketDataProvider:
+    """行情数据源接口"""
+
+    name = 'base'
+    cacheable = True
+
+    def get_price(self, symbol):
+        """返回当前价格，获取失败时返回 None"""
+        raise NotImplementedError
+
+    def get_prices(self, symbols):
+        """批量返回 {大写代码: 当前价格或 None}；默认逐个调用 get_price，支持批量请求的数据源可覆盖"""
+        return {symbol.upper(): self.get_price(symbol) for symbol in symbols}
+
+    def get_expirations(self, symbol):
+        """返回 'YYYY-MM-DD' 格式的到期日列表"""
+        raise NotImplementedError
+
+    def get_option_chain(self, symbol, expiration):
+        """返回 OptionChain(calls, puts)"""
+        raise NotImplementedError
+
+    def ticker(self, symbol):
+        """返回与 yf.Ticker 接口一致的对象，供筛选流程使用"""
+        return ProviderTicker(self, symbol)
+
+
+class FastPathSelector:
+    """按股票记录几种等价取数方法的耗时，优先尝试以往成功且最快的方法
+
+    没试过的方法按默认顺序排在最前，每种方法都成功过一次后按成功耗时的指数移动平均排序；
+    失败过的方法排到最后，直到再次成功。
+    """
+
+    def __init__(self, methods, alpha=0.3):
+        self.methods = tuple(methods)
+        self.alpha = alpha
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def order(self, key):
+        with self._lock:
+            stats = dict(self._stats.get(key, {}))
+
+        def rank(item):
+            position, method = item
+            entry = stats.get(method)
+            if entry is None:
+                return (0, 0.0, position)
+            seconds, failed = entry
+            return (2 if failed else 1, seconds or 0.0, position)
+
+        return [method for _, method in sorted(enumerate(self.methods), key=rank)]
+
+    def success(self, key, method, seconds):
+        with self._lock:
+            stats = self._stats.setdefault(key, {})
+            previous = stats.get(method, (None, False))[0]
+            if previous is not None:
+                seconds = self.alpha * seconds + (1 - self.alpha) * previous
+            stats[method] = (seconds, False)
+
+    def failure(self, key, method):
+        with self._lock:
+            stats = self._stats.setdefault(key, {})
+            stats[method] = (stats.get(method, (None, False))[0], True)
+
+
+class YFinanceProvider(MarketDataProvider):
+    """通过 yfinance 获取实时数据
+
+    获取到期日和期权链时同一股票复用 yf.Ticker 对象（yfinance 获取期权链前需要先取到期日列表），
+    超过 ticker_ttl 秒后重新创建，避免长时间运行时到期日列表过期。yf.Ticker 会在对象内
+    缓存 info 和 fast_info，因此取价每次使用新的对象，价格的有效期只由上层缓存决定。
+    get_price 按股票记住 info / history / fast_info 中最快成功的取价方法并优先使用；
+    get_prices 每 batch_size 个股票发起一次批量下载。
+    """
+
+    name = 'yfinance'
+    PRICE_METHODS = ('info', 'history', 'fast_info')
+
+    def __init__(self, ticker_ttl=3600, session=None, batch_size=100):
+        self.ticker_ttl = ticker_ttl
+        self.session = session
+        self.batch_size = batch_size
+        self._tickers = {}
+        self._lock = threading.Lock()
+        self.price_methods = FastPathSelector(self.PRICE_METHODS)
+
+    def _new_ticker(self, symbol):
+        import yfinance as yf
+        if self.session is not None:
+            return yf.Ticker(symbol, session=self.session)
+        return yf.Ticker(symbol)
+
+    def _yf_ticker(self, symbol):
+        symbol = symbol.upper()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tickers.get(symbol)
+            if entry is None or now - entry[1] > self.ticker_ttl:
+                entry = (self._new_ticker(symbol), now)
+                self._tickers[symbol] = entry
+            return entry[0]
+
+    @staticmethod
+    def _price_by(stock, method):
+        if method == 'info':
+            return stock.info.get('regularMarketPrice')
+        if method == 'history':
+            hist = stock.history(period='1d')
+            return None if hist.empty else hist['Close'].iloc[-1]
+        return stock.fast_info.last_price
+
+    def get_price(self, symbol):
+        import pandas as pd
+        symbol = symbol.upper()
+
+        # 依次尝试几种取价方法，该股票以往最快成功的方法排在最前。
+        # 每种方法使用新的 yf.Ticker：fast_info 会复用同一对象上 history 已取到的行情数据，
+        # 共用对象时记录的耗时是对象内缓存的命中，而不是真实的请求耗时
+        for method in self.price_methods.order(symbol):
+            start = time.perf_counter()
+            try:
+                with span(f'price.{method}', symbol=symbol):
+                    current_price = self._price_by(self._new_ticker(symbol), method)
+            except Exception:
+                current_price = None
+            if current_price is None or pd.isna(current_price):
+                self.price_methods.failure(symbol, method)
+                continue
+            self.price_methods.success(symbol, method, time.perf_counter() - start)
+            return float(current_price)
+        return None
+
+    def get_prices(self, symbols):
+        """每 batch_size 个股票发起一次批量下载取最新价格，批量结果中缺失的股票再逐个获取"""
+        import pandas as pd
+        import yfinance as yf
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        prices = {}
+        for i in range(0, len(symbols), self.batch_size):
+            batch = symbols[i:i + self.batch_size]
+            kwargs = {'session': self.session} if self.session is not None else {}
+            try:
+                with span('price.batch', count=len(batch)):
+                    data = yf.download(batch, period='1d', group_by='column', auto_adjust=False,
+                                       progress=False, threads=True, **kwargs)
+                close = data['Close']
+                if isinstance(close, pd.Series):
+                    close = close.to_frame(batch[0])
+                last = close.ffill().iloc[-1]
+            except Exception:
+                continue
+            for symbol in batch:
+                value = last.get(symbol)
+                if value is not None and not pd.isna(value):
+                    prices[symbol] = float(value)
+        for symbol in symbols:
+            if symbol not in prices:
+                prices[symbol] = self.get_price(symbol)
+        return prices
+
+    def get_expirations(self, symbol):
+        return list(self._yf_ticker(symbol).options)
+
+    def get_option_chain(self, symbol, expiration):
+        chain = self._yf_ticker(symbol).option_chain(expiration)
+        return OptionChain(calls=chain.calls, puts=chain.puts)
+
+
+def frame_to_payload(df):
+    """把 DataFrame 转成可精确还原的 JSON 结构（按列存储并记录 dtype）
+
+    缺失值写为 null，生成的是标准 JSON，其他语言的客户端也能解析。
+    """
+    data = {}
+    for column in df.columns:
+        series = df[column]
+        if str(series.dtype).startswith('datetime64'):
+            data[column] = [None if value is None or value != value else value.isoformat()
+                            for value in series.astype(object)]
+        elif series.dtype.kind == 'f':
+            data[column] = [None if value != value else value for value in series.tolist()]
+        else:
+            data[column] = series.tolist()
+    return {
+        'columns': list(df.columns),
+        'dtypes': {column: str(dtype) for column, dtype in df.dtypes.items()},
+        'data': data,
+    }
+
+
+def frame_from_payload(payload):
+    import pandas as pd
+    df = pd.DataFrame(payload['data'], columns=payload['columns'])
+    for column, dtype in payload['dtypes'].items():
+        if dtype.startswith('datetime64'):
+            df[column] = pd.to_datetime(df[column], format='ISO8601', utc='UTC' in dtype).astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def _write_fixture(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_fixture(path):
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise FixtureNotFoundError(path) from None
+
+
+class RecordingProvider(MarketDataProvider):
+    """包装另一个数据源，把返回的数据写入 fixture 目录"""
+
+    name = 'record'
+
+    def __init__(self, inner, fixture_dir):
+        self.inner = inner
+        self.fixture_dir = fixture_dir
+        _write_fixture(os.path.join(fixture_dir, 'meta.json.gz'),
+                       {'recorded_on': date.today().isoformat(), 'source': inner.name})
+
+    def _path(self, symbol, name):
+        return os.path.join(self.fixture_dir, symbol.upper(), f"{name}.json.gz")
+
+    def get_price(self, symbol):
+        price = self.inner.get_price(symbol)
+        _write_fixture(self._path(symbol, 'price'), {'price': price})
+        return price
+
+    def get_prices(self, symbols):
+        prices = self.inner.get_prices(symbols)
+        for symbol, price in prices.items():
+            _write_fixture(self._path(symbol, 'price'), {'price': price})
+        return prices
+
+    def get_expirations(self, symbol):
+        expirations = list(self.inner.get_expirations(symbol))
+        _write_fixture(self._path(symbol, 'expirations'), {'expirations': expirations})
+        return expirations
+
+    def get_option_chain(self, symbol, expiration):
+        chain = self.inner.get_option_chain(symbol, expiration)
+        _write_fixture(self._path(symbol, f"chain_{expiration}"), {
+            'calls': frame_to_payload(chain.calls),
+            'puts': frame_to_payload(chain.puts),
+        })
+        return chain
+
+
+class ReplayProvider(MarketDataProvider):
+    """从 fixture 目录回放数据
+
+    latency / jitter 为每次请求模拟的网络延迟（秒）。shift_to_today 为 True 时，
+    按录制日期到今天的天数平移到期日，使回放时的到期天数与录制时一致。
+    默认不进入共享的期权链缓存（cacheable=False），每次请求都会读取 fixture。
+    """
+
+    name = 'replay'
+
+    def __init__(self, fixture_dir, latency=0.0, jitter=0.0, shift_to_today=True, seed=None,
+                 cacheable=False):
+        self.fixture_dir = fixture_dir
+        self.cacheable = cacheable
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.offset = timedelta(0)
+        if shift_to_today:
+            try:
+                meta = _read_fixture(os.path.join(fixture_dir, 'meta.json.gz'))
+                self.offset = date.today() - date.fromisoformat(meta['recorded_on'])
+            except FixtureNotFoundError:
+                pass
+
+    def _sleep(self):
+        if self.latency <= 0 and self.jitter <= 0:
+            return
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter > 0 else 0.0
+        time.sleep(self.latency + extra)
+
+    def _load(self, symbol, name, sleep=True):
+        if sleep:
+            self._sleep()
+        return _read_fixture(os.path.join(self.fixture_dir, symbol.upper(), f"{name}.json.gz"))
+
+    def _shift(self, expiration, direction):
+        if not self.offset:
+            return expiration
+        return (date.fromisoformat(expiration) + direction * self.offset).isoformat()
+
+    def get_price(self, symbol):
+        try:
+            return self._load(symbol, 'price')['price']
+        except FixtureNotFoundError:
+            return None
+
+    def get_prices(self, symbols):
+        # 批量请求只模拟一次网络延迟
+        self._sleep()
+        prices = {}
+        for symbol in symbols:
+            try:
+                prices[symbol.upper()] = self._load(symbol, 'price', sleep=False)['price']
+            except FixtureNotFoundError:
+                prices[symbol.upper()] = None
+        return prices
+
+    def get_expirations(self, symbol):
+        return [self._shift(exp, 1) for exp in self._load(symbol, 'expirations')['expirations']]
+
+    def get_option_chain(self, symbol, expiration):
+        payload = self._load(symbol, f"chain_{self._shift(expiration, -1)}")
+        return OptionChain(calls=frame_from_payload(payload['calls']),
+                           puts=frame_from_payload(payload['puts']))
+
+
+class PooledProvider(MarketDataProvider):
+    """包装另一个数据源，把全部请求放到固定大小的长期线程池中执行
+
+    筛选时临时创建的线程池在筛选结束后销毁，线程上的上游连接随之关闭。yfinance 的 curl_cffi
+    会话在每个线程上各自保持连接，请求都在同一组 size 个线程中执行时，这些连接可以在多次筛选、
+    多个客户端之间复用；同一时刻最多有 size 个上游请求。
+    """
+
+    def __init__(self, inner, size=DEFAULT_UPSTREAM_CONNECTIONS):
+        self.inner = inner
+        self.size = size
+        self.name = inner.name
+        self.cacheable = inner.cacheable
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='upstream')
+
+    def _call(self, method, *args):
+        # 在调用方的上下文中执行，span 计入调用方的 Trace
+        return self._executor.submit(contextvars.copy_context().run, getattr(self.inner, method), *args).result()
+
+    def get_price(self, symbol):
+        return self._call('get_price', symbol)
+
+    def get_prices(self, symbols):
+        return self._call('get_prices', list(symbols))
+
+    def get_expirations(self, symbol):
+        return self._call('get_expirations', symbol)
+
+    def get_option_chain(self, symbol, expiration):
+        return self._call('get_option_chain', symbol, expiration)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def provider_from_spec(spec):
+    """根据 'yfinance' / 'record:<目录>' / 'replay:<目录>' 创建数据源"""
+    kind, _, location = (spec or 'yfinance').partition(':')
+    if kind == 'yfinance':
+        return YFinanceProvider()
+    if kind == 'record' and location:
+        return RecordingProvider(YFinanceProvider(), location)
+    if kind == 'replay' and location:
+        return ReplayProvider(location)
+    raise ValueError(f"无法识别的数据源配置: {spec}")
+
+
+_default_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """返回进程内默认数据源（首次调用时按环境变量创建）"""
+    global _default_provider
+    with _provider_lock:
+        if _default_provider is None:
+            _default_provider = provider_from_spec(os.environ.get('OPTION_SCREENER_PROVIDER'))
+        return _default_provider
+
+
+def set_provider(provider):
+    """替换进程内默认数据源，并清空共享的期权链缓存内存层和报价缓存"""
+    global _default_provider
+    from screener_core.chain_cache import shared_cache
+    from screener_core.quotes import shared_quotes
+    with _provider_lock:
+        _default_provider = provider
+    shared_cache().clear()
+    shared_quotes().clear()
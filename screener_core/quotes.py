@@ -0,0 +1,115 @@
+"""
+批量报价服务
+
+一次为多个股票获取现价（数据源支持时合并为少数几次批量请求），缓存 OPTION_CHAIN_CACHE_TTL 秒
+（默认 5 分钟）后过期，与原来 st.cache_data(ttl=300) 的价格缓存一致：休市期间同样按固定
+有效期刷新，盘前盘后的价格变动会反映到筛选和预热中。market_hours_aware=True 时改为与
+期权链缓存相同的规则（休市期间保留到下一个开盘时刻）。获取失败的股票不缓存，下次请求时重试。
+不可缓存的数据源（如回放）每次都直接请求。
+"""
+
+import os
+import threading
+import time
+from screener_core.chain_cache import DEFAULT_TTL, compute_expiry
+from screener_core.providers import get_provider
+from screener_core.singleflight import shared_flight
+from screener_core.tracing import span
+
+
+def _describe(symbols):
+    if len(symbols) <= 3:
+        return ' '.join(symbols)
+    return f"{' '.join(symbols[:3])} 等 {len(symbols)} 个"
+
+
+class QuoteService:
+    """线程安全的批量报价缓存"""
+
+    def __init__(self, ttl=DEFAULT_TTL, market_hours_aware=False, clock=time.time):
+        self.ttl = ttl
+        self.market_hours_aware = market_hours_aware
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+
+    def _fetch(self, provider, symbols):
+        with self._lock:
+            self.requests += 1
+        with span('price', symbols=_describe(symbols)):
+            try:
+                prices = provider.get_prices(symbols)
+            except Exception:
+                prices = {}
+        return {symbol: prices.get(symbol) for symbol in symbols}
+
+    def get_many(self, symbols, provider=None, refresh=False):
+        """返回 {大写代码: 当前价格或 None}，只为缓存中没有的股票发起一次批量请求
+
+        refresh 为 True 时忽略缓存，重新获取全部股票（用于后台预热）。
+        """
+        provider = provider or get_provider()
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        if not provider.cacheable:
+            return self._fetch(provider, symbols)
+
+        now = self.clock()
+        prices = {}
+        missing = []
+        with self._lock:
+            for symbol in symbols:
+                entry = None if refresh else self._entries.get(symbol)
+                if entry is not None and entry[1] > now:
+                    prices[symbol] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(symbol)
+                    self.misses += 0 if refresh else 1
+        if not missing:
+            return prices
+
+        # 其他会话正在请求同一批股票时共享同一次请求
+        fetched = shared_flight().do(('price', tuple(missing)), lambda: self._fetch(provider, missing))
+        expires_at = compute_expiry(self.clock(), self.ttl, self.market_hours_aware)
+        with self._lock:
+            for symbol, price in fetched.items():
+                if price is not None:
+                    self._entries[symbol] = (price, expires_at)
+        prices.update(fetched)
+        return prices
+
+    def get(self, symbol, provider=None):
+        """返回单个股票的当前价格，获取失败时返回 None"""
+        return self.get_many([symbol], provider)[symbol.upper()]
+
+    def expires_in(self, symbol):
+        """缓存的价格距离过期的秒数，未缓存时返回 None"""
+        with self._lock:
+            entry = self._entries.get(symbol.upper())
+        return None if entry is None else entry[1] - self.clock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'requests': self.requests,
+                'entries': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_shared_quotes = QuoteService(ttl=float(os.environ.get('OPTION_CHAIN_CACHE_TTL', DEFAULT_TTL)))
+
+
+def shared_quotes():
+    """返回进程内共享的报价服务"""
+    return _shared_quotes
@@ -0,0 +1,191 @@
+"""
+筛选结果排序与合并
+
+- rank_opportunities: 完整排序，用于表格和导出
+- top_k: 只取按某个指标排名前 k 的行，先 O(n) 部分选择再只对这 k 行排序
+- pareto_mask / pareto_frontier: 收益率（越高越好）、Delta（越低越好）、流动性（越高越好）
+  三个维度上的帕累托前沿，按收益率排序后用二维阶梯扫描，O(n log n)
+"""
+
+from bisect import bisect_left, bisect_right
+import numpy as np
+import pandas as pd
+from screener_core.schema import compact_frame
+
+DEFAULT_RANK_METRIC = 'annualizedReturn'
+DEFAULT_RISK_METRIC = 'real_delta'
+DEFAULT_LIQUIDITY_METRIC = 'openInterest'
+
+
+def rank_opportunities(result_df, by=DEFAULT_RANK_METRIC):
+    """按指标从高到低排序筛选结果"""
+    return result_df.sort_values(by, ascending=False)
+
+
+def top_k(result_df, k, by=DEFAULT_RANK_METRIC, ascending=False):
+    """按指标取排名前 k 的行，结果与 sort_values(by, kind='stable').head(k) 一致
+
+    用 np.partition 找出第 k 名的指标值，只对不差于它的行排序，不对全部候选排序；
+    缺失值排在最后，相同指标值保持原有顺序。
+    """
+    n = len(result_df)
+    if k <= 0 or n == 0:
+        return result_df.iloc[:0]
+    if k >= n:
+        return result_df.sort_values(by, ascending=ascending, kind='stable')
+
+    values = result_df[by].to_numpy(dtype=float)
+    # 统一为越小越好的排序键，缺失值视为最差
+    key = values if ascending else -values
+    key = np.where(np.isnan(key), np.inf, key)
+    kth = np.partition(key, k - 1)[k - 1]
+    better = np.flatnonzero(key < kth)
+    tied = np.flatnonzero(key == kth)[:k - len(better)]
+    index = np.concatenate([better, tied])
+    index = index[np.lexsort((index, key[index]))]
+    return result_df.iloc[index]
+
+
+def pareto_mask(result_df, by=DEFAULT_RANK_METRIC, risk=DEFAULT_RISK_METRIC,
+                liquidity=DEFAULT_LIQUIDITY_METRIC):
+    """返回位于帕累托前沿的行的布尔数组
+
+    一个合约被支配是指存在另一个合约收益率不低于它、Delta 不高于它、流动性不低于它，
+    且至少一项严格更好；三项完全相同的合约同时保留或同时剔除。缺失值视为该维度上最差。
+
+    按收益率从高到低排序后，每个合约只可能被排在它之前的合约支配。扫描时维护已处理合约在
+    (Delta, 流动性) 上的二维非支配阶梯，用二分查找判断是否被支配。大部分候选会被较早的
+    前沿合约支配，因此按倍增的分块先用 searchsorted 批量剔除，只对少量幸存者逐个更新阶梯。
+    """
+    n = len(result_df)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    ret = result_df[by].to_numpy(dtype=float)
+    delta = result_df[risk].to_numpy(dtype=float)
+    liq = result_df[liquidity].to_numpy(dtype=float)
+    ret = np.where(np.isnan(ret), -np.inf, ret)
+    delta = np.where(np.isnan(delta), np.inf, delta)
+    liq = np.where(np.isnan(liq), -np.inf, liq)
+
+    # 收益率降序，其次 Delta 升序、流动性降序：支配者总排在被支配者之前，相同的三元组相邻。
+    # 先只按收益率排序，再只对收益率相同的行按另外两项重排，比三键 lexsort 快数倍
+    order = np.argsort(-ret)
+    r = ret[order]
+    tie = r[1:] == r[:-1]
+    if tie.any():
+        tied = np.zeros(n, dtype=bool)
+        tied[1:] |= tie
+        tied[:-1] |= tie
+        positions = np.flatnonzero(tied)
+        rows = order[positions]
+        order[positions] = rows[np.lexsort((-liq[rows], delta[rows], -ret[rows]))]
+    r, d, q = ret[order], delta[order], liq[order]
+    first = np.ones(n, dtype=bool)
+    first[1:] = (r[1:] != r[:-1]) | (d[1:] != d[:-1]) | (q[1:] != q[:-1])
+    group = np.cumsum(first) - 1
+    unique = np.flatnonzero(first)
+    d, q = d[unique], q[unique]
+
+    on_front = np.zeros(len(unique), dtype=bool)
+    stair_delta, stair_liq = [], []   # Delta 升序，流动性严格递增
+    start, size = 0, 1
+    while start < len(unique):
+        stop = min(start + size, len(unique))
+        candidates = np.arange(start, stop)
+        if stair_delta:
+            arr_delta = np.asarray(stair_delta)
+            arr_liq = np.asarray(stair_liq)
+            pos = np.searchsorted(arr_delta, d[candidates], side='right') - 1
+            dominated = (pos >= 0) & (arr_liq[np.maximum(pos, 0)] >= q[candidates])
+            candidates = candidates[~dominated]
+        for i in candidates:
+            di, qi = d[i], q[i]
+            pos = bisect_right(stair_delta, di) - 1
+            if pos >= 0 and stair_liq[pos] >= qi:
+                continue
+            on_front[i] = True
+            # 新点支配阶梯中 Delta 不低于它且流动性不高于它的点，这些点在阶梯中连续
+            lo = bisect_left(stair_delta, di)
+            hi = lo
+            while hi < len(stair_liq) and stair_liq[hi] <= qi:
+                hi += 1
+            stair_delta[lo:hi] = [di]
+            stair_liq[lo:hi] = [qi]
+        start, size = stop, size * 2
+
+    mask = np.empty(n, dtype=bool)
+    mask[order] = on_front[group]
+    return mask
+
+
+def pareto_frontier(result_df, by=DEFAULT_RANK_METRIC, risk=DEFAULT_RISK_METRIC,
+                    liquidity=DEFAULT_LIQUIDITY_METRIC):
+    """只保留帕累托前沿上的合约，保持原有顺序"""
+    if result_df is None or result_df.empty:
+        return result_df
+    return result_df[pareto_mask(result_df, by, risk, liquidity)]
+
+
+def combine_watchlist_results(results):
+    """合并多个股票的 ScreenResult 并添加股票代码和现价列，不排序"""
+    frames = []
+    for item in results:
+        if item.result is None or item.result.empty:
+            continue
+        # 浅拷贝：只新增两列，不复制各股票已有的结果列
+        frame = item.result.copy(deep=False)
+        frame.insert(0, 'ticker', item.ticker)
+        frame['currentPrice'] = item.current_price
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame()
+    return compact_frame(pd.concat(frames, ignore_index=True))
+
+
+def rank_watchlist_results(results, by=DEFAULT_RANK_METRIC):
+    """合并多个股票的 ScreenResult，添加股票代码列并按指标排序"""
+    combined = combine_watchlist_results(results)
+    if combined.empty:
+        return combined
+    return combined.sort_values(by, ascending=False, kind='stable')
+
+
+class RankingStream:
+    """逐个到期日合并筛选结果
+
+    add() 按到期日在原列表中的位置保存结果；result() 按到期日顺序拼接后排序，
+    因此全部到达后与批量筛选的结果完全一致（包括相同指标值的先后顺序）。
+    """
+
+    def __init__(self, total, by=DEFAULT_RANK_METRIC):
+        self.by = by
+        self._frames = [None] * total
+        self._ranked = None
+        self.received = 0
+
+    def add(self, index, frame):
+        """保存第 index 个到期日的筛选结果（可以为空）"""
+        self._frames[index] = frame
+        self._ranked = None
+        self.received += 1
+
+    def combined(self):
+        """目前已到达结果按到期日顺序拼接，不排序"""
+        frames = [f for f in self._frames if f is not None and not f.empty]
+        return pd.concat(frames) if frames else pd.DataFrame()
+
+    def result(self):
+        """目前已到达结果的合并排序结果"""
+        if self._ranked is None:
+            combined = self.combined()
+            self._ranked = rank_opportunities(combined, self.by) if not combined.empty else combined
+        return self._ranked
+
+    def top(self, n):
+        """当前排名前 n 的机会；尚未完整排序时只做部分选择，不排序全部结果"""
+        if self._ranked is not None:
+            return self._ranked.head(n)
+        combined = self.combined()
+        if combined.empty:
+            return combined
+        return top_k(combined, n, self.by)
@@ -0,0 +1,73 @@
+"""
+期权链和筛选结果的紧凑列类型
+
+yfinance 返回的期权链除合约代码外全部是 float64，合约规格、币种等每行重复的字符串
+各占一份；筛选结果又在此基础上增加权利金、年化收益率和希腊字母。缓存和会话中保存的
+表统一转换为：
+- 重复字符串（股票代码、合约规格、币种）: category，每行只存整数编码
+- 价格、权利金、涨跌幅、隐含波动率（含曲面值和溢价）和希腊字母: float32（约 7 位有效数字）
+- 成交量、持仓量、到期天数: int32，缺失的成交量和持仓量按 0 处理
+
+行权价、抵押品和现价保持 float64：价外区间按行权价与现价的比较筛选，降低精度会让
+边界上的合约在不同路径下得到不同结果。排序和帕累托前沿使用的年化收益率和 real_delta
+也保持 float64，否则相近的值会变成并列，改变排名和前沿。合约代码每行唯一，转换为 category
+也不能去重，保持原类型：pandas 3 为 pyarrow 字符串，pandas 2.x 为 object 列（每行一个 Python
+字符串对象，约占筛选结果每个合约字节数的 40%）。
+"""
+
+import numpy as np
+import pandas as pd
+
+CATEGORY_COLUMNS = ('ticker', 'contractSize', 'currency')
+FLOAT32_COLUMNS = (
+    'lastPrice', 'bid', 'ask', 'change', 'percentChange', 'impliedVolatility',
+    'premium', 'delta', 'gamma', 'theta', 'vega', 'rho', 'surfaceIV', 'ivRichness',
+    'probProfit', 'probAssign', 'expectedPnl', 'cvar',
+)
+INT32_COLUMNS = ('volume', 'openInterest', 'dte')
+
+
+def _compact_column(series, column):
+    """返回转换后的列，已是目标类型或不在上述列中时返回 None"""
+    if column in CATEGORY_COLUMNS:
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return None
+        return series.astype('category')
+    if column in FLOAT32_COLUMNS:
+        if series.dtype == np.float32:
+            return None
+        values = pd.to_numeric(series, errors='coerce')
+        return values.astype(np.float32)
+    if column in INT32_COLUMNS:
+        if series.dtype == np.int32:
+            return None
+        values = pd.to_numeric(series, errors='coerce').fillna(0)
+        return values.astype(np.int32)
+    return None
+
+
+def compact_frame(df):
+    """把已知列转换为紧凑类型，返回新的 DataFrame
+
+    只有被转换的列会分配新内存，其余列与原表共享；attrs 随之保留。
+    """
+    if df is None or df.empty:
+        return df
+    converted = {}
+    for column in df.columns:
+        values = _compact_column(df[column], column)
+        if values is not None:
+            converted[column] = values
+    if not converted:
+        return df
+    result = df.copy(deep=False)
+    for column, values in converted.items():
+        result[column] = values
+    return result
+
+
+def bytes_per_row(df):
+    """DataFrame 平均每行占用的内存字节数（含索引和字符串内容）"""
+    if df is None or len(df) == 0:
+        return 0.0
+    return float(df.memory_usage(index=True, deep=True).sum()) / len(df)
@@ -0,0 +1,453 @@
+"""
+筛选服务
+
+在一个长期运行的进程中通过 HTTP/JSON 提供筛选接口，图形界面的各个会话、笔记本和告警脚本共用
+同一份期权链缓存、报价缓存、请求合并和上游连接：
+- 连接由 asyncio 处理（标准库实现的 HTTP/1.1，支持 keep-alive），筛选在固定大小的线程池中执行
+- 最多 max_concurrent 个请求同时执行，排队等待的请求超过 max_pending 个时直接返回 503
+- 上游数据源由 providers.PooledProvider 包装，请求在一组长期线程中执行，连接可复用
+
+接口（请求体和响应都是 JSON；DataFrame 按列编码并记录 dtype，可精确还原）:
+    GET  /health
+    GET  /stats                                缓存、请求合并、报价和并发统计
+    GET  /metrics                              Prometheus 文本格式的各阶段耗时
+    POST /screen      {"ticker": "SPY", "strategy": "put", "min_dte": 1, ...}
+    POST /watchlist   {"tickers": ["SPY", "QQQ"], ...}   每完成一个股票输出一行 JSON（NDJSON）
+    GET  /expirations?ticker=SPY
+    GET  /chain?ticker=SPY&expiration=2026-11-20        两侧期权链
+
+启动:
+    python -m screener_core serve --port 8765
+    python -m screener_core serve --replay fixtures/ --latency 0.2   # 离线回放
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import re
+import threading
+from collections import Counter
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+from screener_core.chain_cache import shared_cache
+from screener_core.config import (
+    DEFAULT_DAYS_TO_EXPIRATION_MIN, DEFAULT_DAYS_TO_EXPIRATION_MAX, DEFAULT_OTM_PERCENTAGE_MIN,
+    DEFAULT_OTM_PERCENTAGE_MAX, DEFAULT_FETCH_WORKERS, DEFAULT_WATCHLIST_WORKERS, DEFAULT_RISK_FREE_RATE,
+    DEFAULT_DIVIDEND_YIELD, DEFAULT_SERVICE_CONCURRENCY, DEFAULT_SERVICE_QUEUE,
+)
+from screener_core.data import fetch_option_chain, get_expirations, get_ticker
+from screener_core.filtering import BOTH_SIDES, SPREAD_STRATEGIES, STRATEGIES
+from screener_core.pipeline import parse_watchlist, screen_ticker, screen_watchlist
+from screener_core.providers import frame_to_payload
+from screener_core.quotes import shared_quotes
+from screener_core.singleflight import shared_flight
+from screener_core.spreads import SpreadLimits
+from screener_core.tracing import render_prometheus, span
+from screener_core.wire import SCREEN_STRATEGY_NAMES, encode_result
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1024 * 1024
+IDLE_TIMEOUT = 60  # keep-alive 连接空闲超过该秒数后关闭
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 502: 'Bad Gateway',
+               503: 'Service Unavailable'}
+# 股票代码和到期日会成为磁盘缓存和快照的路径，在接口边界只接受严格的格式
+TICKER_PATTERN = re.compile(r'^(?=.*[A-Z0-9])[A-Z0-9.^=-]{1,15}$')
+EXPIRATION_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+class ServiceBusy(Exception):
+    """执行中和排队的请求都已满"""
+
+
+class BadRequest(ValueError):
+    """请求参数错误"""
+
+
+def _strategy(payload):
+    # 可以使用命令行的策略简称（put、condor 等），也可以直接使用策略全名
+    strategy = payload.get('strategy', 'put')
+    strategy = SCREEN_STRATEGY_NAMES.get(strategy, strategy)
+    if strategy not in STRATEGIES and strategy not in SPREAD_STRATEGIES:
+        raise BadRequest(f"未知的策略: {strategy}")
+    return strategy
+
+
+def screen_arguments(payload):
+    """解析筛选请求的公共参数，返回 (位置参数, 关键字参数)"""
+    strategy = _strategy(payload)
+    try:
+        args = (
+            int(payload.get('min_dte', DEFAULT_DAYS_TO_EXPIRATION_MIN)),
+            int(payload.get('max_dte', DEFAULT_DAYS_TO_EXPIRATION_MAX)),
+            float(payload.get('min_otm', DEFAULT_OTM_PERCENTAGE_MIN)),
+            float(payload.get('max_otm', DEFAULT_OTM_PERCENTAGE_MAX)),
+            strategy,
+        )
+        limits = payload.get('spread_limits')
+        kwargs = {
+            'rate': float(payload.get('rate', DEFAULT_RISK_FREE_RATE)),
+            'dividend': float(payload.get('dividend', DEFAULT_DIVIDEND_YIELD)),
+            'spread_limits': SpreadLimits(**limits) if limits else None,
+        }
+    except (TypeError, ValueError) as e:
+        raise BadRequest(f"参数错误: {e}") from None
+    return args, kwargs
+
+
+def _workers(payload, name, default):
+    try:
+        return max(1, int(payload.get(name, default)))
+    except (TypeError, ValueError):
+        raise BadRequest(f"参数错误: {name}") from None
+
+
+def _ticker(value):
+    ticker = str(value or '').strip().upper()
+    if not ticker:
+        raise BadRequest("缺少 ticker 参数")
+    if not TICKER_PATTERN.match(ticker):
+        raise BadRequest(f"无效的股票代码: {ticker[:20]}")
+    return ticker
+
+
+def _expiration(value):
+    expiration = str(value or '').strip()
+    if not expiration:
+        raise BadRequest("缺少 expiration 参数")
+    try:
+        if not EXPIRATION_PATTERN.match(expiration):
+            raise ValueError
+        date.fromisoformat(expiration)
+    except ValueError:
+        raise BadRequest(f"无效的到期日（应为 YYYY-MM-DD）: {expiration[:20]}") from None
+    return expiration
+
+
+def _query_ticker(query):
+    return _ticker((query.get('ticker') or [''])[0])
+
+
+class ScreeningService:
+    """筛选服务：HTTP 路由、并发限制和统计
+
+    provider 为数据源（None 为进程内默认数据源）。start() 在当前事件循环中开始监听；
+    start_background() 在后台线程中运行独立的事件循环（测试和嵌入使用），close() 停止。
+    """
+
+    def __init__(self, provider=None, max_concurrent=DEFAULT_SERVICE_CONCURRENCY,
+                 max_pending=DEFAULT_SERVICE_QUEUE):
+        self.provider = provider
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='screen')
+        self._slots = None
+        self._active = 0
+        self._waiting = 0
+        self.requests = Counter()
+        self.rejected = 0
+        self._server = None
+        self._loop = None
+        self._thread = None
+        self._routes = {
+            '/health': ('GET', self._health),
+            '/stats': ('GET', self._stats),
+            '/metrics': ('GET', self._metrics),
+            '/expirations': ('GET', self._expirations),
+            '/chain': ('GET', self._chain),
+            '/screen': ('POST', self._screen),
+            '/watchlist': ('POST', self._watchlist),
+        }
+
+    async def start(self, host='127.0.0.1', port=0):
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self
+
+    @property
+    def address(self):
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return host, port
+
+    @property
+    def url(self):
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    async def serve_forever(self):
+        """start() 之后持续处理请求，直到任务被取消"""
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_background(self, host='127.0.0.1', port=0):
+        """在后台线程中启动服务，监听成功后返回（port 为 0 时自动选择端口，见 url）"""
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        failure = []
+
+        def run():
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start(host, port))
+            except Exception as e:
+                failure.append(e)
+                ready.set()
+                return
+            ready.set()
+            loop.run_forever()
+            self._server.close()
+            loop.run_until_complete(self._server.wait_closed())
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name='screening-service', daemon=True)
+        self._thread.start()
+        ready.wait()
+        if failure:
+            raise failure[0]
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+        elif self._server is not None:
+            self._server.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, func, *args, **kwargs):
+        """占用一个执行位置，在线程池中执行 func（继承当前上下文中的 Trace）"""
+        await self._acquire()
+        try:
+            return await self._loop.run_in_executor(
+                self._executor, lambda: contextvars.copy_context().run(func, *args, **kwargs))
+        finally:
+            self._release()
+
+    async def _acquire(self):
+        # 事件循环是单线程的，计数不需要加锁
+        if self._slots.locked() and self._waiting >= self.max_pending:
+            self.rejected += 1
+            raise ServiceBusy()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._active += 1
+
+    def _release(self):
+        self._active -= 1
+        self._slots.release()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except (asyncio.TimeoutError, ConnectionError):
+                    break
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    await self._send_json(writer, 400, {'error': "无法解析的请求"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._send_json(writer, 413, {'error': "请求体过大"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._dispatch(method, target, body, writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body, writer, keep_alive):
+        url = urlsplit(target)
+        route = self._routes.get(url.path)
+        if route is None:
+            self.requests['404'] += 1
+            await self._send_json(writer, 404, {'error': f"未知的路径: {url.path}"}, keep_alive)
+            return
+        allowed, handler = route
+        if method != allowed:
+            await self._send_json(writer, 405, {'error': f"{url.path} 只支持 {allowed}"}, keep_alive,
+                                  {'Allow': allowed})
+            return
+        self.requests[url.path] += 1
+        try:
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise BadRequest("请求体必须是 JSON 对象")
+            await handler(writer, keep_alive, payload=payload, query=parse_qs(url.query))
+        except json.JSONDecodeError:
+            await self._send_json(writer, 400, {'error': "请求体不是有效的 JSON"}, keep_alive)
+        except BadRequest as e:
+            await self._send_json(writer, 400, {'error': str(e)}, keep_alive)
+        except ServiceBusy:
+            await self._send_json(writer, 503, {'error': "服务繁忙，请稍后重试"}, keep_alive, {'Retry-After': '1'})
+        except ConnectionError:
+            raise
+        except Exception as e:
+            logger.exception("处理 %s 时出错", url.path)
+            await self._send_json(writer, 500, {'error': str(e)}, keep_alive)
+
+    @staticmethod
+    def _head(status, content_type, keep_alive, extra):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}", f"Content-Type: {content_type}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{name}: {value}" for name, value in (extra or {}).items()]
+        return lines
+
+    async def _send(self, writer, status, body, content_type, keep_alive, extra=None):
+        lines = self._head(status, content_type, keep_alive, extra) + [f"Content-Length: {len(body)}"]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status, obj, keep_alive, extra=None):
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        await self._send(writer, status, body, 'application/json; charset=utf-8', keep_alive, extra)
+
+    async def _health(self, writer, keep_alive, **_):
+        await self._send_json(writer, 200, {'status': 'ok'}, keep_alive)
+
+    def stats(self):
+        return {
+            'service': {
+                'active': self._active,
+                'waiting': self._waiting,
+                'max_concurrent': self.max_concurrent,
+                'max_pending': self.max_pending,
+                'rejected': self.rejected,
+                'requests': dict(self.requests),
+            },
+            'cache': shared_cache().stats(),
+            'flight': shared_flight().stats(),
+            'quotes': shared_quotes().stats(),
+        }
+
+    async def _stats(self, writer, keep_alive, **_):
+        await self._send_json(writer, 200, self.stats(), keep_alive)
+
+    async def _metrics(self, writer, keep_alive, **_):
+        await self._send(writer, 200, render_prometheus().encode('utf-8'),
+                         'text/plain; version=0.0.4; charset=utf-8', keep_alive)
+
+    async def _expirations(self, writer, keep_alive, query, **_):
+        ticker = _query_ticker(query)
+
+        def load():
+            with span('service.expirations', symbol=ticker):
+                return list(get_expirations(get_ticker(ticker, self.provider)))
+
+        try:
+            expirations = await self._run(load)
+        except (ServiceBusy, BadRequest):
+            raise
+        except Exception as e:
+            await self._send_json(writer, 502, {'error': f"获取 {ticker} 的到期日失败: {e}"}, keep_alive)
+            return
+        await self._send_json(writer, 200, {'ticker': ticker, 'expirations': expirations}, keep_alive)
+
+    async def _chain(self, writer, keep_alive, query, **_):
+        ticker = _query_ticker(query)
+        expiration = _expiration((query.get('expiration') or [''])[0])
+
+        def load():
+            with span('service.chain', symbol=ticker, expiration=expiration):
+                return fetch_option_chain(get_ticker(ticker, self.provider), expiration, BOTH_SIDES)
+
+        try:
+            chain = await self._run(load)
+        except (ServiceBusy, BadRequest):
+            raise
+        except Exception as e:
+            await self._send_json(writer, 502, {'error': f"获取 {ticker} {expiration} 的期权链失败: {e}"},
+                                  keep_alive)
+            return
+        await self._send_json(writer, 200, {
+            'ticker': ticker, 'expiration': expiration,
+            'calls': frame_to_payload(chain.calls), 'puts': frame_to_payload(chain.puts),
+        }, keep_alive)
+
+    async def _screen(self, writer, keep_alive, payload, **_):
+        ticker = _ticker(payload.get('ticker'))
+        args, kwargs = screen_arguments(payload)
+        fetch_workers = _workers(payload, 'fetch_workers', DEFAULT_FETCH_WORKERS)
+
+        def run():
+            with span('service.screen', symbol=ticker):
+                return encode_result(screen_ticker(ticker, *args, max_workers=fetch_workers,
+                                                   provider=self.provider, **kwargs))
+
+        await self._send_json(writer, 200, await self._run(run), keep_alive)
+
+    async def _watchlist(self, writer, keep_alive, payload, **_):
+        tickers = payload.get('tickers', [])
+        tickers = parse_watchlist(tickers if isinstance(tickers, str) else ' '.join(map(str, tickers)))
+        if not tickers:
+            raise BadRequest("缺少 tickers 参数")
+        tickers = [_ticker(ticker) for ticker in tickers]
+        args, kwargs = screen_arguments(payload)
+        workers = _workers(payload, 'max_workers', DEFAULT_WATCHLIST_WORKERS)
+        fetch_workers = _workers(payload, 'fetch_workers', DEFAULT_FETCH_WORKERS)
+        queue = asyncio.Queue()
+        stop = threading.Event()
+        loop = self._loop
+
+        def produce():
+            # 在工作线程中逐个产出结果，编码后交给事件循环写出
+            results = screen_watchlist(tickers, *args, max_workers=workers, fetch_workers=fetch_workers,
+                                       provider=self.provider, **kwargs)
+            try:
+                for item in results:
+                    line = json.dumps(encode_result(item), ensure_ascii=False).encode('utf-8') + b'\n'
+                    loop.call_soon_threadsafe(queue.put_nowait, line)
+                    if stop.is_set():
+                        break
+            finally:
+                results.close()
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        # 整个自选股批次占用一个执行位置；按完成先后以分块传输逐行写出
+        await self._acquire()
+        try:
+            lines = self._head(200, 'application/x-ndjson; charset=utf-8', keep_alive,
+                               {'Transfer-Encoding': 'chunked'})
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            future = loop.run_in_executor(self._executor, contextvars.copy_context().run, produce)
+            try:
+                while (line := await queue.get()) is not None:
+                    writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+                    await writer.drain()
+                try:
+                    await future
+                except Exception as e:
+                    logger.exception("批量筛选时出错")
+                    line = json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8') + b'\n'
+                    writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+                writer.write(b'0\r\n\r\n')
+                await writer.drain()
+            finally:
+                # 客户端断开时停止产出，尚未开始的股票不再筛选；等工作线程结束后才释放执行位置
+                stop.set()
+                await asyncio.gather(future, return_exceptions=True)
+        finally:
+            self._release()
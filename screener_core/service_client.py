@@ -0,0 +1,109 @@
+"""
+筛选服务客户端
+
+只使用标准库 urllib 调用 service.ScreeningService 的 HTTP/JSON 接口，返回与本地调用相同的
+ScreenResult、OptionChain 和 DataFrame，图形界面、笔记本和脚本可以直接替换本地筛选。
+
+设置环境变量 OPTION_SCREENER_SERVICE_URL（如 http://127.0.0.1:8765）后，client_from_env()
+返回连接该服务的客户端，图形界面改为通过服务筛选。
+"""
+
+import json
+import os
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+from screener_core.config import (
+    DEFAULT_DIVIDEND_YIELD, DEFAULT_FETCH_WORKERS, DEFAULT_RISK_FREE_RATE, DEFAULT_SERVICE_TIMEOUT,
+    DEFAULT_WATCHLIST_WORKERS,
+)
+from screener_core.providers import OptionChain, frame_from_payload
+from screener_core.wire import decode_result
+
+
+class ServiceError(RuntimeError):
+    """服务返回错误（status 为 HTTP 状态码，无法连接时为 None）"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ServiceClient:
+    """筛选服务的客户端，方法参数与 pipeline 中对应的函数一致"""
+
+    def __init__(self, base_url, timeout=DEFAULT_SERVICE_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _open(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error', e.reason)
+            except ValueError:
+                message = e.reason
+            raise ServiceError(message, e.code) from None
+        except urllib.error.URLError as e:
+            raise ServiceError(f"无法连接筛选服务 {self.base_url}: {e.reason}") from None
+
+    def _json(self, path, payload=None):
+        with self._open(path, payload) as response:
+            return json.loads(response.read())
+
+    @staticmethod
+    def _screen_payload(min_dte, max_dte, min_otm, max_otm, strategy_type, rate, dividend, spread_limits):
+        return {
+            'min_dte': min_dte, 'max_dte': max_dte, 'min_otm': min_otm, 'max_otm': max_otm,
+            'strategy': strategy_type, 'rate': rate, 'dividend': dividend,
+            'spread_limits': None if spread_limits is None else spread_limits._asdict(),
+        }
+
+    def health(self):
+        return self._json('/health')
+
+    def stats(self):
+        """服务端的缓存、请求合并、报价和并发统计"""
+        return self._json('/stats')
+
+    def screen_ticker(self, ticker, min_dte, max_dte, min_otm, max_otm, strategy_type,
+                      max_workers=DEFAULT_FETCH_WORKERS, rate=DEFAULT_RISK_FREE_RATE,
+                      dividend=DEFAULT_DIVIDEND_YIELD, spread_limits=None):
+        """筛选单个股票，返回 ScreenResult"""
+        payload = self._screen_payload(min_dte, max_dte, min_otm, max_otm, strategy_type, rate, dividend,
+                                       spread_limits)
+        return decode_result(self._json('/screen', {'ticker': ticker, 'fetch_workers': max_workers, **payload}))
+
+    def screen_watchlist(self, tickers, min_dte, max_dte, min_otm, max_otm, strategy_type,
+                         max_workers=DEFAULT_WATCHLIST_WORKERS, fetch_workers=DEFAULT_FETCH_WORKERS,
+                         rate=DEFAULT_RISK_FREE_RATE, dividend=DEFAULT_DIVIDEND_YIELD, spread_limits=None):
+        """批量筛选自选股，按服务端完成先后逐个产出 ScreenResult"""
+        payload = self._screen_payload(min_dte, max_dte, min_otm, max_otm, strategy_type, rate, dividend,
+                                       spread_limits)
+        payload.update(tickers=list(tickers), max_workers=max_workers, fetch_workers=fetch_workers)
+        with self._open('/watchlist', payload) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if 'ticker' not in item:
+                    raise ServiceError(item.get('error', "批量筛选失败"), 500)
+                yield decode_result(item)
+
+    def get_expirations(self, ticker):
+        return self._json('/expirations?' + urlencode({'ticker': ticker}))['expirations']
+
+    def get_option_chain(self, ticker, expiration):
+        """返回两侧期权链 OptionChain(calls, puts)，与服务端缓存中的紧凑列类型一致"""
+        payload = self._json('/chain?' + urlencode({'ticker': ticker, 'expiration': expiration}))
+        return OptionChain(calls=frame_from_payload(payload['calls']), puts=frame_from_payload(payload['puts']))
+
+
+def client_from_env():
+    """配置了 OPTION_SCREENER_SERVICE_URL 时返回连接该服务的客户端，否则返回 None"""
+    url = os.environ.get('OPTION_SCREENER_SERVICE_URL')
+    return ServiceClient(url) if url else None
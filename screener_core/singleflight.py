@@ -0,0 +1,81 @@
+"""
+进程内请求合并（single-flight）
+
+多个会话几乎同时请求同一个股票的同一份数据时，只有第一个请求真正访问数据源，
+其余请求等待并共享它的结果（或异常）。请求完成后立即从在途表中移除，
+之后的请求由期权链缓存负责命中。
+"""
+
+import threading
+from collections import Counter
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """按键合并并发请求，并统计节省的上游调用次数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.upstream = Counter()
+        self.coalesced = Counter()
+
+    def do(self, key, fn):
+        """执行 fn() 并返回结果；相同 key 的请求正在进行时等待并共享其结果
+
+        key 的第一个元素作为统计分类（例如 'chain'、'expirations'）。
+        """
+        kind = key[0]
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.upstream[kind] += 1
+            else:
+                self.coalesced[kind] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    def stats(self):
+        """返回各分类的上游调用次数和被合并（节省）的请求次数"""
+        with self._lock:
+            kinds = sorted(set(self.upstream) | set(self.coalesced))
+            return {
+                'upstream': sum(self.upstream.values()),
+                'coalesced': sum(self.coalesced.values()),
+                'in_flight': len(self._calls),
+                'by_kind': {kind: {'upstream': self.upstream[kind], 'coalesced': self.coalesced[kind]}
+                            for kind in kinds},
+            }
+
+
+_shared_flight = SingleFlight()
+
+
+def shared_flight():
+    """返回进程内共享的请求合并器"""
+    return _shared_flight
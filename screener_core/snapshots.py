@@ -0,0 +1,321 @@
+"""
+期权链历史快照
+
+把每次获取到的期权链（附获取时间和标的现价）保存为 Arrow IPC 列式文件，
+按股票代码和日期分区（hive 目录结构），之后可以回看任意一天筛选器看到的数据：
+
+    <目录>/ticker=SPY/date=2026-10-13/<获取时间>-puts.arrow
+
+读取时通过内存映射打开文件，股票代码和日期条件直接裁剪分区目录，到期日、
+到期天数和行权价条件下推到扫描阶段，只有命中的列和行会被实际读入内存。
+
+设置环境变量 OPTION_SCREENER_SNAPSHOT_DIR 后，筛选流程会自动写入快照。
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+import pandas as pd
+from screener_core.chain_cache import HAS_PYARROW, MARKET_TZ
+
+# 快照中保存的期权链列；数据源缺少的列写入空值，保证所有文件结构一致
+CHAIN_COLUMNS = {
+    'contractSymbol': 'string',
+    'lastTradeDate': 'timestamp',
+    'strike': 'float64',
+    'lastPrice': 'float64',
+    'bid': 'float64',
+    'ask': 'float64',
+    'change': 'float64',
+    'percentChange': 'float64',
+    'volume': 'float64',
+    'openInterest': 'float64',
+    'impliedVolatility': 'float64',
+    'inTheMoney': 'bool',
+    'delta': 'float64',
+    'gamma': 'float64',
+    'theta': 'float64',
+    'vega': 'float64',
+    'rho': 'float64',
+}
+
+
+def _arrow_type(pa, name):
+    return {
+        'string': pa.string(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+        'float64': pa.float64(),
+        'bool': pa.bool_(),
+    }[name]
+
+
+def snapshot_schema():
+    """快照文件的 Arrow schema（不含分区列）"""
+    import pyarrow as pa
+    fields = [
+        pa.field('snapshot_time', pa.timestamp('us', tz='UTC')),
+        pa.field('spot', pa.float64()),
+        pa.field('option_type', pa.string()),
+        pa.field('expiration', pa.date32()),
+        pa.field('dte', pa.int32()),
+    ]
+    fields += [pa.field(name, _arrow_type(pa, kind)) for name, kind in CHAIN_COLUMNS.items()]
+    return pa.schema(fields)
+
+
+def _partition_schema():
+    import pyarrow as pa
+    return pa.schema([pa.field('ticker', pa.string()), pa.field('date', pa.string())])
+
+
+def market_date(timestamp):
+    """时间戳对应的美东交易日期（缺少时区数据时使用 UTC）"""
+    return datetime.fromtimestamp(timestamp, MARKET_TZ or timezone.utc).date()
+
+
+class SnapshotWriter:
+    """把获取到的期权链写入快照目录
+
+    同一份数据（按股票、到期日、期权类型和获取时间识别）只写一次，
+    因此缓存命中后重复筛选不会产生重复快照。
+    """
+
+    def __init__(self, root, max_recorded=100_000):
+        self.root = root
+        self.max_recorded = max_recorded
+        self._recorded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _is_new(self, key):
+        with self._lock:
+            if key in self._recorded:
+                return False
+            self._recorded[key] = None
+            while len(self._recorded) > self.max_recorded:
+                self._recorded.popitem(last=False)
+            return True
+
+    def write(self, ticker, spot, option_type, chains):
+        """写入一个股票一次获取的期权链
+
+        chains 为 [(exp, dte, options_df), ...]；options_df.attrs['fetched_at'] 为获取时间，
+        缺失时使用当前时间。返回写入的文件路径，没有新数据时返回 None。
+        """
+        import pyarrow as pa
+        ticker = ticker.upper()
+        now = time.time()
+        frames = []
+        for exp, dte, options_df in chains:
+            if options_df is None or options_df.empty:
+                continue
+            fetched_at = options_df.attrs.get('fetched_at', now)
+            if not self._is_new((ticker, exp, option_type, fetched_at)):
+                continue
+            frames.append(self._to_table(options_df, exp, dte, option_type, spot, fetched_at))
+        if not frames:
+            return None
+
+        table = pa.concat_tables(frames)
+        first_fetch = min(frame.column('snapshot_time')[0].as_py() for frame in frames)
+        day = market_date(first_fetch.timestamp())
+        directory = os.path.join(self.root, f"ticker={ticker}", f"date={day.isoformat()}")
+        name = f"{first_fetch.strftime('%H%M%S%f')}-{option_type}-{uuid.uuid4().hex[:8]}.arrow"
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        # 以 '.' 开头的临时文件会被数据集扫描忽略，写完后再原子替换
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    @staticmethod
+    def _to_table(options_df, exp, dte, option_type, spot, fetched_at):
+        import pyarrow as pa
+        schema = snapshot_schema()
+        n = len(options_df)
+        columns = {
+            'snapshot_time': pa.array([int(fetched_at * 1_000_000)] * n, pa.int64()).cast(schema.field('snapshot_time').type),
+            'spot': pa.array([float(spot)] * n, pa.float64()),
+            'option_type': pa.array([option_type] * n, pa.string()),
+            'expiration': pa.array([date.fromisoformat(exp)] * n, pa.date32()),
+            'dte': pa.array([int(dte)] * n, pa.int32()),
+        }
+        for name, kind in CHAIN_COLUMNS.items():
+            arrow_type = schema.field(name).type
+            if name not in options_df.columns:
+                columns[name] = pa.nulls(n, arrow_type)
+                continue
+            series = options_df[name]
+            if kind == 'timestamp':
+                series = pd.to_datetime(series, utc=True, errors='coerce')
+            elif kind == 'float64':
+                series = pd.to_numeric(series, errors='coerce').astype('float64')
+            elif kind == 'bool':
+                series = series.astype('boolean')
+            else:
+                series = series.astype('string')
+            columns[name] = pa.Array.from_pandas(series).cast(arrow_type)
+        return pa.Table.from_pydict(columns, schema=schema)
+
+
+class SnapshotReader:
+    """读取快照目录，支持按条件裁剪分区并下推过滤"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _files(self, tickers=None, start=None, end=None):
+        """按股票代码和日期裁剪分区目录，只列出需要扫描的文件"""
+        start = str(start) if start is not None else None
+        end = str(end) if end is not None else None
+        files = []
+        for ticker in ([t.upper() for t in tickers] if tickers else self.tickers()):
+            ticker_dir = os.path.join(self.root, f"ticker={ticker}")
+            for day in self.dates(ticker):
+                day = day.isoformat()
+                if (start is not None and day < start) or (end is not None and day > end):
+                    continue
+                day_dir = os.path.join(ticker_dir, f"date={day}")
+                files.extend(os.path.join(day_dir, name) for name in sorted(os.listdir(day_dir))
+                             if name.endswith('.arrow'))
+        return files
+
+    def _dataset(self, files):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+        return ds.dataset(
+            files,
+            schema=pa.unify_schemas([snapshot_schema(), _partition_schema()]),
+            format='ipc',
+            partitioning=ds.partitioning(_partition_schema(), flavor='hive'),
+            partition_base_dir=self.root,
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+        )
+
+    def tickers(self):
+        """已有快照的股票代码"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(self.root) if name.startswith('ticker='))
+
+    def dates(self, ticker):
+        """某个股票已有快照的日期"""
+        directory = os.path.join(self.root, f"ticker={ticker.upper()}")
+        if not os.path.isdir(directory):
+            return []
+        return sorted(date.fromisoformat(name.split('=', 1)[1])
+                      for name in os.listdir(directory) if name.startswith('date='))
+
+    @staticmethod
+    def build_filter(tickers=None, start=None, end=None, option_type=None, expirations=None,
+                     min_dte=None, max_dte=None, min_strike=None, max_strike=None, until=None):
+        """把查询条件转换为 pyarrow 过滤表达式；没有条件时返回 None
+
+        until 为获取时间上限（含），用于取回某一时刻之前的快照。
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        conditions = []
+        if tickers:
+            conditions.append(ds.field('ticker').isin([t.upper() for t in tickers]))
+        # 日期分区值为 ISO 格式字符串，按字符串比较即按日期比较
+        if start is not None:
+            conditions.append(ds.field('date') >= str(start))
+        if end is not None:
+            conditions.append(ds.field('date') <= str(end))
+        if option_type is not None:
+            conditions.append(ds.field('option_type') == option_type)
+        if expirations:
+            values = pa.array([date.fromisoformat(str(exp)) for exp in expirations], pa.date32())
+            conditions.append(ds.field('expiration').isin(values))
+        if min_dte is not None:
+            conditions.append(ds.field('dte') >= min_dte)
+        if max_dte is not None:
+            conditions.append(ds.field('dte') <= max_dte)
+        if min_strike is not None:
+            conditions.append(ds.field('strike') >= min_strike)
+        if max_strike is not None:
+            conditions.append(ds.field('strike') <= max_strike)
+        if until is not None:
+            until = pd.Timestamp(until).tz_convert('UTC').to_pydatetime()
+            conditions.append(ds.field('snapshot_time') <= pa.scalar(until, pa.timestamp('us', tz='UTC')))
+        if not conditions:
+            return None
+        expression = conditions[0]
+        for condition in conditions[1:]:
+            expression = expression & condition
+        return expression
+
+    def query(self, tickers=None, start=None, end=None, option_type=None, expirations=None,
+              min_dte=None, max_dte=None, min_strike=None, max_strike=None, columns=None, until=None):
+        """查询快照，返回 DataFrame（含 ticker 和 date 列）
+
+        start / end 为快照日期（含两端）；columns 只读取指定列，可显著减少读取量；
+        until 为获取时间上限（带时区的时间戳，含）。
+        """
+        files = self._files(tickers, start, end)
+        if not files:
+            return pd.DataFrame()
+        # 分区条件已在列文件时裁剪，其余条件在扫描内存映射文件时过滤
+        expression = self.build_filter(None, None, None, option_type, expirations,
+                                       min_dte, max_dte, min_strike, max_strike, until)
+        table = self._dataset(files).to_table(columns=columns, filter=expression)
+        df = table.to_pandas()
+        if 'expiration' in df.columns:
+            df['expiration'] = df['expiration'].map(lambda d: d.isoformat() if d is not None else None)
+        return df
+
+    def chains_at(self, ticker, snapshot_time, option_type='puts'):
+        """返回某个时刻筛选器看到的期权链 [(exp, dte, options_df), ...]
+
+        只扫描该时刻之前最近一个有快照的日期分区（获取时间条件下推到扫描阶段），
+        每个到期日取该分区内最近一次获取的数据。更早日期记录的到期日不再返回，
+        已过期的到期日也不返回，到期天数按该时刻的交易日期重新计算。
+        """
+        snapshot_time = pd.Timestamp(snapshot_time)
+        if snapshot_time.tzinfo is None:
+            snapshot_time = snapshot_time.tz_localize(MARKET_TZ or timezone.utc)
+        day = market_date(snapshot_time.timestamp())
+        df = pd.DataFrame()
+        for partition in reversed([d for d in self.dates(ticker) if d <= day]):
+            df = self.query([ticker], start=partition, end=partition, option_type=option_type,
+                            until=snapshot_time)
+            if not df.empty:
+                break
+        if df.empty:
+            return []
+        df = df[df['expiration'] >= day.isoformat()]
+        # 每个到期日取最近一次获取的数据
+        latest = df.groupby('expiration')['snapshot_time'].transform('max')
+        df = df[df['snapshot_time'] == latest]
+        chains = []
+        for exp, group in df.groupby('expiration', sort=True):
+            dte = (date.fromisoformat(exp) - day).days
+            chains.append((exp, dte, group[list(CHAIN_COLUMNS)].reset_index(drop=True)))
+        return chains
+
+
+_shared_writer = None
+_writer_lock = threading.Lock()
+
+
+def snapshot_writer():
+    """返回按环境变量 OPTION_SCREENER_SNAPSHOT_DIR 配置的共享快照写入器，未配置时返回 None"""
+    global _shared_writer
+    root = os.environ.get('OPTION_SCREENER_SNAPSHOT_DIR')
+    if not root or not HAS_PYARROW:
+        return None
+    with _writer_lock:
+        if _shared_writer is None or _shared_writer.root != root:
+            _shared_writer = SnapshotWriter(root)
+        return _shared_writer
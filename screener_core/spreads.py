@@ -0,0 +1,286 @@
+"""
+多腿组合筛选内核（牛市看跌价差、熊市看涨价差、铁鹰式、卖出宽跨式）
+
+在单个到期日内配对行权价，全部用数组广播完成，不逐个组合循环：
+1. 每一侧只保留价外区间内（加上最大间距）的合约，按行权价排序，计算隐含波动率和 Delta
+2. 垂直价差：对每个卖出腿，用 searchsorted 找到行权价间距不超过 max_width 的买入腿窗口，
+   广播成 (卖出腿, 窗口偏移) 矩阵，按间距、净权利金和最大亏损剪枝
+3. 铁鹰式：看跌价差矩阵与看涨价差矩阵广播成 (卖出看跌, 看跌偏移, 卖出看涨, 看涨偏移)，
+   分块计算，每对卖出腿只保留收益风险比最高的一组买入腿，行数不超过两侧卖出腿数量之积
+4. 卖出宽跨式：两侧卖出腿直接广播配对，没有买入腿，风险按无保护卖出期权的保证金计算
+
+只有通过剪枝的组合才会生成 DataFrame 行。collateral 为每张组合的最大亏损（宽跨式为保证金），
+annualizedReturn 为按到期天数年化的收益风险比，因此可以和单腿策略使用同一套排序和筛选。
+卖出腿按 bid（为 0 时用 lastPrice）成交，买入腿按 ask（为 0 时用 lastPrice）成交。
+"""
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from screener_core.config import DEFAULT_SPREAD_MAX_LOSS, DEFAULT_SPREAD_MAX_WIDTH, DEFAULT_SPREAD_MIN_CREDIT
+from screener_core.filtering import (
+    SIDE_SPECS, ScreenStats, get_strategy, merge_screen_stats, option_premium, otm_strike_bounds
+)
+from screener_core.greeks import add_greeks
+from screener_core.iv_solver import fill_missing_iv
+from screener_core.schema import compact_frame
+
+SpreadLimits = namedtuple('SpreadLimits', ['max_width', 'min_credit', 'max_loss'],
+                          defaults=(DEFAULT_SPREAD_MAX_WIDTH, DEFAULT_SPREAD_MIN_CREDIT, DEFAULT_SPREAD_MAX_LOSS))
+SpreadLimits.__doc__ = """组合剪枝条件：max_width 为买入腿与卖出腿的最大行权价间距，
+min_credit 为每股最低净权利金，max_loss 为每张组合的最大亏损（美元，None 表示不限制）"""
+
+# 铁鹰式分块广播时每块的最大元素数，限制峰值内存
+CONDOR_BLOCK_ELEMENTS = 2_000_000
+# 无保护卖出期权保证金：权利金 + max(20% 标的价格 - 价外金额, 10% 行权价/标的价格)
+NAKED_MARGIN_RATE = 0.20
+NAKED_MARGIN_FLOOR = 0.10
+
+LEG_COLUMNS = ('shortPut', 'longPut', 'shortCall', 'longCall')
+
+_Side = namedtuple('_Side', ['name', 'frame', 'strike', 'sell', 'buy', 'delta', 'shorts', 'stats'])
+
+
+def _prepare_side(options_df, dte, current_price, min_otm, max_otm, name, max_width, wings,
+                  rate, dividend):
+    """取出一侧需要的合约（按行权价排序），补全隐含波动率和 Delta，标出可作为卖出腿的位置"""
+    spec = SIDE_SPECS[name]
+    if options_df is None or options_df.empty:
+        return None
+    strike = options_df['strike'].to_numpy(dtype=float)
+    min_strike, max_strike = otm_strike_bounds(current_price, min_otm, max_otm, spec)
+    margin = max_width if wings else 0.0
+    near = np.flatnonzero((strike >= min_strike - margin) & (strike <= max_strike + margin))
+    if len(near) == 0:
+        return None
+    # 只物化一次需要的行，之后的列直接写入这张表（浅拷贝避免 pandas 2.x 的链式赋值警告）
+    frame = options_df.iloc[near[np.argsort(strike[near], kind='stable')]].copy(deep=False)
+    frame['dte'] = dte
+    iv_result = fill_missing_iv(frame, current_price, name, rate, dividend)
+    has_greeks = 'delta' in frame.columns
+    if not has_greeks:
+        add_greeks(frame, current_price, name, rate, dividend)
+
+    strike = frame['strike'].to_numpy(dtype=float)
+    bid = frame['bid'].to_numpy(dtype=float)
+    last_price = frame['lastPrice'].to_numpy(dtype=float)
+    ask = frame['ask'].to_numpy(dtype=float) if 'ask' in frame.columns else np.zeros(len(frame))
+    sell = option_premium(bid, last_price)
+    buy = np.where(ask > 0, ask, last_price)
+    delta = frame['delta'].to_numpy(dtype=float)
+    shorts = np.flatnonzero((strike >= min_strike) & (strike <= max_strike) & (sell > 0))
+    stats = ScreenStats(has_greeks, iv_result, int(np.isnan(delta[shorts]).sum()))
+    return _Side(name, frame, strike, sell, buy, delta, shorts, stats)
+
+
+def _vertical_windows(side, max_width):
+    """每个卖出腿与窗口内买入腿组成的垂直价差矩阵
+
+    返回 (买入腿位置, 间距, 每股净权利金, 是否有效)，形状均为 (卖出腿数, 窗口长度)。
+    看跌价差的买入腿行权价更低，看涨价差的更高。
+    """
+    strike, shorts = side.strike, side.shorts
+    short_strike = strike[shorts]
+    if side.name == 'puts':
+        bound = np.searchsorted(strike, short_strike - max_width - 1e-9, side='left')
+        count = shorts - bound
+        sign = -1
+    else:
+        bound = np.searchsorted(strike, short_strike + max_width + 1e-9, side='right')
+        count = bound - shorts - 1
+        sign = 1
+    window = int(count.max()) if len(count) else 0
+    offsets = np.arange(1, window + 1)
+    valid = offsets[None, :] <= count[:, None]
+    longs = np.where(valid, shorts[:, None] + sign * offsets[None, :], shorts[:, None])
+    width = np.abs(short_strike[:, None] - strike[longs])
+    credit = side.sell[shorts][:, None] - side.buy[longs]
+    # 买入腿要有报价；净权利金为正且小于间距（否则报价有误）
+    valid &= (width > 0) & (side.buy[longs] > 0) & (credit > 0) & (credit < width)
+    return longs, width, credit, valid
+
+
+def _limit_mask(credit, risk, limits):
+    mask = (credit >= limits.min_credit) & (risk > 0)
+    if limits.max_loss is not None:
+        mask &= risk * 100 <= limits.max_loss
+    return mask
+
+
+def _verticals(side, limits):
+    longs, width, credit, valid = _vertical_windows(side, limits.max_width)
+    valid &= _limit_mask(credit, width - credit, limits)
+    rows, cols = np.nonzero(valid)
+    legs = {'short': side.shorts[rows], 'long': longs[rows, cols]}
+    return legs, credit[rows, cols], width[rows, cols] - credit[rows, cols], width[rows, cols]
+
+
+def _iron_condors(puts, calls, limits):
+    """每对（卖出看跌, 卖出看涨）保留收益风险比最高的一组买入腿"""
+    p_longs, p_width, p_credit, p_valid = _vertical_windows(puts, limits.max_width)
+    c_longs, c_width, c_credit, c_valid = _vertical_windows(calls, limits.max_width)
+    # 没有任何有效买入腿的卖出腿不参与配对
+    p_keep, c_keep = p_valid.any(axis=1), c_valid.any(axis=1)
+    p_shorts, p_longs, p_width, p_credit, p_valid = (
+        puts.shorts[p_keep], p_longs[p_keep], p_width[p_keep], p_credit[p_keep], p_valid[p_keep])
+    c_shorts, c_longs, c_width, c_credit, c_valid = (
+        calls.shorts[c_keep], c_longs[c_keep], c_width[c_keep], c_credit[c_keep], c_valid[c_keep])
+    n_put, n_call = len(p_shorts), len(c_shorts)
+    empty = np.array([], dtype=np.int64)
+    if n_put == 0 or n_call == 0:
+        return ({'short_put': empty, 'long_put': empty, 'short_call': empty, 'long_call': empty},
+                np.array([]), np.array([]), np.array([]))
+    wp, wc = p_width.shape[1], c_width.shape[1]
+    block = max(1, CONDOR_BLOCK_ELEMENTS // (wp * n_call * wc))
+
+    parts = []
+    for start in range(0, n_put, block):
+        stop = min(start + block, n_put)
+        credit = p_credit[start:stop, :, None, None] + c_credit[None, None, :, :]
+        width = np.maximum(p_width[start:stop, :, None, None], c_width[None, None, :, :])
+        risk = width - credit
+        valid = p_valid[start:stop, :, None, None] & c_valid[None, None, :, :] & _limit_mask(credit, risk, limits)
+        ratio = np.full(credit.shape, -np.inf)
+        np.divide(credit, risk, out=ratio, where=valid)
+        # (卖出看跌, 卖出看涨, 两侧买入腿组合) 上取收益风险比最高的一组
+        ratio = ratio.transpose(0, 2, 1, 3).reshape(stop - start, n_call, wp * wc)
+        best = ratio.argmax(axis=2)
+        found = np.take_along_axis(ratio, best[:, :, None], axis=2)[:, :, 0] > -np.inf
+        p_rows, c_rows = np.nonzero(found)
+        p_off, c_off = np.divmod(best[p_rows, c_rows], wc)
+        p_rows += start
+        parts.append((p_rows, p_off, c_rows, c_off))
+
+    p_rows, p_off, c_rows, c_off = (np.concatenate(items) for items in zip(*parts))
+    credit = p_credit[p_rows, p_off] + c_credit[c_rows, c_off]
+    width = np.maximum(p_width[p_rows, p_off], c_width[c_rows, c_off])
+    legs = {
+        'short_put': p_shorts[p_rows], 'long_put': p_longs[p_rows, p_off],
+        'short_call': c_shorts[c_rows], 'long_call': c_longs[c_rows, c_off],
+    }
+    return legs, credit, width - credit, width
+
+
+def _naked_requirement(sell, strike, current_price, side):
+    """单个无保护卖出期权每股的保证金"""
+    if side == 'puts':
+        out_of_money = np.maximum(current_price - strike, 0.0)
+        floor = NAKED_MARGIN_FLOOR * strike
+    else:
+        out_of_money = np.maximum(strike - current_price, 0.0)
+        floor = NAKED_MARGIN_FLOOR * current_price
+    return sell + np.maximum(NAKED_MARGIN_RATE * current_price - out_of_money, floor)
+
+
+def _strangles(puts, calls, current_price, limits):
+    """两侧卖出腿配对；保证金取两侧要求中较高者加上另一侧的权利金"""
+    p_sell, c_sell = puts.sell[puts.shorts], calls.sell[calls.shorts]
+    p_req = _naked_requirement(p_sell, puts.strike[puts.shorts], current_price, 'puts')
+    c_req = _naked_requirement(c_sell, calls.strike[calls.shorts], current_price, 'calls')
+    credit = p_sell[:, None] + c_sell[None, :]
+    risk = np.maximum(p_req[:, None] + c_sell[None, :], c_req[None, :] + p_sell[:, None])
+    p_rows, c_rows = np.nonzero(_limit_mask(credit, risk, limits))
+    legs = {'short_put': puts.shorts[p_rows], 'short_call': calls.shorts[c_rows]}
+    return legs, credit[p_rows, c_rows], risk[p_rows, c_rows], np.full(len(p_rows), np.nan)
+
+
+def _materialize(legs, credit, risk, width, dte):
+    """按各腿位置生成结果 DataFrame；legs 为 [(列名, _Side, 是否卖出, 位置数组), ...]"""
+    n = len(credit)
+    symbols = None
+    net_delta = np.zeros(n)
+    short_delta = np.zeros(n)
+    volume = None
+    open_interest = None
+    columns = {}
+    for column, side, is_short, positions in legs:
+        frame = side.frame
+        leg_symbols = frame['contractSymbol'].to_numpy(dtype=object)[positions]
+        symbols = leg_symbols if symbols is None else symbols + '/' + leg_symbols
+        delta = side.delta[positions]
+        if is_short:
+            net_delta -= delta
+            short_delta = np.fmax(short_delta, np.abs(delta))
+        else:
+            net_delta += delta
+        leg_volume = pd.to_numeric(frame['volume'], errors='coerce').fillna(0).to_numpy()[positions]
+        leg_oi = pd.to_numeric(frame['openInterest'], errors='coerce').fillna(0).to_numpy()[positions]
+        # 组合的流动性受最差的一条腿限制
+        volume = leg_volume if volume is None else np.minimum(volume, leg_volume)
+        open_interest = leg_oi if open_interest is None else np.minimum(open_interest, leg_oi)
+        columns[column] = side.strike[positions]
+
+    collateral = risk * 100
+    result = pd.DataFrame({
+        'contractSymbol': symbols,
+        'strike': columns.get('shortPut', columns.get('shortCall')),
+        **{column: columns.get(column, np.full(n, np.nan)) for column in LEG_COLUMNS},
+        'width': width,
+        'volume': volume,
+        'openInterest': open_interest,
+        'premium': credit,
+        'collateral': collateral,
+        'returnOnRisk': credit * 100 / collateral,
+        'annualizedReturn': credit * 100 / collateral * (365 / dte),
+        'dte': np.full(n, dte),
+        'delta': net_delta,
+        'real_delta': short_delta,
+    })
+    return compact_frame(result)
+
+
+def screen_spreads(chain, dte, current_price, min_otm, max_otm, strategy, rate=0.0, dividend=0.0,
+                   limits=None):
+    """筛选单个到期日的多腿组合
+
+    chain 为含 puts 和 calls 两侧的 OptionChain；min_otm / max_otm 为卖出腿的价外区间。
+    返回 (筛选结果, ScreenStats)，结果未排序，列类型为 schema.compact_frame 的紧凑类型。
+    """
+    spec = get_strategy(strategy)
+    limits = limits or SpreadLimits()
+    sides = {}
+    for name in spec.sides:
+        options_df = chain.puts if name == 'puts' else chain.calls
+        sides[name] = _prepare_side(options_df, dte, current_price, min_otm, max_otm, name,
+                                    limits.max_width, spec.wings, rate, dividend)
+    stats = merge_screen_stats([side.stats for side in sides.values() if side is not None])
+    if any(side is None or len(side.shorts) == 0 for side in sides.values()):
+        return pd.DataFrame(), stats
+
+    puts, calls = sides.get('puts'), sides.get('calls')
+    if len(sides) == 1:
+        side = puts or calls
+        legs, credit, risk, width = _verticals(side, limits)
+        prefix = 'Put' if side is puts else 'Call'
+        legs = [(f'short{prefix}', side, True, legs['short']), (f'long{prefix}', side, False, legs['long'])]
+    elif spec.wings:
+        legs, credit, risk, width = _iron_condors(puts, calls, limits)
+        legs = [('shortPut', puts, True, legs['short_put']), ('longPut', puts, False, legs['long_put']),
+                ('shortCall', calls, True, legs['short_call']), ('longCall', calls, False, legs['long_call'])]
+    else:
+        legs, credit, risk, width = _strangles(puts, calls, current_price, limits)
+        legs = [('shortPut', puts, True, legs['short_put']), ('shortCall', calls, True, legs['short_call'])]
+
+    if len(credit) == 0:
+        return pd.DataFrame(), stats
+    return _materialize(legs, credit, risk, width, dte), stats
+
+
+def screen_spread_chains(chains, current_price, min_otm, max_otm, strategy, rate=0.0, dividend=0.0,
+                         limits=None):
+    """逐个到期日筛选多腿组合并按到期日顺序拼接
+
+    chains 为 [(exp, dte, OptionChain), ...]；结果与逐个调用 screen_spreads 后拼接一致。
+    """
+    frames, stats = [], []
+    for _, dte, chain in chains:
+        if chain is None:
+            continue
+        result, chain_stats = screen_spreads(chain, dte, current_price, min_otm, max_otm, strategy,
+                                             rate, dividend, limits)
+        if not result.empty:
+            frames.append(result)
+            stats.append(chain_stats)
+    if not frames:
+        return pd.DataFrame(), merge_screen_stats(stats)
+    return pd.concat(frames), merge_screen_stats(stats)
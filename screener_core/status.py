@@ -0,0 +1,42 @@
+"""
+筛选过程的状态信息
+
+核心库不直接输出界面提示，而是把提示写入 logging，同时按顺序记录下来随结果返回，
+由调用方（Streamlit 界面、命令行）决定如何展示。
+"""
+
+import logging
+
+LEVELS = {
+    'info': logging.INFO,
+    'success': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+}
+
+
+class StatusLog:
+    """收集 (级别, 文本) 形式的状态信息，级别为 info/success/warning/error"""
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger('screener_core')
+        self.messages = []
+
+    def add(self, level, message):
+        self.messages.append((level, message))
+        self.logger.log(LEVELS[level], message)
+
+    def info(self, message):
+        self.add('info', message)
+
+    def success(self, message):
+        self.add('success', message)
+
+    def warning(self, message):
+        self.add('warning', message)
+
+    def error(self, message):
+        self.add('error', message)
+
+    def errors(self):
+        return [message for level, message in self.messages if level == 'error']
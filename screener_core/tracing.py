@@ -0,0 +1,261 @@
+"""
+热路径耗时埋点
+
+用 span('阶段名', expiration=...) 包住需要计时的代码：
+- 每个 span 的耗时都计入进程内共享的 StageMetrics，按阶段统计次数、总耗时和近期样本的
+  p50/p95/p99，可导出为 Prometheus 文本格式（写入文件或由本地 HTTP 端点提供）
+- 当前上下文中有 Trace（由 trace() 开启）时，span 同时记录起止时间，供界面绘制瀑布图
+
+Trace 通过 contextvars 传递；提交到线程池的任务需要用 contextvars.copy_context().run
+执行才能继承调用方的 Trace。
+
+通过环境变量导出指标：
+    OPTION_SCREENER_METRICS_FILE   每次筛选完成后把指标写入该文件（可供 node_exporter 的 textfile 收集器读取）
+    OPTION_SCREENER_METRICS_PORT   在本地该端口启动 HTTP 端点，GET /metrics 返回指标
+"""
+
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+Span = namedtuple('Span', ['name', 'start', 'end', 'attrs', 'thread'])
+Span.__doc__ = """一段计时：start / end 为相对于 Trace 开始时刻的秒数，attrs 为附加标签（如到期日）"""
+
+
+class Trace:
+    """收集一次筛选过程中的全部 span，可在多个线程中同时写入"""
+
+    def __init__(self, name=''):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end, attrs):
+        item = Span(name, start - self.origin, end - self.origin, attrs, threading.current_thread().name)
+        with self._lock:
+            self.spans.append(item)
+
+    def frame(self):
+        """按开始时间排序的 span 表，列为 stage / label / start / end / duration / thread"""
+        import pandas as pd
+        with self._lock:
+            spans = sorted(self.spans, key=lambda item: item.start)
+        rows = []
+        seen = {}
+        for item in spans:
+            label = ' '.join([item.name] + [str(value) for value in item.attrs.values() if value not in (None, '')])
+            # 同名 span 加序号区分，瀑布图中每个 span 各占一行
+            seen[label] = seen.get(label, 0) + 1
+            if seen[label] > 1:
+                label = f"{label} #{seen[label]}"
+            rows.append({
+                'stage': item.name,
+                'label': label,
+                'start': item.start,
+                'end': item.end,
+                'duration': item.end - item.start,
+                'thread': item.thread,
+            })
+        return pd.DataFrame(rows, columns=['stage', 'label', 'start', 'end', 'duration', 'thread'])
+
+    def totals(self):
+        """各阶段的 (次数, 总耗时)，按总耗时从大到小排列"""
+        totals = {}
+        with self._lock:
+            for item in self.spans:
+                count, seconds = totals.get(item.name, (0, 0.0))
+                totals[item.name] = (count + 1, seconds + item.end - item.start)
+        return dict(sorted(totals.items(), key=lambda entry: -entry[1][1]))
+
+
+class StageMetrics:
+    """按阶段累计耗时：总次数和总耗时覆盖进程运行以来的全部样本，分位数取最近 window 个样本"""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = [0, 0.0, deque(maxlen=self.window)]
+            stage[0] += 1
+            stage[1] += seconds
+            stage[2].append(seconds)
+
+    def snapshot(self):
+        """返回 {阶段: {'count', 'sum', 'quantiles': {q: 秒}}}"""
+        with self._lock:
+            stages = {name: (count, total, sorted(samples))
+                      for name, (count, total, samples) in self._stages.items()}
+        return {
+            name: {'count': count, 'sum': total, 'quantiles': {q: _quantile(samples, q) for q in QUANTILES}}
+            for name, (count, total, samples) in sorted(stages.items())
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+def _quantile(sorted_samples, q):
+    """最近秩法分位数"""
+    if not sorted_samples:
+        return float('nan')
+    index = min(len(sorted_samples) - 1, max(0, math.ceil(q * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+_current_trace = contextvars.ContextVar('screener_trace', default=None)
+_shared_metrics = StageMetrics()
+
+
+def shared_metrics():
+    """返回进程内共享的阶段耗时统计"""
+    return _shared_metrics
+
+
+def current_trace():
+    """返回当前上下文中的 Trace，没有时返回 None"""
+    return _current_trace.get()
+
+
+@contextmanager
+def trace(name=''):
+    """在 with 块内开启一个 Trace，块内（及继承上下文的线程中）的 span 都记录到它"""
+    item = Trace(name)
+    token = _current_trace.set(item)
+    try:
+        yield item
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """计时一个阶段；出错时同样记录耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _shared_metrics.observe(name, end - start)
+        item = _current_trace.get()
+        if item is not None:
+            item.add(name, start, end, attrs)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(metrics=None, cache_stats=None, flight_stats=None):
+    """把阶段耗时、期权链缓存和请求合并的计数渲染为 Prometheus 文本格式
+
+    cache_stats / flight_stats 默认读取进程内共享的期权链缓存和请求合并器。
+    """
+    if cache_stats is None:
+        from screener_core.chain_cache import shared_cache
+        cache_stats = shared_cache().stats()
+    if flight_stats is None:
+        from screener_core.singleflight import shared_flight
+        flight_stats = shared_flight().stats()
+    stages = (metrics or _shared_metrics).snapshot()
+
+    lines = [
+        '# HELP option_screener_stage_seconds Time spent in each screening stage.',
+        '# TYPE option_screener_stage_seconds summary',
+    ]
+    for name, stage in stages.items():
+        for q, seconds in stage['quantiles'].items():
+            lines.append(f'option_screener_stage_seconds{{stage="{_label(name)}",quantile="{q}"}} {seconds:.6f}')
+        lines.append(f'option_screener_stage_seconds_sum{{stage="{_label(name)}"}} {stage["sum"]:.6f}')
+        lines.append(f'option_screener_stage_seconds_count{{stage="{_label(name)}"}} {stage["count"]}')
+
+    lines += [
+        '# HELP option_screener_chain_cache_lookups_total Option chain cache lookups by result.',
+        '# TYPE option_screener_chain_cache_lookups_total counter',
+        f'option_screener_chain_cache_lookups_total{{result="hit"}} {cache_stats["hits"]}',
+        f'option_screener_chain_cache_lookups_total{{result="disk_hit"}} {cache_stats["disk_hits"]}',
+        f'option_screener_chain_cache_lookups_total{{result="miss"}} {cache_stats["misses"]}',
+        '# HELP option_screener_chain_cache_hit_ratio Share of option chain cache lookups served from cache.',
+        '# TYPE option_screener_chain_cache_hit_ratio gauge',
+        f'option_screener_chain_cache_hit_ratio {cache_stats["hit_rate"]:.6f}',
+        '# HELP option_screener_chain_cache_bytes Bytes held by the in-memory option chain cache.',
+        '# TYPE option_screener_chain_cache_bytes gauge',
+        f'option_screener_chain_cache_bytes {cache_stats["bytes"]}',
+        '# HELP option_screener_upstream_requests_total Requests sent to the market data provider.',
+        '# TYPE option_screener_upstream_requests_total counter',
+    ]
+    by_kind = flight_stats['by_kind']
+    for kind, counts in by_kind.items():
+        lines.append(f'option_screener_upstream_requests_total{{kind="{_label(kind)}"}} {counts["upstream"]}')
+    lines += [
+        '# HELP option_screener_coalesced_requests_total Requests served by an in-flight upstream request.',
+        '# TYPE option_screener_coalesced_requests_total counter',
+    ]
+    for kind, counts in by_kind.items():
+        lines.append(f'option_screener_coalesced_requests_total{{kind="{_label(kind)}"}} {counts["coalesced"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path, metrics=None):
+    """把指标原子地写入文件，读取方不会看到写了一半的内容"""
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render_prometheus(metrics))
+    os.replace(tmp_path, path)
+    return path
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    """在后台线程中启动指标端点并返回服务器对象；重复调用返回已启动的服务器"""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            server = ThreadingHTTPServer((host, port), MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+            _server = server
+        return _server
+
+
+def export_metrics():
+    """按环境变量导出指标：启动本地端点（只启动一次）和/或写入指标文件"""
+    port = os.environ.get('OPTION_SCREENER_METRICS_PORT')
+    if port:
+        serve_metrics(int(port))
+    path = os.environ.get('OPTION_SCREENER_METRICS_FILE')
+    if path:
+        write_prometheus(path)
@@ -0,0 +1,78 @@
+"""
+筛选服务与客户端共用的数据格式
+
+命令行、筛选服务（service）和客户端（service_client）共用的策略简称，以及 ScreenResult、
+IVSurface 与 JSON 结构之间的转换。模块顶层只导入标准库和 providers，客户端进程不会因此
+加载筛选流程、期权链缓存或服务端代码。
+"""
+
+from collections import namedtuple
+from screener_core.providers import frame_from_payload, frame_to_payload
+
+STRATEGY_NAMES = {
+    'put': "现金担保看跌期权",
+    'call': "备兑看涨期权",
+}
+# 多腿组合只用于筛选，快照和回测只支持单腿策略
+SPREAD_NAMES = {
+    'put-spread': "牛市看跌价差",
+    'call-spread': "熊市看涨价差",
+    'condor': "铁鹰式",
+    'strangle': "卖出宽跨式",
+}
+SCREEN_STRATEGY_NAMES = {**STRATEGY_NAMES, **SPREAD_NAMES}
+
+ScreenResult = namedtuple('ScreenResult', ['ticker', 'result', 'current_price', 'error', 'messages', 'surface'],
+                          defaults=(None,))
+ScreenResult.__doc__ = """单个股票的筛选结果
+
+result 为按年化收益率排序的 DataFrame（没有机会时为空），获取数据失败时为 None；
+error 为失败原因；messages 为筛选过程中的 (级别, 文本) 状态信息；
+surface 为由全部已获取到期日构建的 iv_surface.IVSurface（无法构建时为 None）。
+"""
+
+
+def encode_surface(surface):
+    """IVSurface 转为 JSON 结构"""
+    if surface is None:
+        return None
+    return {
+        'spot': surface.spot,
+        'dtes': surface.dtes.tolist(),
+        'grid': surface.grid.tolist(),
+        'total_variance': [[None if value != value else value for value in row]
+                           for row in surface.total_variance.tolist()],
+        'points': surface.points,
+    }
+
+
+def decode_surface(payload):
+    if payload is None:
+        return None
+    import numpy as np
+    from screener_core.iv_surface import IVSurface
+    return IVSurface(payload['spot'], payload['dtes'], payload['grid'],
+                     np.array(payload['total_variance'], dtype=float), payload['points'])
+
+
+def encode_result(result):
+    """ScreenResult 转为 JSON 结构"""
+    return {
+        'ticker': result.ticker,
+        'result': None if result.result is None else frame_to_payload(result.result),
+        'current_price': result.current_price,
+        'error': None if result.error is None else str(result.error),
+        'messages': [list(message) for message in result.messages],
+        'surface': encode_surface(result.surface),
+    }
+
+
+def decode_result(payload):
+    return ScreenResult(
+        payload['ticker'],
+        None if payload['result'] is None else frame_from_payload(payload['result']),
+        payload['current_price'],
+        payload['error'],
+        [tuple(message) for message in payload['messages']],
+        decode_surface(payload.get('surface')),
+    )
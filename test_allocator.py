@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+组合配置测试：满足全部约束、接近穷举最优解、几千个候选即时完成（使用本地模拟数据，不访问网络）
+"""
+
+import itertools
+import time
+import numpy as np
+import pandas as pd
+from screener_core import cli, providers
+from screener_core.allocator import AllocationLimits, allocate
+from screener_core.filtering import CASH_SECURED_PUT
+from screener_core.formatting import format_allocation_df
+from screener_core.pipeline import screen_watchlist
+from screener_core.ranking import rank_watchlist_results
+from benchmarks.synthetic import SyntheticProvider, make_universe
+
+
+def _candidates(n, tickers=5, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'ticker': pd.Categorical(rng.choice([f'T{i:02d}' for i in range(tickers)], n)),
+        'dte': rng.choice([7, 14, 30, 45], n),
+        'collateral': rng.uniform(500, 5000, n).round(),
+        'premium': rng.uniform(0.1, 3.0, n).astype(np.float32),
+        'real_delta': rng.uniform(0.05, 0.5, n).astype(np.float32),
+    })
+
+
+def _check_feasible(df, allocation, limits):
+    book = allocation.book
+    assert (book['quantity'] > 0).all()
+    if limits.max_contracts is not None:
+        assert (book['quantity'] <= limits.max_contracts).all()
+    cost = book['collateral'] * book['quantity']
+    assert cost.sum() <= limits.budget + 1e-6
+    assert (cost.groupby(book['ticker'], observed=True).sum() <= limits.budget * limits.max_ticker_fraction + 1e-6).all()
+    assert (cost.groupby(book['dte']).sum() <= limits.budget * limits.max_expiry_fraction + 1e-6).all()
+    delta = (book['real_delta'].astype(float) * 100 * book['quantity']).sum()
+    if limits.max_delta is not None:
+        assert delta <= limits.max_delta + 1e-6
+    np.testing.assert_allclose(allocation.collateral, cost.sum())
+    np.testing.assert_allclose(allocation.delta, delta)
+    np.testing.assert_allclose(allocation.value, (book['premium'].astype(float) * 100 * book['quantity']).sum())
+    # 选中的合约保持原结果中的顺序
+    assert df.index.get_indexer(book.index).tolist() == sorted(df.index.get_indexer(book.index))
+
+
+def _brute_force(df, limits):
+    cost = df['collateral'].to_numpy()
+    value = df['premium'].to_numpy(dtype=float) * 100
+    delta = df['real_delta'].to_numpy(dtype=float) * 100
+    best = 0.0
+    for quantity in itertools.product(range(limits.max_contracts + 1), repeat=len(df)):
+        quantity = np.array(quantity)
+        spent = cost * quantity
+        if spent.sum() > limits.budget:
+            continue
+        if limits.max_delta is not None and (delta * quantity).sum() > limits.max_delta:
+            continue
+        if (pd.Series(spent).groupby(df['ticker'].to_numpy()).sum() > limits.budget * limits.max_ticker_fraction).any():
+            continue
+        if (pd.Series(spent).groupby(df['dte'].to_numpy()).sum() > limits.budget * limits.max_expiry_fraction).any():
+            continue
+        best = max(best, (value * quantity).sum())
+    return best
+
+
+def test_close_to_optimal_on_small_instances():
+    ratios = []
+    for seed in range(40):
+        df = _candidates(6, tickers=2, seed=seed)
+        limits = AllocationLimits(8000, 0.6, 0.8, None if seed % 2 else 60, 2)
+        allocation = allocate(df, limits)
+        _check_feasible(df, allocation, limits)
+        best = _brute_force(df, limits)
+        assert allocation.value <= best + 1e-6
+        ratios.append(allocation.value / best if best else 1.0)
+    assert np.mean(ratios) > 0.97 and min(ratios) > 0.75
+
+
+def test_repair_swaps_out_small_contracts():
+    # 贪心先买满单位收益略高的小合约，剩余资金放不下收益高得多的大合约
+    df = pd.DataFrame({
+        'ticker': ['AAA', 'BBB'],
+        'dte': [30, 30],
+        'collateral': [600.0, 1000.0],
+        'premium': [0.61, 1.0],
+        'real_delta': [0.2, 0.2],
+    })
+    allocation = allocate(df, AllocationLimits(1000, 1.0, 1.0, None, 1))
+    assert allocation.book['ticker'].tolist() == ['BBB']
+    assert allocation.value == 100.0
+
+
+def test_thousands_of_candidates_interactively():
+    df = _candidates(5000, tickers=50, seed=1)
+    limits = AllocationLimits(1_000_000, 0.1, 0.4, 5000, 10)
+    start = time.perf_counter()
+    allocation = allocate(df, limits)
+    assert time.perf_counter() - start < 1
+    _check_feasible(df, allocation, limits)
+    # 剩余容量不足以再买入任何一张合约
+    assert allocation.delta > limits.max_delta - 100 * df['real_delta'].max()
+    assert allocate(df.iloc[:0], limits).book.empty
+
+
+def test_screened_watchlist_and_expected_pnl_objective():
+    universe = make_universe(n_tickers=3, n_expirations=4, strikes_per_expiration=120, seed=31)
+    results = list(screen_watchlist(list(universe), 1, 90, 0.02, 0.3, CASH_SECURED_PUT,
+                                    provider=SyntheticProvider(universe)))
+    ranked = rank_watchlist_results(results)
+    limits = AllocationLimits(500_000, 0.4, 0.5, 1000, 5)
+    allocation = allocate(ranked, limits)
+    _check_feasible(ranked, allocation, limits)
+    assert allocation.book['ticker'].nunique() == 3
+    display = format_allocation_df(allocation.book)
+    assert list(display.columns[:3]) == ['张数', '占用资金', '权利金合计']
+
+    pnl = ranked.assign(expectedPnl=ranked['premium'].astype(float) * 100 - 10)
+    by_pnl = allocate(pnl, limits, objective='expectedPnl')
+    np.testing.assert_allclose(by_pnl.value, (by_pnl.book['expectedPnl'] * by_pnl.book['quantity']).sum(), rtol=1e-6)
+
+
+def test_cli_budget(tmp_path):
+    universe = make_universe(n_tickers=3, n_expirations=4, strikes_per_expiration=120, seed=32)
+    previous = providers.get_provider()
+    providers.set_provider(SyntheticProvider(universe))
+    try:
+        output = tmp_path / 'book.csv'
+        assert cli.main(['screen', *universe, '--min-dte', '1', '--max-dte', '90', '--budget', '30000',
+                         '--max-ticker-fraction', '0.4', '--max-contracts', '3', '-o', str(output)]) == 0
+    finally:
+        providers.set_provider(previous)
+    df = pd.read_csv(output)
+    spent = df['collateral'] * df['quantity']
+    assert 0 < spent.sum() <= 30000
+    assert (spent.groupby(df['ticker']).sum() <= 12000).all()
+    assert df['quantity'].between(1, 3).all()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+回测引擎测试（合成快照和价格，不访问网络）
+"""
+
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from screener_core import cli
+from screener_core.backtest import (
+    ASSIGNED, ROLLED, BacktestParams, param_grid, run_backtest, run_sweep
+)
+from screener_core.filtering import COVERED_CALL
+from screener_core.chain_cache import HAS_PYARROW
+from screener_core.greeks import black_scholes_price
+from screener_core.snapshots import SnapshotWriter
+
+
+def _market(tickers=('AAA', 'BBB'), days=160, seed=0):
+    """每个交易日一份快照（到期日为 60 天内的周五，行权价网格固定），价格为几何布朗运动"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2030-01-02', periods=days)
+    strikes = np.arange(60.0, 140.1, 2.5)
+    closes, frames = {}, []
+    for ticker in tickers:
+        path = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+        closes[ticker] = path
+        day, exp, spot = [], [], []
+        for d, s in zip(dates, path):
+            for k in range(1, 61):
+                if (d + timedelta(days=k)).weekday() == 4:
+                    day.append(d)
+                    exp.append(d + timedelta(days=k))
+                    spot.append(s)
+        day, exp, spot = (np.repeat(np.array(a), len(strikes)) for a in (day, exp, spot))
+        strike = np.tile(strikes, len(day) // len(strikes))
+        dte = (exp - day).astype('timedelta64[D]').astype(int)
+        for option_type, code in (('puts', 'P'), ('calls', 'C')):
+            fair = black_scholes_price(spot, strike, dte, 0.3, option_type, 0.04)
+            exp_str = pd.DatetimeIndex(exp).strftime('%Y-%m-%d')
+            frames.append(pd.DataFrame({
+                'ticker': ticker,
+                'date': pd.DatetimeIndex(day).strftime('%Y-%m-%d'),
+                'snapshot_time': pd.DatetimeIndex(day).tz_localize('UTC'),
+                'spot': spot,
+                'option_type': option_type,
+                'expiration': exp_str,
+                'dte': dte,
+                'contractSymbol': [f"{ticker}{e}{code}{k:.1f}" for e, k in zip(exp_str, strike)],
+                'strike': strike,
+                'bid': np.round(fair * 0.98, 2),
+                'ask': np.round(fair * 1.02 + 0.01, 2),
+                'lastPrice': np.round(fair, 2),
+            }))
+    return pd.concat(frames, ignore_index=True), pd.DataFrame(closes, index=dates)
+
+
+SNAPSHOTS, PRICES = _market()
+
+
+def _reference(snapshots, prices, params):
+    """逐笔循环的参考实现：持有到期，到期后的下一个快照日开新仓"""
+    trades = []
+    for ticker, group in snapshots[snapshots['option_type'] == 'puts'].groupby('ticker'):
+        days = sorted(group['date'].unique())
+        day = days[0]
+        while day is not None:
+            rows = group[group['date'] == day]
+            premium = np.where(rows['bid'] > 0, rows['bid'], rows['lastPrice'])
+            spot = rows['spot'].iloc[0]
+            ok = ((rows['dte'] >= params.min_dte) & (rows['dte'] <= params.max_dte)
+                  & (rows['strike'] >= spot * (1 - params.max_otm))
+                  & (rows['strike'] <= spot * (1 - params.min_otm)) & (premium > 0))
+            if not ok.any():
+                later = [d for d in days if d > day]
+                day = later[0] if later else None
+                continue
+            ann = premium * 100 / (rows['strike'] * 100) * 365 / rows['dte']
+            best = ann[ok].idxmax()
+            row = rows.loc[best]
+            exp = pd.Timestamp(row['expiration'])
+            if exp > prices.index[-1]:
+                break
+            settle = prices[ticker][prices.index <= exp].iloc[-1]
+            pnl = (premium[rows.index.get_loc(best)] - max(row['strike'] - settle, 0)) * 100
+            trades.append((row['contractSymbol'], pnl))
+            later = [d for d in days if pd.Timestamp(d) > exp]
+            day = later[0] if later else None
+    return trades
+
+
+def test_matches_reference_loop():
+    params = BacktestParams(min_dte=20, max_dte=40, min_otm=0.02, max_otm=0.15)
+    result = run_backtest(SNAPSHOTS, PRICES, params)
+    trades = result.trades[result.trades['outcome'] != 'open'].sort_values(['ticker', 'entry_date'])
+    expected = _reference(SNAPSHOTS, PRICES, params)
+    assert list(trades['contractSymbol']) == [symbol for symbol, _ in expected]
+    assert np.allclose(trades['pnl'], [pnl for _, pnl in expected])
+    assert result.summary['trades'] == len(expected)
+    # 开仓间隔不重叠
+    for _, group in trades.groupby('ticker'):
+        assert (group['entry_date'].iloc[1:].to_numpy() > group['exit_date'].iloc[:-1].to_numpy()).all()
+
+
+def test_roll_and_covered_call():
+    rolled = run_backtest(SNAPSHOTS, PRICES, BacktestParams(min_dte=20, max_dte=40, roll_dte=7))
+    closed = rolled.trades[rolled.trades['outcome'] == ROLLED]
+    assert len(closed) > 0
+    assert ((closed['expiration'] - closed['exit_date']).dt.days <= 7).all()
+
+    calls = run_backtest(SNAPSHOTS, PRICES, BacktestParams(COVERED_CALL, 20, 40, 0.0, 0.1))
+    assigned = calls.trades[calls.trades['outcome'] == ASSIGNED]
+    # 被行权时收益 = 权利金 + 行权价 - 开仓现价
+    assert np.allclose(assigned['pnl'], (assigned['premium'] + assigned['strike'] - assigned['spot']) * 100)
+
+
+def test_sweep_in_process_pool_matches_serial():
+    grid = param_grid(min_dte=[14, 28], max_otm=[0.1, 0.2])
+    assert len(grid) == 4
+    serial = run_sweep(SNAPSHOTS, PRICES, grid, processes=1)
+    pooled = run_sweep(SNAPSHOTS, PRICES, grid, processes=2)
+    pd.testing.assert_frame_equal(serial, pooled)
+    assert (serial['trades'] > 0).all()
+
+
+@pytest.mark.skipif(not HAS_PYARROW, reason="需要 pyarrow")
+def test_cli_backtest_from_snapshot_store(tmp_path):
+    writer = SnapshotWriter(str(tmp_path / 'snapshots'))
+    subset = SNAPSHOTS[(SNAPSHOTS['ticker'] == 'AAA') & (SNAPSHOTS['option_type'] == 'puts')]
+    for day, group in subset[subset['date'] < '2030-03-01'].groupby('date'):
+        chains = []
+        for exp, chain in group.groupby('expiration'):
+            chain = chain.drop(columns=['ticker', 'date', 'spot', 'option_type', 'expiration', 'dte', 'snapshot_time'])
+            chain.attrs['fetched_at'] = pd.Timestamp(day + ' 15:00', tz='UTC').timestamp()
+            chains.append((exp, int(group.loc[group['expiration'] == exp, 'dte'].iloc[0]), chain))
+        writer.write('AAA', group['spot'].iloc[0], 'puts', chains)
+    PRICES.to_csv(tmp_path / 'closes.csv')
+
+    out = tmp_path / 'trades.csv'
+    assert cli.main(['backtest', '--dir', str(tmp_path / 'snapshots'), '--prices', str(tmp_path / 'closes.csv'),
+                     '--min-dte', '20', '--max-dte', '40', '-o', str(out)]) == 0
+    trades = pd.read_csv(out)
+    assert len(trades) > 0 and set(trades['ticker']) == {'AAA'}
+
+    sweep = tmp_path / 'sweep.csv'
+    assert cli.main(['backtest', '--dir', str(tmp_path / 'snapshots'), '--prices', str(tmp_path / 'closes.csv'),
+                     '--min-dte', '14', '20', '--processes', '1', '-o', str(sweep)]) == 0
+    assert list(pd.read_csv(sweep)['min_dte']) == [14, 20]
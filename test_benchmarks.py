@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+基准测试套件测试（只运行极小规模，检查输出结构和回退判断）
+"""
+
+import copy
+from benchmarks.suite import STAGES, compare_results, run_suite
+
+
+def test_suite_reports_every_stage():
+    report = run_suite(sizes=[200], tickers=2, expirations=2, repeat=1)
+    assert [r['stage'] for r in report['results']] == STAGES
+    for record in report['results']:
+        assert record['contracts'] == 200
+        assert record['best_seconds'] > 0
+        assert record['peak_bytes'] >= 0
+    footprint, = report['bytes_per_contract']
+    assert footprint['chain_compact'] < footprint['chain_raw']
+
+    slower = copy.deepcopy(report)
+    for record in slower['results']:
+        record['best_seconds'] = record['best_seconds'] * 2 + 0.01
+    rows = compare_results(report, slower)
+    flagged = {stage for stage, _, metric, _, _, regressed in rows if regressed}
+    assert flagged == set(STAGES)
+    assert not any(regressed for *_, regressed in compare_results(report, report))
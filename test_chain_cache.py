@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+期权链缓存测试
+"""
+
+from datetime import datetime
+import pandas as pd
+import pytest
+from screener_core import chain_cache
+from screener_core.chain_cache import ChainCache, compute_expiry, is_market_open, next_market_open
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _ny(*args):
+    return datetime(*args, tzinfo=chain_cache.MARKET_TZ).timestamp()
+
+
+def _chain(rows=10, offset=0.0):
+    return pd.DataFrame({
+        'contractSymbol': [f"TEST{i:04d}" for i in range(rows)],
+        'strike': [100.0 + i + offset for i in range(rows)],
+        'bid': [1.0] * rows,
+    })
+
+
+needs_tz = pytest.mark.skipif(chain_cache.MARKET_TZ is None, reason="缺少时区数据")
+
+
+@needs_tz
+def test_market_hours():
+    assert is_market_open(_ny(2030, 1, 2, 10, 0))       # 周三盘中
+    assert not is_market_open(_ny(2030, 1, 2, 17, 0))   # 收盘后
+    assert not is_market_open(_ny(2030, 1, 5, 12, 0))   # 周六
+    # 周五收盘后的下一个开盘是周一 9:30
+    assert next_market_open(_ny(2030, 1, 4, 18, 0)) == _ny(2030, 1, 7, 9, 30)
+    # 盘中按 TTL 过期，盘后保留到下一个开盘
+    assert compute_expiry(_ny(2030, 1, 2, 10, 0), 300) == _ny(2030, 1, 2, 10, 5)
+    assert compute_expiry(_ny(2030, 1, 2, 20, 0), 300) == _ny(2030, 1, 3, 9, 30)
+
+
+@needs_tz
+def test_ttl_expiry_and_counters():
+    clock = FakeClock(_ny(2030, 1, 2, 10, 0))
+    cache = ChainCache(ttl=60, clock=clock)
+    assert cache.get('spy', '2030-02-15', 'puts') is None
+    cache.put('spy', '2030-02-15', 'puts', _chain())
+    assert cache.get('SPY', '2030-02-15', 'puts') is not None
+    clock.now += 61
+    assert cache.get('SPY', '2030-02-15', 'puts') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 2, 1)
+
+
+def test_lru_eviction_by_bytes():
+    size = chain_cache.frame_nbytes(_chain())
+    cache = ChainCache(max_bytes=size * 2, market_hours_aware=False)
+    cache.put('AAA', '2030-01-18', 'puts', _chain())
+    cache.put('BBB', '2030-01-18', 'puts', _chain())
+    cache.get('AAA', '2030-01-18', 'puts')  # AAA 变为最近使用
+    cache.put('CCC', '2030-01-18', 'puts', _chain())
+    assert cache.get('BBB', '2030-01-18', 'puts') is None
+    assert cache.get('AAA', '2030-01-18', 'puts') is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= size * 2
+
+
+@pytest.mark.skipif(not chain_cache.HAS_PYARROW, reason="需要 pyarrow")
+def test_disk_tier_survives_restart(tmp_path):
+    clock = FakeClock(1_900_000_000.0)
+    first = ChainCache(ttl=300, disk_dir=str(tmp_path), market_hours_aware=False, clock=clock)
+    first.put('QQQ', '2030-03-15', 'calls', _chain(offset=0.5))
+
+    restarted = ChainCache(ttl=300, disk_dir=str(tmp_path), market_hours_aware=False, clock=clock)
+    df = restarted.get('QQQ', '2030-03-15', 'calls')
+    pd.testing.assert_frame_equal(df, _chain(offset=0.5))
+    assert restarted.stats()['disk_hits'] == 1
+
+    clock.now += 301
+    expired = ChainCache(ttl=300, disk_dir=str(tmp_path), market_hours_aware=False, clock=clock)
+    assert expired.get('QQQ', '2030-03-15', 'calls') is None
+
+
+@pytest.mark.skipif(not chain_cache.HAS_PYARROW, reason="需要 pyarrow")
+def test_disk_tier_ignores_keys_outside_directory(tmp_path):
+    disk_dir = tmp_path / 'cache'
+    # 缓存目录之外已有的文件不能通过 '..' 读到
+    _chain().to_parquet(tmp_path / 'secret_puts.parquet', index=False)
+    cache = ChainCache(ttl=300, disk_dir=str(disk_dir), market_hours_aware=False)
+    assert cache.get('..', 'secret', 'puts') is None
+    assert cache.get('AAA', '../../secret', 'puts') is None
+    assert cache.stats()['disk_hits'] == 0
+
+    cache.put('..', '../escape', 'puts', _chain())
+    cache.put('A/B', '2030-01-18', 'puts', _chain())
+    written = sorted(path.relative_to(tmp_path).as_posix() for path in tmp_path.rglob('*.parquet'))
+    assert written == ['secret_puts.parquet']
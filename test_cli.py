@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+命令行与核心库导入测试（使用本地模拟数据，不访问网络）
+"""
+
+import json
+import subprocess
+import sys
+import pandas as pd
+import pytest
+from screener_core import cli, providers
+from screener_core.chain_cache import HAS_PYARROW
+from test_watchlist import FakeProvider
+
+
+def _loaded_modules(statement):
+    code = (f"import sys; {statement}; "
+            "print(','.join(m for m in ('pandas', 'numpy', 'yfinance', 'streamlit', 'plotly') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return output.stdout.strip()
+
+
+def test_cli_import_is_lazy():
+    assert _loaded_modules("import screener_core.cli") == ''
+
+
+def test_core_does_not_import_ui_libraries():
+    loaded = _loaded_modules("import screener_core.pipeline")
+    assert 'streamlit' not in loaded and 'plotly' not in loaded and 'yfinance' not in loaded
+
+
+@pytest.fixture
+def fake_market():
+    previous = providers.get_provider()
+    providers.set_provider(FakeProvider())
+    yield
+    providers.set_provider(previous)
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'json', 'parquet'])
+def test_screen_writes_ranked_output(fake_market, tmp_path, fmt):
+    if fmt == 'parquet' and not HAS_PYARROW:
+        pytest.skip("需要 pyarrow")
+    output = tmp_path / f"result.{fmt}"
+    code = cli.main(['screen', 'AAA', 'BBB', 'ZZZ', '--min-dte', '30', '--max-dte', '45',
+                     '--min-otm', '0.04', '--max-otm', '0.16', '-o', str(output)])
+    assert code == 0
+    if fmt == 'csv':
+        df = pd.read_csv(output)
+    elif fmt == 'json':
+        df = pd.DataFrame(json.loads(output.read_text(encoding='utf-8')))
+    else:
+        df = pd.read_parquet(output)
+    assert set(df['ticker']) == {'AAA', 'BBB'}
+    assert df['annualizedReturn'].is_monotonic_decreasing
+
+
+def test_screen_fails_when_every_ticker_fails(fake_market, tmp_path):
+    assert cli.main(['screen', 'ZZZ', '-o', str(tmp_path / 'out.csv')]) == 1
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+并发获取期权链的测试（使用本地模拟数据，不访问网络）
+"""
+
+import time
+from collections import namedtuple
+import pandas as pd
+from screener_core.data import fetch_option_chains
+from screener_core.pipeline import analyze_and_filter_puts
+
+OptionChain = namedtuple('OptionChain', ['calls', 'puts'])
+
+
+class FakeStock:
+    """模拟 yf.Ticker，每个到期日返回固定的期权链"""
+
+    def __init__(self, delays=None, fail=()):
+        self.delays = delays or {}
+        self.fail = set(fail)
+
+    def option_chain(self, exp):
+        time.sleep(self.delays.get(exp, 0))
+        if exp in self.fail:
+            raise RuntimeError(f"模拟错误 {exp}")
+        day = int(exp[-2:])
+        strikes = [80.0 + day % 7, 85.0, 90.0, 95.0]
+        puts = pd.DataFrame({
+            'contractSymbol': [f"TEST{exp}P{k}" for k in strikes],
+            'strike': strikes,
+            'bid': [0.0, 1.1, 1.6 + day / 100, 2.4],
+            'lastPrice': [0.5, 1.2, 1.7, 2.5],
+        })
+        return OptionChain(calls=puts.copy(), puts=puts)
+
+
+EXPIRATIONS = [('2030-01-03', 30), ('2030-01-10', 37), ('2030-01-17', 44), ('2030-01-24', 51)]
+
+
+def test_results_keep_expiration_order():
+    """先完成的到期日不影响返回顺序"""
+    stock = FakeStock(delays={'2030-01-03': 0.2, '2030-01-10': 0.1})
+    chains = fetch_option_chains(stock, EXPIRATIONS, 'puts', max_workers=4)
+    assert [(exp, dte) for exp, dte, _, _ in chains] == EXPIRATIONS
+    assert all(error is None for _, _, _, error in chains)
+
+
+def test_concurrent_matches_sequential():
+    """并发结果与逐个获取的筛选结果完全一致"""
+    stock = FakeStock(delays={'2030-01-03': 0.05})
+    frames = []
+    for exp, dte, options_df, _ in fetch_option_chains(stock, EXPIRATIONS, 'puts', max_workers=4):
+        frames.append(analyze_and_filter_puts(stock, exp, dte, 100.0, 0.05, 0.25, options_df))
+    expected = [analyze_and_filter_puts(stock, exp, dte, 100.0, 0.05, 0.25) for exp, dte in EXPIRATIONS]
+    pd.testing.assert_frame_equal(pd.concat(frames), pd.concat(expected))
+
+
+def test_errors_and_timeouts_are_reported():
+    """单个到期日失败或超时不影响其他到期日"""
+    stock = FakeStock(delays={'2030-01-17': 1.0}, fail={'2030-01-10'})
+    progress = []
+    start = time.monotonic()
+    chains = fetch_option_chains(
+        stock, EXPIRATIONS, 'puts', max_workers=2, timeout=0.3,
+        progress_callback=lambda done, total: progress.append((done, total))
+    )
+    assert time.monotonic() - start < 0.9
+    errors = {exp: error for exp, _, _, error in chains}
+    assert isinstance(errors['2030-01-10'], RuntimeError)
+    assert isinstance(errors['2030-01-17'], TimeoutError)
+    assert errors['2030-01-03'] is None and errors['2030-01-24'] is None
+    assert progress[-1] == (4, 4)
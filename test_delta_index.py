@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+按 Delta 筛选测试：有序索引与逐组扫描的结果一致（使用本地模拟数据，不访问网络）
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from screener_core import cli, providers
+from screener_core.config import DELTA_FETCH_OTM_RANGE
+from screener_core.delta_index import DeltaFilter, DeltaIndex
+from screener_core.filtering import CASH_SECURED_PUT, COVERED_CALL
+from screener_core.pipeline import screen_watchlist
+from screener_core.ranking import rank_watchlist_results
+from benchmarks.synthetic import SyntheticProvider, make_universe
+
+
+def _results(n=20000, tickers=30, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'ticker': pd.Categorical(rng.choice([f'T{i:02d}' for i in range(tickers)], n)),
+        'dte': rng.choice([7, 14, 21, 30, 45, 60, 90], n),
+        # 两位小数便于制造相同 Delta 和恰好落在区间端点上的合约
+        'real_delta': np.round(rng.uniform(0, 0.6, n), 2).astype(np.float32),
+        'annualizedReturn': rng.uniform(0, 1, n),
+    })
+    df.loc[rng.choice(n, 50, replace=False), 'real_delta'] = np.nan
+    return df.sort_values('annualizedReturn', ascending=False)
+
+
+def _scan_band(df, low, high, min_dte, max_dte):
+    return df[(df['real_delta'] >= low) & (df['real_delta'] <= high)
+              & (df['dte'] >= min_dte) & (df['dte'] <= max_dte)]
+
+
+def _scan_nearest(df, target, min_dte, max_dte):
+    df = df[(df['dte'] >= min_dte) & (df['dte'] <= max_dte) & df['real_delta'].notna()]
+    distance = (df['real_delta'].astype(float) - target).abs()
+    # 距离相同时取 Delta 较小的
+    best = (df.assign(distance=distance).sort_values(['distance', 'real_delta'], kind='stable')
+            .groupby(['ticker', 'dte'], observed=True).head(1))
+    return df.loc[df.index.isin(best.index)]
+
+
+def test_band_and_nearest_match_scan():
+    df = _results()
+    index = DeltaIndex(df)
+    assert index.groups == 30 * 7
+    for low, high, min_dte, max_dte in [(0.2, 0.3, 1, 90), (0.25, 0.25, 14, 45), (0.0, 1.0, 30, 30), (0.7, 0.9, 1, 90)]:
+        pd.testing.assert_frame_equal(index.band(low, high, min_dte, max_dte), _scan_band(df, low, high, min_dte, max_dte))
+    for target, min_dte, max_dte in [(0.25, 1, 90), (0.305, 20, 60), (0.0, 1, 90), (0.9, 1, 90)]:
+        nearest = index.nearest(target, min_dte, max_dte)
+        pd.testing.assert_frame_equal(nearest, _scan_nearest(df, target, min_dte, max_dte))
+        assert not nearest.duplicated(['ticker', 'dte']).any()
+    # 结果保持原有的收益率顺序
+    assert index.select(DeltaFilter(0.2, 0.3))['annualizedReturn'].is_monotonic_decreasing
+    assert index.select(DeltaFilter(target=0.25))['annualizedReturn'].is_monotonic_decreasing
+
+
+def test_single_ticker_and_empty_results():
+    df = _results(tickers=1).drop(columns='ticker')
+    index = DeltaIndex(df)
+    assert len(index.nearest(0.25)) == 7
+    pd.testing.assert_frame_equal(index.band(0.1, 0.2), _scan_band(df, 0.1, 0.2, 0, 999))
+    empty = DeltaIndex(pd.DataFrame())
+    assert empty.band(0.2, 0.3).empty and empty.nearest(0.25).empty
+
+
+def test_changing_target_does_not_rescan():
+    df = _results(n=1_000_000, tickers=50, seed=1)
+    index = DeltaIndex(df)
+    index.nearest(0.2)
+    start = time.perf_counter()
+    for target in np.linspace(0.05, 0.5, 20):
+        index.nearest(target, 7, 60)
+    per_query = (time.perf_counter() - start) / 20
+    start = time.perf_counter()
+    _scan_nearest(df, 0.25, 7, 60)
+    assert per_query * 20 < time.perf_counter() - start
+
+
+def test_watchlist_delta_modes_for_both_strategies():
+    universe = make_universe(n_tickers=3, n_expirations=6, strikes_per_expiration=120, seed=21)
+    provider = SyntheticProvider(universe)
+    for strategy in (CASH_SECURED_PUT, COVERED_CALL):
+        results = list(screen_watchlist(list(universe), 1, 90, *DELTA_FETCH_OTM_RANGE, strategy, provider=provider))
+        ranked = rank_watchlist_results(results)
+        index = DeltaIndex(ranked)
+        band = index.select(DeltaFilter(0.2, 0.3))
+        assert not band.empty and band['real_delta'].between(0.2, 0.3).all()
+        nearest = index.select(DeltaFilter(target=0.25))
+        groups = ranked.dropna(subset=['real_delta']).groupby(['ticker', 'dte'], observed=True)
+        assert len(nearest) == groups.ngroups
+        closest = groups['real_delta'].apply(lambda d: (d - 0.25).abs().min())
+        np.testing.assert_allclose(
+            (nearest.set_index(['ticker', 'dte'])['real_delta'] - 0.25).abs().sort_index(),
+            closest.sort_index().to_numpy(), atol=1e-7)
+
+
+def test_cli_target_delta(tmp_path):
+    universe = make_universe(n_tickers=2, n_expirations=4, strikes_per_expiration=120, seed=22)
+    previous = providers.get_provider()
+    providers.set_provider(SyntheticProvider(universe))
+    try:
+        output = tmp_path / 'target.csv'
+        assert cli.main(['screen', *universe, '--min-dte', '1', '--max-dte', '90',
+                         '--target-delta', '0.25', '-o', str(output)]) == 0
+        assert cli.main(['screen', *universe, '--strategy', 'condor', '--target-delta', '0.25']) == 2
+    finally:
+        providers.set_provider(previous)
+    df = pd.read_csv(output)
+    assert len(df) == 2 * 4
+    assert not df.duplicated(['ticker', 'dte']).any()
+    assert df["real_delta"].between(0.1, 0.4).all()
+    assert df['annualizedReturn'].is_monotonic_decreasing
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Black-Scholes 希腊字母计算测试
+"""
+
+import time
+import numpy as np
+from screener_core.greeks import black_scholes_price, black_scholes_greeks, norm_cdf
+
+SPOT, RATE, DIVIDEND = 100.0, 0.04, 0.01
+
+
+def _price(spot=SPOT, strike=95.0, dte=30, iv=0.3, option_type='puts', rate=RATE):
+    return black_scholes_price(spot, strike, dte, iv, option_type, rate, DIVIDEND)
+
+
+def test_norm_cdf():
+    assert abs(norm_cdf(0.0) - 0.5) < 1e-7
+    assert abs(norm_cdf(1.959963985) - 0.975) < 1e-7
+    assert abs(norm_cdf(-3.0) - 0.0013498980) < 1e-8
+
+
+def test_put_call_parity():
+    strikes = np.linspace(60, 140, 41)
+    call = black_scholes_price(SPOT, strikes, 45, 0.4, 'calls', RATE, DIVIDEND)
+    put = black_scholes_price(SPOT, strikes, 45, 0.4, 'puts', RATE, DIVIDEND)
+    t = 45 / 365
+    parity = SPOT * np.exp(-DIVIDEND * t) - strikes * np.exp(-RATE * t)
+    assert np.allclose(call - put, parity, atol=1e-6)
+
+
+def test_greeks_match_finite_differences():
+    for option_type in ('calls', 'puts'):
+        greeks = black_scholes_greeks(SPOT, 95.0, 30, 0.3, option_type, RATE, DIVIDEND)
+        h = 1e-3
+        up = _price(spot=SPOT + h, option_type=option_type)
+        down = _price(spot=SPOT - h, option_type=option_type)
+        mid = _price(option_type=option_type)
+        assert np.isclose(greeks['delta'], (up - down) / (2 * h), atol=1e-5)
+        assert np.isclose(greeks['gamma'], (up - 2 * mid + down) / h ** 2, atol=1e-4)
+        vega = (_price(iv=0.3001, option_type=option_type) - _price(iv=0.2999, option_type=option_type)) / 0.0002 / 100
+        assert np.isclose(greeks['vega'], vega, atol=1e-5)
+        theta = (_price(dte=29.99, option_type=option_type) - _price(dte=30.01, option_type=option_type)) / 0.02
+        assert np.isclose(greeks['theta'], theta, atol=1e-5)
+        rho = (_price(rate=RATE + 1e-4, option_type=option_type) - _price(rate=RATE - 1e-4, option_type=option_type)) / 2e-4 / 100
+        assert np.isclose(greeks['rho'], rho, atol=1e-5)
+
+
+def test_invalid_inputs_are_nan():
+    greeks = black_scholes_greeks(SPOT, [90.0, 90.0, 90.0], [30, 0, 30], [0.0, 0.3, np.nan])
+    assert np.isnan(greeks['delta']).all()
+
+
+def test_100k_contracts_under_100ms():
+    rng = np.random.default_rng(0)
+    n = 100_000
+    strikes = rng.uniform(50, 150, n)
+    dte = rng.integers(1, 365, n)
+    iv = rng.uniform(0.1, 1.0, n)
+    is_call = rng.random(n) < 0.5
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        black_scholes_greeks(SPOT, strikes, dte, iv, is_call, RATE, DIVIDEND)
+        best = min(best, time.perf_counter() - start)
+    assert best < 0.1
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+批量隐含波动率求解测试
+"""
+
+import numpy as np
+import pandas as pd
+from screener_core.greeks import black_scholes_price, black_scholes_greeks
+from screener_core.iv_solver import implied_volatility, fill_missing_iv
+
+RATE, DIVIDEND = 0.04, 0.01
+
+
+def test_recovers_volatility_for_100k_contracts():
+    rng = np.random.default_rng(7)
+    n = 100_000
+    strikes = rng.uniform(50, 150, n)
+    dte = rng.integers(1, 365, n)
+    true_iv = rng.uniform(0.05, 2.0, n)
+    is_call = rng.random(n) < 0.5
+    prices = black_scholes_price(100.0, strikes, dte, true_iv, is_call, RATE, DIVIDEND)
+
+    result = implied_volatility(prices, 100.0, strikes, dte, is_call, RATE, DIVIDEND)
+    vega = black_scholes_greeks(100.0, strikes, dte, true_iv, is_call, RATE, DIVIDEND)['vega']
+    # 价格对波动率足够敏感的合约必须全部收敛并精确还原
+    sensitive = vega > 0.01
+    assert result.converged[sensitive].all()
+    assert np.abs(result.iv[sensitive] - true_iv[sensitive]).max() < 1e-5
+    assert result.iterations.max() <= 100
+    assert np.isnan(result.iv[~result.converged]).all()
+
+
+def test_arbitrage_violations_are_unconverged():
+    # 低于内在价值、高于上限、零价格、已到期
+    result = implied_volatility([5.0, 120.0, 0.0, 2.0], 100.0, [110.0, 110.0, 90.0, 90.0],
+                                [30, 30, 30, 0], 'puts', RATE, DIVIDEND)
+    assert not result.converged.any()
+    assert (result.iterations == 0).all()
+
+
+def test_fill_missing_iv_only_touches_stale_rows():
+    strikes = np.array([85.0, 90.0, 95.0])
+    mid = black_scholes_price(100.0, strikes, 30, 0.35, 'puts', RATE, DIVIDEND)
+    df = pd.DataFrame({
+        'strike': strikes,
+        'bid': mid - 0.01,
+        'ask': mid + 0.01,
+        'premium': mid - 0.01,
+        'impliedVolatility': [0.42, 1e-5, np.nan],
+        'dte': 30,
+    })
+    result = fill_missing_iv(df, 100.0, 'puts', RATE, DIVIDEND)
+    assert list(df['iv_solved']) == [False, True, True]
+    assert df['impliedVolatility'].iloc[0] == 0.42
+    assert np.allclose(df['impliedVolatility'].iloc[1:], 0.35, atol=1e-4)
+    assert result.converged.all()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+隐含波动率曲面测试（使用本地模拟数据，不访问网络）
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from screener_core.chain_cache import ChainCache, shared_cache
+from screener_core.filtering import CASH_SECURED_PUT, refilter_results
+from screener_core.iv_surface import apply_iv_surface, build_iv_surface, filter_richness
+from screener_core.pipeline import screen_ticker
+from screener_core.providers import OptionChain
+from benchmarks.synthetic import make_chains, make_option_chain, make_universe
+from test_singleflight import CountingProvider
+
+SPOT = 450.0
+
+
+def _true_iv(strike, spot=SPOT):
+    # benchmarks.synthetic 生成期权链时使用的波动率微笑（不含噪声）
+    m = np.log(strike / spot)
+    return 0.25 + 0.4 * m ** 2 - 0.1 * m
+
+
+def test_surface_recovers_smile_despite_bad_quotes():
+    chains = make_chains(SPOT, 12, 120, 'puts', seed=1)
+    # 一个明显错误的报价不应拉偏曲线
+    chains[3][2].loc[60, 'impliedVolatility'] = 2.5
+    surface = build_iv_surface(chains, SPOT, 'puts', 0.04)
+    strikes = np.linspace(330, 580, 40)
+    for _, dte, _ in chains:
+        np.testing.assert_allclose(surface.iv(strikes, dte), _true_iv(strikes), atol=0.012)
+    # 到期日之间按总方差插值，范围之外保持边界到期日的波动率
+    between = surface.iv(strikes, chains[4][1] + 3)
+    np.testing.assert_allclose(between, _true_iv(strikes), atol=0.012)
+    np.testing.assert_allclose(surface.iv(strikes, 1000), surface.iv(strikes, surface.dtes[-1]))
+
+    metrics = surface.metrics()
+    assert list(metrics['dte']) == [dte for _, dte, _ in chains]
+    expected_skew = _true_iv(SPOT * 0.9) - _true_iv(SPOT * 1.1)
+    np.testing.assert_allclose(metrics['skew'], expected_skew, atol=0.01)
+    assert abs(surface.term_slope()) < 0.01
+
+
+def test_both_sides_use_out_of_the_money_quotes():
+    rng = np.random.default_rng(2)
+    chain = OptionChain(calls=make_option_chain(SPOT, 30, 80, 'calls', rng),
+                        puts=make_option_chain(SPOT, 30, 80, 'puts', rng))
+    surface = build_iv_surface([('2030-01-18', 30, chain)], SPOT, 'both', 0.04)
+    otm = (chain.puts['strike'] < SPOT).sum() + (chain.calls['strike'] >= SPOT).sum()
+    assert surface.points <= otm
+    assert surface.points >= otm * 0.85
+
+
+def test_rebuild_for_forty_expirations_is_fast():
+    chains = make_chains(SPOT, 40, 200, 'puts', seed=4)
+    build_iv_surface(chains, SPOT, 'puts', 0.04)
+    start = time.perf_counter()
+    surface = build_iv_surface(chains, SPOT, 'puts', 0.04)
+    assert time.perf_counter() - start < 0.25
+    assert len(surface.dtes) == 40
+
+
+def test_apply_fills_unsolvable_iv_and_measures_richness():
+    chains = make_chains(SPOT, 4, 60, 'puts', seed=5)
+    surface = build_iv_surface(chains, SPOT, 'puts', 0.04)
+    _, dte, chain = chains[1]
+    result = chain.iloc[10:20].copy()
+    result['dte'] = dte
+    result['impliedVolatility'] = _true_iv(result['strike'].to_numpy()) + 0.02
+    result.loc[result.index[:3], 'impliedVolatility'] = np.nan
+    result['delta'] = np.where(result['impliedVolatility'].isna(), np.nan, -0.2)
+    result['real_delta'] = result['delta'].abs()
+
+    applied, filled = apply_iv_surface(result, surface, SPOT, 'puts', 0.04)
+    assert filled == 3
+    assert 'surfaceIV' not in result.columns  # 不修改输入
+    assert applied['ivRichness'].iloc[:3].isna().all()
+    np.testing.assert_allclose(applied['impliedVolatility'].iloc[:3], applied['surfaceIV'].iloc[:3], rtol=1e-6)
+    assert applied['real_delta'].notna().all()
+    assert (applied['delta'].iloc[3:] == np.float32(-0.2)).all()
+    np.testing.assert_allclose(applied['ivRichness'].iloc[3:], 0.02, atol=0.012)
+
+    assert len(filter_richness(applied, 0.0)) == 7
+    assert len(filter_richness(applied, 0.5)) == 0
+    assert filter_richness(applied, None) is applied
+
+
+def test_surface_cache_invalidated_with_chains():
+    cache = ChainCache(market_hours_aware=False)
+    chain = pd.DataFrame({'strike': [1.0]})
+    cache.put('AAA', '2030-01-18', 'puts', chain)
+    assert not cache.put_surface('AAA', 'k', object(), [('2030-01-18', 'puts'), ('2030-02-15', 'puts')])
+    surface = object()
+    assert cache.put_surface('aaa', 'k', surface, [('2030-01-18', 'puts')])
+    assert cache.get_surface('AAA', 'k') is surface
+    assert cache.stats()['surfaces'] == 1
+    cache.put('BBB', '2030-01-18', 'puts', chain)
+    assert cache.get_surface('AAA', 'k') is surface
+    cache.put('AAA', '2030-02-15', 'calls', chain)
+    assert cache.get_surface('AAA', 'k') is None
+
+
+def test_screen_reuses_cached_surface_and_matches_refilter():
+    universe = make_universe(n_tickers=1, n_expirations=8, strikes_per_expiration=80, seed=6)
+    symbol = next(iter(universe))
+    provider = CountingProvider(universe)
+    shared_cache().clear()
+    try:
+        wide = screen_ticker(symbol, 1, 90, 0.01, 0.3, CASH_SECURED_PUT, provider=provider)
+        again = screen_ticker(symbol, 1, 90, 0.01, 0.3, CASH_SECURED_PUT, provider=provider)
+        assert wide.surface is not None and again.surface is wide.surface
+        assert {'surfaceIV', 'ivRichness'} <= set(wide.result.columns)
+
+        # 曲面值只取决于合约所在到期日，窄条件直接筛选与宽结果重新筛选一致
+        direct = screen_ticker(symbol, 10, 40, 0.03, 0.2, CASH_SECURED_PUT, provider=provider).result
+        narrowed = refilter_results(wide.result, 10, 40, 0.03, 0.2, CASH_SECURED_PUT, current_price=wide.current_price)
+        pd.testing.assert_frame_equal(narrowed.sort_values('contractSymbol'), direct.sort_values('contractSymbol'))
+    finally:
+        shared_cache().clear()
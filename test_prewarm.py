@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+后台缓存预热测试（使用本地模拟数据，不访问网络）
+"""
+
+from collections import Counter
+from datetime import datetime
+import pytest
+from screener_core import prewarm
+from screener_core.chain_cache import MARKET_TZ, shared_cache
+from screener_core.pipeline import screen_ticker
+from screener_core.prewarm import Prewarmer, RequestBudget
+from screener_core.quotes import shared_quotes
+from benchmarks.synthetic import make_universe
+from test_singleflight import CountingProvider
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+# 以下测试的预热间隔取 60 秒，小于报价和期权链 5 分钟的有效期，刚刷新的数据在下一轮不会被当作即将过期，
+# 结果与运行测试时是否处于交易时段无关
+@pytest.fixture
+def clean_caches(monkeypatch):
+    monkeypatch.setattr(prewarm, '_request_counts', Counter())
+    shared_cache().clear()
+    shared_quotes().clear()
+    yield
+    shared_cache().clear()
+    shared_quotes().clear()
+
+
+def test_warm_caches_serve_interactive_screen(clean_caches):
+    universe = make_universe(n_tickers=2, n_expirations=4, strikes_per_expiration=30, seed=5)
+    provider = CountingProvider(universe)
+    warmer = Prewarmer(list(universe), provider=provider, min_dte=1, max_dte=90, interval=60,
+                       budget=RequestBudget(1000))
+    stats = warmer.run_once()
+    assert stats['prices'] == 2 and stats['expirations'] == 2 and stats['chains'] == 8
+    assert stats['deferred'] == []
+    warmed = Counter(provider.calls)
+
+    symbol = next(iter(universe))
+    result = screen_ticker(symbol, 1, 90, 0.01, 0.3, "现金担保看跌期权", provider=provider)
+    assert result.error is None and not result.result.empty
+    assert provider.calls == warmed
+
+    # 数据仍然新鲜时下一轮不发起任何请求
+    assert warmer.run_once()['requests'] == 0
+    assert provider.calls == warmed
+
+
+def test_budget_limits_cycle_and_most_requested_go_first(clean_caches):
+    universe = make_universe(n_tickers=3, n_expirations=2, strikes_per_expiration=20, seed=9)
+    symbols = list(universe)
+    for _ in range(3):
+        prewarm.record_request(symbols[2])
+    prewarm.record_request(symbols[1])
+
+    provider = CountingProvider(universe)
+    clock = FakeClock(0.0)
+    warmer = Prewarmer(symbols, provider=provider, min_dte=1, max_dte=90, interval=60,
+                       budget=RequestBudget(per_minute=60, burst=4, clock=clock))
+    assert warmer.order() == [symbols[2], symbols[1], symbols[0]]
+
+    # 1 次批量报价 + 1 次到期日 + 2 条期权链正好用完预算
+    stats = warmer.run_once()
+    assert stats['requests'] == 4
+    assert stats['chains'] == 2
+    assert stats['deferred'] == [symbols[1], symbols[0]]
+    assert provider.calls['expirations'] == 1
+
+    # 预算恢复后下一轮继续处理顺延的股票，已预热的数据不再请求
+    clock.now += 60
+    stats = warmer.run_once()
+    assert stats['prices'] == 0 and stats['expirations'] == 2 and stats['chains'] == 2
+    assert stats['deferred'] == [symbols[0]]
+    assert provider.calls['chain'] == 4
+
+
+def test_interactive_requests_share_the_budget(clean_caches):
+    universe = make_universe(n_tickers=1, n_expirations=2, strikes_per_expiration=20, seed=3)
+    symbol = next(iter(universe))
+    provider = CountingProvider(universe)
+    clock = FakeClock(0.0)
+    warmer = Prewarmer([symbol], provider=provider, min_dte=1, max_dte=90, interval=60,
+                       budget=RequestBudget(per_minute=60, burst=10, clock=clock))
+    # 交互式筛选发起 1 次报价、1 次到期日和 2 条期权链请求
+    screen_ticker(symbol, 1, 90, 0.01, 0.3, "现金担保看跌期权", provider=provider)
+    warmer.run_once()
+    assert warmer.budget.available == pytest.approx(6)
+
+
+@pytest.mark.skipif(MARKET_TZ is None, reason="缺少美东时区数据")
+def test_next_delay_is_shorter_around_the_open():
+    warmer = Prewarmer([], interval=300, open_interval=60, open_window=(-1800, 3600))
+
+    def at(hour, minute, day=13):
+        # 2027-10-13 为周三，2027-10-16 为周六
+        return datetime(2027, 10, day, hour, minute, tzinfo=MARKET_TZ).timestamp()
+
+    assert warmer.next_delay(at(9, 15)) == 60
+    assert warmer.next_delay(at(10, 15)) == 60
+    assert warmer.next_delay(at(12, 0)) == 300
+    assert warmer.next_delay(at(8, 57)) == 180
+    assert warmer.next_delay(at(6, 0)) == 300
+    assert warmer.next_delay(at(9, 15, day=16)) == 300
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+蒙特卡洛盈利概率测试：与 Black-Scholes 解析值一致、结果可复现（使用本地模拟数据，不访问网络）
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from screener_core import cli, providers
+from screener_core.filtering import CASH_SECURED_PUT, COVERED_CALL, IRON_CONDOR, refilter_results
+from screener_core.greeks import DAYS_PER_YEAR, black_scholes_price, norm_cdf
+from screener_core.iv_surface import build_iv_surface
+from screener_core.pipeline import screen_ticker, screen_watchlist
+from screener_core.probability import (add_probabilities, contract_metrics, historical_volatility,
+                                       simulate_terminal_prices)
+from screener_core.ranking import rank_watchlist_results
+from benchmarks.synthetic import SyntheticProvider, make_chains, make_universe
+
+SPOT, RATE, VOL, DTE = 100.0, 0.04, 0.25, 30
+
+
+def test_lognormal_matches_black_scholes():
+    prices = simulate_terminal_prices(SPOT, DTE, 100_000, seed=1, rate=RATE, volatility=VOL)
+    assert (np.diff(prices) >= 0).all()
+    growth = np.exp(RATE * DTE / DAYS_PER_YEAR)
+    np.testing.assert_allclose(prices.mean(), SPOT * growth, rtol=1e-4)
+
+    strike = np.array([80.0, 90.0, 95.0, 100.0])
+    premium = np.array([0.2, 0.8, 1.8, 3.0])
+    profit, assign, pnl, cvar = contract_metrics(prices, strike, premium, SPOT)
+    sd = VOL * np.sqrt(DTE / DAYS_PER_YEAR)
+    d2 = (np.log(SPOT / strike) + RATE * DTE / DAYS_PER_YEAR - 0.5 * sd * sd) / sd
+    np.testing.assert_allclose(assign, norm_cdf(-d2), atol=2e-3)
+    np.testing.assert_allclose(pnl, premium - black_scholes_price(SPOT, strike, DTE, VOL, 'puts', RATE) * growth,
+                               atol=2e-3)
+    assert (profit > 1 - assign).all()
+    # 最差 5% 的路径仍高于 80 的行权价时不亏损
+    assert cvar[0] < 0 and (cvar[1:] > 0).all()
+
+    # 备兑看涨：正股加卖出看涨，到期价格高于行权价时被行权
+    strike = np.array([105.0, 110.0])
+    premium = np.array([1.2, 0.4])
+    profit, assign, pnl, cvar = contract_metrics(prices, strike, premium, SPOT, covered_call=True)
+    calls = black_scholes_price(SPOT, strike, DTE, VOL, 'calls', RATE) * growth
+    np.testing.assert_allclose(pnl, premium + SPOT * growth - calls - SPOT, atol=3e-3)
+    d2 = (np.log(SPOT / strike) + RATE * DTE / DAYS_PER_YEAR - 0.5 * sd * sd) / sd
+    np.testing.assert_allclose(assign, norm_cdf(d2), atol=2e-3)
+    # 最差 5% 的情形下正股跌幅远大于权利金
+    assert (cvar > SPOT * 0.05).all()
+
+
+def test_surface_distribution_reprices_the_smile():
+    chains = make_chains(SPOT, 8, 120, 'puts', seed=2)
+    surface = build_iv_surface(chains, SPOT, 'puts', RATE)
+    strike = np.linspace(75, 105, 13)
+    for _, dte, _ in chains[2::2]:
+        prices = simulate_terminal_prices(SPOT, dte, 200_000, seed=3, rate=RATE, surface=surface)
+        _, _, pnl, _ = contract_metrics(prices, strike, np.zeros_like(strike), SPOT)
+        # E[max(K - S, 0)] 贴现后等于用曲面波动率计算的看跌期权价格（Breeden-Litzenberger）
+        puts = black_scholes_price(SPOT, strike, dte, surface.iv(strike, dte), 'puts', RATE)
+        np.testing.assert_allclose(-pnl * np.exp(-RATE * dte / DAYS_PER_YEAR), puts, atol=0.01)
+
+
+def test_shared_draws_are_reproducible_and_consistent():
+    universe = make_universe(n_tickers=1, n_expirations=6, strikes_per_expiration=120, seed=4)
+    provider = SyntheticProvider(universe)
+    symbol = next(iter(universe))
+    wide = screen_ticker(symbol, 1, 90, 0.0, 1.0, CASH_SECURED_PUT, provider=provider)
+    first = add_probabilities(wide.result, CASH_SECURED_PUT, wide.current_price, wide.surface, rate=RATE)
+    again = add_probabilities(wide.result, CASH_SECURED_PUT, wide.current_price, wide.surface, rate=RATE)
+    pd.testing.assert_frame_equal(first, again)
+    pooled = add_probabilities(wide.result, CASH_SECURED_PUT, wide.current_price, wide.surface, rate=RATE,
+                               processes=2)
+    pd.testing.assert_frame_equal(first, pooled)
+    assert first['probProfit'].notna().all()
+
+    # 同一到期日的行权价共用到期价格：行权价越高被行权概率越高
+    for _, group in first.groupby('dte'):
+        ordered = group.sort_values('strike')
+        assert ordered['probAssign'].is_monotonic_increasing
+
+    # 概率只取决于合约所在到期日，先计算再重新筛选与直接按窄条件筛选后计算一致
+    direct = screen_ticker(symbol, 10, 40, 0.03, 0.2, CASH_SECURED_PUT, provider=provider)
+    direct = add_probabilities(direct.result, CASH_SECURED_PUT, direct.current_price, direct.surface, rate=RATE)
+    narrowed = refilter_results(first, 10, 40, 0.03, 0.2, CASH_SECURED_PUT, current_price=wide.current_price)
+    pd.testing.assert_frame_equal(narrowed.sort_values('contractSymbol'), direct.sort_values('contractSymbol'))
+
+
+def test_covered_calls_and_historical_volatility():
+    rng = np.random.default_rng(5)
+    days = pd.bdate_range('2026-01-01', periods=300)
+    closes = pd.DataFrame({
+        'AAA': 100 * np.exp(np.cumsum(rng.normal(0, 0.3 / np.sqrt(252), len(days)))),
+        'BBB': 50 * np.exp(np.cumsum(rng.normal(0, 0.6 / np.sqrt(252), len(days)))),
+    }, index=days.strftime('%Y-%m-%d'))
+    vols = historical_volatility(closes, window=250)
+    assert abs(vols['AAA'] - 0.3) < 0.05 and abs(vols['BBB'] - 0.6) < 0.1
+
+    universe = make_universe(n_tickers=2, n_expirations=4, strikes_per_expiration=120, seed=6)
+    results = list(screen_watchlist(list(universe), 1, 90, 0.0, 1.0, COVERED_CALL,
+                                    provider=SyntheticProvider(universe)))
+    ranked = rank_watchlist_results(results)
+    volatility = dict(zip(universe, (0.2, 0.5)))
+    calm = add_probabilities(ranked, COVERED_CALL, volatility=volatility, rate=RATE)
+    wild = add_probabilities(ranked, COVERED_CALL, volatility={k: v * 2 for k, v in volatility.items()}, rate=RATE)
+    # 波动率越高，远离现价的合约被行权概率越高，尾部亏损越大
+    far = (ranked['strike'] / ranked['currentPrice'] > 1.1).to_numpy()
+    assert far.any()
+    assert (wild['probAssign'].to_numpy()[far] > calm['probAssign'].to_numpy()[far]).all()
+    assert (wild['cvar'] > calm['cvar']).all()
+    np.testing.assert_allclose(calm['expectedReturn'],
+                               calm['expectedPnl'] / calm['collateral'] * 365 / calm['dte'], rtol=1e-5)
+    assert add_probabilities(ranked, IRON_CONDOR) is ranked
+
+
+def test_ten_thousand_contracts_at_full_paths():
+    universe = make_universe(n_tickers=10, n_expirations=20, strikes_per_expiration=120, seed=7)
+    results = list(screen_watchlist(list(universe), 1, 400, 0.0, 1.0, CASH_SECURED_PUT,
+                                    provider=SyntheticProvider(universe)))
+    ranked = rank_watchlist_results(results)
+    surfaces = {item.ticker: item.surface for item in results}
+    assert len(ranked) > 8000
+    start = time.perf_counter()
+    result = add_probabilities(ranked, CASH_SECURED_PUT, surface=surfaces, rate=RATE, paths=100_000)
+    assert time.perf_counter() - start < 5
+    assert result['expectedReturn'].notna().all()
+
+
+def test_cli_rank_by_expected_return(tmp_path):
+    universe = make_universe(n_tickers=2, n_expirations=4, strikes_per_expiration=120, seed=8)
+    previous = providers.get_provider()
+    providers.set_provider(SyntheticProvider(universe))
+    try:
+        output = tmp_path / 'expected.csv'
+        assert cli.main(['screen', *universe, '--min-dte', '1', '--max-dte', '90', '--rank-by', 'expectedReturn',
+                         '--top', '10', '--paths', '20000', '-o', str(output)]) == 0
+        assert cli.main(['screen', *universe, '--strategy', 'condor', '--probabilities']) == 2
+    finally:
+        providers.set_provider(previous)
+    df = pd.read_csv(output)
+    assert len(df) == 10
+    assert df['expectedReturn'].is_monotonic_decreasing
+    assert df['probProfit'].between(0, 1).all()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+行情数据源录制 / 回放测试
+"""
+
+import time
+import pandas as pd
+import pytest
+from screener_core.pipeline import screen_ticker
+from screener_core.providers import FixtureNotFoundError, RecordingProvider, ReplayProvider, YFinanceProvider
+from test_watchlist import FakeProvider
+
+
+def _screen(provider):
+    return screen_ticker('AAA', 30, 45, 0.04, 0.16, "现金担保看跌期权", provider=provider)
+
+
+def test_replay_reproduces_recorded_screen(tmp_path):
+    recorded = _screen(RecordingProvider(FakeProvider(), str(tmp_path)))
+    assert (tmp_path / 'AAA' / 'expirations.json.gz').exists()
+
+    replayed = _screen(ReplayProvider(str(tmp_path)))
+    assert replayed.error is None
+    pd.testing.assert_frame_equal(replayed.result, recorded.result)
+
+
+def test_replay_missing_fixtures(tmp_path):
+    RecordingProvider(FakeProvider(), str(tmp_path)).get_price('AAA')
+    replay = ReplayProvider(str(tmp_path))
+    assert replay.get_price('AAA') == 100.0
+    assert replay.get_price('ZZZ') is None
+    with pytest.raises(FixtureNotFoundError):
+        replay.get_expirations('AAA')
+
+
+def test_replay_simulated_latency(tmp_path):
+    RecordingProvider(FakeProvider(), str(tmp_path)).get_price('AAA')
+    replay = ReplayProvider(str(tmp_path), latency=0.05)
+    start = time.perf_counter()
+    replay.get_price('AAA')
+    assert time.perf_counter() - start >= 0.05
+
+
+class CachingYFTicker:
+    """与 yf.Ticker 一样在对象内缓存第一次取到的价格"""
+
+    quote = 100.0
+
+    def __init__(self):
+        self._info = None
+
+    @property
+    def info(self):
+        if self._info is None:
+            self._info = {'regularMarketPrice': CachingYFTicker.quote}
+        return self._info
+
+    @property
+    def options(self):
+        return ('2030-01-18',)
+
+    def option_chain(self, expiration):
+        return type('Chain', (), {'calls': pd.DataFrame(), 'puts': pd.DataFrame()})()
+
+
+def test_yfinance_price_is_not_served_from_reused_ticker(monkeypatch):
+    provider = YFinanceProvider()
+    created = []
+
+    def new_ticker(symbol):
+        created.append(CachingYFTicker())
+        return created[-1]
+
+    provider._new_ticker = new_ticker
+    assert provider.get_price('AAA') == 100.0
+    monkeypatch.setattr(CachingYFTicker, 'quote', 101.0)
+    assert provider.get_price('AAA') == 101.0
+
+    # 到期日和期权链复用同一个对象
+    before = len(created)
+    provider.get_expirations('AAA')
+    provider.get_option_chain('AAA', '2030-01-18')
+    assert len(created) == before + 1
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+批量报价与取价方法自适应测试（使用本地模拟数据，不访问网络）
+"""
+
+import time
+import pandas as pd
+import yfinance
+from screener_core.pipeline import screen_watchlist
+from screener_core.providers import FastPathSelector, MarketDataProvider, YFinanceProvider
+from screener_core.quotes import QuoteService
+from test_watchlist import PRICES, FakeProvider
+
+
+def test_fast_path_selector_explores_then_prefers_fastest():
+    selector = FastPathSelector(('info', 'history', 'fast_info'))
+    assert selector.order('SPY') == ['info', 'history', 'fast_info']
+    selector.success('SPY', 'info', 0.8)
+    assert selector.order('SPY') == ['history', 'fast_info', 'info']
+    selector.success('SPY', 'history', 0.3)
+    selector.failure('SPY', 'fast_info')
+    assert selector.order('SPY') == ['history', 'info', 'fast_info']
+    selector.success('SPY', 'fast_info', 0.05)
+    assert selector.order('SPY') == ['fast_info', 'history', 'info']
+    # 其他股票不受影响
+    assert selector.order('QQQ') == ['info', 'history', 'fast_info']
+
+
+class FakeYFTicker:
+    """info 很慢、history 失败、fast_info 很快的 yf.Ticker"""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    @property
+    def info(self):
+        self.calls.append('info')
+        time.sleep(0.05)
+        return {'regularMarketPrice': 101.0}
+
+    def history(self, period):
+        self.calls.append('history')
+        return pd.DataFrame({'Close': []})
+
+    @property
+    def fast_info(self):
+        self.calls.append('fast_info')
+        return type('FastInfo', (), {'last_price': 101.5})()
+
+
+def test_get_price_learns_fastest_method():
+    provider = YFinanceProvider()
+    calls = []
+    tickers = []
+
+    def new_ticker(symbol):
+        tickers.append(FakeYFTicker(calls))
+        return tickers[-1]
+
+    provider._new_ticker = new_ticker
+    for _ in range(3):
+        assert provider.get_price('spy') is not None
+    # 每次尝试一种方法都使用新的对象，耗时不会来自对象内的缓存
+    assert len(tickers) == len(calls)
+    # 每种方法都试过后，之后只调用最快成功的 fast_info
+    calls.clear()
+    assert provider.get_price('SPY') == 101.5
+    assert calls == ['fast_info']
+
+
+def test_get_prices_downloads_in_batches(monkeypatch):
+    symbols = [f"T{i:03d}" for i in range(200)]
+    downloads = []
+
+    def fake_download(tickers, **kwargs):
+        downloads.append(list(tickers))
+        # T199 不在批量结果中，需要逐个获取
+        columns = pd.MultiIndex.from_product([['Close', 'Open'], [t for t in tickers if t != 'T199']])
+        return pd.DataFrame([[1.0] * len(columns), [2.0] * len(columns)], columns=columns)
+
+    monkeypatch.setattr(yfinance, 'download', fake_download)
+    provider = YFinanceProvider(batch_size=100)
+    provider.get_price = lambda symbol: 3.0
+    prices = provider.get_prices(symbols)
+    assert len(downloads) == 2
+    assert prices['T000'] == 2.0 and prices['T199'] == 3.0
+    assert len(prices) == 200
+
+
+class CountingQuotes(MarketDataProvider):
+    cacheable = True
+
+    def __init__(self):
+        self.requests = []
+
+    def get_prices(self, symbols):
+        self.requests.append(list(symbols))
+        return {symbol.upper(): None if symbol.upper() == 'BAD' else 10.0 for symbol in symbols}
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_quote_service_batches_and_caches():
+    provider = CountingQuotes()
+    clock = FakeClock(1_000_000.0)
+    quotes = QuoteService(ttl=300, market_hours_aware=False, clock=clock)
+    symbols = [f"T{i:03d}" for i in range(200)] + ['BAD']
+
+    prices = quotes.get_many(symbols, provider)
+    assert len(provider.requests) == 1
+    assert prices['T000'] == 10.0 and prices['BAD'] is None
+
+    # 5 分钟内只为获取失败的股票重新请求
+    clock.now += 299
+    assert quotes.get_many(symbols, provider)['T150'] == 10.0
+    assert provider.requests[-1] == ['BAD']
+    assert quotes.get('t001', provider) == 10.0
+    assert len(provider.requests) == 2
+
+    clock.now += 2
+    quotes.get_many(['T001', 'T002'], provider)
+    assert provider.requests[-1] == ['T001', 'T002']
+    assert quotes.stats()['requests'] == 3
+
+
+def test_watchlist_fetches_prices_in_one_request():
+    requests = []
+
+    class BatchFakeProvider(FakeProvider):
+        def get_prices(self, symbols):
+            requests.append(list(symbols))
+            return {symbol: PRICES.get(symbol) for symbol in symbols}
+
+        def get_price(self, symbol):
+            raise AssertionError("自选股批量筛选不应逐个查询价格")
+
+    results = list(screen_watchlist(['AAA', 'BBB', 'ZZZ'], 30, 45, 0.04, 0.16, "现金担保看跌期权",
+                                    provider=BatchFakeProvider()))
+    assert requests == [['AAA', 'BBB', 'ZZZ']]
+    assert {item.ticker for item in results if item.error is None} == {'AAA', 'BBB'}
+
+
+def test_quote_service_uses_flat_ttl_outside_market_hours():
+    provider = CountingQuotes()
+    # 2030-01-05 是星期六，休市期间价格同样 5 分钟后过期
+    clock = FakeClock(1893844800.0)
+    quotes = QuoteService(ttl=300, clock=clock)
+    quotes.get('AAA', provider)
+    clock.now += 301
+    quotes.get('AAA', provider)
+    assert len(provider.requests) == 2
+
+    held = QuoteService(ttl=300, market_hours_aware=True, clock=clock)
+    held.get('AAA', provider)
+    clock.now += 301
+    held.get('AAA', provider)
+    assert len(provider.requests) == 3
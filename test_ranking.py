@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+前 K 名部分选择与帕累托前沿测试
+"""
+
+import numpy as np
+import pandas as pd
+from screener_core import cli, providers
+from screener_core.ranking import RankingStream, pareto_mask, top_k
+from test_watchlist import FakeProvider
+
+
+def _candidates(rng, n, levels=6):
+    # 取值离散，制造大量相同指标值和完全相同的合约
+    return pd.DataFrame({
+        'annualizedReturn': rng.integers(0, levels, n) / 10,
+        'real_delta': rng.integers(0, levels, n) / 10,
+        'openInterest': rng.integers(0, levels, n),
+    }, index=rng.permutation(n) * 3)
+
+
+def _brute_force_front(df):
+    r = df['annualizedReturn'].to_numpy(dtype=float)
+    d = df['real_delta'].to_numpy(dtype=float)
+    q = df['openInterest'].to_numpy(dtype=float)
+    r, d, q = np.nan_to_num(r, nan=-np.inf), np.nan_to_num(d, nan=np.inf), np.nan_to_num(q, nan=-np.inf)
+    no_worse = (r[None, :] >= r[:, None]) & (d[None, :] <= d[:, None]) & (q[None, :] >= q[:, None])
+    better = (r[None, :] > r[:, None]) | (d[None, :] < d[:, None]) | (q[None, :] > q[:, None])
+    return ~(no_worse & better).any(axis=1)
+
+
+def test_top_k_matches_stable_sort():
+    rng = np.random.default_rng(7)
+    for _ in range(100):
+        df = _candidates(rng, int(rng.integers(1, 80)))
+        df.loc[df.sample(frac=0.1, random_state=1).index, 'annualizedReturn'] = np.nan
+        for k in (1, 5, len(df) // 2, len(df) + 3):
+            for ascending in (False, True):
+                expected = df.sort_values('annualizedReturn', ascending=ascending, kind='stable').head(k)
+                result = top_k(df, k, ascending=ascending)
+                assert result.index.equals(expected.index)
+
+
+def test_pareto_mask_matches_brute_force():
+    rng = np.random.default_rng(11)
+    for _ in range(200):
+        df = _candidates(rng, int(rng.integers(1, 120)), levels=int(rng.integers(2, 12)))
+        if rng.random() < 0.3:
+            df.loc[df.sample(frac=0.2, random_state=2).index, 'real_delta'] = np.nan
+        np.testing.assert_array_equal(pareto_mask(df), _brute_force_front(df))
+
+
+def test_pareto_mask_on_continuous_values():
+    rng = np.random.default_rng(3)
+    n = 3000
+    delta = rng.uniform(0, 1, n)
+    df = pd.DataFrame({
+        'annualizedReturn': delta * 2 + rng.normal(0, 0.2, n),
+        'real_delta': delta,
+        'openInterest': rng.integers(0, 5000, n),
+    })
+    np.testing.assert_array_equal(pareto_mask(df), _brute_force_front(df))
+
+
+def test_ranking_stream_top_uses_partial_selection():
+    rng = np.random.default_rng(5)
+    stream = RankingStream(3)
+    for index in (2, 0):
+        stream.add(index, pd.DataFrame({'annualizedReturn': rng.uniform(0, 1, 50)}))
+    top = stream.top(10)
+    assert stream._ranked is None
+    pd.testing.assert_frame_equal(top, stream.result().head(10))
+
+
+def test_cli_frontier_and_top(tmp_path):
+    previous = providers.get_provider()
+    providers.set_provider(FakeProvider())
+    try:
+        full, front = tmp_path / 'full.csv', tmp_path / 'front.csv'
+        args = ['screen', 'AAA', 'BBB', '--min-dte', '30', '--max-dte', '45', '--min-otm', '0.04', '--max-otm', '0.16']
+        assert cli.main(args + ['-o', str(full)]) == 0
+        assert cli.main(args + ['--frontier', '--top', '3', '-o', str(front)]) == 0
+    finally:
+        providers.set_provider(previous)
+    full_df, front_df = pd.read_csv(full), pd.read_csv(front)
+    expected = full_df[pareto_mask(full_df)].head(3)
+    assert list(front_df['contractSymbol']) == list(expected['contractSymbol'])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+向量化筛选内核测试：结果必须与旧版逐到期日筛选完全一致
+"""
+
+import pandas as pd
+from screener_core.filtering import STRATEGIES, CASH_SECURED_PUT, concat_chains, refilter_results, screen_chain
+from screener_core.pipeline import screen_ticker
+from screener_core.schema import bytes_per_row, compact_frame
+from benchmarks.synthetic import make_chains
+from benchmarks.bench_kernel import legacy_screen, kernel_screen
+from test_watchlist import FakeProvider
+
+
+def test_kernel_matches_per_expiration_screening():
+    for strategy, spec in STRATEGIES.items():
+        chains = make_chains(100.0, 8, 60, spec.option_type, seed=3)
+        expected = legacy_screen(chains, 100.0, 0.02, 0.25, strategy, 0.04, 0.01)
+        actual = kernel_screen(chains, 100.0, 0.02, 0.25, strategy, 0.04, 0.01)
+        assert not actual.empty
+        # 内核输出紧凑列类型，数值与旧版转换后的结果完全一致
+        pd.testing.assert_frame_equal(actual, compact_frame(expected))
+
+
+def test_concat_chains_skips_empty_and_aligns_dte():
+    chains = make_chains(50.0, 3, 10, 'puts', seed=1)
+    chains.insert(1, ('2030-01-01', 99, pd.DataFrame()))
+    chain_df, dtes = concat_chains(chains)
+    assert len(chain_df) == len(dtes) == 30
+    assert list(dtes[::10]) == [dte for _, dte, df in chains if not df.empty]
+
+
+def test_no_candidates_returns_empty_frame():
+    chains = make_chains(100.0, 2, 20, 'puts', seed=2)
+    chain_df, dtes = concat_chains(chains)
+    result, stats = screen_chain(chain_df, dtes, 100.0, 0.60, 0.70, CASH_SECURED_PUT)
+    assert result.empty and stats.iv_result is None
+
+
+def test_refilter_superset_matches_direct_screen():
+    provider = FakeProvider()
+    superset = screen_ticker('AAA', 1, 90, 0.01, 0.30, CASH_SECURED_PUT, provider=provider).result
+    for window in [(30, 45, 0.04, 0.16), (36, 45, 0.06, 0.12), (1, 10, 0.01, 0.30)]:
+        direct = screen_ticker('AAA', *window, CASH_SECURED_PUT, provider=provider).result
+        narrowed = refilter_results(superset, *window, CASH_SECURED_PUT, current_price=100.0)
+        if direct.empty:
+            assert narrowed.empty
+        else:
+            pd.testing.assert_frame_equal(narrowed, direct)
+
+
+def test_results_use_compact_types_without_touching_input():
+    chains = make_chains(100.0, 4, 50, 'puts', seed=4)
+    chain_df, dtes = concat_chains(chains)
+    compact = compact_frame(chain_df)
+    assert chain_df['bid'].dtype == 'float64' and compact['bid'].dtype == 'float32'
+    assert compact['currency'].dtype == 'category' and compact['volume'].dtype == 'int32'
+    assert bytes_per_row(compact) < bytes_per_row(chain_df)
+
+    result, _ = screen_chain(compact, dtes, 100.0, 0.02, 0.25, CASH_SECURED_PUT, 0.04)
+    assert result['premium'].dtype == 'float32' and result['dte'].dtype == 'int32'
+    # 排名和帕累托前沿使用的列保持 float64
+    assert result['annualizedReturn'].dtype == 'float64' and result['real_delta'].dtype == 'float64'
+    assert compact_frame(result) is result
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+筛选服务测试：通过 HTTP 筛选与本地筛选一致、多个客户端共用缓存、并发限制（回放本地录制的模拟数据，不访问网络）
+"""
+
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from screener_core import providers
+from screener_core.filtering import CASH_SECURED_PUT, IRON_CONDOR
+from screener_core.pipeline import screen_ticker
+from screener_core.providers import PooledProvider, RecordingProvider, ReplayProvider
+from screener_core.service import ScreeningService
+from screener_core.service_client import ServiceClient, ServiceError
+from screener_core.singleflight import shared_flight
+from screener_core.spreads import SpreadLimits
+from benchmarks.synthetic import SyntheticProvider, make_universe
+
+
+@pytest.fixture(scope='module')
+def fixture_dir(tmp_path_factory):
+    """把模拟数据源录制为 fixture，服务和本地筛选都从这里回放"""
+    path = tmp_path_factory.mktemp('service_fixtures')
+    universe = make_universe(n_tickers=3, n_expirations=6, strikes_per_expiration=80, seed=41)
+    recorder = RecordingProvider(SyntheticProvider(universe), str(path))
+    for symbol in universe:
+        screen_ticker(symbol, 1, 90, 0.0, 1.0, CASH_SECURED_PUT, provider=recorder)
+    return str(path), list(universe)
+
+
+def _service(fixture_dir, latency=0.0, **kwargs):
+    # 与服务进程一样：回放数据进入共享缓存，上游请求在长期线程池中执行
+    upstream = PooledProvider(ReplayProvider(fixture_dir, latency=latency, cacheable=True), 4)
+    previous = providers.get_provider()
+    providers.set_provider(upstream)
+    service = ScreeningService(**kwargs).start_background()
+    return service, upstream, previous
+
+
+def _stop(service, upstream, previous):
+    service.close()
+    upstream.close()
+    providers.set_provider(previous)
+
+
+def test_http_screen_matches_local(fixture_dir):
+    path, symbols = fixture_dir
+    service, upstream, previous = _service(path)
+    try:
+        client = ServiceClient(service.url)
+        assert client.health() == {'status': 'ok'}
+        local = screen_ticker(symbols[0], 1, 90, 0.02, 0.3, CASH_SECURED_PUT, provider=ReplayProvider(path))
+        remote = client.screen_ticker(symbols[0], 1, 90, 0.02, 0.3, CASH_SECURED_PUT)
+        assert remote.error is None and remote.current_price == local.current_price
+        # 列类型（float32、类别等）和取值都原样还原
+        pd.testing.assert_frame_equal(remote.result.reset_index(drop=True), local.result.reset_index(drop=True))
+        np.testing.assert_array_equal(remote.surface.total_variance, local.surface.total_variance)
+        assert remote.messages == local.messages
+
+        condor = client.screen_ticker(symbols[0], 1, 90, 0.02, 0.3, IRON_CONDOR,
+                                      spread_limits=SpreadLimits(10.0, 0.1))
+        assert not condor.result.empty and (condor.result['width'] <= 10.0).all()
+        missing = client.screen_ticker('ZZZ', 1, 90, 0.02, 0.3, 'put')
+        assert missing.result is None and missing.error
+
+        expirations = client.get_expirations(symbols[0])
+        chain = client.get_option_chain(symbols[0], expirations[0])
+        recorded = ReplayProvider(path).get_option_chain(symbols[0], expirations[0])
+        assert chain.puts['strike'].tolist() == recorded.puts['strike'].tolist()
+        assert len(chain.calls) == len(recorded.calls)
+    finally:
+        _stop(service, upstream, previous)
+
+
+def test_watchlist_streams_and_clients_share_cache(fixture_dir):
+    path, symbols = fixture_dir
+    service, upstream, previous = _service(path, latency=0.05)
+    try:
+        before = shared_flight().stats()['by_kind'].get('chain', {}).get('upstream', 0)
+        clients = [ServiceClient(service.url) for _ in range(4)]
+        results = [None] * len(clients)
+
+        def run(i):
+            results[i] = list(clients[i].screen_watchlist([*symbols, 'ZZZ'], 1, 90, 0.02, 0.3, 'put'))
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(clients))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for items in results:
+            assert sorted(item.ticker for item in items) == sorted([*symbols, 'ZZZ'])
+            assert sum(item.error is not None for item in items) == 1
+        # 四个客户端同时筛选，每个到期日的期权链只向上游请求一次
+        stats = clients[0].stats()
+        chains = stats['flight']['by_kind']['chain']['upstream'] - before
+        assert chains == len(symbols) * 6
+        assert stats['cache']['hits'] + stats['flight']['by_kind']['chain']['coalesced'] > 0
+        assert stats['service']['requests']['/watchlist'] == 4
+    finally:
+        _stop(service, upstream, previous)
+
+
+def test_concurrency_limit_rejects_overflow(fixture_dir):
+    path, symbols = fixture_dir
+    service, upstream, previous = _service(path, latency=0.2, max_concurrent=1, max_pending=0)
+    try:
+        client = ServiceClient(service.url)
+        first = threading.Thread(target=client.screen_ticker, args=(symbols[1], 1, 90, 0.02, 0.3, 'put'))
+        first.start()
+        deadline = time.monotonic() + 5
+        while client.stats()['service']['active'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with pytest.raises(ServiceError) as error:
+            client.screen_ticker(symbols[2], 1, 90, 0.02, 0.3, 'put')
+        assert error.value.status == 503
+        first.join()
+        assert client.stats()['service']['rejected'] == 1
+        # 执行位置释放后可以继续处理请求
+        assert client.screen_ticker(symbols[2], 1, 90, 0.02, 0.3, 'put').error is None
+    finally:
+        _stop(service, upstream, previous)
+
+
+def test_bad_requests(fixture_dir):
+    path, symbols = fixture_dir
+    service, upstream, previous = _service(path)
+    try:
+        client = ServiceClient(service.url)
+        for call, status in [
+            (lambda: client._json('/screen', {'ticker': 'AAA', 'strategy': 'nope'}), 400),
+            (lambda: client._json('/screen', {'ticker': 'AAA', 'min_dte': 'x'}), 400),
+            (lambda: client._json('/screen', {}), 400),
+            (lambda: client._json('/screen'), 405),
+            (lambda: client._json('/unknown'), 404),
+            (lambda: client.get_option_chain(symbols[0], '1999-01-01'), 502),
+            # 股票代码和到期日会成为缓存文件路径，格式不对时在接口边界拒绝
+            (lambda: client.get_option_chain('../..', '2030-01-18'), 400),
+            (lambda: client.get_option_chain(symbols[0], '../2030-01-18'), 400),
+            (lambda: client.get_option_chain(symbols[0], '2030-02-30'), 400),
+            (lambda: client.get_expirations('a/b'), 400),
+            (lambda: client._json('/screen', {'ticker': '..'}), 400),
+            (lambda: client._json('/watchlist', {'tickers': ['SPY', '../etc']}), 400),
+        ]:
+            with pytest.raises(ServiceError) as error:
+                call()
+            assert error.value.status == status
+        with pytest.raises(ServiceError) as error:
+            ServiceClient('http://127.0.0.1:9', timeout=1).health()
+        assert error.value.status is None
+    finally:
+        _stop(service, upstream, previous)
+
+
+def test_pooled_provider_uses_long_lived_threads(fixture_dir):
+    path, symbols = fixture_dir
+    seen = set()
+
+    class Tracking(ReplayProvider):
+        def get_option_chain(self, symbol, expiration):
+            seen.add(threading.current_thread().name)
+            return super().get_option_chain(symbol, expiration)
+
+    pooled = PooledProvider(Tracking(path), size=2)
+    try:
+        for symbol in symbols:
+            assert screen_ticker(symbol, 1, 90, 0.02, 0.3, CASH_SECURED_PUT, provider=pooled).error is None
+    finally:
+        pooled.close()
+    # 多次筛选的全部请求都在同一组两个线程中执行
+    assert 1 <= len(seen) <= 2 and all(name.startswith('upstream') for name in seen)
+
+
+def test_client_does_not_load_server_modules():
+    code = ("import sys, screener_core.service_client; "
+            "print(sorted(m for m in ('screener_core.service', 'screener_core.pipeline', "
+            "'screener_core.chain_cache', 'screener_core.quotes', 'pandas') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
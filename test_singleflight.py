@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+请求合并（single-flight）测试（使用本地模拟数据，不访问网络）
+"""
+
+import threading
+import time
+from collections import Counter
+import pandas as pd
+import pytest
+from screener_core.chain_cache import shared_cache
+from screener_core.pipeline import screen_ticker
+from screener_core.singleflight import SingleFlight
+from benchmarks.synthetic import SyntheticProvider, make_universe
+
+
+def _run_concurrently(n, target):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_upstream_request():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'chain'
+
+    results = _run_concurrently(8, lambda: flight.do(('chain', 'SPY', '2030-01-18'), fetch))
+    assert results == ['chain'] * 8
+    assert len(calls) == 1
+    stats = flight.stats()
+    assert stats['upstream'] == 1 and stats['coalesced'] == 7 and stats['in_flight'] == 0
+    assert stats['by_kind'] == {'chain': {'upstream': 1, 'coalesced': 7}}
+
+    # 请求完成后不再合并，下一次调用重新访问数据源
+    assert flight.do(('chain', 'SPY', '2030-01-18'), fetch) == 'chain'
+    assert len(calls) == 2
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.2)
+        raise TimeoutError("upstream timeout")
+
+    results = _run_concurrently(4, lambda: flight.do(('chain', 'SPY', '2030-01-18'), fail))
+    assert all(isinstance(result, TimeoutError) for result in results)
+    assert flight.stats()['upstream'] == 1
+    with pytest.raises(TimeoutError):
+        flight.do(('chain', 'SPY', '2030-01-18'), fail)
+
+
+class CountingProvider(SyntheticProvider):
+    """可缓存的慢速数据源，记录每种请求访问上游的次数"""
+
+    cacheable = True
+
+    def __init__(self, universe):
+        super().__init__(universe)
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+        time.sleep(0.1)
+
+    def get_price(self, symbol):
+        self._count('price')
+        return super().get_price(symbol)
+
+    def get_expirations(self, symbol):
+        self._count('expirations')
+        return super().get_expirations(symbol)
+
+    def get_option_chain(self, symbol, expiration):
+        self._count('chain')
+        return super().get_option_chain(symbol, expiration)
+
+
+def test_concurrent_sessions_fetch_each_chain_once():
+    universe = make_universe(n_tickers=1, n_expirations=6, strikes_per_expiration=40, seed=11)
+    symbol = next(iter(universe))
+    provider = CountingProvider(universe)
+    shared_cache().clear()
+    try:
+        results = _run_concurrently(6, lambda: screen_ticker(
+            symbol, 1, 90, 0.01, 0.3, "现金担保看跌期权", provider=provider))
+    finally:
+        shared_cache().clear()
+
+    assert provider.calls['chain'] == 6
+    assert provider.calls['expirations'] == 1
+    assert provider.calls['price'] == 1
+    for result in results[1:]:
+        pd.testing.assert_frame_equal(result.result, results[0].result)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+期权链历史快照测试（使用本地模拟数据，不访问网络）
+"""
+
+from datetime import date
+import pandas as pd
+import pytest
+from screener_core import cli, providers, snapshots
+from screener_core.chain_cache import HAS_PYARROW, MARKET_TZ
+from screener_core.pipeline import screen_ticker
+from screener_core.snapshots import SnapshotReader, SnapshotWriter
+from benchmarks.synthetic import make_chains
+from test_watchlist import FakeProvider
+
+pytestmark = pytest.mark.skipif(not HAS_PYARROW, reason="需要 pyarrow")
+
+
+def _fetched(chains, fetched_at):
+    for _, _, df in chains:
+        df.attrs['fetched_at'] = fetched_at
+    return chains
+
+
+def test_write_and_query_with_pushdown(tmp_path):
+    writer = SnapshotWriter(str(tmp_path))
+    # 2030-01-02 与 2030-01-03 两天，两个股票
+    day1, day2 = 1893600000.0, 1893686400.0
+    for symbol, spot in (('AAA', 100.0), ('BBB', 50.0)):
+        for fetched_at in (day1, day2):
+            chains = _fetched(make_chains(spot, 4, 20, 'puts', symbol=symbol, first_dte=10), fetched_at)
+            assert writer.write(symbol, spot, 'puts', chains) is not None
+    # 同一份数据不会重复写入
+    assert writer.write('AAA', 100.0, 'puts', chains) is None
+
+    reader = SnapshotReader(str(tmp_path))
+    assert reader.tickers() == ['AAA', 'BBB']
+    assert reader.dates('AAA') == [date(2030, 1, 2), date(2030, 1, 3)]
+
+    df = reader.query(['aaa'], start='2030-01-03', min_dte=15, max_dte=30, min_strike=90, max_strike=110)
+    assert set(df['ticker']) == {'AAA'}
+    assert set(df['date']) == {'2030-01-03'}
+    assert df['dte'].between(15, 30).all()
+    assert df['strike'].between(90, 110).all()
+    assert (df['spot'] == 100.0).all()
+    assert len(df) > 0
+
+    exp = df['expiration'].iloc[0]
+    assert set(reader.query(expirations=[exp], columns=['expiration'])['expiration']) == {exp}
+
+
+def _market_time(days, hour):
+    """今天之后第 days 天美东 hour 点的时间戳（合成期权链的到期日以今天为基准）"""
+    day = pd.Timestamp(date.today()) + pd.Timedelta(days=days, hours=hour)
+    return day.tz_localize(MARKET_TZ or 'UTC').timestamp()
+
+
+def test_chains_at_returns_latest_snapshot(tmp_path):
+    writer = SnapshotWriter(str(tmp_path))
+    first = _fetched(make_chains(100.0, 2, 10, 'puts', seed=1, first_dte=30), _market_time(0, 10))
+    second = _fetched(make_chains(100.0, 2, 10, 'puts', seed=2, first_dte=30), _market_time(0, 11))
+    writer.write('AAA', 100.0, 'puts', first)
+    writer.write('AAA', 101.0, 'puts', second)
+
+    chains = SnapshotReader(str(tmp_path)).chains_at('AAA', pd.Timestamp(_market_time(0, 10.5), unit='s', tz='UTC'))
+    assert [exp for exp, _, _ in chains] == [exp for exp, _, _ in first]
+    for (_, _, restored), (_, _, original) in zip(chains, first):
+        assert list(restored['contractSymbol']) == list(original['contractSymbol'])
+        assert restored['bid'].tolist() == original['bid'].tolist()
+
+
+def test_chains_at_drops_expirations_from_earlier_days(tmp_path):
+    writer = SnapshotWriter(str(tmp_path))
+    # 第 0 天记录 5-40 天到期的期权链，第 20 天记录 60-74 天（即当时 40-54 天）到期的期权链
+    early = _fetched(make_chains(100.0, 6, 10, 'puts', seed=1, first_dte=5), _market_time(0, 10))
+    late = _fetched(make_chains(100.0, 3, 10, 'puts', seed=2, first_dte=60), _market_time(20, 10))
+    writer.write('AAA', 100.0, 'puts', early)
+    writer.write('AAA', 100.0, 'puts', late)
+
+    reader = SnapshotReader(str(tmp_path))
+    scanned = []
+    dataset = reader._dataset
+    reader._dataset = lambda files: scanned.append(files) or dataset(files)
+    when = pd.Timestamp(_market_time(20, 10) + 60, unit='s', tz='UTC')
+    chains = reader.chains_at('AAA', when)
+    # 第 0 天的到期日（已过期或未出现在最近一次获取中）都不返回，到期天数按第 20 天计算
+    today = snapshots.market_date(when.timestamp())
+    assert [exp for exp, _, _ in chains] == [exp for exp, _, _ in late]
+    assert [dte for _, dte, _ in chains] == [(date.fromisoformat(exp) - today).days for exp, _, _ in late]
+    assert [dte for _, dte, _ in chains] == [40, 47, 54]
+    # 只扫描第 20 天的分区
+    assert len(scanned) == 1 and all(f"date={today.isoformat()}" in path for path in scanned[0])
+
+    # 第 0 天之后、第 20 天之前的时刻看到的仍是第 0 天记录的期权链
+    chains = reader.chains_at('AAA', pd.Timestamp(_market_time(3, 12), unit='s', tz='UTC'))
+    assert [dte for _, dte, _ in chains] == [2, 9, 16, 23, 30, 37]
+    assert reader.chains_at('AAA', pd.Timestamp(_market_time(0, 9), unit='s', tz='UTC')) == []
+
+
+def test_screen_records_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setenv('OPTION_SCREENER_SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setattr(snapshots, '_shared_writer', None)
+    screen_ticker('AAA', 30, 45, 0.04, 0.16, "现金担保看跌期权", provider=FakeProvider())
+    df = SnapshotReader(str(tmp_path)).query(['AAA'])
+    assert len(df) == 10
+    assert (df['option_type'] == 'puts').all()
+
+    out = tmp_path / 'out.csv'
+    assert cli.main(['snapshots', 'AAA', '--dir', str(tmp_path), '--min-strike', '90', '-o', str(out)]) == 0
+    assert pd.read_csv(out)['strike'].min() >= 90
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+多腿组合筛选测试：与逐个组合的暴力枚举结果一致（使用本地模拟数据，不访问网络）
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from screener_core import cli, providers
+from screener_core.filtering import BULL_PUT_SPREAD, BEAR_CALL_SPREAD, IRON_CONDOR, SHORT_STRANGLE, refilter_results
+from screener_core.pipeline import apply_surface, screen_ticker, stream_ticker
+from screener_core.providers import OptionChain
+from screener_core.ranking import RankingStream
+from screener_core.spreads import SpreadLimits, screen_spreads
+from benchmarks.synthetic import SyntheticProvider, make_option_chain, make_universe
+
+SPOT = 100.0
+
+
+def _chain(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return OptionChain(calls=make_option_chain(SPOT, 30, n, 'calls', rng),
+                       puts=make_option_chain(SPOT, 30, n, 'puts', rng))
+
+
+def _quotes(df):
+    strike = df['strike'].to_numpy()
+    bid, ask, last = (df[c].to_numpy(dtype=float) for c in ('bid', 'ask', 'lastPrice'))
+    sell = np.where(bid > 0, bid, last)
+    buy = np.where(ask > 0, ask, last)
+    return strike, sell, buy
+
+
+def _brute_verticals(df, side, min_otm, max_otm, limits):
+    strike, sell, buy = _quotes(df)
+    if side == 'puts':
+        lo, hi = SPOT * (1 - max_otm), SPOT * (1 - min_otm)
+    else:
+        lo, hi = SPOT * (1 + min_otm), SPOT * (1 + max_otm)
+    found = {}
+    for i in range(len(df)):
+        if not (lo <= strike[i] <= hi and sell[i] > 0):
+            continue
+        for j in range(len(df)):
+            width = strike[i] - strike[j] if side == 'puts' else strike[j] - strike[i]
+            credit = sell[i] - buy[j]
+            if not (0 < width <= limits.max_width and buy[j] > 0 and 0 < credit < width):
+                continue
+            risk = width - credit
+            if credit >= limits.min_credit and (limits.max_loss is None or risk * 100 <= limits.max_loss):
+                found[(strike[i], strike[j])] = (credit, risk)
+    return found
+
+
+def test_verticals_match_brute_force():
+    chain = _chain()
+    for strategy, side, short_col, long_col in [(BULL_PUT_SPREAD, 'puts', 'shortPut', 'longPut'),
+                                                (BEAR_CALL_SPREAD, 'calls', 'shortCall', 'longCall')]:
+        for limits in [SpreadLimits(10, 0.05, None), SpreadLimits(6, 0.2, 400)]:
+            result, _ = screen_spreads(chain, 30, SPOT, 0.02, 0.3, strategy, 0.04, 0.0, limits)
+            expected = _brute_verticals(getattr(chain, side), side, 0.02, 0.3, limits)
+            assert len(expected) > 0
+            actual = {(row[short_col], row[long_col]): (row['premium'], row['collateral'] / 100)
+                      for _, row in result.iterrows()}
+            assert actual.keys() == expected.keys()
+            for key, (credit, risk) in expected.items():
+                np.testing.assert_allclose(actual[key], (credit, risk), rtol=1e-5)
+
+
+def test_iron_condor_keeps_best_wings_per_short_pair():
+    chain = _chain(30, seed=3)
+    limits = SpreadLimits(8, 0.1, None)
+    result, _ = screen_spreads(chain, 30, SPOT, 0.02, 0.3, IRON_CONDOR, 0.04, 0.0, limits)
+    puts = _brute_verticals(chain.puts, 'puts', 0.02, 0.3, SpreadLimits(8, 0.0, None))
+    calls = _brute_verticals(chain.calls, 'calls', 0.02, 0.3, SpreadLimits(8, 0.0, None))
+    best = {}
+    for (sp, lp), (pc, pr) in puts.items():
+        for (sc, lc), (cc, cr) in calls.items():
+            credit = pc + cc
+            risk = max(sp - lp, lc - sc) - credit
+            if credit < limits.min_credit or risk <= 0:
+                continue
+            ratio = credit / risk
+            if ratio > best.get((sp, sc), (-np.inf,))[0]:
+                best[(sp, sc)] = (ratio, lp, lc)
+    assert len(best) > 0
+    assert len(result) == len(best)
+    for _, row in result.iterrows():
+        ratio, lp, lc = best[(row['shortPut'], row['shortCall'])]
+        assert (row['longPut'], row['longCall']) == (lp, lc)
+        np.testing.assert_allclose(row['returnOnRisk'], ratio / 100 * 100, rtol=1e-5)
+
+
+def test_strangle_uses_naked_margin_and_short_delta():
+    chain = _chain(30, seed=5)
+    result, _ = screen_spreads(chain, 30, SPOT, 0.05, 0.2, SHORT_STRANGLE, 0.04, 0.0, SpreadLimits(min_credit=0.0))
+    assert not result.empty
+    assert result['longPut'].isna().all() and result['longCall'].isna().all()
+    row = result.iloc[0]
+    _, p_sell, _ = _quotes(chain.puts[chain.puts['strike'] == row['shortPut']])
+    _, c_sell, _ = _quotes(chain.calls[chain.calls['strike'] == row['shortCall']])
+    put_req = p_sell[0] + max(0.2 * SPOT - (SPOT - row['shortPut']), 0.1 * row['shortPut'])
+    call_req = c_sell[0] + max(0.2 * SPOT - (row['shortCall'] - SPOT), 0.1 * SPOT)
+    margin = max(put_req + c_sell[0], call_req + p_sell[0])
+    assert row['collateral'] == np.float64(margin * 100)
+    assert (result['real_delta'] >= result['delta'].abs() - 1e-6).all()
+
+
+def test_pipeline_streaming_and_refilter_match_direct_screen():
+    universe = make_universe(n_tickers=1, n_expirations=6, strikes_per_expiration=150, seed=11)
+    provider = SyntheticProvider(universe)
+    symbol = next(iter(universe))
+    spot = universe[symbol][0]
+    for strategy in (BULL_PUT_SPREAD, IRON_CONDOR, SHORT_STRANGLE):
+        limits = SpreadLimits(10, 0.05, None)
+        batch = screen_ticker(symbol, 1, 90, 0.01, 0.3, strategy, provider=provider, spread_limits=limits).result
+        assert not batch.empty
+
+        stream = None
+        for update in stream_ticker(symbol, 1, 90, 0.01, 0.3, strategy, provider=provider, spread_limits=limits):
+            stream = stream or RankingStream(update.total)
+            stream.add(update.index, update.result)
+        # 多腿组合结果不添加曲面列
+        assert apply_surface(stream.result(), update.surface, spot, strategy) is stream.result()
+        pd.testing.assert_frame_equal(stream.result(), batch)
+
+        direct = screen_ticker(symbol, 10, 30, 0.04, 0.16, strategy, provider=provider, spread_limits=limits).result
+        narrowed = refilter_results(batch, 10, 30, 0.04, 0.16, strategy, current_price=spot)
+        assert not direct.empty
+        # 组合结果的索引只是到期日内的序号，年化收益率相同的组合先后顺序也可能不同，按合约代码对齐后比较
+        assert narrowed['annualizedReturn'].is_monotonic_decreasing
+        pd.testing.assert_frame_equal(narrowed.sort_values('contractSymbol', ignore_index=True),
+                                      direct.sort_values('contractSymbol', ignore_index=True))
+
+
+def test_full_chain_condor_screens_in_seconds():
+    rng = np.random.default_rng(0)
+    chains = [OptionChain(calls=make_option_chain(450.0, dte, 400, 'calls', rng, 'SPY'),
+                          puts=make_option_chain(450.0, dte, 400, 'puts', rng, 'SPY'))
+              for dte in range(7, 70, 7)]
+    start = time.perf_counter()
+    total = 0
+    for dte, chain in zip(range(7, 70, 7), chains):
+        result, _ = screen_spreads(chain, dte, 450.0, 0.01, 0.3, IRON_CONDOR, 0.04, 0.0,
+                                   SpreadLimits(10, 0.1, None))
+        total += len(result)
+    assert total > 1000
+    assert time.perf_counter() - start < 10
+
+
+def test_cli_condor(tmp_path):
+    universe = make_universe(n_tickers=2, n_expirations=4, strikes_per_expiration=150, seed=13)
+    previous = providers.get_provider()
+    providers.set_provider(SyntheticProvider(universe))
+    try:
+        output = tmp_path / 'condor.csv'
+        assert cli.main(['screen', *universe, '--strategy', 'condor', '--min-dte', '1', '--max-dte', '30',
+                         '--min-otm', '0.02', '--max-otm', '0.2', '--min-credit', '0.05', '-o', str(output)]) == 0
+    finally:
+        providers.set_provider(previous)
+    df = pd.read_csv(output)
+    assert not df.empty
+    assert (df['shortPut'] < df['shortCall']).all()
+    assert df['annualizedReturn'].is_monotonic_decreasing
@@ -5,7 +5,7 @@
 
 import sys
 import pandas as pd
-from option_screener_gui import (
+from screener_core import (
     get_stock_data, 
     find_potential_expirations,
     analyze_and_filter_puts,
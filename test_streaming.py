@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+逐个到期日流式筛选测试（使用本地模拟数据，不访问网络）
+"""
+
+import random
+import time
+import pandas as pd
+from screener_core.filtering import STRATEGIES
+from screener_core.pipeline import apply_surface, screen_ticker, stream_ticker
+from screener_core.ranking import RankingStream
+from screener_core.status import StatusLog
+from benchmarks.synthetic import SyntheticProvider, make_universe
+
+
+class SlowProvider(SyntheticProvider):
+    """每个期权链随机延迟返回，打乱完成顺序"""
+
+    def __init__(self, universe, slow=None):
+        super().__init__(universe)
+        self.slow = slow
+        self._random = random.Random(1)
+
+    def get_option_chain(self, symbol, expiration):
+        time.sleep(2.0 if expiration == self.slow else self._random.uniform(0, 0.02))
+        return super().get_option_chain(symbol, expiration)
+
+
+UNIVERSE = make_universe(n_tickers=1, n_expirations=10, strikes_per_expiration=80, seed=5)
+SYMBOL = next(iter(UNIVERSE))
+
+
+def test_stream_matches_batch_screen():
+    provider = SlowProvider(UNIVERSE)
+    for strategy in STRATEGIES:
+        expected = screen_ticker(SYMBOL, 1, 90, 0.01, 0.3, strategy, provider=provider)
+        status = StatusLog()
+        stream = None
+        for update in stream_ticker(SYMBOL, 1, 90, 0.01, 0.3, strategy, provider=provider, status=status):
+            stream = stream or RankingStream(update.total)
+            stream.add(update.index, update.result)
+            assert (update.surface is not None) == (update.completed == update.total)
+        assert stream.received == len(provider.get_expirations(SYMBOL))
+        result = apply_surface(stream.result(), update.surface, update.current_price, strategy, status=status)
+        pd.testing.assert_frame_equal(result, expected.result)
+        assert status.messages == expected.messages
+
+
+def test_first_result_arrives_before_slowest_chain():
+    expirations = [exp for exp, _, _ in UNIVERSE[SYMBOL][1]['puts']]
+    provider = SlowProvider(UNIVERSE, slow=expirations[0])
+    start = time.monotonic()
+    updates = stream_ticker(SYMBOL, 1, 90, 0.01, 0.3, "现金担保看跌期权", max_workers=4, provider=provider)
+    first = next(updates)
+    assert time.monotonic() - start < 1.0
+    assert first.expiration != expirations[0]
+    remaining = list(updates)
+    assert remaining[-1].completed == remaining[-1].total == len(expirations)
+
+
+def test_stream_reports_missing_price():
+    status = StatusLog()
+    assert list(stream_ticker('NOPE', 1, 90, 0.01, 0.3, "现金担保看跌期权",
+                              provider=SyntheticProvider(UNIVERSE), status=status)) == []
+    assert status.errors()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+耗时埋点与指标导出测试（使用本地模拟数据，不访问网络）
+"""
+
+import urllib.request
+import pytest
+from screener_core import cli, providers
+from screener_core.pipeline import screen_ticker
+from screener_core.tracing import StageMetrics, render_prometheus, serve_metrics, span, trace
+from benchmarks.synthetic import SyntheticProvider, make_universe
+from test_watchlist import FakeProvider
+
+
+def test_stage_quantiles():
+    metrics = StageMetrics(window=100)
+    for ms in range(1, 201):
+        metrics.observe('option_chain', ms / 1000)
+    stage = metrics.snapshot()['option_chain']
+    # 总次数和总耗时覆盖全部样本，分位数只取最近 100 个（101-200ms）
+    assert stage['count'] == 200
+    assert stage['sum'] == pytest.approx(sum(range(1, 201)) / 1000)
+    assert stage['quantiles'] == pytest.approx({0.5: 0.150, 0.95: 0.195, 0.99: 0.199})
+
+
+def test_trace_collects_spans_from_fetch_threads():
+    universe = make_universe(n_tickers=1, n_expirations=5, strikes_per_expiration=40, seed=3)
+    symbol = next(iter(universe))
+    with trace('screen') as item:
+        result = screen_ticker(symbol, 1, 90, 0.01, 0.3, "现金担保看跌期权", provider=SyntheticProvider(universe))
+    assert not result.result.empty
+
+    spans = item.frame()
+    chains = spans[spans['stage'] == 'option_chain']
+    assert len(chains) == 5
+    assert chains['label'].is_unique
+    assert set(chains['thread']) != {'MainThread'}
+    assert {'price', 'expirations', 'filter', 'rank'} <= set(spans['stage'])
+    assert (spans['start'] >= 0).all() and (spans['duration'] >= 0).all()
+    assert list(item.totals()['option_chain'])[0] == 5
+
+    # 不在 trace 中的 span 只计入进程内统计
+    with span('outside'):
+        pass
+    assert 'outside' not in set(item.frame()['stage'])
+
+
+def test_prometheus_export_and_endpoint():
+    metrics = StageMetrics()
+    metrics.observe('filter', 0.004)
+    text = render_prometheus(
+        metrics,
+        cache_stats={'hits': 3, 'disk_hits': 1, 'misses': 4, 'bytes': 2048, 'hit_rate': 0.5},
+        flight_stats={'by_kind': {'chain': {'upstream': 4, 'coalesced': 6}}},
+    )
+    assert 'option_screener_stage_seconds{stage="filter",quantile="0.99"} 0.004000' in text
+    assert 'option_screener_stage_seconds_count{stage="filter"} 1' in text
+    assert 'option_screener_chain_cache_hit_ratio 0.500000' in text
+    assert 'option_screener_coalesced_requests_total{kind="chain"} 6' in text
+
+    server = serve_metrics(0)
+    url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+    with urllib.request.urlopen(url, timeout=5) as response:
+        body = response.read().decode('utf-8')
+    assert '# TYPE option_screener_stage_seconds summary' in body
+
+
+def test_cli_writes_metrics_file(tmp_path, capsys):
+    previous = providers.get_provider()
+    providers.set_provider(FakeProvider())
+    try:
+        metrics_file = tmp_path / 'screener.prom'
+        code = cli.main(['screen', 'AAA', '--min-dte', '30', '--max-dte', '45', '--timings',
+                         '--metrics-file', str(metrics_file), '-o', str(tmp_path / 'out.csv')])
+    finally:
+        providers.set_provider(previous)
+    assert code == 0
+    assert 'option_screener_stage_seconds_count{stage="option_chain"}' in metrics_file.read_text(encoding='utf-8')
+    assert '筛选各阶段累计' in capsys.readouterr().err
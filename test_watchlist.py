@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+自选股批量筛选测试（使用本地模拟数据，不访问网络）
+"""
+
+from datetime import date, timedelta
+import pandas as pd
+from screener_core.providers import MarketDataProvider, OptionChain
+from screener_core.formatting import format_display_df
+from screener_core.pipeline import parse_watchlist, screen_watchlist
+from screener_core.ranking import rank_watchlist_results
+
+PRICES = {'AAA': 100.0, 'BBB': 50.0, 'CCC': 20.0}
+
+
+class FakeProvider(MarketDataProvider):
+    """本地模拟数据源：每个股票两个到期日，CCC 的期权链总是获取失败"""
+
+    name = 'fake'
+    cacheable = False
+
+    def get_price(self, symbol):
+        return PRICES.get(symbol)
+
+    def get_expirations(self, symbol):
+        return [(date.today() + timedelta(days=d)).isoformat() for d in (35, 42)]
+
+    def get_option_chain(self, symbol, expiration):
+        if symbol == 'CCC':
+            raise RuntimeError("模拟网络错误")
+        price = PRICES[symbol]
+        strikes = [price * f for f in (0.85, 0.9, 0.95, 1.05, 1.1)]
+        chain = pd.DataFrame({
+            'contractSymbol': [f"{symbol}{expiration}{k:.0f}" for k in strikes],
+            'strike': strikes,
+            'bid': [k / price for k in strikes],
+            'lastPrice': [1.0] * len(strikes),
+            'volume': [10] * len(strikes),
+            'openInterest': [100] * len(strikes),
+        })
+        return OptionChain(calls=chain, puts=chain.copy())
+
+
+def test_parse_watchlist():
+    assert parse_watchlist("aapl, msft\nSPY  aapl，qqq") == ['AAPL', 'MSFT', 'SPY', 'QQQ']
+
+
+def test_watchlist_ranks_across_tickers_and_reports_failures():
+    tickers = ['AAA', 'BBB', 'CCC', 'ZZZ']
+    results = list(screen_watchlist(tickers, 30, 45, 0.04, 0.16, "现金担保看跌期权", max_workers=3,
+                                    provider=FakeProvider()))
+    assert sorted(item.ticker for item in results) == sorted(tickers)
+
+    by_ticker = {item.ticker: item for item in results}
+    assert by_ticker['ZZZ'].error is not None
+    assert by_ticker['AAA'].error is None
+    # 所有到期日都失败时结果为空，但提示被记录下来
+    assert by_ticker['CCC'].result.empty
+    assert any(kind == 'warning' for kind, _ in by_ticker['CCC'].messages)
+
+    ranked = rank_watchlist_results(results)
+    assert set(ranked['ticker']) == {'AAA', 'BBB'}
+    assert ranked['annualizedReturn'].is_monotonic_decreasing
+    assert len(ranked) == 12
+
+    display = format_display_df(ranked)
+    assert list(display.columns)[0] == '股票代码'
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+自选股批量筛选（无界面版本）
+
+等同于 `python -m screener_core screen`，保留该脚本以兼容已有的定时任务。
+
+用法示例:
+    python watchlist_screener.py AAPL MSFT SPY --strategy put -o results.csv
+    python watchlist_screener.py --file watchlist.txt --min-dte 20 --max-dte 45
+"""
+
+import sys
+from screener_core.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main(['screen'] + sys.argv[1:]))